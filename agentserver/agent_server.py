@@ -10,6 +10,7 @@ import logging
 import httpx
 import os
 import sys
+import time
 from typing import Dict, Any, Optional
 from datetime import datetime
 
@@ -25,6 +26,13 @@ from agentserver.openclaw.embedded_runtime import get_embedded_runtime, Embedded
 # 配置日志
 logger = logging.getLogger(__name__)
 
+# 旅行监控：订阅 Gateway 活动事件唤醒，事件不可用时按心跳间隔检查
+TRAVEL_HEARTBEAT_SECONDS = 30
+# 收到活动事件后再等一会儿，把同一批连续的工具结果合并为一次分析
+TRAVEL_EVENT_SETTLE_SECONDS = 2.0
+# 事件订阅连接失败后的重试间隔
+TRAVEL_WATCHER_RETRY_SECONDS = 300
+
 
 def _track_travel_task(session_id: str, task: asyncio.Task) -> None:
     Modules.travel_tasks[session_id] = task
@@ -1839,7 +1847,8 @@ async def _run_travel_session(session_id: str, *, resumed: bool = False):
     from apiserver.travel_service import (
         append_progress_event,
         load_session, save_session, TravelStatus,
-        analyze_history,
+        fold_history,
+        get_session_mtime_ns,
         build_forum_post_payload,
         build_quota_warning_prompt,
         build_social_prompt,
@@ -1849,6 +1858,7 @@ async def _run_travel_session(session_id: str, *, resumed: bool = False):
         set_session_phase,
         sync_session_browser_policy,
     )
+    from agentserver.openclaw.ws_client import SessionActivityWatcher
     from agentserver.travel_notifications import (
         build_travel_full_report_message,
         deliver_travel_completion_notifications,
@@ -1926,17 +1936,37 @@ async def _run_travel_session(session_id: str, *, resumed: bool = False):
         f"agent={session.agent_name or session.agent_id or 'default'}"
     )
 
-    def _apply_history_analysis(current_session, analysis) -> None:
-        current_session.discoveries = analysis.discoveries
-        current_session.social_interactions = analysis.social_interactions
-        current_session.credits_used = analysis.credits_used
-        current_session.tool_stats = analysis.tool_stats
-        current_session.sources = list(getattr(analysis, "sources", []) or [])
-        current_session.unique_sources = len(current_session.sources)
-        if getattr(analysis, "summary_report_path", None):
-            current_session.summary_report_path = analysis.summary_report_path
-        if getattr(analysis, "summary_report_title", None):
-            current_session.summary_report_title = analysis.summary_report_title
+    travel_watcher: Optional[SessionActivityWatcher] = None
+    watcher_retry_at = 0.0
+
+    async def _ensure_travel_watcher() -> Optional[SessionActivityWatcher]:
+        nonlocal travel_watcher, watcher_retry_at
+        if travel_watcher is not None and travel_watcher.connected:
+            return travel_watcher
+        if travel_watcher is not None:
+            await travel_watcher.close()
+            travel_watcher = None
+        if time.monotonic() < watcher_retry_at:
+            return None
+        watcher = SessionActivityWatcher(
+            travel_client.config.gateway_url,
+            travel_client.config.gateway_token,
+            session_key,
+        )
+        if await watcher.start():
+            travel_watcher = watcher
+        else:
+            watcher_retry_at = time.monotonic() + TRAVEL_WATCHER_RETRY_SECONDS
+            logger.info(f"[旅行] Gateway 事件订阅不可用，按 {TRAVEL_HEARTBEAT_SECONDS}s 心跳检查: {session_id}")
+        return travel_watcher
+
+    async def _wait_travel_activity() -> bool:
+        """等待会话上的新活动，最长一个心跳间隔；返回是否由事件唤醒"""
+        watcher = await _ensure_travel_watcher()
+        if watcher is None:
+            await asyncio.sleep(TRAVEL_HEARTBEAT_SECONDS)
+            return False
+        return await watcher.wait(TRAVEL_HEARTBEAT_SECONDS, settle=TRAVEL_EVENT_SETTLE_SECONDS)
 
     async def _send_to_travel_client(**kwargs):
         if session.agent_id:
@@ -1948,8 +1978,13 @@ async def _run_travel_session(session_id: str, *, resumed: bool = False):
                     raise RuntimeError(f"干员 [{inst.name}] 客户端未就绪")
                 return await inst.client.send_message(**kwargs)
 
-            return await Modules.instance_manager.run_serialized(session.agent_id, _worker)
-        return await travel_client.send_message(**kwargs)
+            task = await Modules.instance_manager.run_serialized(session.agent_id, _worker)
+        else:
+            task = await travel_client.send_message(**kwargs)
+        # hooks 运行的 agent 事件只带 runId，登记后活动事件才能匹配到本会话
+        if travel_watcher is not None:
+            travel_watcher.track_run(getattr(task, "run_id", None))
+        return task
 
     async def _load_travel_history(*, limit: int, include_tools: bool):
         if session.agent_id:
@@ -2013,6 +2048,7 @@ async def _run_travel_session(session_id: str, *, resumed: bool = False):
             remove_session_browser_policy(cleanup_session_key)
 
     try:
+        await _ensure_travel_watcher()
         # 发送探索指令
         await _send_to_travel_client(
             message=build_travel_prompt(session),
@@ -2041,29 +2077,35 @@ async def _run_travel_session(session_id: str, *, resumed: bool = False):
             )
             save_session(session)
 
-        # 监控循环
+        # 监控循环：由会话活动事件唤醒（无事件时按心跳间隔），
+        # 历史只折叠游标之后的新消息，分析状态保存在 session.analysis_state
         start_time = datetime.fromisoformat(session.started_at)
-        seen_discovery_urls: set = set()
-        seen_social_keys: set = set()
+        idle_window_started = time.monotonic()
+        last_saved_at = time.monotonic()
+        saved_mtime = get_session_mtime_ns(session_id)
 
         while True:
-            await asyncio.sleep(30)
+            await _wait_travel_activity()
 
             # 检查时间限制
             elapsed = (datetime.now() - start_time).total_seconds() / 60
-            session.elapsed_minutes = round(elapsed, 1)
             remaining_minutes = max(0.0, session.time_limit_minutes - elapsed)
-            remaining_credits = max(0, session.credit_limit - session.credits_used)
 
             if elapsed >= session.time_limit_minutes:
+                session.elapsed_minutes = round(elapsed, 1)
                 logger.info(f"[旅行] 时间到达限制 {session.time_limit_minutes} 分钟")
                 break
 
-            # 重新加载 session（可能被外部 cancel）
-            try:
-                session = load_session(session_id)
-            except Exception:
+            # session 文件被外部修改（取消 / 中断 / 浏览器设置）时才重新加载
+            current_mtime = get_session_mtime_ns(session_id)
+            if current_mtime is None:
                 break
+            if current_mtime != saved_mtime:
+                try:
+                    session = load_session(session_id)
+                except Exception:
+                    break
+                saved_mtime = current_mtime
 
             if session.status == TravelStatus.CANCELLED:
                 logger.info(f"[旅行] session 已被取消: {session_id}")
@@ -2075,26 +2117,25 @@ async def _run_travel_session(session_id: str, *, resumed: bool = False):
                 await _cleanup_travel_browser(session, reason="interrupted")
                 return
 
-            previous_discovery_count = len(session.discoveries)
+            changed = False
+            remaining_credits = max(0, session.credit_limit - session.credits_used)
 
-            # 轮询 OpenClaw 获取新消息
+            # 折叠 OpenClaw 新增的消息
             try:
-                history = await _load_travel_history(limit=80, include_tools=True)
+                previous_credits = session.credits_used
+                history = await _load_travel_history(limit=0, include_tools=True)
                 messages = history if isinstance(history, list) else history.get("messages", [])
 
                 # 从工具结果和阶段性文本中提炼发现、社交、预算
-                analysis = analyze_history(messages)
-                _apply_history_analysis(session, analysis)
-
-                existing_activity_ids = {
-                    str((event.meta or {}).get("travel_tool_call_id"))
-                    for event in session.progress_events
-                    if (event.meta or {}).get("travel_tool_call_id")
-                }
-                for activity_event in getattr(analysis, "activity_events", []) or []:
-                    activity_id = str((activity_event.meta or {}).get("travel_tool_call_id") or "")
-                    if activity_id and activity_id in existing_activity_ids:
-                        continue
+                analysis = fold_history(session, messages)
+                changed = bool(
+                    analysis.discoveries
+                    or analysis.social_interactions
+                    or analysis.activity_events
+                    or session.credits_used != previous_credits
+                )
+
+                for activity_event in analysis.activity_events:
                     append_progress_event(
                         session,
                         activity_event.type,
@@ -2103,21 +2144,12 @@ async def _run_travel_session(session_id: str, *, resumed: bool = False):
                         meta=activity_event.meta,
                         timestamp=activity_event.timestamp,
                     )
-                    if activity_id:
-                        existing_activity_ids.add(activity_id)
 
-                for d in session.discoveries:
-                    seen_discovery_urls.add(d.url)
-
-                for s in session.social_interactions:
-                    key = f"{s.type}:{s.post_id}:{s.content_preview[:30]}"
-                    if key not in seen_social_keys:
-                        seen_social_keys.add(key)
-                if len(session.discoveries) > previous_discovery_count:
+                if analysis.discoveries:
                     append_progress_event(
                         session,
                         "discoveries_updated",
-                        f"本轮新增 {len(session.discoveries) - previous_discovery_count} 条发现，累计 {len(session.discoveries)} 条。",
+                        f"本轮新增 {len(analysis.discoveries)} 条发现，累计 {len(session.discoveries)} 条。",
                         meta={
                             "discoveries": len(session.discoveries),
                             "unique_sources": session.unique_sources,
@@ -2127,7 +2159,7 @@ async def _run_travel_session(session_id: str, *, resumed: bool = False):
                     await emit_local_telemetry(
                         "openclaw_discovery_added",
                         {
-                            "new_discoveries": len(session.discoveries) - previous_discovery_count,
+                            "new_discoveries": len(analysis.discoveries),
                             "total_discoveries": len(session.discoveries),
                             "unique_sources": session.unique_sources,
                             "credits_used": session.credits_used,
@@ -2137,11 +2169,15 @@ async def _run_travel_session(session_id: str, *, resumed: bool = False):
                         agent_id=session.agent_id,
                     )
                     session.idle_polls = 0
-                else:
+                    idle_window_started = time.monotonic()
+                elif time.monotonic() - idle_window_started >= TRAVEL_HEARTBEAT_SECONDS:
+                    # idle_polls 按心跳间隔计数，与事件唤醒的频率无关
                     session.idle_polls += 1
+                    idle_window_started = time.monotonic()
+                    changed = True
 
             except Exception as e:
-                logger.warning(f"[旅行] 轮询历史失败: {e}")
+                logger.warning(f"[旅行] 分析历史失败: {e}")
 
             session.elapsed_minutes = round(elapsed, 1)
             session.last_heartbeat_at = datetime.now().isoformat()
@@ -2166,6 +2202,7 @@ async def _run_travel_session(session_id: str, *, resumed: bool = False):
                         name="NagaTravel",
                         timeout_seconds=0,
                     )
+                    changed = True
                     append_progress_event(
                         session,
                         "quota_warning",
@@ -2206,6 +2243,7 @@ async def _run_travel_session(session_id: str, *, resumed: bool = False):
                         timeout_seconds=0,
                     )
                     session.wrap_up_sent = True
+                    changed = True
                     set_session_phase(
                         session,
                         "wrapping_up",
@@ -2215,6 +2253,7 @@ async def _run_travel_session(session_id: str, *, resumed: bool = False):
                             "idle_polls": session.idle_polls,
                             "discoveries": len(session.discoveries),
                         },
+                        save=False,
                     )
                     logger.info(
                         f"[旅行] 已发送收束指令: {session_id}, credits={session.credits_used}, idle={session.idle_polls}"
@@ -2254,7 +2293,11 @@ async def _run_travel_session(session_id: str, *, resumed: bool = False):
                 logger.info(f"[旅行] 长时间无新增发现，准备结束: idle_polls={session.idle_polls}")
                 break
 
-            save_session(session)
+            # 只有内容变化或到了心跳间隔才落盘
+            if changed or time.monotonic() - last_saved_at >= TRAVEL_HEARTBEAT_SECONDS:
+                save_session(session)
+                saved_mtime = get_session_mtime_ns(session_id)
+                last_saved_at = time.monotonic()
 
         # 发送收尾指令
         logger.info(f"[旅行] 发送收尾指令: {session_id}")
@@ -2291,11 +2334,10 @@ async def _run_travel_session(session_id: str, *, resumed: bool = False):
                     )
                     break
 
-            # 收尾完成后重新解析完整历史，确保最终总结里的真实 discovery 会落盘。
-            final_history = await _load_travel_history(limit=120, include_tools=True)
+            # 收尾完成后折叠剩余历史，确保最终总结里的真实 discovery 会落盘。
+            final_history = await _load_travel_history(limit=0, include_tools=True)
             final_messages = final_history if isinstance(final_history, list) else final_history.get("messages", [])
-            final_analysis = analyze_history(final_messages)
-            _apply_history_analysis(session, final_analysis)
+            fold_history(session, final_messages)
         except Exception as e:
             logger.warning(f"[旅行] 收尾指令失败: {e}")
             session.summary = f"旅行完成，共发现 {len(session.discoveries)} 个内容。（收尾指令超时）"
@@ -2503,6 +2545,9 @@ async def _run_travel_session(session_id: str, *, resumed: bool = False):
             )
         except Exception:
             pass
+    finally:
+        if travel_watcher is not None:
+            await travel_watcher.close()
 
 
 # ========== Proactive Vision API ==========
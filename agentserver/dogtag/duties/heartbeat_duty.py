@@ -129,17 +129,7 @@ class HeartbeatExecutor:
         try:
             from apiserver.message_manager import message_manager
 
-            candidates = [
-                (sid, s)
-                for sid, s in message_manager.sessions.items()
-                if s.get("messages")
-            ]
-            if not candidates:
-                return None
-            candidates.sort(
-                key=lambda x: x[1].get("last_activity", ""), reverse=True
-            )
-            return candidates[0][0]
+            return message_manager.get_latest_session_id()
         except Exception as e:
             logger.warning(f"[Heartbeat] 获取活跃会话失败: {e}")
             return None
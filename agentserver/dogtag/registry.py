@@ -18,6 +18,24 @@ class DogTagRegistry:
     def __init__(self):
         self._duties: Dict[str, DogTag] = {}
         self._executors: Dict[str, Callable] = {}  # duty_id → async executor()
+        self._listeners: List[Callable[[], None]] = []  # 职责变更回调（调度器据此重算截止时间）
+
+    def add_listener(self, callback: Callable[[], None]) -> None:
+        """注册职责变更回调（注册 / 移除 / 状态变更时调用）"""
+        if callback not in self._listeners:
+            self._listeners.append(callback)
+
+    def remove_listener(self, callback: Callable[[], None]) -> None:
+        """移除职责变更回调"""
+        if callback in self._listeners:
+            self._listeners.remove(callback)
+
+    def _notify(self) -> None:
+        for callback in list(self._listeners):
+            try:
+                callback()
+            except Exception as e:
+                logger.error(f"[DogTag] 职责变更回调失败: {e}")
 
     def register(self, tag: DogTag, executor: Callable) -> None:
         """注册一个职责"""
@@ -26,12 +44,14 @@ class DogTagRegistry:
         self._duties[tag.duty_id] = tag
         self._executors[tag.duty_id] = executor
         logger.info(f"[DogTag] 注册职责: {tag.duty_id} ({tag.name})")
+        self._notify()
 
     def unregister(self, duty_id: str) -> None:
         """移除一个职责"""
         self._duties.pop(duty_id, None)
         self._executors.pop(duty_id, None)
         logger.info(f"[DogTag] 移除职责: {duty_id}")
+        self._notify()
 
     def get(self, duty_id: str) -> Optional[DogTag]:
         """获取单个职责"""
@@ -59,6 +79,7 @@ class DogTagRegistry:
             old_status = tag.status
             tag.status = status
             logger.info(f"[DogTag] 职责 '{duty_id}' 状态变更: {old_status.value} → {status.value}")
+            self._notify()
         else:
             logger.warning(f"[DogTag] 职责 '{duty_id}' 不存在，无法更新状态")
 
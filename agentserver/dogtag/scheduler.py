@@ -3,19 +3,30 @@
 
 合并 HeartbeatScheduler 的事件驱动逻辑与 ProactiveVisionScheduler 的周期调度逻辑，
 用单一主循环管理所有后台职责。
+
+周期任务按截止时间放入小顶堆，主循环睡到最近的截止时间；职责注册 / 状态变更、窗口模式、
+用户活动、计时器重置和职责执行结束都会唤醒主循环重算截止时间。到期的职责各自以独立
+Task 并发执行，同一职责上一次尚未结束时不会重叠执行。
 """
 
 import asyncio
+import heapq
 import time
 import logging
-from datetime import datetime, time as dt_time
-from typing import Optional, Dict
+from datetime import datetime, timedelta, time as dt_time
+from functools import lru_cache
+from typing import Optional, Dict, List, Tuple
 
 from .models import DogTag, DutyStatus, TriggerType
 from .registry import DogTagRegistry, get_dogtag_registry
 
 logger = logging.getLogger(__name__)
 
+# 周期任务未配置间隔时的默认值（秒）
+DEFAULT_INTERVAL_SECONDS = 30
+# 主循环异常后的退避时间（秒）
+LOOP_ERROR_BACKOFF_SECONDS = 5
+
 
 class DogTagScheduler:
     """统一调度器"""
@@ -38,6 +49,15 @@ class DogTagScheduler:
         # 周期任务：duty_id → 上次执行时间
         self._last_check_times: Dict[str, float] = {}
 
+        # 截止时间堆：(到期时间戳, duty_id)；_dirty 时由主循环整体重建
+        self._deadlines: List[Tuple[float, str]] = []
+        self._dirty: bool = True
+        self._wakeup: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+        # 正在执行的职责：duty_id → Task（防止同一职责重叠执行）
+        self._running_duties: Dict[str, asyncio.Task] = {}
+
     # ------------------------------------------------------------------
     # 生命周期
     # ------------------------------------------------------------------
@@ -49,6 +69,10 @@ class DogTagScheduler:
             return
 
         self._running = True
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._dirty = True
+        self._registry.add_listener(self._reschedule)
         self._task = asyncio.create_task(self._main_loop())
         logger.info("[DogTag] 调度器已启动")
 
@@ -58,6 +82,7 @@ class DogTagScheduler:
             return
 
         self._running = False
+        self._registry.remove_listener(self._reschedule)
 
         # 取消所有事件倒计时
         for duty_id, countdown in list(self._event_countdowns.items()):
@@ -73,33 +98,125 @@ class DogTagScheduler:
             except asyncio.CancelledError:
                 pass
 
+        # 取消执行中的职责
+        running = [task for task in self._running_duties.values() if not task.done()]
+        for task in running:
+            task.cancel()
+        if running:
+            await asyncio.gather(*running, return_exceptions=True)
+        self._running_duties.clear()
+
         logger.info("[DogTag] 调度器已停止")
 
     # ------------------------------------------------------------------
-    # 主循环：1s tick，遍历 PERIODIC 任务
+    # 主循环：睡到最近的截止时间，到期的 PERIODIC 任务并发执行
     # ------------------------------------------------------------------
 
     async def _main_loop(self):
-        """主循环：每秒检查周期任务"""
+        """主循环：按截止时间调度周期任务"""
         while self._running:
             try:
-                # 遍历所有 ENABLED 的周期任务
-                periodic_duties = self._registry.get_active_by_trigger(TriggerType.PERIODIC)
-                for duty in periodic_duties:
-                    if self._should_execute(duty):
-                        last_time = self._last_check_times.get(duty.duty_id, 0.0)
-                        elapsed = time.time() - last_time
-                        interval = duty.interval_seconds or 30
-                        if elapsed >= interval:
-                            await self._execute_duty(duty)
-
-                await asyncio.sleep(1)
+                self._wakeup.clear()
+                delay = self._dispatch_due()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
             except asyncio.CancelledError:
                 logger.info("[DogTag] 主循环被取消")
                 break
             except Exception as e:
                 logger.error(f"[DogTag] 主循环异常: {e}", exc_info=True)
-                await asyncio.sleep(5)
+                self._dirty = True
+                await asyncio.sleep(LOOP_ERROR_BACKOFF_SECONDS)
+
+    def _reschedule(self):
+        """标记截止时间失效并唤醒主循环（可在任意线程调用）"""
+        self._dirty = True
+        if self._wakeup is None or self._loop is None or self._loop.is_closed():
+            return
+        try:
+            running_loop = asyncio.get_running_loop()
+        except RuntimeError:
+            running_loop = None
+        if running_loop is self._loop:
+            self._wakeup.set()
+        else:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    def _rebuild_deadlines(self, now: float):
+        self._deadlines = []
+        for duty in self._registry.get_active_by_trigger(TriggerType.PERIODIC):
+            due = self._next_deadline(duty, now)
+            if due is not None:
+                self._deadlines.append((due, duty.duty_id))
+        heapq.heapify(self._deadlines)
+        self._dirty = False
+
+    def _dispatch_due(self) -> Optional[float]:
+        """启动所有已到期的职责，返回距下一个截止时间的秒数（None 表示等待事件）"""
+        now = time.time()
+        if self._dirty:
+            self._rebuild_deadlines(now)
+
+        while self._deadlines and self._deadlines[0][0] <= now:
+            _, duty_id = heapq.heappop(self._deadlines)
+            duty = self._registry.get(duty_id)
+            if duty is None or duty.trigger_type != TriggerType.PERIODIC:
+                continue
+            if self._should_execute(duty):
+                # 执行结束后由 _on_duty_done 重新计算该职责的截止时间
+                self._start_duty(duty)
+                continue
+            # 到期时条件不满足（如刚离开活跃时段），按当前状态重新排期
+            due = self._next_deadline(duty, now, after_now=True)
+            if due is not None:
+                heapq.heappush(self._deadlines, (due, duty_id))
+
+        if not self._deadlines:
+            return None
+        return max(0.0, self._deadlines[0][0] - now)
+
+    def _next_deadline(self, duty: DogTag, now: float, after_now: bool = False) -> Optional[float]:
+        """计算周期职责的下一次执行时间；需要等待事件（窗口模式、用户活动、执行中）时返回 None"""
+        if duty.status != DutyStatus.ENABLED or duty.duty_id in self._running_duties:
+            return None
+
+        activation = duty.activation
+        if activation is not None:
+            if activation.window_modes is not None and self._window_mode not in activation.window_modes:
+                return None
+            if activation.requires_user_active:
+                if now - self._last_user_activity > activation.inactive_threshold_minutes * 60:
+                    return None
+
+        interval = duty.interval_seconds or DEFAULT_INTERVAL_SECONDS
+        due = self._last_check_times.get(duty.duty_id, 0.0) + interval
+        if after_now:
+            due = max(due, now + 1)
+
+        if activation is not None and activation.active_hours_start and activation.active_hours_end:
+            due = self._next_active_time(activation.active_hours_start, activation.active_hours_end, due)
+
+        # 等待用户活跃的职责在阈值到期后会转为不活跃，到期时由 _should_execute 再确认
+        return due
+
+    @staticmethod
+    def _next_active_time(start_str: str, end_str: str, due: float) -> float:
+        """due 不在活跃时段内时，推迟到下一个时段开始"""
+        from agentserver.utils import is_time_in_range
+
+        hours = _parse_active_hours(start_str, end_str)
+        if hours is None:
+            return due
+        start, end = hours
+        due_dt = datetime.fromtimestamp(due)
+        if is_time_in_range(due_dt.time(), start, end):
+            return due
+        next_start = datetime.combine(due_dt.date(), start)
+        if next_start <= due_dt:
+            next_start += timedelta(days=1)
+        return next_start.timestamp()
 
     # ------------------------------------------------------------------
     # 条件检查
@@ -142,26 +259,39 @@ class DogTagScheduler:
         """检查当前是否在活跃时段"""
         from agentserver.utils import is_time_in_range
 
-        try:
-            now = datetime.now().time()
-            start = dt_time.fromisoformat(start_str)
-            end = dt_time.fromisoformat(end_str)
-            return is_time_in_range(now, start, end)
-        except ValueError:
-            logger.error(f"[DogTag] 时段格式错误: {start_str} - {end_str}")
+        hours = _parse_active_hours(start_str, end_str)
+        if hours is None:
             return True  # 格式错误时不阻塞
+        return is_time_in_range(datetime.now().time(), *hours)
 
     # ------------------------------------------------------------------
     # 执行
     # ------------------------------------------------------------------
 
+    def _start_duty(self, duty: DogTag):
+        """以独立 Task 执行职责，不阻塞主循环和其他职责"""
+        task = asyncio.create_task(self._execute_duty(duty))
+        self._running_duties[duty.duty_id] = task
+        task.add_done_callback(lambda _task, duty_id=duty.duty_id: self._on_duty_done(duty_id, _task))
+
+    def _on_duty_done(self, duty_id: str, task: asyncio.Task):
+        if self._running_duties.get(duty_id) is task:
+            self._running_duties.pop(duty_id, None)
+        self._reschedule()
+
     async def _execute_duty(self, duty: DogTag):
-        """执行一个职责"""
+        """执行一个职责（同一职责不重叠执行）"""
         executor = self._registry.get_executor(duty.duty_id)
         if not executor:
             logger.warning(f"[DogTag] 职责 '{duty.duty_id}' 无执行器，跳过")
             return
 
+        running = self._running_duties.get(duty.duty_id)
+        if running is not None and running is not asyncio.current_task() and not running.done():
+            logger.info(f"[DogTag] 职责 '{duty.duty_id}' 上一次执行尚未结束，跳过")
+            return
+        self._running_duties[duty.duty_id] = asyncio.current_task()
+
         try:
             logger.info(f"[DogTag] 执行职责: {duty.duty_id} ({duty.name})")
             self._last_check_times[duty.duty_id] = time.time()
@@ -177,6 +307,10 @@ class DogTagScheduler:
                 f"[DogTag] 职责 '{duty.duty_id}' 执行失败: {e}",
                 exc_info=True,
             )
+        finally:
+            if self._running_duties.get(duty.duty_id) is asyncio.current_task():
+                self._running_duties.pop(duty.duty_id, None)
+                self._reschedule()
 
     # ------------------------------------------------------------------
     # 事件驱动支持
@@ -260,6 +394,7 @@ class DogTagScheduler:
             return
 
         logger.info(f"[DogTag] 窗口模式切换: {old_mode} → {mode}")
+        self._reschedule()
 
         # 检查所有有窗口模式限制的职责，自动 pause/resume
         for duty in self._registry.get_all().values():
@@ -281,10 +416,12 @@ class DogTagScheduler:
     def update_user_activity(self):
         """更新用户活动时间"""
         self._last_user_activity = time.time()
+        self._reschedule()
 
     def reset_check_timer(self, duty_id: str, reason: str = "external_trigger"):
         """重置指定周期任务的检查计时器"""
         self._last_check_times[duty_id] = time.time()
+        self._reschedule()
         logger.info(
             f"[DogTag] 职责 '{duty_id}' 检查计时器已重置 (原因: {reason})"
         )
@@ -292,6 +429,7 @@ class DogTagScheduler:
     def get_status(self) -> dict:
         """返回调度器状态 + 所有任务状态"""
         duties_status = {}
+        next_runs = {duty_id: due for due, duty_id in self._deadlines}
         for duty_id, duty in self._registry.get_all().items():
             countdown_active = (
                 duty_id in self._event_countdowns
@@ -305,6 +443,12 @@ class DogTagScheduler:
                 "execution_count": duty.execution_count,
                 "last_executed_at": duty.last_executed_at,
                 "countdown_active": countdown_active,
+                "executing": duty_id in self._running_duties,
+                "next_run_at": (
+                    datetime.fromtimestamp(next_runs[duty_id]).isoformat()
+                    if duty_id in next_runs and not self._dirty
+                    else None
+                ),
             }
 
         return {
@@ -318,6 +462,16 @@ class DogTagScheduler:
         }
 
 
+@lru_cache(maxsize=64)
+def _parse_active_hours(start_str: str, end_str: str) -> Optional[Tuple[dt_time, dt_time]]:
+    """解析活跃时段（结果缓存，格式错误只记录一次）"""
+    try:
+        return dt_time.fromisoformat(start_str), dt_time.fromisoformat(end_str)
+    except ValueError:
+        logger.error(f"[DogTag] 时段格式错误: {start_str} - {end_str}")
+        return None
+
+
 # ======================================================================
 # 全局单例
 # ======================================================================
@@ -12,21 +12,40 @@ API 端点:
 - POST /tools/invoke - 直接调用工具
 """
 
+import asyncio
+import hashlib
 import logging
 import json
+import time
 import uuid
+from collections import OrderedDict
 from pathlib import Path
-from typing import Dict, Any, Optional, List
+from typing import Callable, Dict, Any, Optional, List, Tuple
 from dataclasses import dataclass, field
 from datetime import datetime
 from enum import Enum
 
 import httpx
 
+from .session_tail import JsonlTail, get_jsonl_scan, get_jsonl_tail
 from .state_paths import get_openclaw_state_dir
+from .ws_client import RunEventWatcher
 
 logger = logging.getLogger("openclaw.client")
 
+# 等待回复：优先订阅 Gateway 的 chat / agent 结束事件，事件通道不可用时回退到增量轮询
+EVENT_CONNECT_TIMEOUT = 5.0
+# 增量拉取 sessions_history 的初始条数；游标不在窗口内时翻倍，直到上限
+HISTORY_PAGE_LIMIT = 20
+HISTORY_PAGE_MAX_LIMIT = 400
+# 无游标时（发送前的会话快照失败）沿用的全量窗口
+HISTORY_LEGACY_LIMIT = 50
+# 收到结束事件后，回复尚未写入历史时的补拉次数与间隔（秒）
+REPLY_SETTLE_RETRIES = 3
+REPLY_SETTLE_INTERVAL = 0.5
+# 按 session_key 缓存合并后 transcript 的会话数上限（最近使用）
+TRANSCRIPT_CACHE_MAX_SESSIONS = 32
+
 
 class TaskStatus(Enum):
     """任务状态枚举"""
@@ -113,6 +132,126 @@ class OpenClawSessionInfo:
         }
 
 
+@dataclass
+class HistoryCursor:
+    """sessions_history 增量游标：发送消息前会话中的最后一条消息"""
+
+    marker: Optional[str] = None  # None 表示发送前会话为空
+
+
+class HistoryAccumulator:
+    """
+    _normalize_history_messages 的增量状态
+
+    原始消息按时间顺序喂入，归并为 user / assistant 消息（toolResult 并入前一条 assistant）。
+    新追加的消息都不早于已归并的最后一条时只处理新增部分，否则整体重排。
+    """
+
+    def __init__(
+        self,
+        sort_key: Callable[[Dict[str, Any], int], tuple],
+        extract: Callable[[Dict[str, Any]], Dict[str, Any]],
+    ):
+        self._sort_key = sort_key
+        self._extract = extract
+        self._raw: List[Dict[str, Any]] = []
+        self._normalized: List[Dict[str, Any]] = []
+        self._current_assistant: Optional[Dict[str, Any]] = None
+        self._last_key: Optional[tuple] = None
+        # 只有最后一条归并消息还会被后续 toolResult / assistant 修改，之前的清洗结果可以复用
+        self._frozen: List[Dict[str, Any]] = []
+        self._frozen_count = 0
+
+    def extend(self, raw_messages: List[Dict[str, Any]]) -> None:
+        start = len(self._raw)
+        items = [item for item in raw_messages if isinstance(item, dict)]
+        self._raw.extend(items)
+        indexed = sorted(
+            ((self._sort_key(item, start + i), item) for i, item in enumerate(items)),
+            key=lambda pair: pair[0],
+        )
+        if indexed and self._last_key is not None and indexed[0][0] < self._last_key:
+            self._normalized = []
+            self._current_assistant = None
+            self._frozen = []
+            self._frozen_count = 0
+            indexed = sorted(
+                ((self._sort_key(item, i), item) for i, item in enumerate(self._raw)),
+                key=lambda pair: pair[0],
+            )
+        for _, item in indexed:
+            self._feed(item)
+        if indexed:
+            self._last_key = indexed[-1][0]
+
+    def _feed(self, item: Dict[str, Any]) -> None:
+        extracted = self._extract(item)
+        role_key = str(extracted.get("role") or "").strip().lower().replace("-", "_")
+        content = str(extracted.get("content") or "").strip()
+        tool_events = extracted.get("toolEvents") or []
+
+        if role_key == "user":
+            self._current_assistant = None
+            if content:
+                self._normalized.append(
+                    {
+                        "role": "user",
+                        "content": content,
+                        "type": "message",
+                        "toolEvents": [],
+                        "usage": extracted.get("usage"),
+                    }
+                )
+            return
+
+        if role_key in {"assistant", "toolresult", "tool_result"}:
+            current_assistant = self._current_assistant
+            if current_assistant is None:
+                current_assistant = self._current_assistant = {
+                    "role": "assistant",
+                    "content": "",
+                    "type": "message",
+                    "toolEvents": [],
+                    "usage": extracted.get("usage"),
+                }
+                self._normalized.append(current_assistant)
+
+            if content:
+                current_assistant["content"] = (
+                    f"{current_assistant['content']}\n\n{content}".strip()
+                    if current_assistant["content"]
+                    else content
+                )
+            if isinstance(tool_events, list) and tool_events:
+                current_assistant["toolEvents"].extend(tool_events)
+            if extracted.get("usage") and not current_assistant.get("usage"):
+                current_assistant["usage"] = extracted.get("usage")
+
+    @staticmethod
+    def _clean(message: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        content = str(message.get("content") or "").strip()
+        tool_events = message.get("toolEvents") or []
+        if message.get("role") == "assistant" and not content and not tool_events:
+            return None
+        return {**message, "content": content, "toolEvents": list(tool_events)}
+
+    def messages(self) -> List[Dict[str, Any]]:
+        """归并结果（去掉空 assistant）"""
+        stable = len(self._normalized) - 1
+        for message in self._normalized[self._frozen_count:stable]:
+            cleaned = self._clean(message)
+            if cleaned is not None:
+                self._frozen.append(cleaned)
+        self._frozen_count = max(self._frozen_count, stable)
+
+        result = list(self._frozen)
+        if self._normalized:
+            last = self._clean(self._normalized[-1])
+            if last is not None:
+                result.append(last)
+        return result
+
+
 @dataclass
 class OpenClawConfig:
     """OpenClaw 配置"""
@@ -130,6 +269,8 @@ class OpenClawConfig:
     # 默认参数
     default_model: Optional[str] = None
     default_channel: str = "last"
+    # 202 异步任务通过 Gateway WebSocket 事件感知运行结束（关闭后只用增量轮询）
+    reply_via_events: bool = True
 
     # 兼容旧配置
     token: Optional[str] = None
@@ -206,6 +347,10 @@ class OpenClawClient:
         # 调度终端会话信息 - 首次调用时初始化，保持整个运行期间
         self._session_info: Optional[OpenClawSessionInfo] = None
         self._default_session_key: Optional[str] = None
+        # session_key -> (各 transcript 文件已合并的条目数, 合并排序后的条目, 对应排序键)
+        self._transcript_cache: "OrderedDict[str, Tuple[Dict[str, Tuple[int, int]], List[Dict[str, Any]], List[tuple]]]" = (
+            OrderedDict()
+        )
 
     async def _get_client(self) -> httpx.AsyncClient:
         """获取 HTTP 客户端（懒加载，禁用代理确保 localhost 直连）"""
@@ -332,107 +477,81 @@ class OpenClawClient:
         hooks_agent_path = f"{self.config.hooks_path}/agent"
 
         last_error = None
-        for attempt in range(1, max_retries + 1):
-            try:
-                client = await self._get_client()
-
-                logger.info(
-                    f"[OpenClaw] 发送消息到 {hooks_agent_path} (尝试 {attempt}/{max_retries}): {message[:50]}... (timeout={timeout_seconds}s)"
-                )
+        # 需要等待回复时，先订阅结束事件并记下会话游标，再发起请求，避免漏掉很快结束的运行
+        watcher: Optional[RunEventWatcher] = None
+        cursor: Optional[HistoryCursor] = None
+        try:
+            if timeout_seconds > 0:
+                watcher = await self._open_run_watcher(actual_session_key)
+                cursor = await self._snapshot_history_cursor(actual_session_key)
 
-                self._emit_task_event(
-                    task,
-                    kind="request",
-                    message="hooks_agent_request",
-                    data={
-                        "attempt": attempt,
-                        "max_retries": max_retries,
-                        "url": hooks_agent_url,
-                        "session_key": actual_session_key,
-                        "deliver": deliver,
-                        "wake_mode": wake_mode,
-                        "timeout_seconds": timeout_seconds,
-                    },
-                )
+            for attempt in range(1, max_retries + 1):
+                try:
+                    client = await self._get_client()
 
-                response = await client.post(
-                    hooks_agent_url,
-                    json=payload,
-                    headers=self.config.get_hooks_headers(),
-                    timeout=http_timeout,
-                )
+                    logger.info(
+                        f"[OpenClaw] 发送消息到 {hooks_agent_path} (尝试 {attempt}/{max_retries}): {message[:50]}... (timeout={timeout_seconds}s)"
+                    )
 
-                self._emit_task_event(
-                    task,
-                    kind="response",
-                    message="hooks_agent_response",
-                    data={
-                        "status_code": response.status_code,
-                    },
-                )
+                    self._emit_task_event(
+                        task,
+                        kind="request",
+                        message="hooks_agent_request",
+                        data={
+                            "attempt": attempt,
+                            "max_retries": max_retries,
+                            "url": hooks_agent_url,
+                            "session_key": actual_session_key,
+                            "deliver": deliver,
+                            "wake_mode": wake_mode,
+                            "timeout_seconds": timeout_seconds,
+                        },
+                    )
 
-                # /hooks/agent 返回 200/202
-                # 200 表示同步完成（含 reply），202 表示异步接受（需轮询获取回复）
-                if response.status_code in (200, 202):
-                    try:
-                        result = response.json()
-                        task.result = result if isinstance(result, dict) else {}
-                        task.run_id = result.get("runId")
+                    response = await client.post(
+                        hooks_agent_url,
+                        json=payload,
+                        headers=self.config.get_hooks_headers(),
+                        timeout=http_timeout,
+                    )
 
-                        self._emit_task_event(
-                            task,
-                            kind="state",
-                            message="hooks_agent_accepted",
-                            data={
-                                "run_id": task.run_id,
-                                "status": result.get("status", "accepted"),
-                            },
-                        )
+                    self._emit_task_event(
+                        task,
+                        kind="response",
+                        message="hooks_agent_response",
+                        data={
+                            "status_code": response.status_code,
+                        },
+                    )
 
-                        # 检查返回状态
-                        status = result.get("status", "accepted")
-                        if status == "ok" and result.get("reply"):
-                            # 同步完成，包含 reply
-                            task.status = TaskStatus.COMPLETED
-                            task.completed_at = datetime.now().isoformat()
-                            reply = result.get("reply", "")
-                            logger.info(
-                                f"[OpenClaw] 任务同步完成: {task.task_id}, reply: {reply[:100] if reply else 'empty'}..."
-                            )
+                    # /hooks/agent 返回 200/202
+                    # 200 表示同步完成（含 reply），202 表示异步接受（需轮询获取回复）
+                    if response.status_code in (200, 202):
+                        try:
+                            result = response.json()
+                            task.result = result if isinstance(result, dict) else {}
+                            task.run_id = result.get("runId")
 
                             self._emit_task_event(
                                 task,
                                 kind="state",
-                                message="task_completed",
+                                message="hooks_agent_accepted",
                                 data={
                                     "run_id": task.run_id,
-                                    "reply_preview": (reply[:200] if reply else ""),
+                                    "status": result.get("status", "accepted"),
                                 },
                             )
-                        elif timeout_seconds <= 0:
-                            # 调用方选择异步投递，不等待最终 reply。
-                            task.status = TaskStatus.COMPLETED
-                            task.completed_at = datetime.now().isoformat()
-                            logger.info(f"[OpenClaw] 任务已异步接受: {task.task_id}, runId: {task.run_id}")
-                        else:
-                            # 202 异步接受，需要轮询 sessions_history 获取回复
-                            task.status = TaskStatus.RUNNING
-                            logger.info(
-                                f"[OpenClaw] 任务已接受(202): {task.task_id}, runId: {task.run_id}, 开始轮询回复..."
-                            )
 
-                            replies = await self._poll_for_reply(
-                                actual_session_key,
-                                timeout_seconds=timeout_seconds,
-                            )
-                            if replies:
+                            # 检查返回状态
+                            status = result.get("status", "accepted")
+                            if status == "ok" and result.get("reply"):
+                                # 同步完成，包含 reply
                                 task.status = TaskStatus.COMPLETED
                                 task.completed_at = datetime.now().isoformat()
-                                if task.result is None:
-                                    task.result = {}
-                                task.result["replies"] = replies
-                                task.result["reply"] = replies[0] if len(replies) == 1 else "\n\n---\n\n".join(replies)
-                                logger.info(f"[OpenClaw] 轮询获取{len(replies)}条回复成功")
+                                reply = result.get("reply", "")
+                                logger.info(
+                                    f"[OpenClaw] 任务同步完成: {task.task_id}, reply: {reply[:100] if reply else 'empty'}..."
+                                )
 
                                 self._emit_task_event(
                                     task,
@@ -440,112 +559,182 @@ class OpenClawClient:
                                     message="task_completed",
                                     data={
                                         "run_id": task.run_id,
-                                        "replies_count": len(replies),
-                                        "reply_preview": (str(task.result.get("reply", ""))[:200]),
+                                        "reply_preview": (reply[:200] if reply else ""),
                                     },
                                 )
-                            else:
-                                task.status = TaskStatus.FAILED
+                            elif timeout_seconds <= 0:
+                                # 调用方选择异步投递，不等待最终 reply。
+                                task.status = TaskStatus.COMPLETED
                                 task.completed_at = datetime.now().isoformat()
-                                last_error = f"OpenClaw 在 {timeout_seconds}s 内未返回可用回复"
-                                task.error = last_error
-                                logger.warning(f"[OpenClaw] {last_error}")
-
-                                self._emit_task_event(
-                                    task,
-                                    kind="state",
-                                    message="task_failed",
-                                    data={
-                                        "run_id": task.run_id,
-                                        "error": last_error,
-                                    },
+                                logger.info(f"[OpenClaw] 任务已异步接受: {task.task_id}, runId: {task.run_id}")
+                            else:
+                                # 202 异步接受，等待运行结束后拉取本次新增的回复
+                                task.status = TaskStatus.RUNNING
+                                logger.info(
+                                    f"[OpenClaw] 任务已接受(202): {task.task_id}, runId: {task.run_id}, 等待回复..."
                                 )
-                    except Exception:
-                        task.result = {"raw": response.text}
-                        task.status = TaskStatus.RUNNING
 
-                        self._emit_task_event(
-                            task,
-                            kind="error",
-                            message="hooks_agent_parse_failed",
-                            data={
-                                "status_code": response.status_code,
-                                "raw_preview": response.text[:500] if response.text else "",
-                            },
-                        )
+                                replies = await self._wait_for_reply(
+                                    actual_session_key,
+                                    run_id=task.run_id,
+                                    watcher=watcher,
+                                    cursor=cursor,
+                                    timeout_seconds=timeout_seconds,
+                                )
+                                if replies:
+                                    task.status = TaskStatus.COMPLETED
+                                    task.completed_at = datetime.now().isoformat()
+                                    if task.result is None:
+                                        task.result = {}
+                                    task.result["replies"] = replies
+                                    task.result["reply"] = replies[0] if len(replies) == 1 else "\n\n---\n\n".join(replies)
+                                    logger.info(f"[OpenClaw] 获取{len(replies)}条回复成功")
+
+                                    self._emit_task_event(
+                                        task,
+                                        kind="state",
+                                        message="task_completed",
+                                        data={
+                                            "run_id": task.run_id,
+                                            "replies_count": len(replies),
+                                            "reply_preview": (str(task.result.get("reply", ""))[:200]),
+                                        },
+                                    )
+                                else:
+                                    task.status = TaskStatus.FAILED
+                                    task.completed_at = datetime.now().isoformat()
+                                    last_error = f"OpenClaw 在 {timeout_seconds}s 内未返回可用回复"
+                                    task.error = last_error
+                                    logger.warning(f"[OpenClaw] {last_error}")
+
+                                    self._emit_task_event(
+                                        task,
+                                        kind="state",
+                                        message="task_failed",
+                                        data={
+                                            "run_id": task.run_id,
+                                            "error": last_error,
+                                        },
+                                    )
+                        except Exception:
+                            task.result = {"raw": response.text}
+                            task.status = TaskStatus.RUNNING
 
-                    # 更新会话信息
-                    session_status = "error" if task.status == TaskStatus.FAILED else "active"
-                    self._update_session_info(actual_session_key, task.run_id, session_status)
-                    # 成功，跳出重试循环
-                    break
-                else:
-                    last_error = f"HTTP {response.status_code}: {response.text}"
-                    logger.warning(f"[OpenClaw] 消息发送失败 (尝试 {attempt}/{max_retries}): {last_error}")
-
-                    # OpenClaw 2026.2.17+ 默认禁止外部 hooks 传入 sessionKey。
-                    # 命中该错误时不要做无意义重试，尝试补丁配置并给出明确提示。
-                    if (
-                        response.status_code == 400
-                        and "sessionKey is disabled for external /hooks/agent payloads" in (response.text or "")
-                    ):
-                        patched = False
-                        try:
-                            from .llm_config_bridge import ensure_hooks_allow_request_session_key
+                            self._emit_task_event(
+                                task,
+                                kind="error",
+                                message="hooks_agent_parse_failed",
+                                data={
+                                    "status_code": response.status_code,
+                                    "raw_preview": response.text[:500] if response.text else "",
+                                },
+                            )
 
-                            patched = ensure_hooks_allow_request_session_key(auto_create=False)
-                        except Exception:
+                        # 更新会话信息
+                        session_status = "error" if task.status == TaskStatus.FAILED else "active"
+                        self._update_session_info(actual_session_key, task.run_id, session_status)
+                        # 成功，跳出重试循环
+                        break
+                    else:
+                        last_error = f"HTTP {response.status_code}: {response.text}"
+                        logger.warning(f"[OpenClaw] 消息发送失败 (尝试 {attempt}/{max_retries}): {last_error}")
+
+                        # OpenClaw 2026.2.17+ 默认禁止外部 hooks 传入 sessionKey。
+                        # 命中该错误时不要做无意义重试，尝试补丁配置并给出明确提示。
+                        if (
+                            response.status_code == 400
+                            and "sessionKey is disabled for external /hooks/agent payloads" in (response.text or "")
+                        ):
                             patched = False
+                            try:
+                                from .llm_config_bridge import ensure_hooks_allow_request_session_key
 
-                        if patched:
-                            last_error = (
-                                "OpenClaw 拒绝外部 sessionKey（已自动写入 hooks.allowRequestSessionKey=true），"
-                                "请重启 OpenClaw Gateway 后重试。"
+                                patched = ensure_hooks_allow_request_session_key(auto_create=False)
+                            except Exception:
+                                patched = False
+
+                            if patched:
+                                last_error = (
+                                    "OpenClaw 拒绝外部 sessionKey（已自动写入 hooks.allowRequestSessionKey=true），"
+                                    "请重启 OpenClaw Gateway 后重试。"
+                                )
+                            else:
+                                last_error = (
+                                    "OpenClaw 拒绝外部 sessionKey，请在 ~/.naga/openclaw/openclaw.json 设置 "
+                                    "hooks.allowRequestSessionKey=true 并重启 OpenClaw Gateway。"
+                                )
+
+                            task.status = TaskStatus.FAILED
+                            task.error = last_error
+                            self._update_session_info(actual_session_key, None, "error")
+                            self._emit_task_event(
+                                task,
+                                kind="state",
+                                message="task_failed",
+                                data={"error": last_error},
                             )
-                        else:
+                            logger.error(f"[OpenClaw] {last_error}")
+                            break
+
+                        if response.status_code == 405:
                             last_error = (
-                                "OpenClaw 拒绝外部 sessionKey，请在 ~/.naga/openclaw/openclaw.json 设置 "
-                                "hooks.allowRequestSessionKey=true 并重启 OpenClaw Gateway。"
+                                f"HTTP 405: Method Not Allowed (url={hooks_agent_url})。"
+                                f"请检查 openclaw.json 的 hooks.path（当前客户端路径: {self.config.hooks_path}）"
+                                "是否与 Gateway 一致，并确认 gateway.mode=local 后重启 Gateway。"
                             )
+                            task.status = TaskStatus.FAILED
+                            task.error = last_error
+                            self._update_session_info(actual_session_key, None, "error")
+                            self._emit_task_event(
+                                task,
+                                kind="state",
+                                message="task_failed",
+                                data={"error": last_error},
+                            )
+                            logger.error(f"[OpenClaw] {last_error}")
+                            break
 
-                        task.status = TaskStatus.FAILED
-                        task.error = last_error
-                        self._update_session_info(actual_session_key, None, "error")
                         self._emit_task_event(
                             task,
-                            kind="state",
-                            message="task_failed",
-                            data={"error": last_error},
+                            kind="error",
+                            message="hooks_agent_http_error",
+                            data={
+                                "attempt": attempt,
+                                "status_code": response.status_code,
+                                "error_preview": response.text[:500] if response.text else "",
+                            },
                         )
-                        logger.error(f"[OpenClaw] {last_error}")
-                        break
 
-                    if response.status_code == 405:
-                        last_error = (
-                            f"HTTP 405: Method Not Allowed (url={hooks_agent_url})。"
-                            f"请检查 openclaw.json 的 hooks.path（当前客户端路径: {self.config.hooks_path}）"
-                            "是否与 Gateway 一致，并确认 gateway.mode=local 后重启 Gateway。"
-                        )
-                        task.status = TaskStatus.FAILED
-                        task.error = last_error
-                        self._update_session_info(actual_session_key, None, "error")
-                        self._emit_task_event(
-                            task,
-                            kind="state",
-                            message="task_failed",
-                            data={"error": last_error},
-                        )
-                        logger.error(f"[OpenClaw] {last_error}")
-                        break
+                        if attempt < max_retries:
+                            logger.info(f"[OpenClaw] {retry_interval}秒后重试...")
+                            await asyncio.sleep(retry_interval)
+                        else:
+                            # 最后一次尝试也失败了
+                            task.status = TaskStatus.FAILED
+                            task.error = last_error
+                            logger.error(f"[OpenClaw] 消息发送失败，已达最大重试次数: {last_error}")
+                            self._update_session_info(actual_session_key, None, "error")
+
+                            self._emit_task_event(
+                                task,
+                                kind="state",
+                                message="task_failed",
+                                data={
+                                    "error": last_error,
+                                },
+                            )
+
+                except Exception as e:
+                    last_error = str(e)
+                    logger.warning(f"[OpenClaw] 消息发送异常 (尝试 {attempt}/{max_retries}): {e}")
 
                     self._emit_task_event(
                         task,
                         kind="error",
-                        message="hooks_agent_http_error",
+                        message="hooks_agent_exception",
                         data={
                             "attempt": attempt,
-                            "status_code": response.status_code,
-                            "error_preview": response.text[:500] if response.text else "",
+                            "error": last_error,
                         },
                     )
 
@@ -556,8 +745,9 @@ class OpenClawClient:
                         # 最后一次尝试也失败了
                         task.status = TaskStatus.FAILED
                         task.error = last_error
-                        logger.error(f"[OpenClaw] 消息发送失败，已达最大重试次数: {last_error}")
-                        self._update_session_info(actual_session_key, None, "error")
+                        logger.error(f"[OpenClaw] 消息发送异常，已达最大重试次数: {e}")
+                        if self._session_info:
+                            self._session_info.status = "error"
 
                         self._emit_task_event(
                             task,
@@ -567,41 +757,9 @@ class OpenClawClient:
                                 "error": last_error,
                             },
                         )
-
-            except Exception as e:
-                last_error = str(e)
-                logger.warning(f"[OpenClaw] 消息发送异常 (尝试 {attempt}/{max_retries}): {e}")
-
-                self._emit_task_event(
-                    task,
-                    kind="error",
-                    message="hooks_agent_exception",
-                    data={
-                        "attempt": attempt,
-                        "error": last_error,
-                    },
-                )
-
-                if attempt < max_retries:
-                    logger.info(f"[OpenClaw] {retry_interval}秒后重试...")
-                    await asyncio.sleep(retry_interval)
-                else:
-                    # 最后一次尝试也失败了
-                    task.status = TaskStatus.FAILED
-                    task.error = last_error
-                    logger.error(f"[OpenClaw] 消息发送异常，已达最大重试次数: {e}")
-                    if self._session_info:
-                        self._session_info.status = "error"
-
-                    self._emit_task_event(
-                        task,
-                        kind="state",
-                        message="task_failed",
-                        data={
-                            "error": last_error,
-                        },
-                    )
-
+        finally:
+            if watcher is not None:
+                await watcher.close()
         self._tasks[task.task_id] = task
         return task
 
@@ -630,31 +788,92 @@ class OpenClawClient:
         # 持久化会话信息
         self.save_session()
 
-    async def _poll_for_reply(
+    async def _open_run_watcher(self, session_key: str) -> Optional[RunEventWatcher]:
+        """连接 Gateway WebSocket 订阅运行结束事件，不可用时返回 None"""
+        if not self.config.reply_via_events:
+            return None
+        watcher = RunEventWatcher(self.config.gateway_url, self.config.gateway_token, session_key)
+        if await watcher.start(timeout=EVENT_CONNECT_TIMEOUT):
+            return watcher
+        logger.info("[OpenClaw] Gateway 事件订阅不可用，将以增量轮询等待回复")
+        return None
+
+    async def _wait_for_reply(
         self,
         session_key: str,
+        run_id: Optional[str],
+        watcher: Optional[RunEventWatcher],
+        cursor: Optional[HistoryCursor],
         timeout_seconds: int = 1200,
+    ) -> List[str]:
+        """
+        等待 202 异步任务的回复
+
+        有事件订阅时，收到本次运行的 chat final / lifecycle end 等结束事件后立即
+        增量拉取游标之后的 assistant 消息；事件连接中断时，用剩余时间回退到增量轮询。
+
+        Returns:
+            本次运行新增的回复文本列表
+        """
+        deadline = time.monotonic() + timeout_seconds
+        try:
+            if watcher is not None and watcher.connected:
+                outcome = await watcher.wait(run_id, timeout_seconds)
+                if outcome is not None:
+                    logger.info(f"[OpenClaw] 收到运行结束事件: state={outcome.state}, runId={outcome.run_id}")
+                    replies = await self._collect_replies(session_key, cursor)
+                    for _ in range(REPLY_SETTLE_RETRIES):
+                        if replies or outcome.state != "end":
+                            break
+                        # lifecycle end 可能早于回复写入历史
+                        await asyncio.sleep(REPLY_SETTLE_INTERVAL)
+                        replies = await self._collect_replies(session_key, cursor)
+                    if not replies and outcome.state == "final" and outcome.text:
+                        replies = [outcome.text]
+                    if not replies and outcome.state in ("error", "aborted"):
+                        logger.warning(f"[OpenClaw] 运行以 {outcome.state} 结束: {outcome.text}")
+                    return replies
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                logger.warning(f"[OpenClaw] 等待运行结束超时({timeout_seconds}s)")
+                return await self._collect_replies(session_key, cursor)
+            if watcher is not None:
+                logger.info("[OpenClaw] 事件连接中断，回退到增量轮询")
+            return await self._poll_for_reply(
+                session_key,
+                timeout_seconds=remaining,
+                cursor=cursor,
+                initial_delay=0.0 if watcher is not None else 1.0,
+            )
+        finally:
+            if watcher is not None:
+                await watcher.close()
+
+    async def _poll_for_reply(
+        self,
+        session_key: str,
+        timeout_seconds: float = 1200,
         poll_interval: float = 3.0,
         initial_delay: float = 1.0,
+        cursor: Optional[HistoryCursor] = None,
     ) -> List[str]:
         """
         轮询 sessions_history 获取 Agent 回复
 
-        /hooks/agent 返回 202 后，通过 /tools/invoke 调用 sessions_history
-        持续轮询收集所有 assistant 消息，直到消息不再增加或超时。
+        没有结束信号可用时的回退路径：按游标增量拉取新增消息，直到消息不再增加或超时。
+        未提供游标时每次拉取最近 HISTORY_LEGACY_LIMIT 条。
 
         Args:
             session_key: 会话标识
             timeout_seconds: 最大等待时间（秒）
             poll_interval: 轮询间隔（秒）
             initial_delay: 首次轮询前等待时间（秒）
+            cursor: 发送消息前的会话游标
 
         Returns:
             回复文本列表，超时返回收集到的所有消息
         """
-        import asyncio
-        import time
-
         await asyncio.sleep(initial_delay)
 
         start_time = time.time()
@@ -665,26 +884,16 @@ class OpenClawClient:
         while time.time() - start_time < timeout_seconds:
             attempt = int(time.time() - start_time)
             try:
-                client = await self._get_client()
-
-                response = await client.post(
-                    f"{self.config.gateway_url}/tools/invoke",
-                    json={
-                        "tool": "sessions_history",
-                        "args": {
-                            "sessionKey": session_key,
-                            "limit": 50,
-                        },
-                    },
-                    headers=self.config.get_gateway_headers(),
-                    timeout=15,
-                )
-
-                if response.status_code == 200:
-                    data = response.json()
-                    replies = self._extract_all_assistant_replies(data)
-                    if not replies:
-                        replies = self._extract_local_assistant_replies(session_key)
+                fetched = await self._fetch_history_since(session_key, cursor)
+                if fetched is not None:
+                    messages, next_cursor = fetched
+                    if cursor is None:
+                        replies = self._assistant_texts(messages)
+                        if not replies:
+                            replies = self._extract_local_assistant_replies(session_key)
+                    else:
+                        replies = all_replies + self._assistant_texts(messages)
+                        cursor = next_cursor
                     current_count = len(replies)
 
                     if current_count > last_count:
@@ -699,56 +908,145 @@ class OpenClawClient:
                         stable_count += 1
                         if stable_count >= 2 and current_count > 0:
                             logger.info(f"[OpenClaw] 消息已稳定{stable_count}次，共{current_count}条，结束轮询")
-                            return replies
+                            return all_replies
 
             except Exception as e:
                 logger.warning(f"[OpenClaw] 轮询第{attempt}次异常: {e}")
 
             await asyncio.sleep(poll_interval)
 
-        logger.warning(f"[OpenClaw] 轮询超时({timeout_seconds}s)，共收集{len(all_replies)}条消息")
+        logger.warning(f"[OpenClaw] 轮询超时({timeout_seconds:.0f}s)，共收集{len(all_replies)}条消息")
         return all_replies
 
+    async def _fetch_history_page(self, session_key: str, limit: int) -> Optional[List[Dict[str, Any]]]:
+        """拉取最近 limit 条原始历史消息（按时间升序），失败返回 None"""
+        try:
+            client = await self._get_client()
+            response = await client.post(
+                f"{self.config.gateway_url}/tools/invoke",
+                json={
+                    "tool": "sessions_history",
+                    "args": {
+                        "sessionKey": session_key,
+                        "limit": limit,
+                    },
+                },
+                headers=self.config.get_gateway_headers(),
+                timeout=15,
+            )
+        except Exception as e:
+            logger.warning(f"[OpenClaw] 拉取会话历史异常: {e}")
+            return None
+        if response.status_code != 200:
+            return None
+        try:
+            messages = self._history_raw_messages(response.json())
+        except Exception:
+            return None
+        indexed = sorted(enumerate(messages), key=lambda pair: self._history_sort_key(pair[1], pair[0]))
+        return [item for _, item in indexed]
+
     @staticmethod
-    def _extract_all_assistant_replies(data: Dict[str, Any]) -> List[str]:
+    def _history_marker(item: Dict[str, Any]) -> str:
+        message = item.get("message") if isinstance(item.get("message"), dict) else item
+        for key in ("id", "messageId"):
+            value = item.get(key) or message.get(key)
+            if value:
+                return f"id:{value}"
+        raw = json.dumps(item, ensure_ascii=False, sort_keys=True, default=str)
+        return "sha1:" + hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+    async def _snapshot_history_cursor(self, session_key: str) -> Optional[HistoryCursor]:
+        """发送前记下会话最后一条消息；历史不可用时返回 None（回退到全量窗口）"""
+        page = await self._fetch_history_page(session_key, 1)
+        if page is None:
+            return None
+        return HistoryCursor(marker=self._history_marker(page[-1]) if page else None)
+
+    async def _fetch_history_since(
+        self, session_key: str, cursor: Optional[HistoryCursor]
+    ) -> Optional[tuple[List[Dict[str, Any]], Optional[HistoryCursor]]]:
         """
-        从 sessions_history 返回值中提取所有 assistant 的文本回复
+        拉取游标之后新增的原始消息
+
+        从 HISTORY_PAGE_LIMIT 条开始，窗口内找不到游标且窗口已满时翻倍重拉，
+        单次运行只传输新增部分。
+
+        Returns:
+            (新增消息, 推进后的游标)；拉取失败返回 None
         """
-        replies: List[str] = []
-        try:
-            result = data.get("result", {})
-            details = result.get("details", {})
-            messages = details.get("messages", [])
+        if cursor is None:
+            page = await self._fetch_history_page(session_key, HISTORY_LEGACY_LIMIT)
+            return None if page is None else (page, None)
+
+        limit = HISTORY_PAGE_LIMIT
+        while True:
+            page = await self._fetch_history_page(session_key, limit)
+            if page is None:
+                return None
+            new_messages: Optional[List[Dict[str, Any]]] = page if cursor.marker is None else None
+            if cursor.marker is not None:
+                for i in range(len(page) - 1, -1, -1):
+                    if self._history_marker(page[i]) == cursor.marker:
+                        new_messages = page[i + 1:]
+                        break
+            if new_messages is not None and (cursor.marker is not None or len(page) < limit):
+                break
+            if len(page) < limit or limit >= HISTORY_PAGE_MAX_LIMIT:
+                if new_messages is None:
+                    # 游标已不在历史中（会话被压缩或截断），整个窗口视为新增
+                    logger.info(f"[OpenClaw] 会话游标已失效，按最近{len(page)}条消息处理")
+                    new_messages = page
+                break
+            limit *= 2
 
-            if not messages:
-                content = result.get("content", [])
-                if content and isinstance(content, list) and len(content) > 0:
-                    text = content[0].get("text", "")
-                    if isinstance(text, str) and text.strip():
-                        try:
-                            inner = json.loads(text)
-                            messages = inner.get("messages", [])
-                        except json.JSONDecodeError:
-                            pass
+        next_cursor = HistoryCursor(marker=self._history_marker(page[-1])) if page else cursor
+        return new_messages, next_cursor
 
-            for msg in messages:
-                if msg.get("role") != "assistant":
-                    continue
-                content = msg.get("content", [])
-                if isinstance(content, str):
-                    if content.strip():
-                        replies.append(content)
-                elif isinstance(content, list):
-                    text_parts = [
-                        item.get("text", "")
-                        for item in content
-                        if isinstance(item, dict) and item.get("type") == "text"
-                    ]
-                    text = "\n".join(text_parts)
-                    if text.strip():
-                        replies.append(text)
-        except Exception:
-            pass
+    async def _collect_replies(self, session_key: str, cursor: Optional[HistoryCursor]) -> List[str]:
+        fetched = await self._fetch_history_since(session_key, cursor)
+        if fetched is None:
+            return []
+        return self._assistant_texts(fetched[0])
+
+    @staticmethod
+    def _history_raw_messages(data: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """从 /tools/invoke sessions_history 的返回值中取出原始消息列表"""
+        result = data.get("result", {})
+        details = result.get("details", {})
+        messages = details.get("messages", [])
+
+        if not messages:
+            content = result.get("content", [])
+            if content and isinstance(content, list) and len(content) > 0:
+                text = content[0].get("text", "")
+                if isinstance(text, str) and text.strip():
+                    try:
+                        inner = json.loads(text)
+                        messages = inner.get("messages", [])
+                    except json.JSONDecodeError:
+                        pass
+        return [msg for msg in messages if isinstance(msg, dict)]
+
+    @staticmethod
+    def _assistant_texts(messages: List[Dict[str, Any]]) -> List[str]:
+        replies: List[str] = []
+        for msg in messages:
+            if msg.get("role") != "assistant":
+                continue
+            content = msg.get("content", [])
+            if isinstance(content, str):
+                if content.strip():
+                    replies.append(content)
+            elif isinstance(content, list):
+                text_parts = [
+                    item.get("text", "")
+                    for item in content
+                    if isinstance(item, dict) and item.get("type") == "text"
+                ]
+                text = "\n".join(text_parts)
+                if text.strip():
+                    replies.append(text)
         return replies
 
     def _local_sessions_dir(self) -> Path:
@@ -953,88 +1251,62 @@ class OpenClawClient:
     def _normalize_history_messages(cls, raw_messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         if not raw_messages:
             return []
-
-        ordered = [item for item in raw_messages if isinstance(item, dict)]
-        indexed_messages = list(enumerate(ordered))
-        indexed_messages.sort(key=lambda pair: cls._history_sort_key(pair[1], pair[0]))
-
-        normalized: List[Dict[str, Any]] = []
-        current_assistant: Optional[Dict[str, Any]] = None
-
-        for _, item in indexed_messages:
-            extracted = cls._extract_history_message(item)
-            role_key = str(extracted.get("role") or "").strip().lower().replace("-", "_")
-            content = str(extracted.get("content") or "").strip()
-            tool_events = extracted.get("toolEvents") or []
-
-            if role_key == "user":
-                current_assistant = None
-                if content:
-                    normalized.append(
-                        {
-                            "role": "user",
-                            "content": content,
-                            "type": "message",
-                            "toolEvents": [],
-                            "usage": extracted.get("usage"),
-                        }
-                    )
-                continue
-
-            if role_key in {"assistant", "toolresult", "tool_result"}:
-                if current_assistant is None:
-                    current_assistant = {
-                        "role": "assistant",
-                        "content": "",
-                        "type": "message",
-                        "toolEvents": [],
-                        "usage": extracted.get("usage"),
-                    }
-                    normalized.append(current_assistant)
-
-                if content:
-                    current_assistant["content"] = (
-                        f"{current_assistant['content']}\n\n{content}".strip()
-                        if current_assistant["content"]
-                        else content
-                    )
-                if isinstance(tool_events, list) and tool_events:
-                    current_assistant["toolEvents"].extend(tool_events)
-                if extracted.get("usage") and not current_assistant.get("usage"):
-                    current_assistant["usage"] = extracted.get("usage")
-                continue
-
-        cleaned: List[Dict[str, Any]] = []
-        for message in normalized:
-            content = str(message.get("content") or "").strip()
-            tool_events = message.get("toolEvents") or []
-            if message.get("role") == "assistant" and not content and not tool_events:
-                continue
-            message["content"] = content
-            cleaned.append(message)
-        return cleaned
+        accumulator = HistoryAccumulator(cls._history_sort_key, cls._extract_history_message)
+        accumulator.extend(raw_messages)
+        return accumulator.messages()
 
     def _read_local_session_messages(self, session_key: str) -> List[Dict[str, Any]]:
         session_file = self._resolve_local_session_file(session_key)
         if not session_file:
             return []
 
-        raw_messages: List[Dict[str, Any]] = []
+        tail = get_jsonl_tail(session_file)
         try:
-            for line in session_file.read_text(encoding="utf-8").splitlines():
-                line = line.strip()
-                if not line:
-                    continue
-                entry = json.loads(line)
-                if entry.get("type") != "message":
-                    continue
-                if not isinstance(entry.get("message"), dict):
-                    continue
-                raw_messages.append(entry)
+            with tail.lock:
+                tail.refresh()
+                # 归并状态挂在 tail 上：只把新解析的 message 条目喂给 accumulator
+                state = tail.derived.get("history")
+                if state is None or state[0] != tail.generation:
+                    accumulator = HistoryAccumulator(self._history_sort_key, self._extract_history_message)
+                    state = (tail.generation, 0, accumulator)
+                generation, consumed, accumulator = state
+                accumulator.extend([
+                    entry
+                    for _, entry in tail.entries[consumed:]
+                    if entry.get("type") == "message" and isinstance(entry.get("message"), dict)
+                ])
+                tail.derived["history"] = (generation, len(tail.entries), accumulator)
+                return accumulator.messages()
         except Exception as e:
             logger.warning(f"[OpenClaw] 读取本地会话历史失败: {e}")
             return []
-        return self._normalize_history_messages(raw_messages)
+
+    @staticmethod
+    def _transcript_entries(tail: JsonlTail) -> List[Dict[str, Any]]:
+        """单个文件去重后的 transcript 条目，随 tail 增量追加"""
+        state = tail.derived.get("transcript")
+        if state is None or state[0] != tail.generation:
+            state = (tail.generation, 0, [], set())
+        generation, consumed, entries, seen_keys = state
+        for line_no, entry in tail.entries[consumed:]:
+            entry_id = str(entry.get("id") or "").strip()
+            dedupe_key = entry_id or str(line_no)
+            if dedupe_key in seen_keys:
+                continue
+            seen_keys.add(dedupe_key)
+            entries.append(
+                {
+                    "entryType": entry.get("type"),
+                    "id": entry.get("id"),
+                    "parentId": entry.get("parentId"),
+                    "timestamp": entry.get("timestamp"),
+                    "sourceFile": tail.path.name,
+                    "message": entry.get("message"),
+                    "raw": entry,
+                }
+            )
+        tail.derived["transcript"] = (generation, len(tail.entries), entries, seen_keys)
+        return entries
 
     def _read_local_session_transcript(self, session_key: str) -> List[Dict[str, Any]]:
         sessions_dir = self._local_sessions_dir()
@@ -1052,43 +1324,22 @@ class OpenClawClient:
             for session_file in sessions_dir.glob("*.jsonl"):
                 if session_file in candidate_files:
                     continue
+                scan = get_jsonl_scan(session_file)
                 try:
-                    text = session_file.read_text(encoding="utf-8", errors="ignore")
+                    if any(scan.contains(key) for key in candidate_keys):
+                        candidate_files.append(session_file)
                 except Exception:
                     continue
-                if any(key in text for key in candidate_keys):
-                    candidate_files.append(session_file)
         except Exception as e:
             logger.warning(f"[OpenClaw] 扫描本地 transcript 片段失败: {e}")
 
-        transcript_entries: List[Dict[str, Any]] = []
-        seen_keys: set[str] = set()
+        tails = [get_jsonl_tail(session_file) for session_file in candidate_files]
         try:
-            for session_file in candidate_files:
-                for line_no, raw_line in enumerate(
-                    session_file.read_text(encoding="utf-8", errors="ignore").splitlines(),
-                    start=1,
-                ):
-                    line = raw_line.strip()
-                    if not line:
-                        continue
-                    entry = json.loads(line)
-                    entry_id = str(entry.get("id") or "").strip()
-                    dedupe_key = f"{session_file.name}:{entry_id or line_no}"
-                    if dedupe_key in seen_keys:
-                        continue
-                    seen_keys.add(dedupe_key)
-                    transcript_entries.append(
-                        {
-                            "entryType": entry.get("type"),
-                            "id": entry.get("id"),
-                            "parentId": entry.get("parentId"),
-                            "timestamp": entry.get("timestamp"),
-                            "sourceFile": session_file.name,
-                            "message": entry.get("message"),
-                            "raw": entry,
-                        }
-                    )
+            per_file: List[List[Dict[str, Any]]] = []
+            for tail in tails:
+                with tail.lock:
+                    tail.refresh()
+                    per_file.append(self._transcript_entries(tail))
         except Exception as e:
             logger.warning(f"[OpenClaw] 读取本地 transcript 失败: {e}")
             return []
@@ -1098,8 +1349,38 @@ class OpenClawClient:
             source_file = str(item.get("sourceFile") or "")
             return (timestamp, source_file)
 
-        transcript_entries.sort(key=_sort_key)
-        return transcript_entries
+        # 合并结果按 session_key 缓存：候选文件及其 generation 不变时只归并新增条目
+        progress = {str(tail.path): (tail.generation, len(entries)) for tail, entries in zip(tails, per_file)}
+        cached = self._transcript_cache.get(session_key)
+        if (
+            cached is None
+            or cached[0].keys() != progress.keys()
+            or any(cached[0][path][0] != progress[path][0] for path in progress)
+        ):
+            cached = ({path: (generation, 0) for path, (generation, _) in progress.items()}, [], [])
+        merged_progress, transcript_entries, sort_keys = cached
+
+        new_items = sorted(
+            (
+                (_sort_key(item), item)
+                for tail, entries in zip(tails, per_file)
+                for item in entries[merged_progress[str(tail.path)][1]:]
+            ),
+            key=lambda pair: pair[0],
+        )
+        if new_items and sort_keys and new_items[0][0] < sort_keys[-1]:
+            # 新条目早于已合并的条目：整体重排（timsort 对近乎有序的数据接近线性）
+            pairs = sorted(list(zip(sort_keys, transcript_entries)) + new_items, key=lambda pair: pair[0])
+            sort_keys = [key for key, _ in pairs]
+            transcript_entries = [item for _, item in pairs]
+        else:
+            sort_keys.extend(key for key, _ in new_items)
+            transcript_entries.extend(item for _, item in new_items)
+        self._transcript_cache[session_key] = (progress, transcript_entries, sort_keys)
+        self._transcript_cache.move_to_end(session_key)
+        while len(self._transcript_cache) > TRANSCRIPT_CACHE_MAX_SESSIONS:
+            self._transcript_cache.popitem(last=False)
+        return list(transcript_entries)
 
     def _extract_local_assistant_replies(self, session_key: str) -> List[str]:
         replies: List[str] = []
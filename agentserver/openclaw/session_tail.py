@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+OpenClaw 本地会话 JSONL 的增量读取。
+
+会话 transcript 只追加写入，每个文件对应一个 JsonlTail：记住已解析到的字节偏移和文件身份
+（st_dev + st_ino），之后每次读取只解析新追加的完整行。文件被替换（inode 变化）或截断
+（大小小于偏移）时整体重读，并更换 generation，依赖解析结果的缓存据此失效。
+共享的 JsonlTail 按最近使用保留 MAX_CACHED_TAILS 个，淘汰后再次读取时重新解析；
+generation 全局递增，重新创建的 JsonlTail 不会与淘汰前的缓存混淆。
+
+包含性检查（按会话键筛选候选文件）要覆盖目录下的全部文件，由单独的 JsonlScan 记录每个子串
+已扫描到的偏移。它不持有解析结果，按 MAX_CACHED_SCANS 单独限量，
+扫描大量文件时不会把真正需要的 JsonlTail 挤出缓存。
+"""
+
+from __future__ import annotations
+
+import itertools
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger("openclaw.session_tail")
+
+# 包含性检查（contains）每次读取的块大小
+SCAN_CHUNK_BYTES = 1024 * 1024
+# 共享 JsonlTail 的数量上限（每个都持有整份 transcript 的解析结果）
+MAX_CACHED_TAILS = 64
+# 共享 JsonlScan 的数量上限（只记录扫描偏移，远小于 JsonlTail）
+MAX_CACHED_SCANS = 4096
+
+_generations = itertools.count(1)
+
+
+class JsonlTail:
+    """单个 JSONL 文件的增量解析状态"""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.lock = threading.RLock()
+        self.generation = 0
+        # (行号, 条目)，行号从 1 开始并计入空行，与 splitlines 的编号一致
+        self.entries: List[Tuple[int, Dict[str, Any]]] = []
+        # 调用方基于 entries 派生的缓存（需自行比对 generation）
+        self.derived: Dict[str, Any] = {}
+        self._identity: Optional[Tuple[int, int]] = None
+        self._offset = 0
+        self._line_count = 0
+        self._mid_line = False  # 上次把无换行结尾的完整 JSON 当作一行消费了
+
+    def _sync_identity(self) -> Optional[os.stat_result]:
+        try:
+            stat = self.path.stat()
+        except OSError:
+            self._reset(None)
+            return None
+        identity = (stat.st_dev, stat.st_ino)
+        if identity != self._identity or stat.st_size < self._offset:
+            if self._identity is not None:
+                logger.info(f"[OpenClaw] 会话文件已替换或截断，重新读取: {self.path.name}")
+            self._reset(identity)
+        return stat
+
+    def _reset(self, identity: Optional[Tuple[int, int]]) -> None:
+        if self._identity is None and identity is None:
+            return
+        self._identity = identity
+        self._offset = 0
+        self._line_count = 0
+        self._mid_line = False
+        self.entries = []
+        self.generation = next(_generations)
+
+    def refresh(self) -> int:
+        """解析新追加的完整行，返回新增条目数"""
+        with self.lock:
+            stat = self._sync_identity()
+            if stat is None or stat.st_size == self._offset:
+                return 0
+            with open(self.path, "rb") as f:
+                f.seek(self._offset)
+                data = f.read(stat.st_size - self._offset)
+
+            consumed = data.rfind(b"\n") + 1
+            lines = data[:consumed].split(b"\n")[:-1] if consumed else []
+            if self._mid_line and lines and not lines[0].strip():
+                lines = lines[1:]
+            self._mid_line = False
+            before = len(self.entries)
+            for raw_line in lines:
+                self._line_count += 1
+                self._append_line(raw_line)
+
+            # 末尾没有换行的片段：写入尚未完成时留到下次；已是完整 JSON 则直接消费
+            fragment = data[consumed:]
+            if fragment.strip() and self._append_line(fragment, count=True):
+                consumed = len(data)
+                self._mid_line = True
+            self._offset += consumed
+            return len(self.entries) - before
+
+    def _append_line(self, raw_line: bytes, count: bool = False) -> bool:
+        line = raw_line.strip()
+        if not line:
+            return False
+        try:
+            entry = json.loads(line.decode("utf-8", errors="ignore"))
+        except ValueError:
+            return False
+        if not isinstance(entry, dict):
+            return False
+        if count:
+            self._line_count += 1
+        self.entries.append((self._line_count, entry))
+        return True
+
+
+class JsonlScan:
+    """单个 JSONL 文件的子串扫描状态，不解析内容"""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.lock = threading.Lock()
+        self._identity: Optional[Tuple[int, int]] = None
+        self._needles: Dict[str, int] = {}  # 子串 -> 已扫描到的偏移，-1 表示已命中
+        self._size = 0
+
+    def contains(self, needle: str) -> bool:
+        """文件中是否出现过 needle（不含换行）；只扫描上次检查之后追加的部分"""
+        with self.lock:
+            try:
+                stat = self.path.stat()
+            except OSError:
+                self._identity = None
+                self._needles.clear()
+                return False
+            identity = (stat.st_dev, stat.st_ino)
+            if identity != self._identity or stat.st_size < self._size:
+                self._identity = identity
+                self._needles.clear()
+            self._size = stat.st_size
+            position = self._needles.get(needle, 0)
+            if position < 0:
+                return True
+            encoded = needle.encode("utf-8")
+            with open(self.path, "rb") as f:
+                f.seek(position)
+                carry = b""
+                while position < stat.st_size:
+                    chunk = f.read(min(SCAN_CHUNK_BYTES, stat.st_size - position))
+                    if not chunk:
+                        break
+                    position += len(chunk)
+                    window = carry + chunk
+                    if encoded in window:
+                        self._needles[needle] = -1
+                        return True
+                    carry = window[-(len(encoded) - 1):] if len(encoded) > 1 else b""
+            # 保留 len(needle)-1 字节的重叠，跨块或写入中的匹配下次仍能命中
+            self._needles[needle] = max(0, position - len(carry))
+            return False
+
+
+_tails: "OrderedDict[str, JsonlTail]" = OrderedDict()
+_scans: "OrderedDict[str, JsonlScan]" = OrderedDict()
+_tails_lock = threading.Lock()
+
+
+def _get_shared(cache: OrderedDict, factory, path: Path, limit: int):
+    key = os.path.normcase(os.path.abspath(str(path)))
+    with _tails_lock:
+        item = cache.get(key)
+        if item is None:
+            item = cache[key] = factory(Path(path))
+            while len(cache) > limit:
+                cache.popitem(last=False)
+        else:
+            cache.move_to_end(key)
+        return item
+
+
+def get_jsonl_tail(path: Path) -> JsonlTail:
+    """按文件路径取共享的 JsonlTail（同一文件在多个客户端间复用解析结果）"""
+    return _get_shared(_tails, JsonlTail, path, MAX_CACHED_TAILS)
+
+
+def get_jsonl_scan(path: Path) -> JsonlScan:
+    """按文件路径取共享的 JsonlScan（候选文件筛选用，与 JsonlTail 分开限量）"""
+    return _get_shared(_scans, JsonlScan, path, MAX_CACHED_SCANS)
@@ -7,6 +7,7 @@ OpenClaw Gateway WebSocket 客户端。
 1. 完成 Gateway 的 connect.challenge / connect 握手
 2. 调用 chat.send
 3. 接收 chat / agent 事件
+4. 订阅单个会话的运行结束事件（RunEventWatcher）与活动事件（SessionActivityWatcher）
 """
 
 from __future__ import annotations
@@ -17,7 +18,9 @@ import json
 import logging
 import sys
 import uuid
-from typing import Any, Awaitable, Callable, Dict, Optional
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Optional, Set
 
 import websockets
 from websockets.client import WebSocketClientProtocol
@@ -25,6 +28,11 @@ from websockets.client import WebSocketClientProtocol
 logger = logging.getLogger("openclaw.ws_client")
 
 PROTOCOL_VERSION = 3
+# chat 事件的终止状态；agent lifecycle 事件的终止阶段
+CHAT_TERMINAL_STATES = ("final", "error", "aborted")
+LIFECYCLE_TERMINAL_PHASES = ("end", "error")
+# 会改变会话历史的 agent tool 事件阶段
+TOOL_RESULT_PHASES = ("end", "result")
 
 
 class OpenClawWSClient:
@@ -226,4 +234,198 @@ class OpenClawWSClient:
         self._closing = False
 
 
+@dataclass
+class RunOutcome:
+    """一次 Agent 运行的结束事件"""
+
+    state: str                     # final / error / aborted / end
+    run_id: Optional[str] = None
+    text: str = ""                 # chat final 携带的回复文本，或错误信息
+
+
+def _message_text(message: Any) -> str:
+    if isinstance(message, str):
+        return message.strip()
+    if not isinstance(message, dict):
+        return ""
+    content = message.get("content")
+    if isinstance(content, str):
+        return content.strip()
+    if isinstance(content, list):
+        parts = [
+            str(item.get("text") or "").strip()
+            for item in content
+            if isinstance(item, dict) and item.get("type") == "text"
+        ]
+        return "\n".join(part for part in parts if part)
+    return str(message.get("text") or "").strip()
+
+
+def same_session_key(candidate: str, session_key: str) -> bool:
+    """Gateway 事件里的 sessionKey 可能带 agent:main: 前缀"""
+    if not candidate or not session_key:
+        return False
+    return (
+        candidate == session_key
+        or candidate.endswith(f":{session_key}")
+        or session_key.endswith(f":{candidate}")
+    )
+
+
+class _SessionEventWatcher:
+    """订阅 Gateway 事件并按 runId / sessionKey 过滤出单个会话的事件"""
+
+    def __init__(self, gateway_url: str, token: Optional[str], session_key: str):
+        self.session_key = session_key
+        self._events: asyncio.Queue = asyncio.Queue()
+        self._client = OpenClawWSClient(gateway_url, token, on_event=self._events.put_nowait)
+
+    @property
+    def connected(self) -> bool:
+        return self._client.connected
+
+    async def start(self, timeout: float = 5.0) -> bool:
+        try:
+            return await asyncio.wait_for(self._client.connect(), timeout=timeout)
+        except Exception as e:
+            logger.info(f"事件订阅不可用: {e}")
+            await self._client.close()
+            return False
+
+    def _is_ours(self, payload: Dict[str, Any], run_ids: Set[str], *, exclusive: bool = False) -> bool:
+        """
+        事件是否属于本会话。
+
+        exclusive 为 True 时只认 run_ids 中的运行：事件带 runId 且 run_ids 非空时必须命中，
+        同一会话上其他运行的事件不算；不带 runId 的事件才回退到按 sessionKey 匹配。
+        """
+        event_run_id = str(payload.get("runId") or "").strip()
+        if event_run_id and event_run_id in run_ids:
+            return True
+        if exclusive and event_run_id and run_ids:
+            return False
+        return same_session_key(str(payload.get("sessionKey") or ""), self.session_key)
+
+    async def _next_frame(self, deadline: float) -> Optional[Dict[str, Any]]:
+        """取下一帧事件；超时或连接中断返回 None（已排队的事件仍会先返回）"""
+        if not self._events.empty():
+            return self._events.get_nowait()
+        recv_task = self._client._recv_task
+        remaining = deadline - time.monotonic()
+        if remaining <= 0 or recv_task is None or recv_task.done():
+            return None
+        getter = asyncio.ensure_future(self._events.get())
+        done, _ = await asyncio.wait({getter, recv_task}, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+        if getter in done:
+            return getter.result()
+        getter.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await getter
+        return self._events.get_nowait() if not self._events.empty() else None
+
+    async def close(self) -> None:
+        await self._client.close()
+
+
+class RunEventWatcher(_SessionEventWatcher):
+    """
+    等待指定会话上的一次运行结束。
+
+    应在发起 /hooks/agent 之前 start()，这样在 HTTP 响应返回 runId 之前就已结束的
+    快速运行也不会丢失结束事件；事件先进入队列，wait() 时再按 runId / sessionKey 匹配。
+    已知 runId 后，同一会话上其他运行的结束事件不会结束等待。
+    """
+
+    def _match(self, frame: Dict[str, Any], run_id: Optional[str]) -> Optional[RunOutcome]:
+        payload = frame.get("payload")
+        if not isinstance(payload, dict) or not self._is_ours(payload, {run_id} if run_id else set(), exclusive=True):
+            return None
+        event_run_id = str(payload.get("runId") or "").strip() or None
+
+        event = frame.get("event")
+        if event == "chat":
+            state = str(payload.get("state") or "")
+            if state not in CHAT_TERMINAL_STATES:
+                return None
+            text = _message_text(payload.get("message"))
+            if state != "final":
+                text = text or str(payload.get("errorMessage") or "")
+            return RunOutcome(state=state, run_id=event_run_id, text=text)
+        if event == "agent" and payload.get("stream") == "lifecycle":
+            data = payload.get("data") if isinstance(payload.get("data"), dict) else {}
+            phase = str(data.get("phase") or "")
+            if phase not in LIFECYCLE_TERMINAL_PHASES:
+                return None
+            return RunOutcome(state=phase, run_id=event_run_id, text=str(data.get("error") or ""))
+        return None
+
+    async def wait(self, run_id: Optional[str], timeout: float) -> Optional[RunOutcome]:
+        """
+        等待运行结束事件。
+
+        Returns:
+            RunOutcome；超时或事件连接中断时返回 None（调用方应回退到轮询）
+        """
+        deadline = time.monotonic() + max(0.0, timeout)
+        while True:
+            frame = await self._next_frame(deadline)
+            if frame is None:
+                return None
+            outcome = self._match(frame, run_id)
+            if outcome is not None:
+                return outcome
+
+
+class SessionActivityWatcher(_SessionEventWatcher):
+    """
+    感知会话上会改变历史的活动：工具结果、回复完成、运行结束。
+
+    hooks 投递的运行只在 agent 事件里带 runId，发送后用 track_run() 登记。
+    同一会话上其他运行的活动同样会改变历史，也算作活动。
+    """
+
+    def __init__(self, gateway_url: str, token: Optional[str], session_key: str):
+        super().__init__(gateway_url, token, session_key)
+        self._run_ids: Set[str] = set()
+
+    def track_run(self, run_id: Optional[str]) -> None:
+        if run_id:
+            self._run_ids.add(str(run_id))
+
+    def _is_activity(self, frame: Dict[str, Any]) -> bool:
+        payload = frame.get("payload")
+        if not isinstance(payload, dict) or not self._is_ours(payload, self._run_ids):
+            return False
+        event = frame.get("event")
+        if event == "chat":
+            return str(payload.get("state") or "") in CHAT_TERMINAL_STATES
+        if event == "agent":
+            data = payload.get("data") if isinstance(payload.get("data"), dict) else {}
+            phase = str(data.get("phase") or "")
+            stream = payload.get("stream")
+            return (stream == "tool" and phase in TOOL_RESULT_PHASES) or (
+                stream == "lifecycle" and phase in LIFECYCLE_TERMINAL_PHASES
+            )
+        return False
+
+    async def wait(self, timeout: float, settle: float = 0.0) -> bool:
+        """
+        等待下一次活动；收到后再等 settle 秒，把同一批连续事件合并为一次唤醒。
+
+        Returns:
+            是否有活动；超时或连接中断返回 False
+        """
+        deadline = time.monotonic() + max(0.0, timeout)
+        while True:
+            frame = await self._next_frame(deadline)
+            if frame is None:
+                return False
+            if self._is_activity(frame):
+                break
+        if settle > 0:
+            await asyncio.sleep(settle)
+        while not self._events.empty():
+            self._events.get_nowait()
+        return True
+
 import contextlib
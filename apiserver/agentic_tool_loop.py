@@ -5,6 +5,8 @@ Agentic Tool Loop 核心引擎
 """
 
 import asyncio
+import copy
+import functools
 import json
 import logging
 import re
@@ -17,6 +19,9 @@ import httpx
 from system.config import get_config, get_server_port
 from apiserver.agent_directory import format_agent_directory_text, resolve_agent_descriptor
 from apiserver import naga_auth
+from apiserver.stream_events import StreamEvent, data_event
+from apiserver.tool_result_cache import get_tool_result_cache, make_cache_key
+from apiserver.tool_scheduler import PRIORITY_FOREGROUND, get_tool_scheduler
 
 logger = logging.getLogger(__name__)
 
@@ -93,6 +98,67 @@ def _extract_json_objects(text: str) -> List[Dict[str, Any]]:
     return [obj for obj in objects if isinstance(obj.get("agentType"), str) and obj["agentType"]]
 
 
+# 匹配 ```tool ... ``` 代码块（允许未闭合的尾部块用 \Z 兜底）
+# 注意: 用 [ \t]* 而非 \s* 避免吃掉换行符; 用 \Z 而非 $ 避免 MULTILINE 下提前匹配行尾
+_TOOL_BLOCK_RE = re.compile(r"```tool[ \t]*\n([\s\S]*?)(?:```|\Z)")
+# 流式解析只认已闭合的代码块
+_CLOSED_TOOL_BLOCK_RE = re.compile(r"```tool[ \t]*\n([\s\S]*?)```")
+_TOOL_BLOCK_OPEN = "```tool"
+_TOOL_BLOCK_HEADER_RE = re.compile(r"```tool[ \t]*")
+
+
+def _parse_tool_block(block_content: str) -> List[Dict[str, Any]]:
+    """解析单个 ```tool``` 代码块内容中的工具调用"""
+    block_content = block_content.strip()
+    if not block_content:
+        return []
+    return _extract_json_objects(_normalize_fullwidth_json_chars(block_content))
+
+
+class IncrementalToolBlockParser:
+    """流式 ```tool``` 代码块解析器
+
+    LLM 还在输出时，每当一个 ```tool``` 代码块闭合就立即解析出其中的工具调用，
+    调用方无需等待整段回复结束即可派发。只处理已闭合的代码块：结果始终是
+    parse_tool_calls_from_text(完整文本) 所得调用列表的前缀，
+    未闭合的尾部块、特殊语法和裸 JSON 仍由流结束后的整段解析处理。
+    """
+
+    def __init__(self):
+        self._text = ""
+        self._scan_pos = 0  # 此前的文本已确认不含未处理的代码块
+        self.calls: List[Dict[str, Any]] = []  # 已解析出的调用（按出现顺序）
+
+    def feed(self, chunk: str) -> List[Dict[str, Any]]:
+        """追加一段流式文本，返回本次新闭合代码块中的工具调用"""
+        self._text += chunk
+        if "`" not in chunk:
+            return []  # 代码块只可能在反引号到达时开始或闭合
+
+        new_calls: List[Dict[str, Any]] = []
+        while True:
+            start = self._text.find(_TOOL_BLOCK_OPEN, self._scan_pos)
+            if start < 0:
+                # 保留可能是 "```tool" 前半截的尾部，下次从那里继续找
+                self._scan_pos = max(self._scan_pos, len(self._text) - len(_TOOL_BLOCK_OPEN) + 1)
+                break
+            match = _CLOSED_TOOL_BLOCK_RE.match(self._text, start)
+            if match is None:
+                header = _TOOL_BLOCK_HEADER_RE.match(self._text, start)
+                if header.end() < len(self._text) and self._text[header.end()] != "\n":
+                    # 开头行不是 ```tool + 换行（如 ```tools），不是工具代码块
+                    self._scan_pos = start + 1
+                    continue
+                # 开头行未结束或代码块尚未闭合，等待更多文本
+                self._scan_pos = start
+                break
+            new_calls.extend(_parse_tool_block(match.group(1)))
+            self._scan_pos = match.end()
+
+        self.calls.extend(new_calls)
+        return new_calls
+
+
 def _extract_tool_blocks(text: str) -> Tuple[str, List[Dict[str, Any]]]:
     """从 ```tool``` 代码块中提取工具调用JSON。
 
@@ -101,17 +167,10 @@ def _extract_tool_blocks(text: str) -> Tuple[str, List[Dict[str, Any]]]:
     """
 
     tool_calls: List[Dict[str, Any]] = []
-    # 匹配 ```tool ... ``` 代码块（允许未闭合的尾部块用 \Z 兜底）
-    # 注意: 用 [ \t]* 而非 \s* 避免吃掉换行符; 用 \Z 而非 $ 避免 MULTILINE 下提前匹配行尾
-    pattern = re.compile(r"```tool[ \t]*\n([\s\S]*?)(?:```|\Z)")
+    pattern = _TOOL_BLOCK_RE
 
     for match in pattern.finditer(text):
-        block_content = match.group(1).strip()
-        if not block_content:
-            continue
-        normalized = _normalize_fullwidth_json_chars(block_content)
-        extracted = _extract_json_objects(normalized)
-        tool_calls.extend(extracted)
+        tool_calls.extend(_parse_tool_block(match.group(1)))
 
     # 从文本中移除 ```tool...``` 代码块
     clean_text = pattern.sub("", text).strip()
@@ -347,7 +406,7 @@ async def _execute_mcp_call(call: Dict[str, Any], source_agent_id: Optional[str]
             }
 
     try:
-        from mcpserver.mcp_registry import is_service_visible_to_agent
+        from mcpserver.mcp_registry import get_tool_cache_ttl, is_service_visible_to_agent
         from mcpserver.mcp_manager import get_mcp_manager
 
         if not is_service_visible_to_agent(service_name, agent_id=source_agent_id):
@@ -361,7 +420,13 @@ async def _execute_mcp_call(call: Dict[str, Any], source_agent_id: Optional[str]
 
         manager = get_mcp_manager()
         t0 = _time.monotonic()
-        result = await manager.unified_call(service_name, call)
+        # manifest 中开启 resultCache 的只读工具：相同参数在 TTL 内复用结果，并发相同调用只执行一次
+        result = await get_tool_result_cache().get_or_run(
+            make_cache_key("mcp", service_name, tool_name, call),
+            get_tool_cache_ttl(service_name, tool_name),
+            lambda: manager.unified_call(service_name, call),
+            cacheable=_is_cacheable_mcp_result,
+        )
         elapsed = _time.monotonic() - t0
         logger.info(f"[AgenticLoop] MCP调用完成: {service_name}/{tool_name} 耗时 {elapsed:.2f}s")
         return {
@@ -382,6 +447,19 @@ async def _execute_mcp_call(call: Dict[str, Any], source_agent_id: Optional[str]
         }
 
 
+def _is_cacheable_mcp_result(result: Any) -> bool:
+    """MCP 服务以 {"status": "error", ...} JSON 文本返回错误，错误结果不缓存"""
+    if not isinstance(result, str):
+        return result is not None
+    if result.lstrip().startswith("{"):
+        try:
+            parsed = json.loads(result)
+        except (json.JSONDecodeError, TypeError):
+            return True
+        return not (isinstance(parsed, dict) and parsed.get("status") == "error")
+    return True
+
+
 async def _execute_openclaw_call(call: Dict[str, Any], session_id: str) -> Dict[str, Any]:
     """执行单个OpenClaw调用（Agent 模式，通过 /hooks/agent 走二次 LLM）"""
     message = call.get("message", "")
@@ -625,6 +703,17 @@ async def _execute_brave_search(call: Dict[str, Any]) -> Dict[str, Any]:
         }
 
 
+async def _execute_cached_search(call: Dict[str, Any], service_name: str, executor) -> Dict[str, Any]:
+    """带结果缓存的 web_search：相同搜索参数在 online_search.result_cache_ttl 内复用成功结果"""
+    result = await get_tool_result_cache().get_or_run(
+        make_cache_key("openclaw_tool", service_name, "web_search", call.get("args", {})),
+        get_config().online_search.result_cache_ttl,
+        lambda: executor(call),
+        cacheable=lambda r: r.get("status") == "success",
+    )
+    return {**result, "tool_call": call}
+
+
 async def execute_pre_search(query: str, count: int = 8) -> Optional[str]:
     """
     前置搜索：在主 LLM 调用前执行搜索，返回格式化的搜索结果文本。
@@ -634,13 +723,13 @@ async def execute_pre_search(query: str, count: int = 8) -> Optional[str]:
     call = {"args": {"query": query, "count": count}}
 
     if naga_auth.is_authenticated():
-        result = await _execute_naga_search(call)
+        result = await _execute_cached_search(call, "naga_search", _execute_naga_search)
         if result.get("status") == "success" and result.get("result"):
             return result["result"]
 
     cfg = get_config()
     if cfg.online_search.search_api_key:
-        result = await _execute_brave_search(call)
+        result = await _execute_cached_search(call, "brave_search", _execute_brave_search)
         if result.get("status") == "success" and result.get("result"):
             return result["result"]
 
@@ -682,10 +771,10 @@ async def _execute_openclaw_tool_call(
     # web_search: 已登录走 Naga 代理，未登录有 key 走 Brave，都没有走 OpenClaw
     if tool_name == "web_search":
         if naga_auth.is_authenticated():
-            return await _execute_naga_search(call)
+            return await _execute_cached_search(call, "naga_search", _execute_naga_search)
         cfg = get_config()
         if cfg.online_search.search_api_key:
-            return await _execute_brave_search(call)
+            return await _execute_cached_search(call, "brave_search", _execute_brave_search)
 
     # 本地可执行工具：直接在本机执行，不经过 OpenClaw agent session
     if tool_name in _LOCAL_EXEC_TOOLS:
@@ -1155,30 +1244,36 @@ async def execute_tool_calls(
     tool_calls: List[Dict[str, Any]],
     session_id: str,
     source_agent_id: Optional[str] = None,
+    priority: int = PRIORITY_FOREGROUND,
 ) -> List[Dict[str, Any]]:
     """按 agentType 分组并行执行工具调用（不包含 live2d）。
 
+    调用经 ToolScheduler 按服务限制并发与速率，前台会话（priority=PRIORITY_FOREGROUND）优先放行；
+    结果按原始调用顺序返回。
+
     Returns:
         [{"tool_call": {...}, "result": "...", "status": "success|error", "service_name": "...", "tool_name": "..."}]
     """
-    tasks = []
+    jobs = []
     for call in tool_calls:
         agent_type = call.get("agentType", "")
         if agent_type == "mcp":
-            tasks.append(_execute_mcp_call(call, source_agent_id=source_agent_id))
+            runner = functools.partial(_execute_mcp_call, call, source_agent_id=source_agent_id)
         elif agent_type == "openclaw":
-            tasks.append(_execute_openclaw_call(call, session_id))
+            runner = functools.partial(_execute_openclaw_call, call, session_id)
         elif agent_type in ("tool", "openclaw_tool"):
-            tasks.append(_execute_openclaw_tool_call(call, source_agent_id=source_agent_id))
+            runner = functools.partial(_execute_openclaw_tool_call, call, source_agent_id=source_agent_id)
         elif agent_type == "naga_control":
-            tasks.append(_execute_naga_control(call))
+            runner = functools.partial(_execute_naga_control, call)
         else:
             logger.warning(f"[AgenticLoop] 未知agentType: {agent_type}, 跳过: {call}")
+            continue
+        jobs.append((call, runner))
 
-    if not tasks:
+    if not jobs:
         return []
 
-    results = await asyncio.gather(*tasks, return_exceptions=True)
+    results = await get_tool_scheduler().run_all(jobs, priority=priority)
     final = []
     for r in results:
         if isinstance(r, Exception):
@@ -1196,6 +1291,21 @@ async def execute_tool_calls(
     return final
 
 
+def _exclude_dispatched(
+    calls: List[Dict[str, Any]],
+    dispatched: List[Dict[str, Any]],
+) -> List[Dict[str, Any]]:
+    """从 calls 中按出现次数扣除已派发的调用（模型重复发出的相同调用仍各执行一次）"""
+    pending = list(dispatched)
+    remaining = []
+    for call in calls:
+        if call in pending:
+            pending.remove(call)
+        else:
+            remaining.append(call)
+    return remaining
+
+
 # ---------------------------------------------------------------------------
 # 格式化
 # ---------------------------------------------------------------------------
@@ -1217,21 +1327,6 @@ def format_tool_results_for_llm(results: List[Dict[str, Any]]) -> str:
     return "\n\n".join(parts)
 
 
-# ---------------------------------------------------------------------------
-# SSE 辅助
-# ---------------------------------------------------------------------------
-
-
-def _format_sse_event(event_type: str, data: Any) -> str:
-    """格式化扩展SSE事件"""
-    payload = {"type": event_type}
-    if isinstance(data, dict):
-        payload.update(data)
-    else:
-        payload["data"] = data
-    return f"data: {json.dumps(payload, ensure_ascii=False)}\n\n"
-
-
 # ---------------------------------------------------------------------------
 # Native Function Calling → Dispatch 格式转换
 # ---------------------------------------------------------------------------
@@ -1305,10 +1400,11 @@ async def run_agentic_loop(
     model_override: Optional[Dict[str, str]] = None,
     tools: Optional[List[Dict[str, Any]]] = None,
     source_agent_id: Optional[str] = None,
-) -> AsyncGenerator[str, None]:
+    priority: int = PRIORITY_FOREGROUND,
+) -> AsyncGenerator[StreamEvent, None]:
     """Agentic tool loop 核心。
 
-    流式输出SSE chunks，包含：
+    流式输出 StreamEvent（SSE 编码由 HTTP 路由在出口处统一完成），包含：
     - content/reasoning chunks（透传自LLM）
     - round_start/tool_calls/tool_results/round_end 事件
 
@@ -1320,9 +1416,10 @@ async def run_agentic_loop(
         max_rounds: 最大循环轮数
         model_override: 临时模型覆盖参数（用于视觉模型等场景）
         tools: OpenAI function calling schemas（可选，传入时启用原生工具调用）
+        priority: 工具调度优先级（后台会话传 PRIORITY_BACKGROUND，让位于用户前台对话）
 
     Yields:
-        SSE格式的data chunks
+        StreamEvent
     """
     from .llm_service import get_llm_service
 
@@ -1338,153 +1435,180 @@ async def run_agentic_loop(
         #    round 1 压缩历史对话，round 2+ 压缩上一轮工具结果膨胀的上下文
         try:
             from .context_compressor import compress_context
-            compress_result = await compress_context(messages)
+            compress_result = await compress_context(messages, session_id)
             if compress_result.compressed:
                 messages[:] = compress_result.messages
-            for sse_event in compress_result.sse_events:
-                yield sse_event
+            for event in compress_result.events:
+                yield event
         except Exception as e:
             logger.debug(f"[AgenticLoop] 上下文压缩跳过: {e}")
 
         # 1. 通知前端开始新一轮
         if round_num > 1:
-            yield _format_sse_event("round_start", {"round": round_num})
+            yield data_event("round_start", {"round": round_num})
 
         # 2. 流式调用LLM，累积完整输出
-        complete_text = ""
-        complete_reasoning = ""
         native_calls = None  # 原生 function calling 结果
         t_llm_start = _time.monotonic()
 
         # 总结轮不传 tools（禁止再次工具调用）
         round_tools = tools if round_num <= max_rounds else None
 
-        async for chunk in llm_service.stream_chat_with_context(messages, get_config().api.temperature,
-                                                                 model_override=model_override,
-                                                                 tools=round_tools):
-            if chunk.startswith("data: "):
-                try:
-                    data_str = chunk[6:].strip()
-                    if data_str and data_str != "[DONE]":
-                        chunk_data = json.loads(data_str)
-                        chunk_type = chunk_data.get("type", "content")
-                        chunk_text = chunk_data.get("text", "")
-
-                        if chunk_type == "content":
-                            complete_text += chunk_text
-                        elif chunk_type == "reasoning":
-                            complete_reasoning += chunk_text
-                        elif chunk_type == "tool_calls_native":
-                            # 原生 function calling：完整 tool_calls JSON
-                            try:
-                                native_calls = json.loads(chunk_text)
-                            except (json.JSONDecodeError, TypeError):
-                                logger.warning(f"[AgenticLoop] native tool_calls 解析失败: {chunk_text[:200]}")
-                            continue  # 不透传此内部事件给前端
-                except Exception:
-                    pass
-
-            # 透传所有SSE chunks给前端（content + reasoning）
-            yield chunk
-
-        # 3. 从完整输出中解析工具调用
-        #    优先使用 native tool calls，回退到文本解析（兼容期）
-        t_llm_elapsed = _time.monotonic() - t_llm_start
-        logger.info(
-            f"[AgenticLoop] Round {round_num} LLM流式输出完成: {t_llm_elapsed:.2f}s, "
-            f"content={len(complete_text)}字, reasoning={len(complete_reasoning)}字, "
-            f"native_calls={'yes' if native_calls else 'no'}"
-        )
-        logger.debug(
-            f"[AgenticLoop] Round {round_num} complete_text ({len(complete_text)} chars): {complete_text[:300]!r}"
-        )
-
-        use_native = False
-        if native_calls:
-            tool_calls = _convert_native_to_dispatch(native_calls)
-            clean_text = complete_text  # native 模式下 content 就是纯文本
-            use_native = True
-            logger.info(f"[AgenticLoop] Round {round_num}: 使用原生 function calling, {len(tool_calls)} 个工具调用")
-        else:
-            clean_text, tool_calls = parse_tool_calls_from_text(complete_text)
-
-        # 4. 分离 live2d 和可执行调用
-        actionable_calls = [tc for tc in tool_calls if tc.get("agentType") != "live2d"]
-        live2d_calls = [tc for tc in tool_calls if tc.get("agentType") == "live2d"]
-
-        # 4a. 如果检测到了任何工具调用，发送 content_clean 让前端替换掉带有工具代码块的原文
-        if tool_calls and clean_text != complete_text:
-            # 保留工具调用前的简短说明文字（如"让我查一下"），仅移除 ```tool``` 代码块
-            yield _format_sse_event("content_clean", {"text": clean_text})
-
-        # 4b. 所有工具调用都先透传给前端，再触发实际执行/动画。
-        call_descriptions = []
-        for tc in tool_calls:
-            desc = {"agentType": tc.get("agentType", "")}
-            if tc.get("agentType") == "live2d":
-                desc["service_name"] = "live2d"
-                if tc.get("action"):
-                    desc["tool_name"] = tc["action"]
-            if tc.get("service_name"):
-                desc["service_name"] = tc["service_name"]
-            if tc.get("tool_name"):
-                desc["tool_name"] = tc["tool_name"]
-            if tc.get("message"):
-                desc["message"] = tc["message"][:100]
-            call_descriptions.append(desc)
-        if call_descriptions:
-            yield _format_sse_event("tool_calls", {"calls": call_descriptions})
-
-        # 4c. Live2D 在工具调用已经进入消息流后再异步触发，避免生成正文时频繁变脸。
-        if live2d_calls:
-            asyncio.create_task(_send_live2d_actions(live2d_calls, session_id))
-
-        # 5. 如果没有可执行的工具调用，循环结束
-        if not actionable_calls:
-            # 模型只返回了 live2d 调用而没有文字内容时（Anthropic 常见行为），
-            # 需要将 live2d tool call 的结果回注并再调用一轮 LLM 来生成文字回复
-            if live2d_calls and not complete_text.strip() and use_native and round_num < max_rounds:
-                logger.info(f"[AgenticLoop] Round {round_num}: 模型仅返回 live2d 调用无正文，"
-                            f"回注 tool result 继续下一轮获取文字回复")
-                # 构造 assistant message + tool results for live2d calls
-                assistant_msg = {
-                    "role": "assistant",
-                    "content": None,
-                    "tool_calls": [
-                        {
-                            "id": c.get("_tool_call_id", f"call_{i}"),
-                            "type": "function",
-                            "function": {
-                                "name": c.get("_original_name", ""),
-                                "arguments": c.get("_original_args", "{}"),
-                            },
-                        }
-                        for i, c in enumerate(live2d_calls)
-                    ],
-                }
-                messages.append(assistant_msg)
-                for c in live2d_calls:
-                    messages.append({
-                        "role": "tool",
-                        "tool_call_id": c.get("_tool_call_id", ""),
-                        "content": "已执行",
-                    })
-                yield _format_sse_event("round_end", {"round": round_num, "has_more": True})
-                continue
-
-            t_round_elapsed = _time.monotonic() - t_round_start
-            t_total_elapsed = _time.monotonic() - t_loop_start
-            logger.info(f"[AgenticLoop] Round {round_num}: 无工具调用，循环结束 "
-                        f"(本轮 {t_round_elapsed:.2f}s, 总计 {t_total_elapsed:.2f}s)")
-            # 发送本轮结束信号
-            yield _format_sse_event("round_end", {"round": round_num, "has_more": False})
-            break
+        text_parts: List[str] = []
+        reasoning_parts: List[str] = []
+        # 文本协议（无原生 function calling）：```tool``` 代码块一闭合就提前派发，不等正文输出完
+        block_parser = IncrementalToolBlockParser() if round_tools is None else None
+        early_calls: List[Dict[str, Any]] = []
+        early_parsed: List[Dict[str, Any]] = []  # 派发前的副本（执行过程可能改写调用字典），用于流结束后扣除
+        early_tasks: List[asyncio.Task] = []
+        try:
+            async for event in llm_service.stream_chat_events(messages, get_config().api.temperature,
+                                                              model_override=model_override,
+                                                              tools=round_tools):
+                if event.type == "content":
+                    text_parts.append(event.text)
+                    if block_parser is not None:
+                        new_calls = [
+                            tc for tc in block_parser.feed(event.text) if tc.get("agentType") != "live2d"
+                        ]
+                        if new_calls:
+                            if not early_calls:
+                                logger.info(
+                                    f"[AgenticLoop] Round {round_num}: 流式解析到工具调用，提前派发 "
+                                    f"(首个派发距LLM开始 {_time.monotonic() - t_llm_start:.2f}s)"
+                                )
+                            early_calls.extend(new_calls)
+                            early_parsed.extend(copy.deepcopy(new_calls))
+                            early_tasks.append(asyncio.create_task(execute_tool_calls(
+                                new_calls, session_id, source_agent_id=source_agent_id, priority=priority
+                            )))
+                elif event.type == "reasoning":
+                    reasoning_parts.append(event.text)
+                elif event.type == "tool_calls_native":
+                    # 原生 function calling：完整 tool_calls 列表
+                    native_calls = event.get("calls")
+                    continue  # 不透传此内部事件给前端
+
+                # 透传所有事件给前端（content + reasoning）
+                yield event
+            complete_text = "".join(text_parts)
+            complete_reasoning = "".join(reasoning_parts)
+
+            # 3. 从完整输出中解析工具调用
+            #    优先使用 native tool calls，回退到文本解析（兼容期）
+            t_llm_elapsed = _time.monotonic() - t_llm_start
+            logger.info(
+                f"[AgenticLoop] Round {round_num} LLM流式输出完成: {t_llm_elapsed:.2f}s, "
+                f"content={len(complete_text)}字, reasoning={len(complete_reasoning)}字, "
+                f"native_calls={'yes' if native_calls else 'no'}"
+            )
+            logger.debug(
+                f"[AgenticLoop] Round {round_num} complete_text ({len(complete_text)} chars): {complete_text[:300]!r}"
+            )
 
-        logger.info(f"[AgenticLoop] Round {round_num}: 检测到 {len(actionable_calls)} 个工具调用")
+            use_native = False
+            if native_calls:
+                tool_calls = _convert_native_to_dispatch(native_calls)
+                clean_text = complete_text  # native 模式下 content 就是纯文本
+                use_native = True
+                logger.info(f"[AgenticLoop] Round {round_num}: 使用原生 function calling, {len(tool_calls)} 个工具调用")
+            else:
+                clean_text, tool_calls = parse_tool_calls_from_text(complete_text)
+
+            # 4. 分离 live2d 和可执行调用
+            actionable_calls = [tc for tc in tool_calls if tc.get("agentType") != "live2d"]
+            live2d_calls = [tc for tc in tool_calls if tc.get("agentType") == "live2d"]
+
+            # 4a. 如果检测到了任何工具调用，发送 content_clean 让前端替换掉带有工具代码块的原文
+            if tool_calls and clean_text != complete_text:
+                # 保留工具调用前的简短说明文字（如"让我查一下"），仅移除 ```tool``` 代码块
+                yield data_event("content_clean", {"text": clean_text})
+
+            # 4b. 所有工具调用都先透传给前端，再触发实际执行/动画。
+            call_descriptions = []
+            for tc in tool_calls:
+                desc = {"agentType": tc.get("agentType", "")}
+                if tc.get("agentType") == "live2d":
+                    desc["service_name"] = "live2d"
+                    if tc.get("action"):
+                        desc["tool_name"] = tc["action"]
+                if tc.get("service_name"):
+                    desc["service_name"] = tc["service_name"]
+                if tc.get("tool_name"):
+                    desc["tool_name"] = tc["tool_name"]
+                if tc.get("message"):
+                    desc["message"] = tc["message"][:100]
+                call_descriptions.append(desc)
+            if call_descriptions:
+                yield data_event("tool_calls", {"calls": call_descriptions})
+
+            # 4c. Live2D 在工具调用已经进入消息流后再异步触发，避免生成正文时频繁变脸。
+            if live2d_calls:
+                asyncio.create_task(_send_live2d_actions(live2d_calls, session_id))
+
+            # 5. 如果没有可执行的工具调用，循环结束
+            if not actionable_calls:
+                # 模型只返回了 live2d 调用而没有文字内容时（Anthropic 常见行为），
+                # 需要将 live2d tool call 的结果回注并再调用一轮 LLM 来生成文字回复
+                if live2d_calls and not complete_text.strip() and use_native and round_num < max_rounds:
+                    logger.info(f"[AgenticLoop] Round {round_num}: 模型仅返回 live2d 调用无正文，"
+                                f"回注 tool result 继续下一轮获取文字回复")
+                    # 构造 assistant message + tool results for live2d calls
+                    assistant_msg = {
+                        "role": "assistant",
+                        "content": None,
+                        "tool_calls": [
+                            {
+                                "id": c.get("_tool_call_id", f"call_{i}"),
+                                "type": "function",
+                                "function": {
+                                    "name": c.get("_original_name", ""),
+                                    "arguments": c.get("_original_args", "{}"),
+                                },
+                            }
+                            for i, c in enumerate(live2d_calls)
+                        ],
+                    }
+                    messages.append(assistant_msg)
+                    for c in live2d_calls:
+                        messages.append({
+                            "role": "tool",
+                            "tool_call_id": c.get("_tool_call_id", ""),
+                            "content": "已执行",
+                        })
+                    yield data_event("round_end", {"round": round_num, "has_more": True})
+                    continue
 
-        # 7. 并行执行工具调用
-        t_tool_start = _time.monotonic()
-        results = await execute_tool_calls(actionable_calls, session_id, source_agent_id=source_agent_id)
+                t_round_elapsed = _time.monotonic() - t_round_start
+                t_total_elapsed = _time.monotonic() - t_loop_start
+                logger.info(f"[AgenticLoop] Round {round_num}: 无工具调用，循环结束 "
+                            f"(本轮 {t_round_elapsed:.2f}s, 总计 {t_total_elapsed:.2f}s)")
+                # 发送本轮结束信号
+                yield data_event("round_end", {"round": round_num, "has_more": False})
+                break
+
+            logger.info(f"[AgenticLoop] Round {round_num}: 检测到 {len(actionable_calls)} 个工具调用")
+
+            # 7. 并行执行工具调用（流式阶段已提前派发的调用只等待结果，不重复执行）
+            t_tool_start = _time.monotonic()
+            if early_tasks:
+                # 未提前派发的调用立即启动，与提前派发的调用并行，不排在最慢的那个后面
+                remaining_calls = _exclude_dispatched(actionable_calls, early_parsed)
+                if remaining_calls:
+                    early_tasks.append(asyncio.create_task(execute_tool_calls(
+                        remaining_calls, session_id, source_agent_id=source_agent_id, priority=priority
+                    )))
+                results = [r for batch in await asyncio.gather(*early_tasks) for r in batch]
+                actionable_calls = early_calls + remaining_calls
+            else:
+                results = await execute_tool_calls(
+                    actionable_calls, session_id, source_agent_id=source_agent_id, priority=priority
+                )
+        finally:
+            # 生成器被关闭（客户端断开）或 LLM 流异常时，取消仍在执行的提前派发调用
+            for task in early_tasks:
+                if not task.done():
+                    task.cancel()
         t_tool_elapsed = _time.monotonic() - t_tool_start
         logger.info(f"[AgenticLoop] Round {round_num}: 工具执行完成 {t_tool_elapsed:.2f}s "
                     f"({len(results)} 个工具)")
@@ -1511,7 +1635,7 @@ async def run_agentic_loop(
                     "result": display_result,
                 }
             )
-        yield _format_sse_event("tool_results", {"results": result_summaries})
+        yield data_event("tool_results", {"results": result_summaries})
 
         # 9. 将本轮LLM输出 + 工具结果注入消息历史
         if use_native:
@@ -1563,7 +1687,7 @@ async def run_agentic_loop(
                     f"[AgenticLoop] 注入 {len(queued)} 条排队消息: "
                     f"{[q.source for q in queued]}"
                 )
-                yield _format_sse_event(
+                yield data_event(
                     "queued_messages",
                     {"count": len(queued), "sources": [q.source for q in queued]},
                 )
@@ -1573,12 +1697,12 @@ async def run_agentic_loop(
         # 9a. 连续失败达到阈值时提前终止，进入总结轮
         if consecutive_failures >= 2:
             logger.warning(f"[AgenticLoop] 连续 {consecutive_failures} 轮工具全部失败，提前终止循环")
-            yield _format_sse_event("round_end", {"round": round_num, "has_more": True})
+            yield data_event("round_end", {"round": round_num, "has_more": True})
             needs_summary = True
             break
 
         # 发送本轮结束信号
-        yield _format_sse_event("round_end", {"round": round_num, "has_more": True})
+        yield data_event("round_end", {"round": round_num, "has_more": True})
 
         t_round_elapsed = _time.monotonic() - t_round_start
         t_total_elapsed = _time.monotonic() - t_loop_start
@@ -1597,16 +1721,16 @@ async def run_agentic_loop(
         # 总结轮前也检查压缩（多轮工具调用后 context 可能已经很大）
         try:
             from .context_compressor import compress_context
-            compress_result = await compress_context(messages)
+            compress_result = await compress_context(messages, session_id)
             if compress_result.compressed:
                 messages[:] = compress_result.messages
-            for sse_event in compress_result.sse_events:
-                yield sse_event
+            for event in compress_result.events:
+                yield event
         except Exception as e:
             logger.debug(f"[AgenticLoop] 总结轮压缩跳过: {e}")
 
         # 通知前端开始总结轮（重要：触发 api_server 重置 is_tool_event 标记）
-        yield _format_sse_event("round_start", {"round": max_rounds + 1, "summary": True})
+        yield data_event("round_start", {"round": max_rounds + 1, "summary": True})
 
         # 注入总结指令
         messages.append({
@@ -1619,9 +1743,9 @@ async def run_agentic_loop(
         })
 
         # 最终总结轮：流式输出（不传 tools，禁止再发起工具调用）
-        async for chunk in llm_service.stream_chat_with_context(messages, get_config().api.temperature,
-                                                                 model_override=model_override,
-                                                                 tools=None):
-            yield chunk
+        async for event in llm_service.stream_chat_events(messages, get_config().api.temperature,
+                                                          model_override=model_override,
+                                                          tools=None):
+            yield event
 
-        yield _format_sse_event("round_end", {"round": max_rounds + 1, "has_more": False})
+        yield data_event("round_end", {"round": max_rounds + 1, "has_more": False})
@@ -108,6 +108,18 @@ async def lifespan(app: FastAPI):
         except Exception as e:
             print(f"[WARN] Telemetry 初始化失败: {e}")
 
+        # GRAG 启用时立即启动五元组提取任务管理器，回放上次未处理完的持久化任务，
+        # 不必等到第一轮对话写入记忆时才惰性启动
+        try:
+            from system.config import get_config as _gc
+            if _gc().grag.enabled:
+                from summer_memory.memory_manager import memory_manager  # 注册任务完成回调
+                from summer_memory.task_manager import start_task_manager
+                if memory_manager.enabled:
+                    await start_task_manager()
+        except Exception as e:
+            print(f"[WARN] 记忆任务管理器启动失败: {e}")
+
         print("[SUCCESS] API服务器初始化完成")
         yield
     except Exception as e:
@@ -122,6 +134,12 @@ async def lifespan(app: FastAPI):
             await get_telemetry_manager().shutdown()
         except Exception as e:
             print(f"[WARN] Telemetry 清理失败: {e}")
+        try:
+            if "summer_memory.task_manager" in sys.modules:
+                from summer_memory.task_manager import stop_task_manager
+                await stop_task_manager()
+        except Exception as e:
+            print(f"[WARN] 记忆任务管理器停止失败: {e}")
 
 
 # 创建FastAPI应用
@@ -222,6 +240,7 @@ class ChatRequest(BaseModel):
     skill: Optional[str] = None  # 用户主动选择的技能名称，注入完整指令到系统提示词
     images: Optional[List[str]] = None  # 截屏图片 base64 数据列表（data:image/png;base64,...）
     temporary: bool = False  # 临时会话标记，临时会话不持久化到磁盘
+    background: bool = False  # 后台会话（内部回调等非用户发起的对话），工具调度让位于用户前台对话
 
 
 class ChatResponse(BaseModel):
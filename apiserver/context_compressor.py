@@ -7,6 +7,8 @@
    注入 system prompt 的 <compress> 标签中。
 2. **运行时压缩**：agentic loop 每轮开始前检查，当总 token 超过阈值时
    压缩早期消息，防止超长上下文导致 API 报错。
+   超过较低的预压缩水位时，会在后台提前为早期 loop 生成摘要（按 loop 内容缓存），
+   到达阈值时直接替换，无需再同步等待摘要 LLM 调用；早期 loop 变化后旧摘要作废。
 
 压缩后的摘要格式：
     以下是上次对话的压缩记录：
@@ -15,24 +17,30 @@
     </compress>
 """
 
+import asyncio
 import json
 import logging
+from collections import OrderedDict
 from dataclasses import dataclass, field
-from typing import Dict, List, Optional, Tuple
+from typing import Any, Dict, List, Optional, Tuple
 
 import litellm
 from litellm import acompletion
 
 from . import naga_auth
+from .stream_events import StreamEvent, data_event
 from system.config import get_config
 
 logger = logging.getLogger("ContextCompressor")
 
 # ── 常量 ──
 TOKEN_THRESHOLD = 100_000       # 运行时压缩：总 token 超过此值触发
+SPECULATIVE_THRESHOLD = 70_000  # 预压缩水位：超过此值在后台提前生成早期 loop 摘要（0 关闭）
 MAX_KEEP_LOOPS = 10             # 最多保留的最近 loop 数
 MAX_KEEP_TOKENS = 10_000        # 保留区 token 上限
 COMPRESS_MODEL = "gpt-4.1-nano"
+TOKEN_CACHE_SIZE = 4096         # 单条消息 token 数缓存容量
+MAX_TRACKED_SESSIONS = 64       # 保留增量 token 账本的会话数
 
 COMPRESS_MARKER = "以下是上次对话的压缩记录："
 
@@ -50,7 +58,7 @@ def _load_summarize_prompt() -> str:
 class CompressResult:
     """压缩结果"""
     messages: List[Dict]                        # 压缩后（或原始）的消息列表
-    sse_events: List[str] = field(default_factory=list)  # 要转发给前端的 SSE 事件
+    events: List[StreamEvent] = field(default_factory=list)  # 要转发给前端的流式事件
     compressed: bool = False                    # 是否实际执行了压缩
 
 
@@ -67,6 +75,83 @@ def count_tokens(messages: List[Dict], model: str = "gpt-4") -> int:
         return estimated
 
 
+_token_cache: "OrderedDict[Tuple, int]" = OrderedDict()
+
+
+def _message_cache_key(msg: Dict) -> Tuple:
+    """单条消息的缓存键：role + 内容（str 直接作键，利用 str 自身缓存的 hash）"""
+    content = msg.get("content", "")
+    if not isinstance(content, str):
+        content = json.dumps(content, ensure_ascii=False, sort_keys=True, default=str)
+    extra = ""
+    if msg.get("tool_calls"):
+        extra = json.dumps(msg["tool_calls"], ensure_ascii=False, sort_keys=True, default=str)
+    return (msg.get("role", ""), content, extra)
+
+
+def count_message_tokens(msg: Dict, model: str = "gpt-4") -> int:
+    """计算单条消息的 token 数（按内容缓存，同一内容只分词一次）"""
+    key = _message_cache_key(msg)
+    cached = _token_cache.get(key)
+    if cached is not None:
+        _token_cache.move_to_end(key)
+        return cached
+    tokens = count_tokens([msg], model=model)
+    _token_cache[key] = tokens
+    if len(_token_cache) > TOKEN_CACHE_SIZE:
+        _token_cache.popitem(last=False)
+    return tokens
+
+
+def count_tokens_cached(messages: List[Dict]) -> int:
+    """逐条累加缓存的消息 token 数（比整体计数多出每条消息的固定开销，偏保守）"""
+    return sum(count_message_tokens(m) for m in messages)
+
+
+class TokenLedger:
+    """单个会话的增量 token 账本
+
+    记录已计数的消息前缀（消息对象 + content 对象的身份），
+    再次计数时只为新增或被修改/替换的消息查缓存或分词，未变化的前缀直接复用。
+    """
+
+    def __init__(self):
+        self._entries: List[Tuple[Dict, Any, int]] = []  # (消息, content, token 数)
+        self.total = 0
+
+    def count(self, messages: List[Dict]) -> int:
+        entries = self._entries
+        n = 0
+        limit = min(len(entries), len(messages))
+        while n < limit:
+            msg, content, _ = entries[n]
+            if msg is not messages[n] or msg.get("content") is not content:
+                break
+            n += 1
+        if n < len(entries):
+            self.total -= sum(tokens for _, _, tokens in entries[n:])
+            del entries[n:]
+        for msg in messages[n:]:
+            tokens = count_message_tokens(msg)
+            entries.append((msg, msg.get("content"), tokens))
+            self.total += tokens
+        return self.total
+
+
+_ledgers: "OrderedDict[str, TokenLedger]" = OrderedDict()
+
+
+def _get_ledger(session_id: str) -> TokenLedger:
+    ledger = _ledgers.get(session_id)
+    if ledger is None:
+        ledger = _ledgers[session_id] = TokenLedger()
+        if len(_ledgers) > MAX_TRACKED_SESSIONS:
+            _ledgers.popitem(last=False)
+    else:
+        _ledgers.move_to_end(session_id)
+    return ledger
+
+
 def _msg_text(msg: Dict) -> str:
     """提取消息的纯文本（兼容多模态 content）"""
     content = msg.get("content", "")
@@ -163,7 +248,7 @@ def _select_recent_loops(loops: List[List[Dict]]) -> Tuple[List[List[Dict]], Lis
     for loop in reversed(loops):
         if len(kept) >= MAX_KEEP_LOOPS:
             break
-        loop_tokens = count_tokens(loop)
+        loop_tokens = count_tokens_cached(loop)
         if kept and kept_tokens + loop_tokens > MAX_KEEP_TOKENS:
             break
         kept.insert(0, loop)
@@ -177,32 +262,123 @@ def _select_recent_loops(loops: List[List[Dict]]) -> Tuple[List[List[Dict]], Lis
     return loops[:split_point], loops[split_point:]
 
 
-# ── SSE 格式化 ──
+# ── 后台预压缩 ──
+
+@dataclass
+class _SpeculativeSummary:
+    """后台预生成的早期 loop 摘要"""
+    loop_count: int                 # 覆盖的前 N 个 loop
+    loop_keys: Tuple                # 这些 loop 的内容键，用于判断是否过期
+    task: "asyncio.Task"
+
+
+_speculative: "OrderedDict[str, _SpeculativeSummary]" = OrderedDict()
+
+
+def _loops_keys(loops: List[List[Dict]]) -> Tuple:
+    return tuple(_message_cache_key(msg) for loop in loops for msg in loop)
+
 
-def _sse(chunk_type: str, **kwargs) -> str:
-    """格式化一条 SSE 事件"""
-    data = {"type": chunk_type, **kwargs}
-    return f"data: {json.dumps(data, ensure_ascii=False)}\n\n"
+def _discard_speculative(session_id: str) -> None:
+    spec = _speculative.pop(session_id, None)
+    if spec and not spec.task.done():
+        spec.task.cancel()
+
+
+def _start_speculative_summary(session_id: str, loops: List[List[Dict]]) -> None:
+    """在后台为当前早期 loop 生成摘要；已有覆盖其前缀的摘要时不重复发起"""
+    early_loops, _ = _select_recent_loops(loops)
+    if not early_loops:
+        return
+    keys = _loops_keys(early_loops)
+
+    spec = _speculative.get(session_id)
+    if spec is not None:
+        still_valid = keys[:len(spec.loop_keys)] == spec.loop_keys
+        failed = spec.task.done() and not spec.task.cancelled() and spec.task.result() is None
+        if still_valid and not failed:
+            return
+        _discard_speculative(session_id)
+
+    text = _format_messages_for_summary([msg for loop in early_loops for msg in loop])
+    task = asyncio.create_task(_generate_summary(text), name=f"speculative_compress_{session_id[:8]}")
+    _speculative[session_id] = _SpeculativeSummary(len(early_loops), keys, task)
+    while len(_speculative) > MAX_TRACKED_SESSIONS:
+        _discard_speculative(next(iter(_speculative)))
+    logger.info(f"[压缩] 超过预压缩水位，后台预生成 {len(early_loops)} 个早期 loop 的摘要")
+
+
+async def _take_speculative_summary(
+    session_id: str, loops: List[List[Dict]],
+) -> Tuple[Optional[List[List[Dict]]], Optional[str]]:
+    """取出与当前早期 loop 匹配的预生成摘要。
+
+    Returns:
+        (被摘要覆盖的 loop, 摘要)；没有可用摘要时返回 (None, None)
+    """
+    spec = _speculative.pop(session_id, None)
+    if spec is None:
+        return None, None
+
+    k = spec.loop_count
+    # 至少保留最后一个 loop；覆盖的 loop 内容必须未变
+    if k >= len(loops) or _loops_keys(loops[:k]) != spec.loop_keys:
+        if not spec.task.done():
+            spec.task.cancel()
+        logger.info("[压缩] 早期 loop 已变化，丢弃过期的预生成摘要")
+        return None, None
+    # 摘要之后剩余的消息应不超过“水位后新增量 + 保留区”，否则预生成摘要
+    # 释放的空间不够（例如期间出现超大工具结果），改为同步完整压缩
+    remainder = sum(count_tokens_cached(loop) for loop in loops[k:])
+    if remainder > TOKEN_THRESHOLD - SPECULATIVE_THRESHOLD + MAX_KEEP_TOKENS:
+        if not spec.task.done():
+            spec.task.cancel()
+        logger.info(f"[压缩] 预生成摘要之后仍有 {remainder} tokens，改为同步压缩")
+        return None, None
+
+    if not spec.task.done():
+        logger.info("[压缩] 等待后台预生成摘要完成…")
+    try:
+        summary = await spec.task
+    except asyncio.CancelledError:
+        return None, None
+    if not summary:
+        return None, None
+    return loops[:k], summary
+
+
+# ── 流式事件 ──
+
+def _event(chunk_type: str, **kwargs) -> StreamEvent:
+    """构建一条转发给前端的流式事件"""
+    return data_event(chunk_type, kwargs)
 
 
 # ── 运行时压缩（agentic loop 每轮调用） ──
 
-async def compress_context(messages: List[Dict]) -> CompressResult:
+async def compress_context(messages: List[Dict], session_id: Optional[str] = None) -> CompressResult:
     """当消息 token 数超过阈值时压缩上下文。
 
-    在 agentic loop 每轮开始前调用。
+    在 agentic loop 每轮开始前调用。传入 session_id 时使用该会话的增量 token 账本，
+    未变化的消息不会重复分词。
 
     Returns:
         CompressResult，包含压缩后的 messages 和要发给前端的 SSE 事件列表
     """
     # ── 1. 检查是否需要压缩 ──
-    total_tokens = count_tokens(messages)
+    if session_id:
+        total_tokens = _get_ledger(session_id).count(messages)
+    else:
+        total_tokens = count_tokens_cached(messages)
     if total_tokens <= TOKEN_THRESHOLD:
         logger.debug(f"[压缩] {total_tokens} tokens ≤ {TOKEN_THRESHOLD}，跳过")
+        if session_id and SPECULATIVE_THRESHOLD and total_tokens > SPECULATIVE_THRESHOLD:
+            start_idx = 1 if messages and messages[0].get("role") == "system" else 0
+            _start_speculative_summary(session_id, _split_into_loops(messages, start_idx))
         return CompressResult(messages=messages)
 
-    events: List[str] = []
-    events.append(_sse("compress_start",
+    events: List[StreamEvent] = []
+    events.append(_event("compress_start",
                        text=f"上下文过长（{total_tokens:,} tokens），正在压缩历史消息…"))
 
     # ── 2. 分离 system prompt ──
@@ -211,27 +387,36 @@ async def compress_context(messages: List[Dict]) -> CompressResult:
 
     # ── 3. 按 loop 切分并选取保留区 ──
     all_loops = _split_into_loops(messages, start_idx)
-    early_loops, recent_loops = _select_recent_loops(all_loops)
+    summary = None
+    if session_id:
+        early_loops, summary = await _take_speculative_summary(session_id, all_loops)
+    if summary is not None:
+        recent_loops = all_loops[len(early_loops):]
+    else:
+        early_loops, recent_loops = _select_recent_loops(all_loops)
 
     if not early_loops:
         logger.info("[压缩] 没有可压缩的早期消息，跳过")
-        events.append(_sse("compress_end", text="无需压缩，所有消息已在保留范围内"))
-        return CompressResult(messages=messages, sse_events=events)
+        events.append(_event("compress_end", text="无需压缩，所有消息已在保留范围内"))
+        return CompressResult(messages=messages, events=events)
 
     early_messages = [msg for loop in early_loops for msg in loop]
     recent_messages = [msg for loop in recent_loops for msg in loop]
 
-    events.append(_sse("compress_progress",
+    events.append(_event("compress_progress",
                        text=f"压缩 {len(early_loops)} 个对话轮次，保留最近 {len(recent_loops)} 轮…"))
 
-    # ── 4. 调用 LLM 生成摘要 ──
-    conversation_text = _format_messages_for_summary(early_messages)
-    summary = await _generate_summary(conversation_text)
+    # ── 4. 调用 LLM 生成摘要（已有后台预生成的摘要时直接使用） ──
+    if summary is None:
+        conversation_text = _format_messages_for_summary(early_messages)
+        summary = await _generate_summary(conversation_text)
+    else:
+        logger.info(f"[压缩] 使用后台预生成的摘要（覆盖 {len(early_loops)} 个 loop）")
 
     if not summary:
         logger.warning("[压缩] 摘要生成失败，返回原始消息")
-        events.append(_sse("compress_end", text="压缩失败，使用原始上下文"))
-        return CompressResult(messages=messages, sse_events=events)
+        events.append(_event("compress_end", text="压缩失败，使用原始上下文"))
+        return CompressResult(messages=messages, events=events)
 
     # ── 5. 组装压缩后的消息：摘要写入 system prompt 的 <compress> 标签 ──
     compressed = []
@@ -257,20 +442,23 @@ async def compress_context(messages: List[Dict]) -> CompressResult:
         })
     compressed.extend(recent_messages)
 
-    compressed_tokens = count_tokens(compressed)
+    if session_id:
+        compressed_tokens = _get_ledger(session_id).count(compressed)
+    else:
+        compressed_tokens = count_tokens_cached(compressed)
     saved = total_tokens - compressed_tokens
 
-    events.append(_sse("compress_end",
+    events.append(_event("compress_end",
                        text=f"压缩完成：{total_tokens:,} → {compressed_tokens:,} tokens（节省 {saved:,}）"))
     # 通知前端插入 info 标记（持久化到会话历史，但不计入 LLM 上下文）
-    events.append(_sse("compress_info", text="【已压缩上下文】"))
+    events.append(_event("compress_info", text="【已压缩上下文】"))
 
     logger.info(
         f"[压缩] {total_tokens} → {compressed_tokens} tokens "
         f"(节省 {saved}, 压缩 {len(early_loops)} loops, 保留 {len(recent_loops)} loops)"
     )
 
-    return CompressResult(messages=compressed, sse_events=events, compressed=True)
+    return CompressResult(messages=compressed, events=events, compressed=True)
 
 
 # ── 辅助函数 ──
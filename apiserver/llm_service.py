@@ -8,7 +8,7 @@ LLM服务模块
 import logging
 import sys
 import os
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, AsyncGenerator
 from dataclasses import dataclass
 
 # 添加项目根目录到Python路径
@@ -19,6 +19,7 @@ from litellm import acompletion
 from fastapi import FastAPI, HTTPException
 from system.config import get_config
 from . import naga_auth
+from .stream_events import StreamEvent, data_event, text_event
 
 # 配置日志
 logger = logging.getLogger("LLMService")
@@ -256,6 +257,17 @@ class LLMService:
     async def stream_chat_with_context(self, messages: List[Dict], temperature: float = 0.7,
                                        model_override: Optional[Dict[str, str]] = None,
                                        tools: Optional[List[Dict]] = None):
+        """stream_chat_events 的 SSE 字符串版本（供直接转发给 HTTP 客户端的调用方）
+
+        Yields:
+            格式为 "data: <json>\n\n" 的 SSE 事件
+        """
+        async for event in self.stream_chat_events(messages, temperature, model_override, tools):
+            yield event.to_sse()
+
+    async def stream_chat_events(self, messages: List[Dict], temperature: float = 0.7,
+                                 model_override: Optional[Dict[str, str]] = None,
+                                 tools: Optional[List[Dict]] = None) -> AsyncGenerator[StreamEvent, None]:
         """带上下文的流式聊天调用，支持 reasoning_content 交织输出 + 原生 function calling
 
         Args:
@@ -266,13 +278,13 @@ class LLMService:
             tools: OpenAI function calling schemas（可选）
 
         Yields:
-            格式为 "data: <json>\n\n" 的 SSE 事件
-            JSON 结构: {"type": "content"|"reasoning"|"tool_calls_native", "text": "..."}
+            StreamEvent，type 为 "content"|"reasoning"|"token_refreshed"|"auth_expired" 时载荷为 text；
+            "tool_calls_native" 的载荷为 calls（[{id, name, arguments}]，仅进程内使用）
         """
         if not self._initialized:
             self._initialize_client()
             if not self._initialized:
-                yield self._format_sse_chunk("content", "LLM服务不可用: 客户端初始化失败")
+                yield text_event("content", "LLM服务不可用: 客户端初始化失败")
                 return
 
         # 重试策略：最多 3 次
@@ -350,12 +362,12 @@ class LLMService:
                     # 处理 reasoning_content（思考过程）
                     reasoning = getattr(delta, "reasoning_content", None)
                     if reasoning:
-                        yield self._format_sse_chunk("reasoning", reasoning)
+                        yield text_event("reasoning", reasoning)
 
                     # 处理 content（正式回答）
                     content = getattr(delta, "content", None)
                     if content:
-                        yield self._format_sse_chunk("content", content)
+                        yield text_event("content", content)
 
                     # 处理 tool_calls delta（原生 function calling）
                     tc_deltas = getattr(delta, "tool_calls", None)
@@ -374,9 +386,8 @@ class LLMService:
 
                 # 流结束后，如果有 tool_calls，yield 一个完整事件
                 if pending_tool_calls:
-                    import json
                     calls = [pending_tool_calls[i] for i in sorted(pending_tool_calls)]
-                    yield self._format_sse_chunk("tool_calls_native", json.dumps(calls, ensure_ascii=False))
+                    yield data_event("tool_calls_native", {"calls": calls})
 
                 # 流式响应正常完成，跳出重试循环
                 return
@@ -394,14 +405,14 @@ class LLMService:
                         new_token = result.get("access_token")
                         # 通过 SSE 推送新 token 给前端，避免前端旧 token 轮询覆盖后端新 token
                         if new_token:
-                            yield self._format_sse_chunk("token_refreshed", new_token)
+                            yield text_event("token_refreshed", new_token)
                         logger.info("Token 刷新成功，重试 LLM 调用")
                         continue  # 重试
                     except Exception as refresh_err:
                         logger.error(f"Token 刷新失败: {refresh_err}")
                 # 刷新失败或已刷新过 → 通知前端触发重新登录
                 logger.error(f"流式聊天认证失败: {e}")
-                yield self._format_sse_chunk("auth_expired", "登录已过期，请重新登录")
+                yield text_event("auth_expired", "登录已过期，请重新登录")
                 return
 
             except (litellm.APIConnectionError, litellm.ServiceUnavailableError, litellm.Timeout) as e:
@@ -412,29 +423,14 @@ class LLMService:
                     await asyncio.sleep(1)  # 短暂等待后重试
                     continue
                 logger.error(f"[LLM] 流式调用连接异常，已耗尽重试次数: {e}")
-                yield self._format_sse_chunk("content", f"流式调用出错（连接异常，已重试 {max_attempts} 次）: {str(e)}")
+                yield text_event("content", f"流式调用出错（连接异常，已重试 {max_attempts} 次）: {str(e)}")
                 return
 
             except Exception as e:
                 logger.error(f"流式聊天调用失败: {e}")
-                yield self._format_sse_chunk("content", f"流式调用出错: {str(e)}")
+                yield text_event("content", f"流式调用出错: {str(e)}")
                 return
 
-    def _format_sse_chunk(self, chunk_type: str, text: str) -> str:
-        """格式化 SSE 数据块
-
-        Args:
-            chunk_type: "content" 或 "reasoning"
-            text: 文本内容
-
-        Returns:
-            SSE 格式的数据块
-        """
-        import json
-
-        data = {"type": chunk_type, "text": text}
-        return f"data: {json.dumps(data, ensure_ascii=False)}\n\n"
-
 
 # 全局LLM服务实例
 _llm_service: Optional[LLMService] = None
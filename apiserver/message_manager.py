@@ -5,6 +5,7 @@
 """
 
 import asyncio
+import atexit
 import uuid
 import logging
 import re
@@ -12,7 +13,6 @@ import sys
 import time
 from typing import Dict, List, Optional
 from datetime import datetime, timedelta
-from pathlib import Path
 
 logger = logging.getLogger(__name__)
 
@@ -47,7 +47,6 @@ class MessageManager:
     """统一的消息管理器"""
 
     def __init__(self):
-        self.sessions: Dict[str, Dict] = {}
         # 从配置文件读取最大历史轮数，默认为10轮
         try:
             from system.config import config
@@ -70,71 +69,33 @@ class MessageManager:
         # 后台异步任务引用集合（防止 GC 回收未完成的任务）
         self._background_tasks: set = set()
 
-        # 会话持久化存储目录
+        # 会话持久化存储目录（追加日志 + 后台快照合并，写入不阻塞事件循环）
         from system.config import get_data_dir
+        from apiserver.session_store import SessionStore, LazySessionMap
         self.sessions_dir = get_data_dir() / "sessions"
-        self.sessions_dir.mkdir(parents=True, exist_ok=True)
+        self.store = SessionStore(self.sessions_dir, max_messages=self.max_messages_per_session)
+        atexit.register(self.store.close)
 
-        # 启动时从磁盘加载所有会话
-        self._load_all_sessions_from_disk()
+        # 启动时只读取会话索引，消息正文在首次访问时按需加载（LRU 淘汰）
+        self.sessions: LazySessionMap = LazySessionMap(self.store, self.store.load_index())
+        if self.sessions:
+            logger.info(f"会话索引加载完成，共 {len(self.sessions)} 个历史会话")
 
-    def _get_session_file(self, session_id: str) -> Path:
-        """获取会话文件路径"""
-        return self.sessions_dir / f"{session_id}.json"
-
-    def _save_session_to_disk(self, session_id: str):
-        """将单个会话保存到磁盘"""
-        session = self.sessions.get(session_id)
-        if not session:
-            return
-        try:
-            import json
-            data = {
-                "session_id": session_id,
-                "created_at": session["created_at"],
-                "last_activity": session["last_activity"],
-                "agent_type": session.get("agent_type", "default"),
-                "temporary": session.get("temporary", False),
-                "messages": session["messages"],
-                "compress": session.get("compress", ""),
-            }
-            self._get_session_file(session_id).write_text(
-                json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8"
-            )
-        except Exception as e:
-            logger.error(f"保存会话到磁盘失败 {session_id}: {e}")
-
-    def _load_all_sessions_from_disk(self):
-        """启动时从磁盘加载所有会话"""
-        import json
-        loaded = 0
-        for f in self.sessions_dir.glob("*.json"):
-            try:
-                data = json.loads(f.read_text(encoding="utf-8"))
-                sid = data.get("session_id") or f.stem
-                self.sessions[sid] = {
-                    "created_at": data.get("created_at", ""),
-                    "last_activity": data.get("last_activity", ""),
-                    "agent_type": data.get("agent_type", "default"),
-                    "temporary": data.get("temporary", False),
-                    "messages": data.get("messages", []),
-                    "compress": data.get("compress", ""),
-                }
-                loaded += 1
-            except Exception as e:
-                logger.warning(f"加载会话文件失败 {f.name}: {e}")
-        if loaded:
-            logger.info(f"从磁盘加载了 {loaded} 个历史会话")
+    @staticmethod
+    def _session_meta(session: Dict) -> Dict:
+        """提取需要持久化的会话元信息"""
+        return {
+            "created_at": session["created_at"],
+            "last_activity": session["last_activity"],
+            "agent_type": session.get("agent_type", "default"),
+            "temporary": session.get("temporary", False),
+            "compress": session.get("compress", ""),
+        }
 
     def _delete_session_file(self, session_id: str):
-        """从磁盘删除会话文件"""
-        try:
-            p = self._get_session_file(session_id)
-            if p.exists():
-                p.unlink()
-        except Exception as e:
-            logger.error(f"删除会话文件失败 {session_id}: {e}")
-    
+        """从磁盘删除会话文件（快照与日志）"""
+        self.store.delete(session_id)
+
     def generate_session_id(self) -> str:
         """生成唯一的会话ID"""
         return str(uuid.uuid4())
@@ -154,6 +115,7 @@ class MessageManager:
             logger.debug(f"使用现有会话: {session_id}")
             # 更新最后活动时间
             self.sessions[session_id]["last_activity"] = datetime.now().isoformat()
+            self.sessions.touch(session_id)
             return session_id
 
         # 初始化新会话（空消息列表，不注入历史）
@@ -179,18 +141,20 @@ class MessageManager:
             return False
 
         session = self.sessions[session_id]
-        session["messages"].append({"role": role, "content": content})
+        message = {"role": role, "content": content}
+        session["messages"].append(message)
         session["last_activity"] = datetime.now().isoformat()
 
         # 限制消息数量
         if len(session["messages"]) > self.max_messages_per_session:
             session["messages"] = session["messages"][-self.max_messages_per_session:]
+        self.sessions.touch(session_id)
 
         logger.debug(f"会话 {session_id} 添加消息: {role} - {content[:50]}...")
 
-        # 临时会话不持久化到磁盘
+        # 临时会话不持久化到磁盘；只追加本条消息，不重写整个会话
         if not session.get("temporary"):
-            self._save_session_to_disk(session_id)
+            self.store.append_message(session_id, message, self._session_meta(session))
         return True
     
     def get_messages(self, session_id: str) -> List[Dict]:
@@ -207,30 +171,25 @@ class MessageManager:
     
     def _get_previous_session_messages(self, current_session_id: str, max_messages: int = 20) -> List[Dict]:
         """获取上一个会话的最近消息（按最后活动时间排序，排除当前会话）"""
-        candidates = [
-            (sid, s) for sid, s in self.sessions.items()
-            if sid != current_session_id and s.get("messages")
-        ]
-        if not candidates:
+        prev_id = self._get_previous_session_id(current_session_id)
+        if not prev_id:
             return []
-        # 按最后活动时间倒序，取最近的一个会话
-        candidates.sort(key=lambda x: x[1].get("last_activity", ""), reverse=True)
-        prev_messages = candidates[0][1]["messages"]
-        return prev_messages[-max_messages:]
+        return self.get_messages(prev_id)[-max_messages:]
 
     def _get_previous_session_id(self, current_session_id: str) -> Optional[str]:
         """获取上一个会话的 ID（按最后活动时间排序，排除当前会话）"""
-        candidates = [
-            (sid, s) for sid, s in self.sessions.items()
-            if sid != current_session_id and s.get("messages")
-        ]
-        if not candidates:
-            return None
-        candidates.sort(key=lambda x: x[1].get("last_activity", ""), reverse=True)
-        return candidates[0][0]
+        return self.get_latest_session_id(exclude_session_id=current_session_id)
+
+    def get_latest_session_id(self, exclude_session_id: Optional[str] = None,
+                              include_temporary: bool = True) -> Optional[str]:
+        """获取最近活跃且有消息的会话 ID（查最近活跃顺序表，不扫描、不加载消息正文）"""
+        return self.sessions.latest(exclude_session_id, include_temporary)
 
     def get_session_compress(self, session_id: str) -> str:
         """获取会话的压缩摘要"""
+        info = self.sessions.info(session_id)
+        if not info or not info["has_compress"]:
+            return ""
         session = self.sessions.get(session_id)
         return (session.get("compress", "") if session else "") or ""
 
@@ -241,7 +200,7 @@ class MessageManager:
             return
         session["compress"] = compress
         if not session.get("temporary"):
-            self._save_session_to_disk(session_id)
+            self.store.update_meta(session_id, self._session_meta(session))
 
     def build_conversation_messages(self, session_id: str, system_prompt: str,
                                   current_message: str, include_history: bool = True) -> List[Dict]:
@@ -320,30 +279,32 @@ class MessageManager:
         return messages
     
     def get_session_info(self, session_id: str) -> Optional[Dict]:
-        """获取会话详细信息"""
-        session = self.sessions.get(session_id)
-        if not session:
+        """获取会话详细信息（来自索引，不加载消息正文）"""
+        info = self.sessions.info(session_id)
+        if not info:
             return None
-        
+        return self._format_session_info(session_id, info)
+
+    def _format_session_info(self, session_id: str, info: Dict) -> Dict:
+        """索引条目 -> 对外的会话信息结构"""
         return {
             "session_id": session_id,
-            "created_at": session["created_at"],
-            "last_active_at": session["last_activity"],
-            "message_count": len(session["messages"]),
-            "conversation_rounds": len(session["messages"]) // 2,
-            "agent_type": session["agent_type"],
+            "created_at": info["created_at"],
+            "last_active_at": info["last_activity"],
+            "message_count": info["message_count"],
+            "conversation_rounds": info["message_count"] // 2,
+            "agent_type": info["agent_type"],
             "max_history_rounds": self.max_history_rounds,
-            "temporary": session.get("temporary", False),
-            "last_message": session["messages"][-1]["content"][:100] + "..." if session["messages"] else "无对话历史"
+            "temporary": info["temporary"],
+            "last_message": info["last_message"] + "..." if info["message_count"] else "无对话历史"
         }
     
     def get_all_sessions_info(self) -> List[Dict]:
-        """获取所有会话信息（返回列表，按最近活跃时间倒序排列）"""
-        sessions_list = []
-        for session_id in self.sessions:
-            info = self.get_session_info(session_id)
-            if info:
-                sessions_list.append(info)
+        """获取所有会话信息（返回列表，按最近活跃时间倒序排列，仅查索引）"""
+        sessions_list = [
+            self._format_session_info(session_id, info)
+            for session_id, info in self.sessions.infos()
+        ]
         sessions_list.sort(key=lambda s: s.get("last_active_at", ""), reverse=True)
         return sessions_list
     
@@ -372,9 +333,9 @@ class MessageManager:
         max_age = timedelta(hours=max_age_hours)
         expired_sessions = []
 
-        for session_id, session in self.sessions.items():
+        for session_id, info in self.sessions.infos():
             try:
-                last_active = datetime.fromisoformat(session["last_activity"])
+                last_active = datetime.fromisoformat(info["last_activity"])
                 if now - last_active > max_age:
                     expired_sessions.append(session_id)
             except (ValueError, KeyError):
@@ -249,13 +249,13 @@ async def _list_sessions(params: dict) -> dict:
 
     limit = params.get("limit", 20)
     sessions = []
-    for sid, sdata in list(message_manager.sessions.items())[:limit]:
+    for info in message_manager.get_all_sessions_info()[:limit]:
         sessions.append({
-            "session_id": sid,
-            "created_at": sdata.get("created_at", ""),
-            "last_activity": sdata.get("last_activity", ""),
-            "message_count": len(sdata.get("messages", [])),
-            "agent_type": sdata.get("agent_type", "default"),
+            "session_id": info["session_id"],
+            "created_at": info["created_at"],
+            "last_activity": info["last_active_at"],
+            "message_count": info["message_count"],
+            "agent_type": info["agent_type"],
         })
     return {"success": True, "result": {"count": len(message_manager.sessions), "sessions": sessions}}
 
@@ -388,7 +388,7 @@ async def _get_memory_stats(params: dict) -> dict:
     # 会话记忆
     try:
         from apiserver.message_manager import message_manager
-        total_msgs = sum(len(s.get("messages", [])) for s in message_manager.sessions.values())
+        total_msgs = sum(info["message_count"] for _, info in message_manager.sessions.infos())
         stats["sessions"] = {"count": len(message_manager.sessions), "total_messages": total_msgs}
     except Exception:
         pass
@@ -1,6 +1,7 @@
 """核心对话路由（/chat, /chat/stream）"""
 
 import asyncio
+import json
 import logging
 import threading
 import time
@@ -506,7 +507,7 @@ async def _trigger_chat_stream_no_intent(session_id: str, response_text: str):
             "session_id": session_id,
             "disable_tts": False,
             "return_audio": False,
-
+            "background": True,  # 内部回调触发，不是用户前台对话
         }
 
         # 调用现有的流式对话接口
@@ -545,7 +546,7 @@ async def _send_ai_response_directly(session_id: str, response_text: str):
             "session_id": session_id,
             "disable_tts": False,
             "return_audio": False,
-
+            "background": True,  # 内部回调触发，不是用户前台对话
         }
 
         from system.config import get_server_port
@@ -909,6 +910,7 @@ async def chat_stream(request: ChatRequest):
             # ====== Agentic Tool Loop ======
             yield 'data: {"type":"status","text":"娜迦打字中..."}\n\n'
             from apiserver.agentic_tool_loop import run_agentic_loop
+            from apiserver.tool_scheduler import PRIORITY_BACKGROUND, PRIORITY_FOREGROUND
 
             t_prepare_elapsed = _time.monotonic() - t_api_start
             logger.info(f"[ChatStream] 预处理完成: {t_prepare_elapsed:.2f}s "
@@ -939,141 +941,134 @@ async def chat_stream(request: ChatRequest):
             all_rounds_content = ""
             had_tool_events = False
 
-            async for chunk in run_agentic_loop(
+            async for event in run_agentic_loop(
                 messages,
                 session_id,
                 model_override=model_override,
                 tools=tools,
                 source_agent_id=request.agent_id,
+                priority=PRIORITY_BACKGROUND if request.background else PRIORITY_FOREGROUND,
             ):
-                if chunk.startswith("data: "):
-                    try:
-                        import json as json_module
-
-                        data_str = chunk[6:].strip()
-                        if data_str and data_str != "[DONE]":
-                            chunk_data = json_module.loads(data_str)
-                            chunk_type = chunk_data.get("type", "content")
-                            chunk_text = chunk_data.get("text", "")
-
-                            if chunk_type == "content":
-                                # 累积本轮内容（TTS + 保存）
-                                current_round_text += chunk_text
-                                if request.return_audio:
-                                    complete_text += chunk_text
-                                if chunk_text and not first_response_sent:
-                                    first_response_sent = True
-                                    emit_telemetry(
-                                        "chat_first_token",
-                                        {
-                                            "mode": "stream",
-                                            "first_response_ms": int((_time.monotonic() - t_api_start) * 1000),
-                                            "kind": "content",
-                                        },
-                                        source="apiserver",
-                                        session_id=session_id,
-                                        agent_id=request.agent_id,
-                                        trace_id=f"chat:{session_id}",
-                                    )
-                                # TTS：每轮的正常content都发送（不含工具内容）
-                                if tool_extractor and not is_tool_event:
-                                    asyncio.create_task(tool_extractor.process_text_chunk(chunk_text))
-                            elif chunk_type == "reasoning":
-                                complete_reasoning += chunk_text
-                                if chunk_text and not first_response_sent:
-                                    first_response_sent = True
-                                    emit_telemetry(
-                                        "chat_first_token",
-                                        {
-                                            "mode": "stream",
-                                            "first_response_ms": int((_time.monotonic() - t_api_start) * 1000),
-                                            "kind": "reasoning",
-                                        },
-                                        source="apiserver",
-                                        session_id=session_id,
-                                        agent_id=request.agent_id,
-                                        trace_id=f"chat:{session_id}",
-                                    )
-                            elif chunk_type == "round_end":
-                                # 每轮结束时，完成TTS处理并重置
-                                has_more = chunk_data.get("has_more", False)
-                                if has_more:
-                                    # 中间轮：累积本轮内容到持久化缓冲
-                                    all_rounds_content += current_round_text
-                                if has_more and tool_extractor and not request.return_audio:
-                                    # 中间轮结束，flush TTS缓冲
-                                    try:
-                                        await tool_extractor.finish_processing()
-                                    except Exception as e:
-                                        logger.debug(f"中间轮TTS flush失败: {e}")
-                                    if voice_integration:
-                                        try:
-                                            threading.Thread(
-                                                target=voice_integration.finish_processing,
-                                                daemon=True,
-                                            ).start()
-                                        except Exception:
-                                            pass
-                                    # 重新初始化 tool_extractor 给下一轮使用
-                                    try:
-                                        from apiserver.streaming_tool_extractor import StreamingToolCallExtractor
-                                        tool_extractor = StreamingToolCallExtractor()
-                                        if voice_integration and not request.return_audio:
-                                            tool_extractor.set_callbacks(
-                                                on_text_chunk=None,
-                                                voice_integration=voice_integration,
-                                            )
-                                    except Exception:
-                                        pass
-                                current_round_text = ""
-                            elif chunk_type == "tool_calls":
-                                is_tool_event = True
-                                had_tool_events = True
-                                if chunk_data.get("calls") and not first_response_sent:
-                                    first_response_sent = True
-                                    emit_telemetry(
-                                        "chat_first_token",
-                                        {
-                                            "mode": "stream",
-                                            "first_response_ms": int((_time.monotonic() - t_api_start) * 1000),
-                                            "kind": "tool_calls",
-                                        },
-                                        source="apiserver",
-                                        session_id=session_id,
-                                        agent_id=request.agent_id,
-                                        trace_id=f"chat:{session_id}",
+                try:
+                    chunk_type = event.type
+                    chunk_text = event.text
+
+                    if chunk_type == "content":
+                        # 累积本轮内容（TTS + 保存）
+                        current_round_text += chunk_text
+                        if request.return_audio:
+                            complete_text += chunk_text
+                        if chunk_text and not first_response_sent:
+                            first_response_sent = True
+                            emit_telemetry(
+                                "chat_first_token",
+                                {
+                                    "mode": "stream",
+                                    "first_response_ms": int((_time.monotonic() - t_api_start) * 1000),
+                                    "kind": "content",
+                                },
+                                source="apiserver",
+                                session_id=session_id,
+                                agent_id=request.agent_id,
+                                trace_id=f"chat:{session_id}",
+                            )
+                        # TTS：每轮的正常content都发送（不含工具内容）
+                        if tool_extractor and not is_tool_event:
+                            asyncio.create_task(tool_extractor.process_text_chunk(chunk_text))
+                    elif chunk_type == "reasoning":
+                        complete_reasoning += chunk_text
+                        if chunk_text and not first_response_sent:
+                            first_response_sent = True
+                            emit_telemetry(
+                                "chat_first_token",
+                                {
+                                    "mode": "stream",
+                                    "first_response_ms": int((_time.monotonic() - t_api_start) * 1000),
+                                    "kind": "reasoning",
+                                },
+                                source="apiserver",
+                                session_id=session_id,
+                                agent_id=request.agent_id,
+                                trace_id=f"chat:{session_id}",
+                            )
+                    elif chunk_type == "round_end":
+                        # 每轮结束时，完成TTS处理并重置
+                        has_more = event.get("has_more", False)
+                        if has_more:
+                            # 中间轮：累积本轮内容到持久化缓冲
+                            all_rounds_content += current_round_text
+                        if has_more and tool_extractor and not request.return_audio:
+                            # 中间轮结束，flush TTS缓冲
+                            try:
+                                await tool_extractor.finish_processing()
+                            except Exception as e:
+                                logger.debug(f"中间轮TTS flush失败: {e}")
+                            if voice_integration:
+                                try:
+                                    threading.Thread(
+                                        target=voice_integration.finish_processing,
+                                        daemon=True,
+                                    ).start()
+                                except Exception:
+                                    pass
+                            # 重新初始化 tool_extractor 给下一轮使用
+                            try:
+                                from apiserver.streaming_tool_extractor import StreamingToolCallExtractor
+                                tool_extractor = StreamingToolCallExtractor()
+                                if voice_integration and not request.return_audio:
+                                    tool_extractor.set_callbacks(
+                                        on_text_chunk=None,
+                                        voice_integration=voice_integration,
                                     )
-                                for call in chunk_data.get("calls", []):
-                                    svc = call.get("service_name") or call.get("agentType") or "tool"
-                                    tn = call.get("tool_name") or ""
-                                    label = f"{svc}: {tn}" if tn else svc
-                                    payload = json_module.dumps(call, ensure_ascii=False, indent=2)
-                                    all_rounds_content += f"\n```tool-call\n{label}\n{payload}\n```\n"
-                            elif chunk_type == "tool_results":
-                                is_tool_event = True
-                                # 将工具结果格式化为 tool-result 代码块，用于持久化
-                                had_tool_events = True
-                                for r in chunk_data.get("results", []):
-                                    st = "\u2705" if r.get("status") == "success" else "\u274c"
-                                    svc = r.get("service_name", "unknown")
-                                    tn = r.get("tool_name", "")
-                                    label = f"{svc}: {tn}" if tn else svc
-                                    rt = (r.get("result", "") or "").strip()
-                                    all_rounds_content += f"\n```tool-result\n{st} {label}\n{rt}\n```\n"
-                            elif chunk_type == "round_start":
-                                # 新一轮开始，重置工具事件标记
-                                is_tool_event = False
-                            elif chunk_type == "compress_info":
-                                # 运行时压缩完成，标记后续需要保存 info 消息
-                                was_compressed = True
-
-                            # 透传所有 chunk 给前端（content/reasoning/tool events）
-                            yield chunk
-                            continue
-                    except Exception as e:
-                        logger.error(f"[API Server] 流式数据解析错误: {e}")
+                            except Exception:
+                                pass
+                        current_round_text = ""
+                    elif chunk_type == "tool_calls":
+                        is_tool_event = True
+                        had_tool_events = True
+                        if event.get("calls") and not first_response_sent:
+                            first_response_sent = True
+                            emit_telemetry(
+                                "chat_first_token",
+                                {
+                                    "mode": "stream",
+                                    "first_response_ms": int((_time.monotonic() - t_api_start) * 1000),
+                                    "kind": "tool_calls",
+                                },
+                                source="apiserver",
+                                session_id=session_id,
+                                agent_id=request.agent_id,
+                                trace_id=f"chat:{session_id}",
+                            )
+                        for call in event.get("calls", []):
+                            svc = call.get("service_name") or call.get("agentType") or "tool"
+                            tn = call.get("tool_name") or ""
+                            label = f"{svc}: {tn}" if tn else svc
+                            payload = json.dumps(call, ensure_ascii=False, indent=2)
+                            all_rounds_content += f"\n```tool-call\n{label}\n{payload}\n```\n"
+                    elif chunk_type == "tool_results":
+                        is_tool_event = True
+                        # 将工具结果格式化为 tool-result 代码块，用于持久化
+                        had_tool_events = True
+                        for r in event.get("results", []):
+                            st = "\u2705" if r.get("status") == "success" else "\u274c"
+                            svc = r.get("service_name", "unknown")
+                            tn = r.get("tool_name", "")
+                            label = f"{svc}: {tn}" if tn else svc
+                            rt = (r.get("result", "") or "").strip()
+                            all_rounds_content += f"\n```tool-result\n{st} {label}\n{rt}\n```\n"
+                    elif chunk_type == "round_start":
+                        # 新一轮开始，重置工具事件标记
+                        is_tool_event = False
+                    elif chunk_type == "compress_info":
+                        # 运行时压缩完成，标记后续需要保存 info 消息
+                        was_compressed = True
+
+                except Exception as e:
+                    logger.error(f"[API Server] 流式事件处理错误: {e}")
 
-                yield chunk
+                # 透传所有事件给前端（content/reasoning/tool events），SSE 编码只在此处进行一次
+                yield event.to_sse()
 
             # ====== 流式处理完成 ======
 
@@ -2392,9 +2392,9 @@ async def search_quintuples(keywords: str = ""):
             }
 
         # 回退到本地 summer_memory
-        from summer_memory.quintuple_graph import query_graph_by_keywords
+        from summer_memory.quintuple_graph import query_graph_by_keywords_async
 
-        results = query_graph_by_keywords(keyword_list)
+        results = await query_graph_by_keywords_async(keyword_list)
         return {
             "status": "success",
             "quintuples": [
@@ -2416,6 +2416,11 @@ async def search_quintuples(keywords: str = ""):
 # ============ 搜索代理 ============
 
 
+# 搜索代理在工具调度器中的服务分组。不能与 agentic loop 的 web_search 共用：
+# loop 的 web_search 可能转给 OpenClaw 网关执行，网关再回调本代理，共用名额时会排在自己的调用方后面
+_PROXY_SEARCH_CALL = {"agentType": "search_proxy"}
+
+
 @router.api_route("/tools/search", methods=["GET", "POST"])
 async def proxy_search(request: Request):
     """统一搜索代理: 优先 NagaModel，回退 Brave，供 Naga 与 OpenClaw 共用。"""
@@ -2427,10 +2432,16 @@ async def proxy_search(request: Request):
 
     import httpx
 
+    from apiserver.tool_scheduler import get_tool_scheduler
+
     async def _call_upstream(client: httpx.AsyncClient, url: str, headers: dict):
-        if request.method == "GET":
-            return await client.get(url, params=params, headers=headers, timeout=30)
-        return await client.post(url, json=params, headers=headers, timeout=30)
+        async def _send():
+            if request.method == "GET":
+                return await client.get(url, params=params, headers=headers, timeout=30)
+            return await client.post(url, json=params, headers=headers, timeout=30)
+
+        # 调用方是 OpenClaw 网关（旅行、后台 agent 运行等），按 search_proxy 分组单独限流
+        return await get_tool_scheduler().run(_PROXY_SEARCH_CALL, _send)
 
     try:
         async with httpx.AsyncClient() as client:
@@ -464,18 +464,10 @@ async def receive_proactive_message(payload: Dict[str, Any]):
 
         if not session_id:
             logger.warning("[ProactiveMessage] 未指定 session_id，将自动选择最近活跃会话")
-            recent_session_ids = [
-                sid for sid, session in message_manager.sessions.items()
-                if session.get("messages") and not session.get("temporary")
-            ]
-            if recent_session_ids:
-                recent_session_ids.sort(
-                    key=lambda sid: message_manager.sessions[sid].get("last_activity", ""),
-                    reverse=True,
-                )
-                session_id = recent_session_ids[0]
-            else:
-                session_id = message_manager.create_session()
+            session_id = (
+                message_manager.get_latest_session_id(include_temporary=False)
+                or message_manager.create_session()
+            )
 
         # 构建通知数据
         notification_data = {
@@ -0,0 +1,597 @@
+#!/usr/bin/env python3
+"""
+会话持久化存储 — 追加式日志 + 后台快照压缩
+
+每个会话在磁盘上由两部分组成：
+  - sessions/<id>.json   快照（与旧格式兼容，额外记录 journal_seq）
+  - sessions/<id>.jsonl  追加日志，每行一条记录（meta 更新或新消息）
+另有 sessions/_index.json 记录每个会话的元信息摘要（不含消息正文），
+启动时只读索引，消息正文在首次访问时加载（LazySessionMap，LRU 淘汰）。
+
+写入请求只在调用方线程入队（O(1)），由单个后台写线程按顺序落盘，
+不阻塞事件循环；日志累计到一定条数后在后台合并为新快照，
+快照通过 临时文件 + fsync + os.replace 原子替换。
+快照中的 journal_seq 保证合并中途崩溃时日志记录不会被重复回放。
+"""
+
+import json
+import logging
+import os
+import queue
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import MutableMapping
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# 快照中保留的会话元字段
+META_FIELDS = ("created_at", "last_activity", "agent_type", "temporary", "compress")
+
+# 日志累计多少条记录后触发后台合并
+DEFAULT_COMPACT_EVERY = 64
+
+# 会话索引文件名（与会话快照同目录）
+INDEX_FILENAME = "_index.json"
+
+# 索引脏写最短间隔（秒）
+INDEX_SAVE_INTERVAL = 5.0
+
+# 内存中最多保留多少个会话的消息正文
+DEFAULT_MAX_LOADED = 256
+
+
+def build_index_entry(session: Dict[str, Any]) -> Dict[str, Any]:
+    """从完整会话字典生成索引条目"""
+    messages = session.get("messages") or []
+    last = messages[-1].get("content", "") if messages else ""
+    return {
+        "created_at": session.get("created_at", ""),
+        "last_activity": session.get("last_activity", ""),
+        "agent_type": session.get("agent_type", "default"),
+        "temporary": session.get("temporary", False),
+        "message_count": len(messages),
+        "has_compress": bool(session.get("compress")),
+        "last_message": last[:100] if isinstance(last, str) else "",
+    }
+
+
+class SessionStore:
+    """会话追加日志存储（单写线程，调用方无阻塞）"""
+
+    def __init__(self, sessions_dir: Path, max_messages: int = 0,
+                 compact_every: int = DEFAULT_COMPACT_EVERY):
+        self.sessions_dir = Path(sessions_dir)
+        self.sessions_dir.mkdir(parents=True, exist_ok=True)
+        self.max_messages = max_messages
+        self.compact_every = max(1, compact_every)
+
+        # 以下状态只在写线程中访问（_index 在写线程启动前由 load_index 初始化）
+        self._seq: Dict[str, int] = {}             # 每个会话已分配的最大 seq
+        self._pending: Dict[str, int] = {}         # 上次快照后日志中的记录数
+        self._index: Dict[str, Dict[str, Any]] = {}
+        self._index_dirty = False
+        self._index_saved_at = 0.0
+
+        # 已在磁盘上有记录的会话（调用方线程读写，受锁保护）
+        self._known: set = set()
+        self._known_lock = threading.Lock()
+
+        # 每个会话已入队但写线程尚未处理完的写入数
+        self._inflight: Dict[str, int] = {}
+        self._inflight_cond = threading.Condition()
+
+        self._queue: "queue.Queue[Optional[tuple]]" = queue.Queue()
+        self._closed = False
+        self._writer = threading.Thread(target=self._writer_loop, name="session-store-writer", daemon=True)
+        self._writer.start()
+
+    # ------------------------------------------------------------------
+    # 路径
+    # ------------------------------------------------------------------
+
+    def snapshot_path(self, session_id: str) -> Path:
+        return self.sessions_dir / f"{session_id}.json"
+
+    def journal_path(self, session_id: str) -> Path:
+        return self.sessions_dir / f"{session_id}.jsonl"
+
+    @property
+    def index_path(self) -> Path:
+        return self.sessions_dir / INDEX_FILENAME
+
+    # ------------------------------------------------------------------
+    # 读取（启动加载 / 按需加载时调用，调用前应 flush 保证一致）
+    # ------------------------------------------------------------------
+
+    def list_session_ids(self) -> List[str]:
+        """列出磁盘上所有会话 ID（快照或日志任一存在即可）"""
+        ids = {p.stem for p in self.sessions_dir.glob("*.json") if p.name != INDEX_FILENAME}
+        ids.update(p.stem for p in self.sessions_dir.glob("*.jsonl"))
+        return sorted(ids)
+
+    def load_index(self) -> Dict[str, Dict[str, Any]]:
+        """读取会话索引，并与磁盘文件对账
+
+        以下情况会解析该会话的完整文件并刷新索引条目：
+        索引中没有、存在未合并日志、快照 mtime 与索引记录不一致（索引落后于快照）。
+        索引中有但磁盘上已不存在的会话会被剔除。
+        """
+        index: Dict[str, Dict[str, Any]] = {}
+        if self.index_path.exists():
+            try:
+                data = json.loads(self.index_path.read_text(encoding="utf-8"))
+                index = data.get("sessions", {}) if isinstance(data, dict) else {}
+            except Exception as e:
+                logger.warning(f"会话索引损坏，将重建: {e}")
+
+        snapshots = {p.stem: p for p in self.sessions_dir.glob("*.json") if p.name != INDEX_FILENAME}
+        journals = {p.stem for p in self.sessions_dir.glob("*.jsonl")}
+        all_ids = set(snapshots) | journals
+
+        refreshed = 0
+        result: Dict[str, Dict[str, Any]] = {}
+        for sid in all_ids:
+            snap = snapshots.get(sid)
+            snap_mtime = snap.stat().st_mtime_ns if snap else 0
+            entry = index.get(sid)
+            if entry is None or sid in journals or entry.get("snapshot_mtime") != snap_mtime:
+                try:
+                    session, _ = self._read_session(sid)
+                except Exception as e:
+                    logger.warning(f"加载会话失败 {sid}: {e}")
+                    continue
+                if session is None:
+                    continue
+                entry = build_index_entry(session)
+                entry["snapshot_mtime"] = snap_mtime
+                refreshed += 1
+            result[sid] = entry
+
+        with self._known_lock:
+            self._known.update(result)
+        self._index = {sid: dict(e) for sid, e in result.items()}
+        if refreshed or len(result) != len(index):
+            self._index_dirty = True
+            self._submit(("save_index", "", None))
+            logger.info(f"会话索引已对账：{len(result)} 个会话，刷新 {refreshed} 个")
+        return result
+
+    def load(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """读取快照并回放日志，返回会话字典；不存在返回 None"""
+        session, _ = self._read_session(session_id)
+        if session is not None:
+            with self._known_lock:
+                self._known.add(session_id)
+        return session
+
+    def load_all(self) -> Dict[str, Dict[str, Any]]:
+        """加载磁盘上的全部会话"""
+        sessions: Dict[str, Dict[str, Any]] = {}
+        for sid in self.list_session_ids():
+            try:
+                session = self.load(sid)
+            except Exception as e:
+                logger.warning(f"加载会话失败 {sid}: {e}")
+                continue
+            if session is not None:
+                sessions[sid] = session
+        return sessions
+
+    def _read_session(self, session_id: str) -> tuple:
+        """读取快照 + 日志，返回 (会话字典, 日志中最大 seq)"""
+        session: Optional[Dict[str, Any]] = None
+        base_seq = 0
+
+        snap = self.snapshot_path(session_id)
+        if snap.exists():
+            data = json.loads(snap.read_text(encoding="utf-8"))
+            session = {
+                "created_at": data.get("created_at", ""),
+                "last_activity": data.get("last_activity", ""),
+                "agent_type": data.get("agent_type", "default"),
+                "temporary": data.get("temporary", False),
+                "messages": data.get("messages", []),
+                "compress": data.get("compress", ""),
+            }
+            base_seq = int(data.get("journal_seq", 0) or 0)
+
+        max_seq = base_seq
+        journal = self.journal_path(session_id)
+        if journal.exists():
+            with open(journal, "r", encoding="utf-8") as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        # 崩溃导致的末尾半行，忽略
+                        logger.warning(f"会话日志存在损坏记录，已跳过: {journal.name}")
+                        continue
+                    seq = int(record.get("seq", 0))
+                    if seq <= base_seq:
+                        continue
+                    max_seq = max(max_seq, seq)
+                    if session is None:
+                        session = {
+                            "created_at": "", "last_activity": "", "agent_type": "default",
+                            "temporary": False, "messages": [], "compress": "",
+                        }
+                    self._apply_record(session, record)
+
+        if session is not None and self.max_messages and len(session["messages"]) > self.max_messages:
+            session["messages"] = session["messages"][-self.max_messages:]
+        return session, max_seq
+
+    @staticmethod
+    def _apply_record(session: Dict[str, Any], record: Dict[str, Any]):
+        op = record.get("op")
+        if op == "meta":
+            for key, value in (record.get("data") or {}).items():
+                if key in META_FIELDS:
+                    session[key] = value
+        elif op == "msg":
+            session["messages"].append(record.get("message", {}))
+            if record.get("last_activity"):
+                session["last_activity"] = record["last_activity"]
+
+    # ------------------------------------------------------------------
+    # 写入（调用方线程，仅入队）
+    # ------------------------------------------------------------------
+
+    def append_message(self, session_id: str, message: Dict[str, Any], meta: Dict[str, Any]):
+        """追加一条消息；会话首次落盘时会先写入完整元信息"""
+        with self._known_lock:
+            first = session_id not in self._known
+            self._known.add(session_id)
+        if first:
+            self._submit(("meta", session_id, {k: meta.get(k) for k in META_FIELDS if k in meta}))
+        self._submit(("msg", session_id, {"message": message, "last_activity": meta.get("last_activity", "")}))
+
+    def update_meta(self, session_id: str, meta: Dict[str, Any]):
+        """更新会话元信息（如 compress 摘要）"""
+        with self._known_lock:
+            self._known.add(session_id)
+        self._submit(("meta", session_id, {k: v for k, v in meta.items() if k in META_FIELDS}))
+
+    def delete(self, session_id: str):
+        """删除会话的快照与日志（与之前的写入保持顺序）"""
+        with self._known_lock:
+            self._known.discard(session_id)
+        self._submit(("delete", session_id, None))
+
+    def compact(self, session_id: str):
+        """请求立即合并指定会话"""
+        self._submit(("compact", session_id, None))
+
+    def is_persisted(self, session_id: str) -> bool:
+        """会话是否已落盘且没有待处理的写入（此时可从磁盘完整读回）"""
+        with self._known_lock:
+            if session_id not in self._known:
+                return False
+        with self._inflight_cond:
+            return not self._inflight.get(session_id)
+
+    def wait_session(self, session_id: str, timeout: Optional[float] = None) -> bool:
+        """只等待指定会话已入队的写入完成（没有待写入时立即返回）"""
+        with self._inflight_cond:
+            return self._inflight_cond.wait_for(lambda: not self._inflight.get(session_id), timeout)
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """等待队列中所有写入完成"""
+        if self._closed:
+            return True
+        done = threading.Event()
+        self._submit(("barrier", "", done))
+        return done.wait(timeout)
+
+    def close(self, timeout: float = 10.0):
+        """合并所有待合并会话并停止写线程"""
+        if self._closed:
+            return
+        self._queue.put(None)
+        self._closed = True
+        self._writer.join(timeout)
+
+    def _submit(self, op: tuple):
+        if self._closed:
+            logger.warning(f"会话存储已关闭，丢弃写入: {op[0]} {op[1]}")
+            return
+        if op[1]:
+            with self._inflight_cond:
+                self._inflight[op[1]] = self._inflight.get(op[1], 0) + 1
+        self._queue.put(op)
+
+    def _settle(self, session_id: str):
+        """写线程处理完一条会话写入"""
+        with self._inflight_cond:
+            remaining = self._inflight.get(session_id, 0) - 1
+            if remaining > 0:
+                self._inflight[session_id] = remaining
+            else:
+                self._inflight.pop(session_id, None)
+                self._inflight_cond.notify_all()
+
+    # ------------------------------------------------------------------
+    # 写线程
+    # ------------------------------------------------------------------
+
+    def _writer_loop(self):
+        while True:
+            try:
+                op = self._queue.get(timeout=INDEX_SAVE_INTERVAL)
+            except queue.Empty:
+                self._save_index()
+                continue
+            if op is None:
+                # 退出前把尚未合并的日志写成快照
+                for sid, pending in list(self._pending.items()):
+                    if pending:
+                        try:
+                            self._do_compact(sid)
+                        except Exception as e:
+                            logger.error(f"会话存储退出合并失败 {sid}: {e}")
+                self._save_index(force=True)
+                break
+            kind, session_id, payload = op
+            try:
+                if kind == "barrier":
+                    payload.set()
+                elif kind == "save_index":
+                    self._save_index(force=True)
+                elif kind == "delete":
+                    self._do_delete(session_id)
+                elif kind == "compact":
+                    if self._pending.get(session_id):
+                        self._do_compact(session_id)
+                else:
+                    self._do_append(session_id, kind, payload)
+                    if self._pending.get(session_id, 0) >= self.compact_every:
+                        self._do_compact(session_id)
+                if self._index_dirty and time.monotonic() - self._index_saved_at >= INDEX_SAVE_INTERVAL:
+                    self._save_index()
+            except Exception as e:
+                logger.error(f"会话存储写入失败 {kind} {session_id}: {e}")
+            finally:
+                if session_id:
+                    self._settle(session_id)
+
+    def _save_index(self, force: bool = False):
+        """原子写入会话索引（仅在有变更时）"""
+        if not self._index_dirty and not force:
+            return
+        self._index_saved_at = time.monotonic()
+        self._index_dirty = False
+        self._write_atomic(self.index_path, {"version": 1, "sessions": self._index}, indent=None)
+
+    def _write_atomic(self, path: Path, data: Dict[str, Any], indent: Optional[int] = 2):
+        """临时文件 + fsync + os.replace 原子写入 JSON"""
+        fd, tmp_path = tempfile.mkstemp(dir=str(self.sessions_dir), suffix=".tmp", prefix=f".{path.stem}_")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False, indent=indent)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+        except BaseException:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            raise
+
+    def _update_index(self, session_id: str, kind: str, payload: Dict[str, Any]):
+        """根据写入的日志记录增量更新索引条目"""
+        entry = self._index.setdefault(session_id, build_index_entry({}))
+        if kind == "meta":
+            for key, value in payload.items():
+                if key == "compress":
+                    entry["has_compress"] = bool(value)
+                elif key in META_FIELDS:
+                    entry[key] = value
+        elif kind == "msg":
+            count = entry.get("message_count", 0) + 1
+            entry["message_count"] = min(count, self.max_messages) if self.max_messages else count
+            content = payload.get("message", {}).get("content", "")
+            entry["last_message"] = content[:100] if isinstance(content, str) else ""
+            if payload.get("last_activity"):
+                entry["last_activity"] = payload["last_activity"]
+        self._index_dirty = True
+
+    def _next_seq(self, session_id: str) -> int:
+        if session_id not in self._seq:
+            # 首次写入：从磁盘恢复 seq，避免与已有日志冲突
+            _, max_seq = self._read_session(session_id)
+            self._seq[session_id] = max_seq
+            self._pending[session_id] = self._count_journal(session_id)
+        self._seq[session_id] += 1
+        return self._seq[session_id]
+
+    def _count_journal(self, session_id: str) -> int:
+        journal = self.journal_path(session_id)
+        if not journal.exists():
+            return 0
+        with open(journal, "rb") as f:
+            return sum(1 for line in f if line.strip())
+
+    def _do_append(self, session_id: str, kind: str, payload: Dict[str, Any]):
+        record = {"seq": self._next_seq(session_id), "op": kind}
+        if kind == "meta":
+            record["data"] = payload
+        else:
+            record.update(payload)
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with open(self.journal_path(session_id), "a", encoding="utf-8") as f:
+            f.write(line)
+        self._pending[session_id] = self._pending.get(session_id, 0) + 1
+        self._update_index(session_id, kind, payload)
+
+    def _do_compact(self, session_id: str):
+        """把快照与日志合并为新快照，原子替换后截断日志"""
+        session, max_seq = self._read_session(session_id)
+        if session is None:
+            return
+        data = {"session_id": session_id}
+        data.update({k: session.get(k) for k in META_FIELDS})
+        data["messages"] = session["messages"]
+        data["journal_seq"] = max_seq
+
+        snap = self.snapshot_path(session_id)
+        self._write_atomic(snap, data)
+
+        # 快照已包含 journal_seq 之前的全部记录，崩溃于此处也不会重复回放
+        journal = self.journal_path(session_id)
+        try:
+            journal.unlink()
+        except FileNotFoundError:
+            pass
+        self._seq[session_id] = max_seq
+        self._pending[session_id] = 0
+
+        entry = build_index_entry(session)
+        entry["snapshot_mtime"] = snap.stat().st_mtime_ns
+        self._index[session_id] = entry
+        self._index_dirty = True
+
+    def _do_delete(self, session_id: str):
+        for p in (self.snapshot_path(session_id), self.journal_path(session_id)):
+            try:
+                p.unlink()
+            except FileNotFoundError:
+                pass
+        self._seq.pop(session_id, None)
+        self._pending.pop(session_id, None)
+        if self._index.pop(session_id, None) is not None:
+            self._index_dirty = True
+
+
+class LazySessionMap(MutableMapping):
+    """按需加载的会话字典
+
+    键集合与元信息来自索引（常驻内存），消息正文在首次访问时从 SessionStore 加载，
+    超过 max_loaded 后按 LRU 淘汰已持久化会话的正文；临时会话和尚未落盘（或仍有待写入）
+    的会话无法从磁盘完整读回，始终常驻。
+
+    另维护 _recent：有消息的会话按 last_activity 升序排列，由 touch() 在会话活动时
+    移到末尾，查找“最近活跃的其他会话”只需从末尾倒序取第一个非排除项。
+    """
+
+    def __init__(self, store: SessionStore, index: Dict[str, Dict[str, Any]],
+                 max_loaded: int = DEFAULT_MAX_LOADED):
+        self._store = store
+        self._index: Dict[str, Dict[str, Any]] = dict(index)
+        self._loaded: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self.max_loaded = max(1, max_loaded)
+        self._recent: "OrderedDict[str, None]" = OrderedDict(
+            (sid, None) for sid, _ in sorted(
+                ((sid, e) for sid, e in self._index.items() if e.get("message_count")),
+                key=lambda item: item[1].get("last_activity", ""),
+            )
+        )
+
+    def __getitem__(self, session_id: str) -> Dict[str, Any]:
+        session = self._loaded.get(session_id)
+        if session is not None:
+            self._loaded.move_to_end(session_id)
+            return session
+        if session_id not in self._index:
+            raise KeyError(session_id)
+        # 只等待该会话自己的待写入记录落盘（被淘汰的会话通常没有），再从磁盘读取
+        self._store.wait_session(session_id)
+        session = self._store.load(session_id)
+        if session is None:
+            del self._index[session_id]
+            raise KeyError(session_id)
+        self._loaded[session_id] = session
+        self._evict()
+        return session
+
+    def __setitem__(self, session_id: str, session: Dict[str, Any]):
+        self._loaded[session_id] = session
+        self._loaded.move_to_end(session_id)
+        self._index[session_id] = build_index_entry(session)
+        self.touch(session_id)
+        self._evict()
+
+    def __delitem__(self, session_id: str):
+        if session_id not in self._index:
+            raise KeyError(session_id)
+        del self._index[session_id]
+        self._loaded.pop(session_id, None)
+        self._recent.pop(session_id, None)
+
+    def __contains__(self, session_id: object) -> bool:
+        return session_id in self._index
+
+    def __iter__(self):
+        return iter(list(self._index))
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def clear(self):
+        self._index.clear()
+        self._loaded.clear()
+        self._recent.clear()
+
+    def touch(self, session_id: str):
+        """会话发生活动（新消息 / last_activity 更新）后调用，维护最近活跃顺序"""
+        session = self._loaded.get(session_id)
+        if session is not None:
+            has_messages = bool(session.get("messages"))
+        else:
+            has_messages = bool(self._index.get(session_id, {}).get("message_count"))
+        if has_messages:
+            self._recent[session_id] = None
+            self._recent.move_to_end(session_id)
+        else:
+            self._recent.pop(session_id, None)
+
+    def latest(self, exclude_session_id: Optional[str] = None,
+               include_temporary: bool = True) -> Optional[str]:
+        """最近活跃且有消息的会话 ID（排除指定会话），摊还 O(1)"""
+        for session_id in reversed(self._recent):
+            if session_id == exclude_session_id:
+                continue
+            if not include_temporary:
+                session = self._loaded.get(session_id)
+                entry = session if session is not None else self._index.get(session_id, {})
+                if entry.get("temporary"):
+                    continue
+            return session_id
+        return None
+
+    def is_loaded(self, session_id: str) -> bool:
+        return session_id in self._loaded
+
+    def info(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """获取会话索引条目，不触发正文加载（已加载的会话以内存为准）"""
+        session = self._loaded.get(session_id)
+        if session is not None:
+            return build_index_entry(session)
+        entry = self._index.get(session_id)
+        return dict(entry) if entry is not None else None
+
+    def infos(self):
+        """遍历 (session_id, 索引条目)，不触发正文加载"""
+        for session_id in list(self._index):
+            entry = self.info(session_id)
+            if entry is not None:
+                yield session_id, entry
+
+    def _evict(self):
+        if len(self._loaded) <= self.max_loaded:
+            return
+        for session_id in list(self._loaded):
+            if len(self._loaded) <= self.max_loaded:
+                break
+            session = self._loaded[session_id]
+            if session.get("temporary") or not self._store.is_persisted(session_id):
+                continue
+            self._index[session_id] = build_index_entry(session)
+            del self._loaded[session_id]
@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+进程内流式事件
+
+LLMService → agentic loop → 路由 之间传递的类型化事件，替代逐 token 的
+"data: {json}\\n\\n" 字符串往返（编码 → 解析 → 再编码）。
+SSE 编码只在 HTTP 出口处调用 to_sse() 执行一次。
+"""
+
+import json
+from dataclasses import dataclass, field
+from typing import Any, Dict
+
+
+@dataclass
+class StreamEvent:
+    """一条流式事件：type + 载荷字段（编码后即 {"type": ..., **data}）"""
+
+    type: str
+    data: Dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def text(self) -> str:
+        return self.data.get("text", "")
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return self.data.get(key, default)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"type": self.type, **self.data}
+
+    def to_sse(self) -> str:
+        """编码为 SSE 数据块"""
+        return f"data: {json.dumps(self.to_dict(), ensure_ascii=False)}\n\n"
+
+
+def text_event(event_type: str, text: str) -> StreamEvent:
+    """文本类事件（content / reasoning / auth_expired 等），编码为 {"type", "text"}"""
+    return StreamEvent(event_type, {"text": text})
+
+
+def data_event(event_type: str, data: Any) -> StreamEvent:
+    """扩展事件：dict 载荷平铺，其它载荷放入 data 字段"""
+    if isinstance(data, dict):
+        return StreamEvent(event_type, dict(data))
+    return StreamEvent(event_type, {"data": data})
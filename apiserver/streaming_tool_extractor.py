@@ -6,12 +6,11 @@
 """
 
 import re
-import json
 import logging
 import asyncio
 import sys
 import os
-from typing import Callable, Optional, Dict, List
+from typing import Callable, Optional, Dict, List, Tuple
 import threading
 
 # 添加项目根目录到Python路径
@@ -32,6 +31,103 @@ MAX_SENTENCE_LENGTH = 50   # 缓冲池最大长度，超过即强制截断
 MIN_SENTENCE_LENGTH = 30   # 30字开始找断点，50字强制截断
 SECONDARY_BREAKS = "，、,— "  # 次要断点字符（逗号、顿号、空格、破折号）
 
+_SPECIAL_CHAR_RE = re.compile(r"[。？！；\.\?\!\;`]")  # 断句标点或反引号
+_BACKTICK_RUN_RE = re.compile(r"`+")
+
+
+def _find_best_cut_position(text: str) -> int:
+    """在缓冲区中找到最佳截断位置（从后往前找次要断点）"""
+    for i in range(len(text) - 1, MIN_SENTENCE_LENGTH - 1, -1):
+        if text[i] in SECONDARY_BREAKS:
+            return i + 1  # 断点字符包含在前一段
+    # 无任何断点 → 直接在最大长度处截断
+    return len(text)
+
+
+class SentenceSegmenter:
+    """TTS 分句器
+
+    每个文本块用一次正则扫描定位断句标点 / 反引号，普通文本整段并入缓冲区；
+    反引号计数、代码块状态、未成句的尾部缓冲在块之间延续，切分结果与逐字符处理一致。
+
+    feed()/finish() 返回动作列表：
+        ("send", 句子)   发送一句给 TTS
+        ("flush", 文本)  发送剩余文本（可为空）并刷新 TTS 缓冲（进入代码块 / 流结束时）
+    """
+
+    SEND = "send"
+    FLUSH = "flush"
+
+    def __init__(self):
+        self.buffer = ""            # 未成句的尾部文本（不超过 MAX_SENTENCE_LENGTH）
+        self.in_code_block = False
+        self.backtick_count = 0
+
+    def feed(self, chunk: str) -> List[Tuple[str, str]]:
+        actions: List[Tuple[str, str]] = []
+        pos, n = 0, len(chunk)
+        while pos < n:
+            if chunk[pos] == "`":
+                # 反引号本身不进入 TTS 缓冲区，只计数
+                end = _BACKTICK_RUN_RE.match(chunk, pos).end()
+                self.backtick_count += end - pos
+                pos = end
+                continue
+
+            # 反引号之后的第一个非反引号字符：≥3 个则切换代码块状态
+            if self.backtick_count >= 3:
+                if not self.in_code_block:
+                    # 进入代码块前，把缓冲区文本发走并刷新语音缓冲区
+                    actions.append((self.FLUSH, self.buffer.strip()))
+                    self.buffer = ""
+                self.in_code_block = not self.in_code_block
+            self.backtick_count = 0
+
+            if self.in_code_block:
+                # 代码块内容跳过，直接跳到下一个反引号
+                nxt = chunk.find("`", pos)
+                pos = n if nxt == -1 else nxt
+                continue
+
+            m = _SPECIAL_CHAR_RE.search(chunk, pos)
+            end = m.start() if m else n
+            if end > pos:
+                self._append_plain(chunk[pos:end], actions)
+            pos = end
+            if m and chunk[end] != "`":
+                # 遇到句子结束标点 → 立即截断发送
+                sentence = (self.buffer + chunk[end]).strip()
+                if sentence:
+                    actions.append((self.SEND, sentence))
+                self.buffer = ""
+                pos = end + 1
+        return actions
+
+    def _append_plain(self, text: str, actions: List[Tuple[str, str]]):
+        """并入不含标点 / 反引号的文本，缓冲区满 MAX_SENTENCE_LENGTH 即强制截断"""
+        while text:
+            room = MAX_SENTENCE_LENGTH - len(self.buffer)
+            if len(text) < room:
+                self.buffer += text
+                return
+            self.buffer += text[:room]
+            text = text[room:]
+            cut_pos = _find_best_cut_position(self.buffer)
+            sentence = self.buffer[:cut_pos].strip()
+            if sentence:
+                actions.append((self.SEND, sentence))
+            self.buffer = self.buffer[cut_pos:]
+
+    def finish(self) -> List[Tuple[str, str]]:
+        """流结束：处理末尾未结束的反引号序列，发送剩余文本并刷新"""
+        if self.backtick_count >= 3:
+            self.in_code_block = not self.in_code_block
+        self.backtick_count = 0
+        text = self.buffer
+        self.buffer = ""
+        return [(self.FLUSH, text)]
+
+
 class CallbackManager:
     """回调函数管理器 - 统一处理同步/异步回调"""
     
@@ -70,13 +166,10 @@ class StreamingToolCallExtractor:
     
     def __init__(self, mcp_manager=None):
         self.mcp_manager = mcp_manager
-        self.text_buffer = ""  # 普通文本缓冲区
-        self.complete_text = ""  # 完整文本内容
-        self.sentence_endings = r"[。？！；\.\?\!\;]"  # 断句标点
+        self._text_parts: List[str] = []  # 完整文本内容（按块累积，读取时拼接）
 
-        # 代码块跳过状态（不发送给 TTS）
-        self.in_code_block = False
-        self.backtick_count = 0
+        # 分句器（含代码块跳过状态，代码块内容不发送给 TTS）
+        self._segmenter = SentenceSegmenter()
 
         # 使用回调管理器
         self.callback_manager = CallbackManager()
@@ -110,7 +203,7 @@ class StreamingToolCallExtractor:
 
         处理流程：
         1. 累积完整文本（用于最终保存）
-        2. 逐字符检查：跳过代码块，检测句子结束符
+        2. 分句器整块扫描：跳过代码块，检测句子结束符
         3. 遇到结束符时立即切割并发送完整句子到TTS
         4. 缓冲区超过 MAX_SENTENCE_LENGTH 时强制截断
         """
@@ -134,66 +227,25 @@ class StreamingToolCallExtractor:
                 results.append(result)
 
         # 累积完整文本（用于最终保存到数据库）
-        self.complete_text += text_chunk
-
-        # 逐字符累积并检查分节条件
-        for char in text_chunk:
-            # --- 代码块检测：反引号计数 ---
-            if char == '`':
-                self.backtick_count += 1
-                continue  # 反引号本身不进入 TTS 缓冲区
-            else:
-                if self.backtick_count >= 3:
-                    # 切换代码块状态
-                    if not self.in_code_block:
-                        # 进入代码块前，把缓冲区文本发走并刷新语音缓冲区
-                        self._send_and_flush_voice(self.text_buffer.strip())
-                        self.text_buffer = ""
-                    self.in_code_block = not self.in_code_block
-                self.backtick_count = 0
-
-            # 代码块内容跳过，不发送给 TTS
-            if self.in_code_block:
-                continue
+        self._text_parts.append(text_chunk)
 
-            self.text_buffer += char
-
-            # 条件1：遇到句子结束标点 → 立即截断发送
-            if re.search(self.sentence_endings, char):
-                sentence = self.text_buffer.strip()
-                if sentence:
-                    self._send_to_voice_integration(sentence)
-                self.text_buffer = ""
-
-            # 条件2：缓冲区超过最大长度且无标点 → 强制截断
-            elif len(self.text_buffer) >= MAX_SENTENCE_LENGTH:
-                cut_pos = self._find_best_cut_position(self.text_buffer)
-                sentence = self.text_buffer[:cut_pos].strip()
-                if sentence:
-                    self._send_to_voice_integration(sentence)
-                self.text_buffer = self.text_buffer[cut_pos:]
+        # 整块分句并发送
+        self._dispatch(self._segmenter.feed(text_chunk))
 
         return results if results else None
 
-    def _find_best_cut_position(self, text: str) -> int:
-        """在缓冲区中找到最佳截断位置（从后往前找次要断点）"""
-        for i in range(len(text) - 1, MIN_SENTENCE_LENGTH - 1, -1):
-            if text[i] in SECONDARY_BREAKS:
-                return i + 1  # 断点字符包含在前一段
-        # 无任何断点 → 直接在最大长度处截断
-        return len(text)
-    
+    def _dispatch(self, actions: List[Tuple[str, str]]):
+        """执行分句器给出的动作"""
+        for action, text in actions:
+            if action == SentenceSegmenter.SEND:
+                self._send_to_voice_integration(text)
+            else:
+                self._send_and_flush_voice(text)
+
     async def _flush_text_buffer(self):
         """刷新文本缓冲区 - 处理流式结束时的剩余文本"""
-        # 处理末尾未结束的反引号序列
-        if self.backtick_count >= 3:
-            self.in_code_block = not self.in_code_block
-        self.backtick_count = 0
-
         # 发送剩余文本并刷新语音缓冲区（确保无标点短文本也能进 TTS 队列）
-        text = self.text_buffer
-        self.text_buffer = ""
-        self._send_and_flush_voice(text)
+        self._dispatch(self._segmenter.finish())
         return None
     
     def _send_to_voice_integration(self, text: str):
@@ -231,16 +283,21 @@ class StreamingToolCallExtractor:
         await self._flush_text_buffer()
         return None
     
+    @property
+    def complete_text(self) -> str:
+        """完整文本内容（拼接后合并为单段，避免重复拼接）"""
+        if len(self._text_parts) > 1:
+            self._text_parts = ["".join(self._text_parts)]
+        return self._text_parts[0] if self._text_parts else ""
+
     def get_complete_text(self) -> str:
         """获取完整文本内容"""
         return self.complete_text
     
     def reset(self):
         """重置提取器状态"""
-        self.text_buffer = ""
-        self.complete_text = ""
-        self.in_code_block = False
-        self.backtick_count = 0
+        self._text_parts = []
+        self._segmenter = SentenceSegmenter()
         self._pending_display.clear()
     
     async def process_streaming_response(self, llm_service, messages: List[Dict], 
@@ -249,22 +306,13 @@ class StreamingToolCallExtractor:
         if voice_integration:
             self.voice_integration = voice_integration
         
-        async for chunk in llm_service.stream_chat_with_context(messages, temperature):
-            if chunk.startswith("data: "):
-                try:
-                    data_str = chunk[6:].strip()
-                    if data_str == '[DONE]':
-                        break
-                    chunk_data = json.loads(data_str)
-                    text = chunk_data.get("text", "")
-                    if text:
-                        await self.process_text_chunk(text)
-                except Exception as e:
-                    logger.error(f"处理流式响应块失败: {e}")
-                    continue
-            else:
-                # 直接处理文本内容
-                await self.process_text_chunk(chunk)
+        async for event in llm_service.stream_chat_events(messages, temperature):
+            try:
+                if event.text:
+                    await self.process_text_chunk(event.text)
+            except Exception as e:
+                logger.error(f"处理流式响应块失败: {e}")
+                continue
         
         # 完成处理
         await self.finish_processing()
@@ -15,6 +15,7 @@ from urllib.parse import urlparse
 import httpx
 
 from apiserver import naga_auth
+from apiserver.tool_result_cache import get_tool_result_cache
 from system.config import IS_PACKAGED, VERSION, get_config, get_data_dir
 
 logger = logging.getLogger(__name__)
@@ -411,6 +412,7 @@ class TelemetryManager:
             "dropped_events": self._dropped_events,
             "auth_blocked": bool(self._auth_blocked_token_hash),
             "auth_blocked_reason": self._auth_blocked_reason,
+            "tool_cache": get_tool_result_cache().stats(),
         }
 
 
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+工具结果缓存
+
+agentic loop 中模型经常在同一会话或相邻轮次重复发起相同的只读工具调用
+（同一关键词的 web_search、同一城市的天气查询等）。本模块按
+(agentType, service_name, tool_name, 规范化参数) 缓存成功结果：
+
+- 每个工具单独设置 TTL，TTL <= 0 表示不缓存（默认不缓存，需显式开启）
+- 并发的相同调用合并为一次执行，其余调用等待同一结果；执行放在独立任务中，
+  发起者被取消时只要还有其他等待者就继续执行，全部等待者都取消后才取消
+- 命中率等统计通过 stats() 暴露给遥测
+"""
+
+import asyncio
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_ENTRIES = 512  # 最多缓存的结果条数（LRU 淘汰）
+
+# 调用字典中不属于工具参数的路由字段（另外 "_" 开头的键是 _tool_call_id 等回注用的元数据）
+_ROUTING_FIELDS = frozenset({"agentType", "service_name", "tool_name"})
+
+CacheKey = Tuple[str, str, str, str]
+
+
+def canonicalize_args(args: Any) -> str:
+    """参数规范化：键排序、紧凑分隔，保证等价参数得到相同字符串"""
+    if isinstance(args, dict):
+        args = {
+            k: v for k, v in args.items()
+            if k not in _ROUTING_FIELDS and not (isinstance(k, str) and k.startswith("_"))
+        }
+    try:
+        return json.dumps(args, sort_keys=True, ensure_ascii=False, separators=(",", ":"), default=str)
+    except (TypeError, ValueError):
+        return repr(args)
+
+
+def make_cache_key(agent_type: str, service_name: str, tool_name: str, args: Any) -> CacheKey:
+    return (agent_type or "", service_name or "", tool_name or "", canonicalize_args(args))
+
+
+class ToolResultCache:
+    """带 TTL、LRU 上限与在途请求合并的工具结果缓存"""
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[CacheKey, Tuple[float, Any]]" = OrderedDict()  # key -> (过期时间, 结果)
+        self._inflight: Dict[CacheKey, asyncio.Task] = {}
+        self._waiters: Dict[asyncio.Task, int] = {}   # 在途调用的等待者数（含发起者）
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def _get_fresh(self, key: CacheKey) -> Tuple[bool, Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return False, None
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return False, None
+        self._entries.move_to_end(key)
+        return True, value
+
+    def _put(self, key: CacheKey, ttl: float, value: Any):
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def get_or_run(
+        self,
+        key: CacheKey,
+        ttl: float,
+        runner: Callable[[], Awaitable[Any]],
+        cacheable: Optional[Callable[[Any], bool]] = None,
+    ) -> Any:
+        """命中直接返回；相同调用在途时等待其结果；否则执行 runner 并按 TTL 缓存。
+
+        runner 抛出的异常会传递给所有等待者，且不会被缓存；
+        cacheable(result) 返回 False 的结果（如错误结果）同样不缓存。
+        某个等待者（包括发起者）被取消不影响其他等待者，最后一个等待者取消时才取消 runner。
+        """
+        if ttl <= 0:
+            return await runner()
+
+        found, value = self._get_fresh(key)
+        if found:
+            self.hits += 1
+            logger.debug(f"[ToolCache] 命中: {key[1]}/{key[2]}")
+            return value
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+            logger.debug(f"[ToolCache] 合并在途调用: {key[1]}/{key[2]}")
+        else:
+            self.misses += 1
+            task = asyncio.ensure_future(self._run(key, ttl, runner, cacheable))
+            self._inflight[key] = task
+
+        self._waiters[task] = self._waiters.get(task, 0) + 1
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if not task.done() and self._waiters[task] == 1:
+                task.cancel()
+            raise
+        finally:
+            self._waiters[task] -= 1
+            if not self._waiters[task]:
+                del self._waiters[task]
+
+    async def _run(
+        self,
+        key: CacheKey,
+        ttl: float,
+        runner: Callable[[], Awaitable[Any]],
+        cacheable: Optional[Callable[[Any], bool]],
+    ) -> Any:
+        try:
+            value = await runner()
+            if cacheable is None or cacheable(value):
+                self._put(key, ttl, value)
+            return value
+        finally:
+            self._inflight.pop(key, None)
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """命中统计（合并的在途调用计为命中）"""
+        served = self.hits + self.coalesced
+        total = served + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "coalesced": self.coalesced,
+            "misses": self.misses,
+            "hit_rate": round(served / total, 4) if total else 0.0,
+        }
+
+
+_tool_result_cache: Optional[ToolResultCache] = None
+
+
+def get_tool_result_cache() -> ToolResultCache:
+    global _tool_result_cache
+    if _tool_result_cache is None:
+        _tool_result_cache = ToolResultCache()
+    return _tool_result_cache
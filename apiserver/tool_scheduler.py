@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+并行工具调用调度器
+
+模型一次输出多个工具调用时，execute_tool_calls 不再直接把全部调用丢进一个无上限的
+asyncio.gather，而是按服务分组（OpenClaw 网关、web_search、各 MCP 服务等）限制：
+
+- 并发数：同一服务同时在途的调用数上限
+- 速率：令牌桶，限制每秒发起的调用数，允许 burst 次突发
+- 优先级：名额空出时优先分配给前台会话（用户当前对话），ChatRequest.background 的内部对话让位
+
+OpenClaw 网关经 /tools/search 代理发起的搜索使用独立的 search_proxy 分组，不占用 web_search 的名额。
+
+限制读取自 config.json 的 tool_scheduler 段，修改后下次调度即生效。
+结果仍按原始调用顺序返回。
+"""
+
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from system.config import get_config
+
+logger = logging.getLogger(__name__)
+
+PRIORITY_FOREGROUND = 0  # 用户当前对话
+PRIORITY_BACKGROUND = 1  # 内部回调等非用户发起的后台对话
+
+
+class TokenBucket:
+    """令牌桶：rate 个/秒补充，最多积累 burst 个"""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        if self.rate <= 0:
+            return
+        # 加锁保证先到先得，避免多个等待者同时醒来抢同一个令牌
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class PrioritySemaphore:
+    """带优先级的信号量：名额释放时按 (优先级, 到达顺序) 唤醒等待者"""
+
+    def __init__(self, limit: int):
+        self.limit = limit  # 0 为不限
+        self._active = 0
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._seq = itertools.count()
+
+    async def acquire(self, priority: int = PRIORITY_FOREGROUND):
+        if self.limit <= 0 or (self._active < self.limit and not self._waiters):
+            self._active += 1
+            return
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._seq), future))
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # 已被分配名额但调用方被取消：把名额交给下一个等待者
+                self.release()
+            raise
+
+    def release(self):
+        self._active -= 1
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                self._active += 1
+                future.set_result(None)
+                return
+
+
+class _ServiceLimiter:
+    def __init__(self, concurrency: int, rate: float, burst: int):
+        self.signature = (concurrency, rate, burst)
+        self.semaphore = PrioritySemaphore(concurrency)
+        self.bucket = TokenBucket(rate, burst)
+
+
+def service_group(call: Dict[str, Any]) -> List[str]:
+    """调用所属的服务分组，按从具体到宽泛排列（用于查找配置）"""
+    agent_type = call.get("agentType", "")
+    if agent_type == "mcp":
+        return [f"mcp:{call.get('service_name', '')}", "mcp"]
+    if agent_type in ("tool", "openclaw_tool"):
+        tool_name = call.get("tool_name", "")
+        if tool_name == "web_search":
+            return ["web_search", "openclaw"]
+        from apiserver.agentic_tool_loop import _LOCAL_EXEC_TOOLS
+        if tool_name in _LOCAL_EXEC_TOOLS:
+            return ["local"]
+        return ["openclaw"]
+    if agent_type == "openclaw":
+        return ["openclaw"]
+    return [agent_type or "unknown"]
+
+
+class ToolScheduler:
+    """按服务分组施加并发 / 速率限制，并对前台会话优先放行"""
+
+    def __init__(self):
+        self._limiters: Dict[str, _ServiceLimiter] = {}
+
+    def _get_limiter(self, call: Dict[str, Any]) -> Tuple[str, _ServiceLimiter]:
+        cfg = get_config().tool_scheduler
+        groups = service_group(call)
+        key, limit = groups[-1], None
+        for group in groups:
+            if group in cfg.services:
+                key, limit = group, cfg.services[group]
+                break
+        if limit is None:
+            signature = (cfg.default_concurrency, 0.0, 1)
+        else:
+            signature = (limit.concurrency, limit.rate, limit.burst)
+
+        limiter = self._limiters.get(key)
+        if limiter is None or limiter.signature != signature:
+            # 首次使用或配置已修改：重建（已在途的调用仍在旧限制器上完成）
+            limiter = _ServiceLimiter(*signature)
+            self._limiters[key] = limiter
+        return key, limiter
+
+    async def run(
+        self,
+        call: Dict[str, Any],
+        runner: Callable[[], Awaitable[Any]],
+        priority: int = PRIORITY_FOREGROUND,
+    ) -> Any:
+        key, limiter = self._get_limiter(call)
+        t0 = time.monotonic()
+        await limiter.semaphore.acquire(priority)
+        try:
+            await limiter.bucket.acquire()
+            waited = time.monotonic() - t0
+            if waited > 0.5:
+                logger.info(f"[ToolScheduler] {key} 排队 {waited:.2f}s 后执行")
+            return await runner()
+        finally:
+            limiter.semaphore.release()
+
+    async def run_all(
+        self,
+        jobs: List[Tuple[Dict[str, Any], Callable[[], Awaitable[Any]]]],
+        priority: int = PRIORITY_FOREGROUND,
+    ) -> List[Any]:
+        """并行调度一批调用，按原始顺序返回结果（异常作为结果返回）"""
+        return await asyncio.gather(
+            *(self.run(call, runner, priority) for call, runner in jobs),
+            return_exceptions=True,
+        )
+
+
+_tool_scheduler: Optional[ToolScheduler] = None
+
+
+def get_tool_scheduler() -> ToolScheduler:
+    global _tool_scheduler
+    if _tool_scheduler is None:
+        _tool_scheduler = ToolScheduler()
+    return _tool_scheduler
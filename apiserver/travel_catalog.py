@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+旅行 session 目录索引（SQLite）
+
+session 正文仍是 TRAVEL_DIR 下的 <session_id>.json，本表只记录筛选和排序需要的字段，
+按状态 / 干员查询时不必逐个解析 session 文件：
+
+  - travel/catalog.db   表 sessions(session_id, agent_id, status, created_at, file_mtime_ns, file_size)
+
+save_session 写完文件后调用 record() 同步本表（apiserver 与 agentserver 两个进程都会写，
+WAL 模式下可并发访问）。不经过 save_session 的变化（旧版本写入、手动增删文件、写文件后
+进程崩溃）由 reconcile 兜底：每个进程首次查询时按文件的 mtime/size 全量核对一次，之后
+目录的 mtime 变化（新增 / 删除 / 替换文件）时再核对，只重新读取发生变化的文件。
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Any, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+CATALOG_FILENAME = "catalog.db"
+
+# 表示“不按干员过滤”
+ANY_AGENT = object()
+
+
+class TravelSessionCatalog:
+    """session 文件的筛选索引"""
+
+    def __init__(self, travel_dir: Path, db_path: Optional[Path] = None):
+        self.travel_dir = Path(travel_dir)
+        self.db_path = Path(db_path) if db_path else self.travel_dir / CATALOG_FILENAME
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._reconciled_dir_mtime: Optional[int] = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.db_path), timeout=10, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            # status 为 NULL 表示文件不是合法的 session（如 browser-policies.json 或写入中的文件）
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS sessions ("
+                "session_id TEXT PRIMARY KEY, agent_id TEXT, status TEXT, created_at TEXT, "
+                "file_mtime_ns INTEGER NOT NULL, file_size INTEGER NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_sessions_status ON sessions (status, created_at)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_sessions_agent ON sessions (agent_id, created_at)")
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def record(self, session_id: str, agent_id: Optional[str], status: str, created_at: str,
+               stat: os.stat_result) -> None:
+        """save_session 写完文件后同步索引"""
+        with self._lock:
+            try:
+                conn = self._connect()
+                conn.execute(
+                    "INSERT OR REPLACE INTO sessions VALUES (?, ?, ?, ?, ?, ?)",
+                    (session_id, agent_id, status, created_at, stat.st_mtime_ns, stat.st_size),
+                )
+                conn.commit()
+            except sqlite3.Error as e:
+                # 索引写失败不影响 session 本身，下次核对时按文件 mtime 修正
+                logger.warning(f"更新旅行 session 索引失败 [{session_id}]: {e}")
+                self._reconciled_dir_mtime = None
+
+    def query(
+        self,
+        *,
+        agent_id: Any = ANY_AGENT,
+        statuses: Optional[Iterable[str]] = None,
+        limit: Optional[int] = None,
+    ) -> List[str]:
+        """按 agent/status 过滤，返回按 created_at 倒序的 session_id"""
+        with self._lock:
+            conn = self._connect()
+            self._reconcile(conn)
+            sql = "SELECT session_id FROM sessions WHERE status IS NOT NULL"
+            params: list = []
+            if agent_id is not ANY_AGENT:
+                sql += " AND agent_id IS ?"
+                params.append(agent_id)
+            if statuses is not None:
+                statuses = list(statuses)
+                if not statuses:
+                    return []
+                sql += f" AND status IN ({', '.join('?' * len(statuses))})"
+                params.extend(statuses)
+            sql += " ORDER BY created_at DESC"
+            if limit is not None:
+                sql += " LIMIT ?"
+                params.append(limit)
+            return [row[0] for row in conn.execute(sql, params)]
+
+    def invalidate(self) -> None:
+        """下次查询时重新全量核对（查询结果对应的文件已不可用时调用）"""
+        with self._lock:
+            self._reconciled_dir_mtime = None
+
+    def _reconcile(self, conn: sqlite3.Connection) -> None:
+        try:
+            dir_mtime = self.travel_dir.stat().st_mtime_ns
+        except OSError:
+            return
+        if dir_mtime == self._reconciled_dir_mtime:
+            return
+
+        indexed = {
+            row[0]: (row[1], row[2])
+            for row in conn.execute("SELECT session_id, file_mtime_ns, file_size FROM sessions")
+        }
+        upserts: List[Tuple] = []
+        present = set()
+        with os.scandir(self.travel_dir) as entries:
+            for entry in entries:
+                if not entry.name.endswith(".json") or not entry.is_file():
+                    continue
+                session_id = entry.name[:-len(".json")]
+                present.add(session_id)
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                if indexed.get(session_id) == (stat.st_mtime_ns, stat.st_size):
+                    continue
+                upserts.append((session_id, *self._read_fields(Path(entry.path)), stat.st_mtime_ns, stat.st_size))
+        removed = [(session_id,) for session_id in indexed if session_id not in present]
+
+        if upserts or removed:
+            conn.executemany("INSERT OR REPLACE INTO sessions VALUES (?, ?, ?, ?, ?, ?)", upserts)
+            conn.executemany("DELETE FROM sessions WHERE session_id = ?", removed)
+            conn.commit()
+            logger.info(f"旅行 session 索引已核对: 更新 {len(upserts)} 条，移除 {len(removed)} 条")
+        self._reconciled_dir_mtime = dir_mtime
+
+    @staticmethod
+    def _read_fields(path: Path) -> Tuple[Optional[str], Optional[str], Optional[str]]:
+        """读取 (agent_id, status, created_at)；不是合法 session 时 status 为 None"""
+        try:
+            data = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None, None, None
+        if not isinstance(data, dict) or not data.get("session_id") or not data.get("created_at"):
+            return None, None, None
+        return data.get("agent_id"), str(data.get("status") or "pending"), str(data["created_at"])
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
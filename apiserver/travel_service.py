@@ -4,10 +4,13 @@
 """
 
 import ast
+import hashlib
 import json
 import logging
 import math
+import os
 import re
+import tempfile
 import uuid
 from datetime import datetime
 from enum import Enum
@@ -22,9 +25,11 @@ logger = logging.getLogger(__name__)
 # ── 数据目录 ────────────────────────────────────
 
 from system.config import get_data_dir
+from apiserver.travel_catalog import ANY_AGENT, TravelSessionCatalog
 
 TRAVEL_DIR = get_data_dir() / "travel"
 TRAVEL_DIR.mkdir(parents=True, exist_ok=True)
+_catalog = TravelSessionCatalog(TRAVEL_DIR)
 
 WRAPPED_CONTENT_RE = re.compile(
     r"<<<EXTERNAL_UNTRUSTED_CONTENT[^>]*>>>\s*(?:Source:[^\n]*\n)?(?:---\n)?(?P<body>.*?)<<<END_EXTERNAL_UNTRUSTED_CONTENT[^>]*>>>",
@@ -109,6 +114,24 @@ class TravelProgressEvent(BaseModel):
     meta: dict[str, Any] = Field(default_factory=dict)
 
 
+class TravelAnalysisState(BaseModel):
+    """
+    历史增量分析状态，随 session 落盘。
+
+    cursor 之前的消息已经计入 session（发现、积分、工具统计），不再重复解析。最后一条消息
+    可能还会并入新的工具结果，只临时计入，tail_* 记录它的贡献，下次折叠时先撤销再重算。
+    """
+
+    started: bool = False  # 是否折叠过；没有 analysis_state 的旧 session 首次折叠时以历史为准重建统计
+    cursor: int = 0
+    anchor: Optional[str] = None  # 第 cursor 条消息的指纹，不一致说明历史被重写
+    seen_tool_results: list[str] = Field(default_factory=list)
+    pending_call_args: dict[str, dict[str, Any]] = Field(default_factory=dict)
+    tail_credits: int = 0
+    tail_turns: int = 0
+    tail_social: int = 0
+
+
 class TravelSession(BaseModel):
     session_id: str
     status: TravelStatus = TravelStatus.PENDING
@@ -152,6 +175,7 @@ class TravelSession(BaseModel):
     time_warning_sent: bool = False
     credit_warning_sent: bool = False
     progress_events: list[TravelProgressEvent] = Field(default_factory=list)
+    analysis_state: TravelAnalysisState = Field(default_factory=TravelAnalysisState)
     # 结果
     discoveries: list[TravelDiscovery] = Field(default_factory=list)
     social_interactions: list[SocialInteraction] = Field(default_factory=list)
@@ -254,10 +278,32 @@ def create_session(
 
 
 def save_session(session: TravelSession) -> None:
-    """将 session 写入 JSON 文件"""
+    """将 session 写入 JSON 文件并同步目录索引"""
     session.last_checkpoint_at = datetime.now().isoformat()
     path = _session_path(session.session_id)
-    path.write_text(session.model_dump_json(indent=2), encoding="utf-8")
+    # 先写临时文件再替换，另一个进程核对索引时不会读到写了一半的文件；
+    # apiserver 与 agentserver 可能同时保存同一 session，每次写入使用独立的临时文件
+    fd, tmp_path = tempfile.mkstemp(dir=str(path.parent), prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(session.model_dump_json(indent=2))
+        # 替换前取临时文件的 stat（rename 保留 mtime/size）：替换后再 stat path 可能取到
+        # 另一个进程随后写入的版本，导致索引记录了那个版本的 mtime 却是本次的字段
+        stat = os.stat(tmp_path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+    _catalog.record(
+        session.session_id,
+        session.agent_id,
+        session.status.value,
+        session.created_at,
+        stat,
+    )
 
 
 def set_session_phase(
@@ -381,33 +427,50 @@ def get_session_or_none(session_id: str) -> Optional[TravelSession]:
         return None
 
 
+def get_session_mtime_ns(session_id: str) -> Optional[int]:
+    """session 文件的修改时间（纳秒），用于判断是否被外部修改；文件不存在时返回 None"""
+    try:
+        return _session_path(session_id).stat().st_mtime_ns
+    except OSError:
+        return None
+
+
 def get_active_session() -> Optional[TravelSession]:
     """兼容旧逻辑：返回最近创建的 running session。"""
-    sessions = list_sessions(statuses={TravelStatus.RUNNING})
+    sessions = list_sessions(statuses={TravelStatus.RUNNING}, limit=1)
     return sessions[0] if sessions else None
 
 
-_ANY_AGENT = object()
+_ANY_AGENT = ANY_AGENT
 
 
 def list_sessions(
     *,
     agent_id: Any = _ANY_AGENT,
     statuses: Optional[set[TravelStatus]] = None,
+    limit: Optional[int] = None,
 ) -> list[TravelSession]:
-    """列出 session，支持按 agent/status 过滤，按 created_at 倒序。"""
+    """列出 session，支持按 agent/status 过滤，按 created_at 倒序。
+
+    先查目录索引筛出 session_id，只解析命中的 session 文件。
+    """
+    status_values = None if statuses is None else [TravelStatus(status).value for status in statuses]
+    session_ids = _catalog.query(agent_id=agent_id, statuses=status_values, limit=limit)
     sessions: list[TravelSession] = []
-    for path in TRAVEL_DIR.glob("*.json"):
-        try:
-            session = TravelSession.model_validate_json(path.read_text(encoding="utf-8"))
-            if agent_id is not _ANY_AGENT and session.agent_id != agent_id:
-                continue
-            if statuses is not None and session.status not in statuses:
-                continue
-            sessions.append(session)
-        except Exception:
+    for session_id in session_ids:
+        session = get_session_or_none(session_id)
+        if session is None:
+            # 文件在核对之后被删除或损坏，下次查询重新核对
+            _catalog.invalidate()
+            continue
+        if agent_id is not _ANY_AGENT and session.agent_id != agent_id:
             continue
-    sessions.sort(key=lambda s: s.created_at, reverse=True)
+        if statuses is not None and session.status not in statuses:
+            continue
+        sessions.append(session)
+    if limit is not None and len(sessions) < limit and len(session_ids) == limit:
+        # 索引与文件不一致导致命中被过滤掉，退回不限条数再查一次
+        return list_sessions(agent_id=agent_id, statuses=statuses)[:limit]
     return sessions
 
 
@@ -424,12 +487,12 @@ def list_interruptible_sessions(*, agent_id: Any = _ANY_AGENT) -> list[TravelSes
 
 
 def get_open_session_for_agent(agent_id: Optional[str]) -> Optional[TravelSession]:
-    sessions = list_open_sessions(agent_id=agent_id)
+    sessions = list_sessions(agent_id=agent_id, statuses=OPEN_TRAVEL_STATUSES, limit=1)
     return sessions[0] if sessions else None
 
 
 def get_latest_session(*, agent_id: Any = _ANY_AGENT) -> Optional[TravelSession]:
-    sessions = list_sessions(agent_id=agent_id)
+    sessions = list_sessions(agent_id=agent_id, limit=1)
     return sessions[0] if sessions else None
 
 
@@ -1157,39 +1220,118 @@ def _summary_report_from_travel_tool_result(result: Any) -> tuple[Optional[str],
     return file_path, title
 
 
-def analyze_history(history_messages: list[dict]) -> TravelHistoryAnalysis:
-    """从 OpenClaw 历史中提炼发现、社交互动和近似预算消耗。"""
-    now = datetime.now().isoformat()
-    analysis = TravelHistoryAnalysis()
-    seen_urls: set[str] = set()
-    seen_tool_results: set[str] = set()
-    call_args: dict[str, dict[str, Any]] = {}
-    seen_progress_ids: set[str] = set()
+def _history_fingerprint(msg: dict[str, Any]) -> str:
+    tool_events = msg.get("toolEvents") or msg.get("tool_events") or []
+    raw = f"{msg.get('role')}\x00{msg.get('content')}\x00{len(tool_events) if isinstance(tool_events, list) else 0}"
+    return hashlib.sha1(raw.encode("utf-8", errors="ignore")).hexdigest()
 
-    for msg in history_messages:
+
+def _reset_history_analysis(session: TravelSession) -> None:
+    session.discoveries = []
+    session.social_interactions = []
+    session.credits_used = 0
+    session.tool_stats = {}
+    session.sources = []
+    session.unique_sources = 0
+    session.analysis_state = TravelAnalysisState()
+
+
+def _parse_social_from_text(content: str, now: str) -> list[SocialInteraction]:
+    interactions: list[SocialInteraction] = []
+    for match in SOCIAL_TAG_RE.finditer(content):
+        post_id = match.group("post_id")
+        if post_id:
+            post_id = post_id.strip()
+            if post_id.lower() in ("none", "null", ""):
+                post_id = None
+        interactions.append(
+            SocialInteraction(
+                type=match.group("type").strip(),
+                post_id=post_id,
+                content_preview=match.group("content_preview").strip(),
+                timestamp=now,
+            )
+        )
+    return interactions
+
+
+def fold_history(
+    session: TravelSession,
+    history_messages: list[dict],
+    *,
+    now: Optional[str] = None,
+) -> TravelHistoryAnalysis:
+    """
+    把游标之后的历史消息增量计入 session。
+
+    history_messages 为完整的归并历史（get_local_session_history(limit=0)）；游标之前的消息只在
+    历史被重写时才会重新解析。
+
+    Returns:
+        本次新增的发现、社交互动和活动事件；credits_used / tool_stats 为累计值
+    """
+    now = now or datetime.now().isoformat()
+    state = session.analysis_state
+    rewritten = state.cursor > len(history_messages) or (
+        state.cursor and _history_fingerprint(history_messages[state.cursor - 1]) != state.anchor
+    )
+    if rewritten:
+        logger.info(f"旅行 session 历史已变化，重新分析: {session.session_id}")
+    if rewritten or not state.started:
+        _reset_history_analysis(session)
+        state = session.analysis_state
+    state.started = True
+    cursor = state.cursor
+
+    # 撤销上次对最后一条消息的临时计入
+    session.credits_used -= state.tail_credits
+    if state.tail_turns:
+        session.tool_stats["llm.turn"] = session.tool_stats.get("llm.turn", 0) - state.tail_turns
+    if state.tail_social:
+        del session.social_interactions[-state.tail_social:]
+    state.tail_credits = state.tail_turns = state.tail_social = 0
+
+    delta = TravelHistoryAnalysis()
+    seen_urls = {discovery.url for discovery in session.discoveries}
+    seen_tool_results = set(state.seen_tool_results)
+    call_args = state.pending_call_args
+
+    def _add_discovery(discovery: Optional[TravelDiscovery]) -> None:
+        if discovery is None or discovery.url in seen_urls:
+            return
+        seen_urls.add(discovery.url)
+        session.discoveries.append(discovery)
+        delta.discoveries.append(discovery)
+
+    last_index = len(history_messages) - 1
+    for index in range(cursor, len(history_messages)):
+        msg = history_messages[index]
+        is_tail = index == last_index
         text_content = _extract_message_text(msg)
         role = str(msg.get("role") or "").strip().lower().replace("-", "_")
         if role in {"user", "assistant"}:
-            analysis.credits_used += _estimate_message_credit_cost(msg)
-            analysis.tool_stats["llm.turn"] = analysis.tool_stats.get("llm.turn", 0) + 1
+            cost = _estimate_message_credit_cost(msg)
+            session.credits_used += cost
+            session.tool_stats["llm.turn"] = session.tool_stats.get("llm.turn", 0) + 1
+            if is_tail:
+                state.tail_credits = cost
+                state.tail_turns = 1
 
         if text_content:
             for discovery in parse_discoveries_from_text(text_content, now=now):
-                if discovery.url in seen_urls:
-                    continue
-                seen_urls.add(discovery.url)
-                analysis.discoveries.append(discovery)
-
-        tool_events = _extract_tool_events_from_message(msg)
-        if not tool_events:
-            continue
-
-        for event in tool_events:
-            if not isinstance(event, dict):
-                continue
+                _add_discovery(discovery)
+            social = _parse_social_from_text(text_content, now)
+            session.social_interactions.extend(social)
+            delta.social_interactions.extend(social)
+            if is_tail:
+                state.tail_social = len(social)
+
+        for event in _extract_tool_events_from_message(msg):
             event_type = str(event.get("type") or "").strip()
             tool_call_id = str(event.get("toolCallId") or "").strip()
             if event_type == "tool_call" and tool_call_id:
+                if tool_call_id in seen_tool_results:
+                    continue
                 args = event.get("args")
                 if isinstance(args, dict):
                     call_args[tool_call_id] = args
@@ -1202,12 +1344,13 @@ def analyze_history(history_messages: list[dict]) -> TravelHistoryAnalysis:
                 continue
 
             seen_tool_results.add(tool_call_id)
+            state.seen_tool_results.append(tool_call_id)
             name = str(event.get("name") or "").strip()
-            args = call_args.get(tool_call_id, {})
+            args = call_args.pop(tool_call_id, {})
             is_error = bool(event.get("isError"))
             stat_key, cost = _estimate_event_cost(name, args, is_error)
-            analysis.credits_used += cost
-            analysis.tool_stats[stat_key] = analysis.tool_stats.get(stat_key, 0) + 1
+            session.credits_used += cost
+            session.tool_stats[stat_key] = session.tool_stats.get(stat_key, 0) + 1
 
             progress_event = _progress_event_from_tool_result(
                 name=name,
@@ -1217,9 +1360,8 @@ def analyze_history(history_messages: list[dict]) -> TravelHistoryAnalysis:
                 tool_call_id=tool_call_id,
                 now=now,
             )
-            if progress_event and tool_call_id not in seen_progress_ids:
-                seen_progress_ids.add(tool_call_id)
-                analysis.activity_events.append(progress_event)
+            if progress_event:
+                delta.activity_events.append(progress_event)
 
             if is_error:
                 continue
@@ -1227,42 +1369,44 @@ def analyze_history(history_messages: list[dict]) -> TravelHistoryAnalysis:
             result = event.get("result")
             if name == "web_search":
                 for discovery in _discoveries_from_web_search_result(result, now):
-                    if discovery.url in seen_urls:
-                        continue
-                    seen_urls.add(discovery.url)
-                    analysis.discoveries.append(discovery)
-                continue
-
-            if name == "travel_discovery":
-                discovery = _discovery_from_travel_tool_result(result, now)
-                if discovery is not None and discovery.url not in seen_urls:
-                    seen_urls.add(discovery.url)
-                    analysis.discoveries.append(discovery)
-                continue
-
-            if name == "travel_summary":
+                    _add_discovery(discovery)
+            elif name == "travel_discovery":
+                _add_discovery(_discovery_from_travel_tool_result(result, now))
+            elif name == "travel_summary":
                 report_path, report_title = _summary_report_from_travel_tool_result(result)
                 if report_path:
-                    analysis.summary_report_path = report_path
+                    session.summary_report_path = delta.summary_report_path = report_path
                 if report_title:
-                    analysis.summary_report_title = report_title
-                continue
+                    session.summary_report_title = delta.summary_report_title = report_title
+            elif name == "browser":
+                _add_discovery(_discovery_from_browser_result(args, result, now))
+            elif name == "web_fetch":
+                _add_discovery(_discovery_from_web_fetch_result(args, result, now))
+
+    state.cursor = max(0, last_index)
+    state.anchor = _history_fingerprint(history_messages[state.cursor - 1]) if state.cursor else None
+    if delta.discoveries:
+        known_sources = set(session.sources)
+        for source in _collect_sources_from_discoveries(delta.discoveries):
+            if source not in known_sources:
+                known_sources.add(source)
+                session.sources.append(source)
+        session.unique_sources = len(session.sources)
+
+    delta.credits_used = session.credits_used
+    delta.tool_stats = dict(session.tool_stats)
+    delta.sources = list(session.sources)
+    return delta
 
-            if name == "browser":
-                discovery = _discovery_from_browser_result(args, result, now)
-                if discovery is not None and discovery.url not in seen_urls:
-                    seen_urls.add(discovery.url)
-                    analysis.discoveries.append(discovery)
-                continue
-
-            if name == "web_fetch":
-                discovery = _discovery_from_web_fetch_result(args, result, now)
-                if discovery is not None and discovery.url not in seen_urls:
-                    seen_urls.add(discovery.url)
-                    analysis.discoveries.append(discovery)
 
-    analysis.social_interactions = parse_social(history_messages)
-    analysis.sources = _collect_sources_from_discoveries(analysis.discoveries)
+def analyze_history(history_messages: list[dict]) -> TravelHistoryAnalysis:
+    """从 OpenClaw 历史中提炼发现、社交互动和近似预算消耗。"""
+    scratch = TravelSession(session_id="", created_at="")
+    analysis = fold_history(scratch, history_messages)
+    analysis.discoveries = scratch.discoveries
+    analysis.social_interactions = scratch.social_interactions
+    analysis.summary_report_path = scratch.summary_report_path
+    analysis.summary_report_title = scratch.summary_report_title
     return analysis
 
 
@@ -1282,20 +1426,6 @@ def parse_social(history_messages: list[dict]) -> list[SocialInteraction]:
     now = datetime.now().isoformat()
     for msg in history_messages:
         content = _extract_message_text(msg)
-        if not content:
-            continue
-        for match in SOCIAL_TAG_RE.finditer(content):
-            post_id = match.group("post_id")
-            if post_id:
-                post_id = post_id.strip()
-                if post_id.lower() in ("none", "null", ""):
-                    post_id = None
-            interactions.append(
-                SocialInteraction(
-                    type=match.group("type").strip(),
-                    post_id=post_id,
-                    content_preview=match.group("content_preview").strip(),
-                    timestamp=now,
-                )
-            )
+        if content:
+            interactions.extend(_parse_social_from_text(content, now))
     return interactions
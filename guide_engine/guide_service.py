@@ -18,6 +18,9 @@ from .neo4j_service import Neo4jService
 
 logger = logging.getLogger("GuideService")
 
+VECTOR_TOP_K = 5
+VECTOR_MIN_SCORE = 0.3
+
 
 class GuideService:
     GAME_ID_DISPLAY_MAP: dict[str, str] = {
@@ -299,6 +302,10 @@ class GuideService:
             #     task_keys.append(f"neo4j_syn_{operator_names[0]}")
             #     tasks.append(self.neo4j.get_operator_synergies(game_id, operator_names[0]))
 
+        # 2. 本地向量索引检索攻略分块
+        task_keys.append("vector")
+        tasks.append(self._search_chunks(game_id, request.content))
+
         # ---- 并行执行 ----
         results = await asyncio.gather(*tasks, return_exceptions=True)
         result_map: dict[str, Any] = dict(zip(task_keys, results))
@@ -322,6 +329,20 @@ class GuideService:
                 if syn_text:
                     context_parts.append(syn_text)
 
+        # ---- 处理向量检索结果 ----
+        hits = result_map.get("vector")
+        if isinstance(hits, Exception):
+            logger.warning("[GuideService] vector search failed: %s", hits)
+        elif hits:
+            context_parts.append(self._format_chunk_context(hits))
+            for hit in hits:
+                references.append(GuideReference(
+                    type=hit.chunk.get("chunk_type", "document"),
+                    title=hit.chunk.get("entity_name", ""),
+                    source="vector_index",
+                    score=round(hit.score, 4),
+                ))
+
         # ---- 计算上下文 ----
         calc_context = await self._build_calculation_context(request, route, [], prompt_config)
         if calc_context:
@@ -330,6 +351,35 @@ class GuideService:
 
         return "\n\n---\n\n".join(context_parts), references
 
+    @staticmethod
+    async def _search_chunks(game_id: str, query: str) -> list[Any]:
+        """在本地向量索引中混合检索（BM25 + 向量 + 时效性）当前游戏的分块；索引未构建时返回空列表"""
+        from .rag.vector_index import get_index_embedder, get_vector_index
+
+        if not query.strip():
+            return []
+
+        def _search() -> list[Any]:
+            # 索引文件更新后 get_vector_index 会重新加载，与检索一起放到线程中，不阻塞事件循环
+            index = get_vector_index()
+            if index is None or not len(index):
+                return []
+            return index.hybrid_search(
+                query, get_index_embedder(), VECTOR_TOP_K, game_id=game_id, min_score=VECTOR_MIN_SCORE,
+            )
+
+        return await asyncio.to_thread(_search)
+
+    @staticmethod
+    def _format_chunk_context(hits: list[Any]) -> str:
+        """格式化向量检索到的攻略分块"""
+        lines = ["## 相关资料"]
+        for hit in hits:
+            chunk = hit.chunk
+            lines.append(f"### {chunk.get('entity_name', '')}（{chunk.get('chunk_type', '')}）")
+            lines.append(chunk.get("content", ""))
+        return "\n".join(lines)
+
     # ---- Neo4j 格式化辅助 ----
 
     @staticmethod
@@ -3,10 +3,7 @@ import json
 from pathlib import Path
 from typing import List, Dict, Any, Optional
 
-try:
-    from neo4j import AsyncGraphDatabase
-except ImportError:
-    AsyncGraphDatabase = None  # type: ignore[assignment,misc]
+from system.neo4j_client import Neo4jClient, get_neo4j_client
 
 from .models import get_guide_engine_settings
 
@@ -18,32 +15,24 @@ class Neo4jService:
     ENEMY_NAME_TOKENS = ("级", "鬼", "姬", "栖", "棲", "要塞", "砲台", "飞行场", "飛行場", "集积地", "集積地", "泊地")
 
     def __init__(self):
-        self._driver = None
+        self._client: Optional[Neo4jClient] = None
         self._seed_lock: asyncio.Lock = asyncio.Lock()
         self._seed_attempted_games: set[str] = set()
 
     async def connect(self):
-        """连接 Neo4j"""
-        if self._driver is None:
-            if AsyncGraphDatabase is None:
-                raise RuntimeError("neo4j 未安装，请运行 pip install neo4j 或禁用攻略引擎的图数据库功能")
+        """获取共享 Neo4j 客户端（与记忆图谱共用驱动和连接池）"""
+        if self._client is None:
             settings = get_guide_engine_settings()
-            self._driver = AsyncGraphDatabase.driver(
-                settings.neo4j_uri, auth=(settings.neo4j_user, settings.neo4j_password)
-            )
+            self._client = get_neo4j_client(settings.neo4j_uri, settings.neo4j_user, settings.neo4j_password)
 
     async def close(self):
-        """关闭连接"""
-        if self._driver:
-            await self._driver.close()
-            self._driver = None
+        """释放引用（共享驱动在进程退出时统一关闭）"""
+        self._client = None
 
     async def execute_query(self, query: str, parameters: Dict = None) -> List[Dict]:
-        """执行 Cypher 查询"""
+        """执行 Cypher 查询（带超时与瞬时错误重试）"""
         await self.connect()
-        async with self._driver.session() as session:
-            result = await session.run(query, parameters or {})
-            return [record.data() async for record in result]
+        return await self._client.run(query, parameters or {}, write=True)
 
     async def ensure_seed_data(self, game_id: str) -> None:
         """检测并自动导入基础图数据（每个 game_id 仅尝试一次）"""
@@ -325,6 +314,7 @@ class Neo4jService:
             "CREATE CONSTRAINT IF NOT EXISTS FOR (f:Faction) REQUIRE (f.game_id, f.id) IS UNIQUE",
             "CREATE CONSTRAINT IF NOT EXISTS FOR (s:Ship) REQUIRE (s.game_id, s.id) IS UNIQUE",
             "CREATE CONSTRAINT IF NOT EXISTS FOR (e:EnemyShip) REQUIRE (e.game_id, e.id) IS UNIQUE",
+            "CREATE CONSTRAINT IF NOT EXISTS FOR (c:GuideChunk) REQUIRE (c.game_id, c.id) IS UNIQUE",
             "CREATE INDEX IF NOT EXISTS FOR (o:Operator) ON (o.name)",
             "CREATE INDEX IF NOT EXISTS FOR (o:Operator) ON (o.name_en)",
             "CREATE INDEX IF NOT EXISTS FOR (o:Operator) ON (o.game_id)",
@@ -467,6 +457,49 @@ class Neo4jService:
             {"game_id": game_id, "op_name": operator_name, "faction_id": faction_id},
         )
 
+    async def upsert_chunks(self, game_id: str, chunks: List[Dict[str, Any]]) -> int:
+        """写入 / 更新攻略分块节点（Chunk.to_dict() 格式），并挂到所属实体节点上"""
+        query = """
+        UNWIND $rows AS row
+        MERGE (c:GuideChunk {game_id: $game_id, id: row.id})
+        SET c.entity_type = row.entity_type,
+            c.entity_id = row.entity_id,
+            c.entity_name = row.entity_name,
+            c.chunk_type = row.chunk_type,
+            c.chunk_index = row.chunk_index,
+            c.content = row.content
+        MERGE (e:GuideEntity {game_id: $game_id, entity_type: row.entity_type, id: row.entity_id})
+        SET e.name = row.entity_name
+        MERGE (e)-[:HAS_CHUNK]->(c)
+        """
+        rows = [
+            {key: chunk[key] for key in (
+                "id", "entity_type", "entity_id", "entity_name", "chunk_type", "chunk_index", "content")}
+            for chunk in chunks
+        ]
+        total = 0
+        for batch in self._chunk_rows(rows, 300):
+            await self.execute_query(query, {"game_id": game_id, "rows": batch})
+            total += len(batch)
+        return total
+
+    async def delete_chunks(self, game_id: str, chunk_ids: List[str]) -> int:
+        """删除攻略分块节点，并清理不再有分块的实体节点"""
+        query = """
+        UNWIND $ids AS chunk_id
+        MATCH (c:GuideChunk {game_id: $game_id, id: chunk_id})
+        OPTIONAL MATCH (e:GuideEntity)-[:HAS_CHUNK]->(c)
+        DETACH DELETE c
+        WITH DISTINCT e
+        WHERE e IS NOT NULL AND NOT (e)-[:HAS_CHUNK]->()
+        DETACH DELETE e
+        """
+        total = 0
+        for batch in self._chunk_rows(list(chunk_ids), 300):
+            await self.execute_query(query, {"game_id": game_id, "ids": batch})
+            total += len(batch)
+        return total
+
     async def clear_game_data(self, game_id: str):
         """清除游戏的所有图数据"""
         await self.execute_query(
@@ -0,0 +1,108 @@
+"""
+BM25 词法索引
+
+分词：英文 / 数字按词切分，中日文按字符二元组（单字片段保留单字），与向量检索互补，
+负责干员名、技能名等精确词的召回。倒排表按词存放在 array('i') 中，检索时零拷贝转为
+NumPy 数组逐词累加得分。
+"""
+
+from __future__ import annotations
+
+import math
+import re
+from array import array
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+|[\u3040-\u30ff\u3400-\u9fff]+")
+
+
+def tokenize(text: str) -> List[str]:
+    tokens: List[str] = []
+    for piece in _TOKEN_RE.findall((text or "").lower()):
+        if piece.isascii() or len(piece) == 1:
+            tokens.append(piece)
+        else:
+            tokens.extend(piece[i:i + 2] for i in range(len(piece) - 1))
+    return tokens
+
+
+def _term_frequencies(text: str) -> Dict[str, int]:
+    counts: Dict[str, int] = {}
+    for token in tokenize(text):
+        counts[token] = counts.get(token, 0) + 1
+    return counts
+
+
+class BM25Index:
+    """按行号（与 VectorIndex 的矩阵行一致）索引文档"""
+
+    def __init__(self):
+        self._postings: Dict[str, Tuple[array, array]] = {}   # term -> (rows, tfs)
+        self._doc_lengths = array("i")
+        self._total_length = 0
+
+    def __len__(self) -> int:
+        return len(self._doc_lengths)
+
+    def set(self, row: int, text: str, old_text: Optional[str] = None):
+        """写入第 row 行；覆盖已有行时传入旧文本以移除旧倒排"""
+        if old_text is not None and row < len(self._doc_lengths):
+            self.remove(row, old_text)
+        while len(self._doc_lengths) <= row:
+            self._doc_lengths.append(0)
+        counts = _term_frequencies(text)
+        for term, tf in counts.items():
+            rows, tfs = self._postings.setdefault(term, (array("i"), array("i")))
+            rows.append(row)
+            tfs.append(tf)
+        length = sum(counts.values())
+        self._doc_lengths[row] = length
+        self._total_length += length
+
+    def remove(self, row: int, text: str):
+        """移除第 row 行（text 为该行当前文本）的倒排，行号保留为空文档"""
+        for term in _term_frequencies(text):
+            posting = self._postings.get(term)
+            if posting is None:
+                continue
+            rows, tfs = posting
+            try:
+                i = rows.index(row)
+            except ValueError:
+                continue
+            del rows[i]
+            del tfs[i]
+            if not rows:
+                del self._postings[term]
+        self._total_length -= self._doc_lengths[row]
+        self._doc_lengths[row] = 0
+
+    def truncate(self, size: int):
+        """丢弃 size 之后的行（调用方需先 remove 这些行）"""
+        del self._doc_lengths[size:]
+
+    def scores(self, query: str, size: Optional[int] = None) -> np.ndarray:
+        """返回每一行的 BM25 得分（长度为 size，默认等于已索引行数）"""
+        size = len(self._doc_lengths) if size is None else size
+        scores = np.zeros(size, dtype=np.float32)
+        n_docs = len(self._doc_lengths)
+        if not n_docs or not self._total_length:
+            return scores
+        doc_lengths = np.frombuffer(self._doc_lengths, dtype=np.int32)
+        avg_length = self._total_length / n_docs
+        for term in set(tokenize(query)):
+            posting = self._postings.get(term)
+            if posting is None:
+                continue
+            rows = np.frombuffer(posting[0], dtype=np.int32)
+            tfs = np.frombuffer(posting[1], dtype=np.int32).astype(np.float32)
+            df = len(rows)
+            idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * doc_lengths[rows] / avg_length)
+            scores[rows] += idf * tfs * (BM25_K1 + 1) / (tfs + norm)
+        return scores
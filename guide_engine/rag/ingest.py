@@ -0,0 +1,367 @@
+"""
+攻略数据增量入库
+
+按内容哈希只重新处理发生变化的实体：
+  - 文件级：记录 size / mtime / 内容哈希，size 与 mtime 都未变的文件直接跳过，不读取
+  - 实体级：流式解析数据文件（顶层为实体数组或 id -> 实体 的对象，逐项 raw_decode，
+    不整体 json.load），按实体原始 JSON 文本的 MD5 判断是否变化，只把变化的实体交给处理器
+  - 分块级：分块 id 本身含内容 MD5（Document.add_chunk），新旧 id 集合求差即得
+    需要 upsert / 删除的分块；文件中消失的实体，其分块全部删除
+
+变化同步到向量索引（VectorIndex），可选同步到 Neo4j（GuideChunk 节点）；
+全部写入成功后才更新清单，失败的批次下次运行会重新处理。
+
+  - <数据目录>/guide_engine/ingest_manifest.json
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from .base import BaseProcessor
+from .vector_index import (
+    DEFAULT_EMBED_BATCH_SIZE,
+    VectorIndex,
+    default_index_dir,
+    default_processors,
+    get_default_embedder,
+)
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_FILENAME = "ingest_manifest.json"
+MANIFEST_VERSION = 1
+STREAM_BLOCK_SIZE = 1 << 20   # 每次从数据文件读取的字符数
+
+_WHITESPACE = " \t\r\n"
+
+
+def default_manifest_path() -> Path:
+    from system.config import get_data_dir
+    return get_data_dir() / "guide_engine" / MANIFEST_FILENAME
+
+
+# ---------------------------------------------------------------------------
+# 流式 JSON 解析
+# ---------------------------------------------------------------------------
+
+class _NeedMore(Exception):
+    """缓冲区内的数据不足以解析出下一项"""
+
+
+_END = object()   # 容器结束标记
+
+
+class JsonItemStream:
+    """逐项读取顶层为数组或对象的 JSON 文件，产出 (key, value, raw_text)
+
+    数组的 key 为下标，对象的 key 为键名；raw_text 为该项在文件中的原始文本，用于计算哈希。
+    读取到的全部文本同时累计进 digest，迭代结束后即为整个文件的内容哈希。
+    """
+
+    def __init__(self, path: str | Path, block_size: int = STREAM_BLOCK_SIZE):
+        self.path = Path(path)
+        self.block_size = block_size
+        self._decoder = json.JSONDecoder()
+        self._hasher = hashlib.md5()
+
+    @property
+    def digest(self) -> str:
+        return self._hasher.hexdigest()
+
+    def _skip_ws(self, buf: str, pos: int) -> int:
+        while pos < len(buf) and buf[pos] in _WHITESPACE:
+            pos += 1
+        if pos >= len(buf):
+            raise _NeedMore
+        return pos
+
+    def _decode(self, buf: str, pos: int, eof: bool) -> Tuple[Any, int]:
+        try:
+            value, end = self._decoder.raw_decode(buf, pos)
+        except json.JSONDecodeError:
+            raise _NeedMore
+        if not eof:
+            # 数字等标量可能被截断在缓冲区末尾（如 "-2.5e10" 只读到 "-2.5e"），
+            # 要求其后已经出现分隔符
+            follow = end
+            while follow < len(buf) and buf[follow] in _WHITESPACE:
+                follow += 1
+            if follow >= len(buf) or buf[follow] not in ",:]}":
+                raise _NeedMore
+        return value, end
+
+    def _parse_item(self, buf: str, pos: int, is_object: bool, first: bool, eof: bool):
+        """解析一项；返回 (key, value, start, end, next_pos)，容器结束时 key 为 _END"""
+        pos = self._skip_ws(buf, pos)
+        if buf[pos] == ("}" if is_object else "]"):
+            return _END, None, pos, pos, pos + 1
+        if not first:
+            if buf[pos] != ",":
+                raise ValueError(f"{self.path}: 位置 {pos} 处缺少逗号")
+            pos = self._skip_ws(buf, pos + 1)
+        key = None
+        if is_object:
+            key, pos = self._decode(buf, pos, eof)
+            if not isinstance(key, str):
+                raise ValueError(f"{self.path}: 对象键必须是字符串")
+            pos = self._skip_ws(buf, pos)
+            if buf[pos] != ":":
+                raise ValueError(f"{self.path}: 键 {key!r} 后缺少冒号")
+            pos = self._skip_ws(buf, pos + 1)
+        start = pos
+        value, end = self._decode(buf, pos, eof)
+        return key, value, start, end, end
+
+    def __iter__(self) -> Iterator[Tuple[Any, Any, str]]:
+        with open(self.path, "r", encoding="utf-8-sig") as f:
+            buf, eof = "", False
+
+            def read_more(size: int) -> bool:
+                nonlocal buf
+                block = f.read(size)
+                if block:
+                    self._hasher.update(block.encode("utf-8"))
+                    buf += block
+                return bool(block)
+
+            eof = not read_more(self.block_size)
+            pos = 0
+            while True:
+                try:
+                    pos = self._skip_ws(buf, 0)
+                    break
+                except _NeedMore:
+                    if eof:
+                        return   # 空文件
+                    eof = not read_more(self.block_size)
+            if buf[pos] not in "[{":
+                raise ValueError(f"{self.path}: 顶层必须是数组或对象")
+            is_object = buf[pos] == "{"
+            pos += 1
+
+            index, want = 0, self.block_size
+            while True:
+                try:
+                    key, value, start, end, pos_next = self._parse_item(buf, pos, is_object, index == 0, eof)
+                except _NeedMore:
+                    if eof:
+                        raise ValueError(f"{self.path}: JSON 不完整")
+                    eof = not read_more(want)
+                    want *= 2   # 单项超过缓冲区时加倍读取，避免反复重解析
+                    continue
+                if key is _END:
+                    break
+                yield (key if is_object else index), value, buf[start:end]
+                index += 1
+                pos, want = pos_next, self.block_size
+                if pos > self.block_size:
+                    buf, pos = buf[pos:], 0
+            while read_more(self.block_size):   # 读完剩余内容，保证文件哈希完整
+                pass
+
+
+# ---------------------------------------------------------------------------
+# 增量入库
+# ---------------------------------------------------------------------------
+
+@dataclass
+class IngestReport:
+    files_scanned: int = 0
+    files_changed: int = 0
+    entities_changed: int = 0
+    entities_removed: int = 0
+    chunks_upserted: int = 0
+    chunks_deleted: int = 0
+    chunks_embedded: int = 0
+
+
+@dataclass
+class _GamePlan:
+    """单个游戏本轮需要写入的变化"""
+    game_id: str
+    upserts: List[Dict[str, Any]] = field(default_factory=list)
+    deletes: List[str] = field(default_factory=list)
+    files: Dict[str, Dict[str, Any]] = field(default_factory=dict)      # data_key -> 文件记录
+    entities: Dict[str, Dict[str, Any]] = field(default_factory=dict)   # 变化后的实体记录（None 为删除）
+
+
+def _entity_ident(data_key: str, key: Any, value: Any, seen: Dict[str, int]) -> str:
+    """实体在清单中的键：对象取键名，数组优先取实体自身的 id / name，其次下标"""
+    if isinstance(key, str):
+        ident = key
+    elif isinstance(value, dict) and (value.get("id") or value.get("name")):
+        ident = str(value.get("id") or value.get("name"))
+    else:
+        ident = f"#{key}"
+    count = seen.get(ident, 0)
+    seen[ident] = count + 1
+    return f"{data_key}:{ident}" + (f"#{count}" if count else "")
+
+
+class IncrementalIngestor:
+    """对比清单，只把变化的实体重新分块并同步到向量索引 / Neo4j"""
+
+    def __init__(self, gamedata_dir: str | Path, index: VectorIndex, *, embedder=None,
+                 processors: Optional[Sequence[BaseProcessor]] = None,
+                 manifest_path: str | Path | None = None, index_dir: str | Path | None = None,
+                 neo4j=None, batch_size: int = DEFAULT_EMBED_BATCH_SIZE):
+        self.gamedata_dir = Path(gamedata_dir)
+        self.index = index
+        self.embedder = embedder or get_default_embedder(index.embedder_name or None)
+        if processors is None:
+            processors = default_processors()
+        self.processors = list(processors)
+        self.manifest_path = Path(manifest_path) if manifest_path else default_manifest_path()
+        self.index_dir = Path(index_dir) if index_dir else default_index_dir()
+        self.neo4j = neo4j   # guide_engine.neo4j_service.Neo4jService，可选
+        self.batch_size = batch_size
+        self.manifest = self._load_manifest()
+
+    def _load_manifest(self) -> Dict[str, Any]:
+        try:
+            manifest = json.loads(self.manifest_path.read_text(encoding="utf-8"))
+            if manifest.get("version") == MANIFEST_VERSION:
+                return manifest
+            logger.info("[Ingest] 清单版本不同，全量重建")
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            logger.warning(f"[Ingest] 读取清单失败，全量重建: {e}")
+        return {"version": MANIFEST_VERSION, "games": {}}
+
+    def _save_manifest(self):
+        self.manifest_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.manifest_path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(self.manifest, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp, self.manifest_path)
+
+    # ------------------------------------------------------------------
+    # 扫描
+    # ------------------------------------------------------------------
+
+    def _plan_game(self, processor: BaseProcessor, report: IngestReport) -> _GamePlan:
+        game_state = self.manifest["games"].get(processor.game_id, {"files": {}, "entities": {}})
+        old_files: Dict[str, Any] = game_state["files"]
+        old_entities: Dict[str, Any] = game_state["entities"]
+        plan = _GamePlan(processor.game_id)
+
+        for data_key, relative in processor.get_data_files().items():
+            path = self.gamedata_dir / relative
+            old_file = old_files.get(data_key)
+            prefix = f"{data_key}:"
+            if not path.exists():
+                if old_file is not None:
+                    # 数据文件被移除：删除其全部实体
+                    for ident, entry in old_entities.items():
+                        if ident.startswith(prefix):
+                            plan.deletes.extend(entry["chunks"])
+                            plan.entities[ident] = None
+                            report.entities_removed += 1
+                    plan.files[data_key] = None
+                continue
+
+            report.files_scanned += 1
+            stat = path.stat()
+            if old_file and old_file["size"] == stat.st_size and old_file["mtime_ns"] == stat.st_mtime_ns:
+                continue
+
+            stream = JsonItemStream(path)
+            seen_idents: Dict[str, int] = {}
+            present: set[str] = set()
+            failed = False
+            for key, value, raw in stream:
+                ident = _entity_ident(data_key, key, value, seen_idents)
+                present.add(ident)
+                entity_hash = hashlib.md5(raw.encode("utf-8")).hexdigest()
+                old_entry = old_entities.get(ident)
+                if old_entry is not None and old_entry["hash"] == entity_hash:
+                    continue
+
+                single = {data_key: {key: value} if isinstance(key, str) else [value]}
+                try:
+                    chunks = [chunk.to_dict() for doc in processor.process(single) for chunk in doc.chunks]
+                except Exception as e:
+                    # 保留旧分块，且不记录文件状态，下次运行重试
+                    logger.warning(f"[Ingest] {processor.game_id} {ident} 处理失败: {e}")
+                    failed = True
+                    continue
+                new_ids = [chunk["id"] for chunk in chunks]
+                old_ids = set(old_entry["chunks"]) if old_entry else set()
+                plan.upserts.extend(chunk for chunk in chunks if chunk["id"] not in old_ids)
+                plan.deletes.extend(old_ids.difference(new_ids))
+                plan.entities[ident] = {"hash": entity_hash, "chunks": new_ids}
+                report.entities_changed += 1
+
+            for ident, entry in old_entities.items():
+                if ident.startswith(prefix) and ident not in present:
+                    plan.deletes.extend(entry["chunks"])
+                    plan.entities[ident] = None
+                    report.entities_removed += 1
+
+            if old_file is None or old_file.get("hash") != stream.digest:
+                report.files_changed += 1
+            if not failed:
+                plan.files[data_key] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "hash": stream.digest}
+        return plan
+
+    # ------------------------------------------------------------------
+    # 写入
+    # ------------------------------------------------------------------
+
+    def _apply_index(self, plan: _GamePlan, report: IngestReport):
+        from .base import Chunk, ChunkType
+
+        # 同一分块可能从一个实体移到另一个实体：先删后写，删除集合中剔除本轮仍存在的 id
+        upsert_ids = {chunk["id"] for chunk in plan.upserts}
+        plan.deletes = [chunk_id for chunk_id in dict.fromkeys(plan.deletes) if chunk_id not in upsert_ids]
+        report.chunks_deleted += self.index.remove(plan.deletes)
+        chunks = [Chunk(**{**c, "chunk_type": ChunkType(c["chunk_type"])}) for c in plan.upserts]
+        report.chunks_embedded += self.index.add_chunks(chunks, self.embedder, self.batch_size)
+        report.chunks_upserted += len(plan.upserts)
+
+    async def _apply_neo4j(self, plan: _GamePlan):
+        if plan.deletes:
+            await self.neo4j.delete_chunks(plan.game_id, plan.deletes)
+        if plan.upserts:
+            await self.neo4j.upsert_chunks(plan.game_id, plan.upserts)
+
+    def _commit_manifest(self, plan: _GamePlan):
+        game_state = self.manifest["games"].setdefault(plan.game_id, {"files": {}, "entities": {}})
+        for data_key, record in plan.files.items():
+            if record is None:
+                game_state["files"].pop(data_key, None)
+            else:
+                game_state["files"][data_key] = record
+        for ident, entry in plan.entities.items():
+            if entry is None:
+                game_state["entities"].pop(ident, None)
+            else:
+                game_state["entities"][ident] = entry
+
+    async def run(self) -> IngestReport:
+        report = IngestReport()
+        for processor in self.processors:
+            plan = await asyncio.to_thread(self._plan_game, processor, report)
+            if plan.upserts or plan.deletes:
+                await asyncio.to_thread(self._apply_index, plan, report)
+                if self.neo4j is not None:
+                    await self._apply_neo4j(plan)
+                logger.info(f"[Ingest] {plan.game_id}: upsert {len(plan.upserts)} 个分块，删除 {len(plan.deletes)} 个")
+            if plan.files or plan.entities:
+                self._commit_manifest(plan)
+
+        if report.chunks_upserted or report.chunks_deleted:
+            await asyncio.to_thread(self.index.save, self.index_dir)
+        self._save_manifest()   # 清单在索引落盘之后写入
+        return report
+
+    def run_sync(self) -> IngestReport:
+        return asyncio.run(self.run())
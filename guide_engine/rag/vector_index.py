@@ -0,0 +1,561 @@
+"""
+RAG 分块向量索引
+
+把各游戏处理器产出的 Chunk 编码为向量，保存在一个 float32 矩阵中做本地检索：
+  - 入库时按批调用嵌入模型（OpenAI 兼容 /embeddings 接口），向量统一做 L2 归一化
+  - 检索时查询向量与矩阵做一次矩阵乘得到余弦相似度，argpartition 取 top-k
+  - game_id / chunk_type 以整数编码存放在并行数组中，过滤只是一次向量化掩码
+  - 时效性级别、过时标记、发布时间、版本号在入库时由 rag_utils 计算一次并存为列，
+    hybrid_search 对候选行做 BM25 + 向量 + 时效性加权的向量化重排，不再逐条跑正则
+  - 持久化为 vectors.npy + columns.npz + chunks.jsonl + meta.json，加载时 vectors.npy 以只读 memmap 打开
+
+离线或未配置嵌入接口时使用 HashingEmbedder（字符 n-gram 哈希），结果确定、无需网络。
+
+  - <数据目录>/guide_engine/vector_index/
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import threading
+import zlib
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+from ..rag_utils import compute_freshness_columns, freshness_weights
+from .base import BaseProcessor, Chunk, ChunkType
+from .bm25 import BM25Index
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_EMBED_BATCH_SIZE = 64
+DEFAULT_HASHING_DIM = 256
+EMBEDDING_REQUEST_TIMEOUT = 30.0   # 秒
+INITIAL_CAPACITY = 1024
+SUBSET_SCAN_RATIO = 0.5            # 过滤后剩余行占比低于该值时只对子集做矩阵乘
+HYBRID_CANDIDATES = 50             # 向量与 BM25 各自召回的候选数
+HYBRID_VECTOR_WEIGHT = 0.6         # 融合分 = 向量分 * w + 归一化 BM25 分 * (1 - w)，再乘时效性权重
+
+VECTORS_FILENAME = "vectors.npy"
+CHUNKS_FILENAME = "chunks.jsonl"
+COLUMNS_FILENAME = "columns.npz"
+META_FILENAME = "meta.json"
+
+# GuideService 使用的游戏 ID -> 处理器的 game_id
+GAME_ID_TO_PROCESSOR: Dict[str, str] = {
+    "genshin-impact": "genshin",
+    "honkai-star-rail": "starrail",
+    "zenless-zone-zero": "zenless",
+    "wuthering-waves": "wutheringwaves",
+    "punishing-gray-raven": "pgr",
+    "uma-musume": "umamusume",
+}
+
+
+def normalize_game_id(game_id: str) -> str:
+    game_id = (game_id or "").strip().lower()
+    return GAME_ID_TO_PROCESSOR.get(game_id, game_id)
+
+
+def _l2_normalize(matrix: np.ndarray) -> np.ndarray:
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+# ---------------------------------------------------------------------------
+# 嵌入模型
+# ---------------------------------------------------------------------------
+
+class HashingEmbedder:
+    """确定性的离线嵌入：字符 1-gram / 2-gram 经 crc32 哈希到固定维度（带符号）"""
+
+    def __init__(self, dim: int = DEFAULT_HASHING_DIM):
+        self.dim = dim
+        self.name = f"hashing-{dim}"
+
+    def _embed_one(self, text: str) -> np.ndarray:
+        text = "".join((text or "").lower().split())
+        grams = list(text) + [text[i:i + 2] for i in range(len(text) - 1)]
+        if not grams:
+            return np.zeros(self.dim, dtype=np.float32)
+        hashes = np.fromiter((zlib.crc32(g.encode("utf-8")) for g in grams), dtype=np.uint64, count=len(grams))
+        buckets = (hashes % self.dim).astype(np.intp)
+        signs = np.where((hashes >> 31) & 1, -1.0, 1.0)
+        return np.bincount(buckets, weights=signs, minlength=self.dim).astype(np.float32)
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        if not texts:
+            return np.zeros((0, self.dim), dtype=np.float32)
+        return _l2_normalize(np.stack([self._embed_one(text) for text in texts]))
+
+
+class OpenAIEmbedder:
+    """OpenAI 兼容 /embeddings 接口，一次请求编码一批文本"""
+
+    def __init__(self, base_url: str, api_key: str, model: str, timeout: float = EMBEDDING_REQUEST_TIMEOUT):
+        self.base_url = base_url.rstrip("/")
+        self.api_key = api_key
+        self.model = model
+        self.timeout = timeout
+        self.name = f"openai:{model}"
+        self.dim: Optional[int] = None
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        import httpx
+
+        if not texts:
+            return np.zeros((0, self.dim or 0), dtype=np.float32)
+        response = httpx.post(
+            f"{self.base_url}/embeddings",
+            headers={"Authorization": f"Bearer {self.api_key}"},
+            json={"model": self.model, "input": list(texts)},
+            timeout=self.timeout,
+        )
+        response.raise_for_status()
+        data = sorted(response.json()["data"], key=lambda item: item["index"])
+        matrix = _l2_normalize(np.array([item["embedding"] for item in data], dtype=np.float32))
+        self.dim = matrix.shape[1]
+        return matrix
+
+
+def get_default_embedder(name: Optional[str] = None):
+    """按配置选择嵌入模型；name 为已有索引记录的嵌入模型名，保证查询与入库一致"""
+    if name and name.startswith("hashing-"):
+        return HashingEmbedder(int(name.split("-", 1)[1]))
+
+    from ..models import get_guide_engine_settings
+
+    settings = get_guide_engine_settings()
+    if settings.embedding_api_base_url and settings.embedding_api_key and settings.embedding_api_model:
+        embedder = OpenAIEmbedder(
+            settings.embedding_api_base_url, settings.embedding_api_key, settings.embedding_api_model)
+        if name and name != embedder.name:
+            logger.warning(f"[VectorIndex] 索引使用 {name} 构建，当前配置为 {embedder.name}，检索结果可能失准")
+        return embedder
+    return HashingEmbedder()
+
+
+# ---------------------------------------------------------------------------
+# 向量索引
+# ---------------------------------------------------------------------------
+
+@dataclass
+class VectorHit:
+    score: float
+    chunk: Dict[str, Any]   # Chunk.to_dict() 的结果
+    vector_score: Optional[float] = None
+    bm25_score: Optional[float] = None
+    freshness_weight: Optional[float] = None
+
+
+# 与矩阵行对齐的列：属性名 -> (dtype, 空值)
+_COLUMNS: Dict[str, tuple] = {
+    "_game_codes": (np.int32, 0),
+    "_type_codes": (np.int32, 0),
+    "_level_codes": (np.int8, 0),
+    "_deprecated": (np.bool_, False),
+    "_publish_ts": (np.float64, np.nan),
+    "_version_major": (np.int32, -1),
+    "_version_minor": (np.int32, -1),
+}
+
+
+class VectorIndex:
+    """Chunk 向量矩阵 + 并行的过滤 / 时效性列"""
+
+    def __init__(self, dim: Optional[int] = None, embedder_name: str = ""):
+        self.dim = dim
+        self.embedder_name = embedder_name
+        self._vectors = np.zeros((0, dim or 0), dtype=np.float32)
+        for name, (dtype, _) in _COLUMNS.items():
+            setattr(self, name, np.zeros(0, dtype=dtype))
+        self._size = 0
+        self._bm25: Optional[BM25Index] = None    # 首次 hybrid_search 时构建
+        self._chunks: List[Dict[str, Any]] = []
+        self._positions: Dict[str, int] = {}      # chunk_id -> 行号
+        self._game_ids: Dict[str, int] = {}       # game_id -> 编码
+        self._chunk_types: Dict[str, int] = {}    # chunk_type -> 编码
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __contains__(self, chunk_id: str) -> bool:
+        return chunk_id in self._positions
+
+    @staticmethod
+    def _code(table: Dict[str, int], value: str) -> int:
+        code = table.get(value)
+        if code is None:
+            code = table[value] = len(table)
+        return code
+
+    def _reserve(self, extra: int):
+        needed = self._size + extra
+        capacity = self._vectors.shape[0]
+        if needed <= capacity and self._vectors.flags.writeable:
+            return
+        capacity = max(needed, capacity * 2, INITIAL_CAPACITY)
+        vectors = np.zeros((capacity, self.dim), dtype=np.float32)
+        vectors[:self._size] = self._vectors[:self._size]   # memmap 加载后首次写入时复制到内存
+        self._vectors = vectors
+        for name, (dtype, empty) in _COLUMNS.items():
+            column = np.full(capacity, empty, dtype=dtype)
+            column[:self._size] = getattr(self, name)[:self._size]
+            setattr(self, name, column)
+
+    def add(self, chunks: Sequence[Dict[str, Any]], vectors: np.ndarray):
+        """写入已编码的分块；chunk_id 已存在时覆盖原行"""
+        vectors = _l2_normalize(vectors)
+        if len(chunks) != len(vectors):
+            raise ValueError(f"分块数 {len(chunks)} 与向量数 {len(vectors)} 不一致")
+        with self._lock:
+            if self.dim is None:
+                self.dim = vectors.shape[1]
+                self._vectors = np.zeros((0, self.dim), dtype=np.float32)
+            elif vectors.shape[1] != self.dim:
+                raise ValueError(f"向量维度 {vectors.shape[1]} 与索引维度 {self.dim} 不一致")
+            self._reserve(len(chunks))
+            for chunk, vector in zip(chunks, vectors):
+                row = self._positions.get(chunk["id"])
+                old_content = None
+                if row is None:
+                    row = self._size
+                    self._size += 1
+                    self._positions[chunk["id"]] = row
+                    self._chunks.append(chunk)
+                else:
+                    old_content = self._chunks[row]["content"]
+                    self._chunks[row] = chunk
+                self._vectors[row] = vector
+                self._set_columns(row, chunk)
+                if self._bm25 is not None:
+                    self._bm25.set(row, chunk["content"], old_content)
+
+    def remove(self, chunk_ids: Iterable[str]) -> int:
+        """删除分块，末行移入空位保持矩阵紧凑；返回实际删除数"""
+        removed = 0
+        with self._lock:
+            for chunk_id in chunk_ids:
+                row = self._positions.pop(chunk_id, None)
+                if row is None:
+                    continue
+                self._reserve(0)   # memmap 加载的只读矩阵先复制到内存
+                last = self._size - 1
+                if self._bm25 is not None:
+                    self._bm25.remove(row, self._chunks[row]["content"])
+                if row != last:
+                    moved = self._chunks[last]
+                    self._vectors[row] = self._vectors[last]
+                    for name in _COLUMNS:
+                        column = getattr(self, name)
+                        column[row] = column[last]
+                    self._chunks[row] = moved
+                    self._positions[moved["id"]] = row
+                    if self._bm25 is not None:
+                        self._bm25.remove(last, moved["content"])
+                        self._bm25.set(row, moved["content"])
+                self._chunks.pop()
+                self._size -= 1
+                if self._bm25 is not None:
+                    self._bm25.truncate(self._size)
+                removed += 1
+        return removed
+
+    def _set_columns(self, row: int, chunk: Dict[str, Any]):
+        self._game_codes[row] = self._code(self._game_ids, chunk["game_id"])
+        self._type_codes[row] = self._code(self._chunk_types, chunk["chunk_type"])
+        fresh = compute_freshness_columns(chunk["chunk_type"], chunk["content"], chunk.get("metadata"))
+        self._level_codes[row] = fresh.level_code
+        self._deprecated[row] = fresh.deprecated
+        self._publish_ts[row] = fresh.publish_ts
+        self._version_major[row] = fresh.version_major
+        self._version_minor[row] = fresh.version_minor
+
+    def add_chunks(self, chunks: Iterable[Chunk], embedder, batch_size: int = DEFAULT_EMBED_BATCH_SIZE) -> int:
+        """按批编码并写入分块，跳过内容未变化的已有分块；返回新编码的分块数"""
+        pending: List[Dict[str, Any]] = []
+        embedded = 0
+        for chunk in chunks:
+            record = chunk.to_dict()
+            row = self._positions.get(record["id"])
+            if row is not None and self._chunks[row]["content"] == record["content"]:
+                continue
+            pending.append(record)
+            if len(pending) >= batch_size:
+                self.add(pending, embedder.embed([c["content"] for c in pending]))
+                embedded += len(pending)
+                pending = []
+        if pending:
+            self.add(pending, embedder.embed([c["content"] for c in pending]))
+            embedded += len(pending)
+        if embedded and not self.embedder_name:
+            self.embedder_name = embedder.name
+        return embedded
+
+    def _filter_mask(self, game_id: Optional[str], chunk_types: Optional[Iterable[str]]) -> Optional[np.ndarray]:
+        mask = None
+        if game_id:
+            code = self._game_ids.get(normalize_game_id(game_id))
+            if code is None:
+                return np.zeros(self._size, dtype=bool)
+            mask = self._game_codes[:self._size] == code
+        if chunk_types:
+            codes = [self._chunk_types[t] for t in (ChunkType(t).value for t in chunk_types) if t in self._chunk_types]
+            type_mask = np.isin(self._type_codes[:self._size], codes)
+            mask = type_mask if mask is None else mask & type_mask
+        return mask
+
+    def search(self, query_vector: np.ndarray, top_k: int = 5, *, game_id: Optional[str] = None,
+               chunk_types: Optional[Iterable[str]] = None, min_score: float = -1.0) -> List[VectorHit]:
+        """余弦相似度 top-k；game_id 接受 GuideService 与处理器两种写法"""
+        with self._lock:
+            if not self._size or top_k <= 0:
+                return []
+            query = _l2_normalize(np.asarray(query_vector, dtype=np.float32).reshape(-1))
+            matrix = self._vectors[:self._size]
+            mask = self._filter_mask(game_id, chunk_types)
+            if mask is None:
+                rows = None
+                scores = matrix @ query
+            else:
+                rows = np.flatnonzero(mask)
+                if not len(rows):
+                    return []
+                if len(rows) < self._size * SUBSET_SCAN_RATIO:
+                    scores = matrix[rows] @ query
+                else:
+                    scores = np.where(mask, matrix @ query, -np.inf)[rows]
+
+            k = min(top_k, len(scores))
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            hits = []
+            for i in top:
+                score = float(scores[i])
+                if score < min_score:
+                    break
+                row = int(rows[i]) if rows is not None else int(i)
+                hits.append(VectorHit(score=score, chunk=self._chunks[row]))
+            return hits
+
+    def search_text(self, query: str, embedder, top_k: int = 5, **filters) -> List[VectorHit]:
+        return self.search(embedder.embed([query])[0], top_k, **filters)
+
+    def _ensure_bm25(self) -> BM25Index:
+        if self._bm25 is None:
+            bm25 = BM25Index()
+            for row, chunk in enumerate(self._chunks):
+                bm25.set(row, chunk["content"])
+            self._bm25 = bm25
+        return self._bm25
+
+    def hybrid_search(self, query: str, embedder, top_k: int = 5, *, game_id: Optional[str] = None,
+                      chunk_types: Optional[Iterable[str]] = None, current_version: Optional[str] = None,
+                      now: Optional[float] = None, candidates: int = HYBRID_CANDIDATES,
+                      vector_weight: float = HYBRID_VECTOR_WEIGHT, min_score: float = 0.0) -> List[VectorHit]:
+        """向量与 BM25 各召回 candidates 个候选，按融合分 * 时效性权重重排"""
+        with self._lock:
+            if not self._size or top_k <= 0:
+                return []
+            query_vector = _l2_normalize(embedder.embed([query])[0])
+            vector_hits = self.search(query_vector, candidates, game_id=game_id, chunk_types=chunk_types)
+
+            bm25 = self._ensure_bm25().scores(query, self._size)
+            mask = self._filter_mask(game_id, chunk_types)
+            if mask is not None:
+                bm25 = np.where(mask, bm25, 0.0)
+            k = min(candidates, self._size)
+            lexical_rows = np.argpartition(-bm25, k - 1)[:k]
+            lexical_rows = lexical_rows[bm25[lexical_rows] > 0]
+
+            rows = np.union1d([self._positions[h.chunk["id"]] for h in vector_hits], lexical_rows).astype(np.intp)
+            if not len(rows):
+                return []
+            vector_scores = np.clip(self._vectors[rows] @ query_vector, 0.0, 1.0)
+            lexical_scores = bm25[rows]
+            peak = lexical_scores.max()
+            if peak > 0:
+                lexical_scores = lexical_scores / peak
+            weights = freshness_weights(
+                self._level_codes[rows], self._deprecated[rows], self._publish_ts[rows],
+                self._version_major[rows], self._version_minor[rows], current_version, now,
+            )
+            scores = (vector_weight * vector_scores + (1 - vector_weight) * lexical_scores) * weights
+
+            order = np.argsort(-scores, kind="stable")[:top_k]
+            return [
+                VectorHit(
+                    score=float(scores[i]), chunk=self._chunks[int(rows[i])],
+                    vector_score=float(vector_scores[i]), bm25_score=float(bm25[rows[i]]),
+                    freshness_weight=float(weights[i]),
+                )
+                for i in order if scores[i] >= min_score
+            ]
+
+    # ------------------------------------------------------------------
+    # 持久化
+    # ------------------------------------------------------------------
+
+    def save(self, directory: str | Path):
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        # 先写临时文件再 os.replace：已 memmap 旧 vectors.npy 的读者仍持有旧 inode，
+        # 原地截断会让它们访问越界（SIGBUS）；meta.json 最后替换，作为新版本就绪的标记
+        with self._lock:
+            with _atomic_output(directory / VECTORS_FILENAME, "wb") as f:
+                np.save(f, np.ascontiguousarray(self._vectors[:self._size]))
+            with _atomic_output(directory / COLUMNS_FILENAME, "wb") as f:
+                np.savez(f, **{
+                    name.lstrip("_"): getattr(self, name)[:self._size]
+                    for name in _COLUMNS if name not in ("_game_codes", "_type_codes")
+                })
+            with _atomic_output(directory / CHUNKS_FILENAME, "w") as f:
+                for chunk in self._chunks:
+                    f.write(json.dumps(chunk, ensure_ascii=False) + "\n")
+            meta = {"dim": self.dim, "embedder": self.embedder_name, "count": self._size}
+            with _atomic_output(directory / META_FILENAME, "w") as f:
+                f.write(json.dumps(meta, ensure_ascii=False))
+
+    @classmethod
+    def load(cls, directory: str | Path, mmap: bool = True) -> "VectorIndex":
+        directory = Path(directory)
+        meta = json.loads((directory / META_FILENAME).read_text(encoding="utf-8"))
+        index = cls(dim=meta.get("dim"), embedder_name=meta.get("embedder", ""))
+        vectors = np.load(directory / VECTORS_FILENAME, mmap_mode="r" if mmap else None)
+        with open(directory / CHUNKS_FILENAME, "r", encoding="utf-8") as f:
+            chunks = [json.loads(line) for line in f if line.strip()]
+        if len(chunks) != len(vectors):
+            raise ValueError(f"向量索引损坏：{len(chunks)} 个分块对应 {len(vectors)} 行向量")
+
+        index._vectors = vectors
+        index._size = len(chunks)
+        index._chunks = chunks
+        index._positions = {chunk["id"]: row for row, chunk in enumerate(chunks)}
+        index._game_codes = np.fromiter(
+            (index._code(index._game_ids, c["game_id"]) for c in chunks), dtype=np.int32, count=len(chunks))
+        index._type_codes = np.fromiter(
+            (index._code(index._chunk_types, c["chunk_type"]) for c in chunks), dtype=np.int32, count=len(chunks))
+
+        columns_path = directory / COLUMNS_FILENAME
+        if columns_path.exists():
+            with np.load(columns_path) as columns:
+                for name in _COLUMNS:
+                    key = name.lstrip("_")
+                    if key in columns.files:
+                        setattr(index, name, columns[key])
+        else:
+            # 旧版本索引没有时效性列，补算一次
+            for name, (dtype, empty) in _COLUMNS.items():
+                if name not in ("_game_codes", "_type_codes"):
+                    setattr(index, name, np.full(len(chunks), empty, dtype=dtype))
+            for row, chunk in enumerate(chunks):
+                index._set_columns(row, chunk)
+        return index
+
+
+@contextmanager
+def _atomic_output(path: Path, mode: str):
+    """写入同目录下的临时文件，成功后 os.replace 到目标路径"""
+    tmp_path = path.with_name(path.name + ".tmp")
+    try:
+        with open(tmp_path, mode, encoding=None if "b" in mode else "utf-8") as f:
+            yield f
+        os.replace(tmp_path, path)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+
+
+# ---------------------------------------------------------------------------
+# 构建与全局实例
+# ---------------------------------------------------------------------------
+
+def default_index_dir() -> Path:
+    from system.config import get_data_dir
+    return get_data_dir() / "guide_engine" / "vector_index"
+
+
+def iter_processor_chunks(processor: BaseProcessor, gamedata_dir: str | Path) -> Iterable[Chunk]:
+    """读取处理器声明的数据文件（缺失的跳过）并逐个产出分块"""
+    data: Dict[str, Any] = {}
+    for key, relative in processor.get_data_files().items():
+        path = Path(gamedata_dir) / relative
+        if not path.exists():
+            continue
+        with open(path, "r", encoding="utf-8") as f:
+            data[key] = json.load(f)
+    if not data:
+        return
+    for document in processor.process(data):
+        yield from document.chunks
+
+
+def default_processors() -> List[BaseProcessor]:
+    from .processors import (
+        ArknightsProcessor, GenshinProcessor, PGRProcessor, StarrailProcessor,
+        UmaMusumeProcessor, WutheringWavesProcessor, ZenlessProcessor,
+    )
+    return [ArknightsProcessor(), GenshinProcessor(), StarrailProcessor(), ZenlessProcessor(),
+            WutheringWavesProcessor(), PGRProcessor(), UmaMusumeProcessor()]
+
+
+def build_vector_index(gamedata_dir: str | Path, embedder=None, *, index: Optional[VectorIndex] = None,
+                       processors: Optional[Sequence[BaseProcessor]] = None,
+                       batch_size: int = DEFAULT_EMBED_BATCH_SIZE) -> VectorIndex:
+    """用全部（或指定）游戏处理器的分块全量构建索引（数据更新时用 ingest.IncrementalIngestor）"""
+    if processors is None:
+        processors = default_processors()
+    index = index or VectorIndex()
+    embedder = embedder or get_default_embedder(index.embedder_name or None)
+    for processor in processors:
+        added = index.add_chunks(iter_processor_chunks(processor, gamedata_dir), embedder, batch_size)
+        if added:
+            logger.info(f"[VectorIndex] {processor.game_id}: 编码 {added} 个分块")
+    return index
+
+
+_index: Optional[VectorIndex] = None
+_index_version: Optional[tuple] = None   # 已加载索引对应的 meta.json (inode, mtime_ns)
+_embedder = None
+_index_lock = threading.Lock()
+
+
+def get_vector_index() -> Optional[VectorIndex]:
+    """加载持久化的索引；尚未构建时返回 None
+
+    save() 最后替换 meta.json，每次调用按其 inode / mtime 判断索引是否被重建或增量
+    入库更新过，变化时重新加载；重新加载失败时继续使用旧实例。
+    """
+    global _index, _index_version, _embedder
+    with _index_lock:
+        directory = default_index_dir()
+        try:
+            stat = (directory / META_FILENAME).stat()
+        except OSError:
+            return _index
+        version = (stat.st_ino, stat.st_mtime_ns)
+        if _index is None or version != _index_version:
+            try:
+                index = VectorIndex.load(directory)
+                _embedder = get_default_embedder(index.embedder_name or None)
+                _index, _index_version = index, version
+                logger.info(f"[VectorIndex] 已加载 {len(_index)} 个分块（{_index.embedder_name}）")
+            except Exception as e:
+                logger.warning(f"[VectorIndex] 加载失败 {directory}: {e}")
+                _index_version = version   # 同一版本不重复尝试
+        return _index
+
+
+def get_index_embedder():
+    """与已加载索引匹配的嵌入模型"""
+    get_vector_index()
+    return _embedder
@@ -12,11 +12,14 @@ from __future__ import annotations
 
 import math
 import re
+import time
 from dataclasses import dataclass
 from datetime import datetime
 from enum import Enum
 from typing import Any
 
+import numpy as np
+
 
 class FreshnessLevel(str, Enum):
     """时效性级别"""
@@ -84,12 +87,25 @@ DEPRECATED_PATTERNS: list[str] = [
 ]
 
 
+# 每个级别的关键词合并为一条预编译正则，按 FRESHNESS_KEYWORDS 的顺序匹配
+_FRESHNESS_REGEXES: list[tuple[FreshnessLevel, re.Pattern[str]]] = [
+    (level, re.compile("|".join(f"(?:{p})" for p in patterns)))
+    for level, patterns in FRESHNESS_KEYWORDS.items()
+]
+_DEPRECATED_REGEX = re.compile("|".join(f"(?:{p})" for p in DEPRECATED_PATTERNS), re.IGNORECASE)
+
+# 列存储中的级别编码（下标即编码）
+FRESHNESS_LEVEL_CODES: list[FreshnessLevel] = list(FreshnessLevel)
+_HALF_LIFE_BY_CODE = np.array([HALF_LIFE_DAYS[level] for level in FRESHNESS_LEVEL_CODES], dtype=np.float64)
+DEFAULT_FRESHNESS_WEIGHT = 0.7     # 无发布日期
+DEPRECATED_FRESHNESS_WEIGHT = 0.1
+
+
 def _determine_freshness_level(content_type: str, content: str) -> FreshnessLevel:
     """确定内容的时效性级别"""
-    for level, patterns in FRESHNESS_KEYWORDS.items():
-        for pattern in patterns:
-            if re.search(pattern, content):
-                return level
+    for level, regex in _FRESHNESS_REGEXES:
+        if regex.search(content):
+            return level
     return CONTENT_TYPE_FRESHNESS.get(content_type, FreshnessLevel.SEASONAL)
 
 
@@ -153,10 +169,7 @@ def is_deprecated(content: str, metadata: dict[str, Any] | None = None) -> bool:
     """检查内容是否已过时"""
     if metadata and metadata.get("is_deprecated"):
         return True
-    for pattern in DEPRECATED_PATTERNS:
-        if re.search(pattern, content, re.IGNORECASE):
-            return True
-    return False
+    return bool(_DEPRECATED_REGEX.search(content))
 
 
 def apply_freshness_weight(
@@ -194,3 +207,85 @@ def apply_freshness_weight(
 
     adjusted.sort(key=lambda x: x["score"], reverse=True)
     return adjusted
+
+
+# ---------------------------------------------------------------------------
+# 列式预计算：入库时每个分块计算一次，检索时对候选数组做向量化加权
+# ---------------------------------------------------------------------------
+
+@dataclass(slots=True)
+class FreshnessColumns:
+    """单个分块的时效性列值"""
+    level_code: int
+    deprecated: bool
+    publish_ts: float      # 无发布日期时为 nan
+    version_major: int     # 无版本或无法解析时为 -1
+    version_minor: int     # 版本只有主版本号时为 -1
+
+
+def _parse_version(version: str | None) -> tuple[int, int]:
+    if not version:
+        return -1, -1
+    try:
+        parts = [int(x) for x in str(version).split(".")[:2]]
+    except ValueError:
+        return -1, -1
+    return parts[0], (parts[1] if len(parts) > 1 else -1)
+
+
+def compute_freshness_columns(
+    content_type: str,
+    content: str,
+    metadata: dict[str, Any] | None = None,
+) -> FreshnessColumns:
+    """提取 calculate_freshness_weight 依赖的全部内容侧信息（正则扫描只在这里发生）"""
+    metadata = metadata or {}
+    publish_ts = math.nan
+    date_str = metadata.get("publish_date")
+    if date_str:
+        try:
+            publish_ts = datetime.fromisoformat(date_str).timestamp()
+        except (ValueError, TypeError, OverflowError):
+            pass
+    major, minor = _parse_version(metadata.get("game_version"))
+    level = _determine_freshness_level(content_type, content)
+    return FreshnessColumns(
+        level_code=FRESHNESS_LEVEL_CODES.index(level),
+        deprecated=is_deprecated(content, metadata),
+        publish_ts=publish_ts,
+        version_major=major,
+        version_minor=minor,
+    )
+
+
+def freshness_weights(
+    level_codes: np.ndarray,
+    deprecated: np.ndarray,
+    publish_ts: np.ndarray,
+    version_major: np.ndarray,
+    version_minor: np.ndarray,
+    current_version: str | None = None,
+    now: float | None = None,
+) -> np.ndarray:
+    """calculate_freshness_weight 的向量化版本，输入为候选分块的列数组"""
+    now = time.time() if now is None else now
+    age_days = np.floor((now - publish_ts) / 86400.0)
+    with np.errstate(invalid="ignore"):
+        time_w = np.where(age_days <= 0, 1.0, np.exp2(-age_days / _HALF_LIFE_BY_CODE[level_codes]))
+
+    ver_w = np.ones(len(level_codes), dtype=np.float64)
+    cur_major, cur_minor = _parse_version(current_version)
+    if cur_major >= 0:
+        has_version = version_major >= 0
+        minor_diff = np.where(
+            (version_minor >= 0) & (cur_minor >= 0), np.abs(cur_minor - version_minor), 0)
+        distance = np.abs(cur_major - version_major) * 10 + minor_diff
+        ver_w = np.select(
+            [~has_version | (distance == 0), distance <= 2, distance <= 5, distance <= 10],
+            [1.0, 0.95, 0.8, 0.6],
+            default=0.4,
+        )
+
+    weights = np.clip(time_w * ver_w, 0.1, 1.0)
+    weights = np.where(np.isnan(publish_ts), DEFAULT_FRESHNESS_WEIGHT, weights)
+    return np.where(deprecated, DEPRECATED_FRESHNESS_WEIGHT, weights)
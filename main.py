@@ -152,8 +152,7 @@ class ServiceManager:
         """初始化后台服务 - 优化启动流程"""
         logger.info("正在启动后台服务...")
         try:
-            # 任务管理器由memory_manager自动启动，无需手动启动
-            # await start_task_manager()
+            # 任务管理器在 API 服务器启动时（GRAG 启用）于其事件循环中启动，此处不再启动
             
             # 标记服务就绪
             self._services_ready = True
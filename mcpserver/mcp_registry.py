@@ -105,6 +105,23 @@ def get_service_owner_agent_id(service_name: str) -> Optional[str]:
     return owner_agent_id or None
 
 
+def get_tool_cache_ttl(service_name: str, tool_name: str) -> float:
+    """读取 manifest 中的结果缓存配置，返回该工具的缓存秒数（0 表示不缓存）
+
+    manifest 示例：
+        "resultCache": {"enabled": true, "tools": {"today_weather": 600}}
+    仅只读、幂等的工具应开启。
+    """
+    manifest = MANIFEST_CACHE.get(service_name) or {}
+    cache_cfg = manifest.get("resultCache") or {}
+    if not isinstance(cache_cfg, dict) or not cache_cfg.get("enabled"):
+        return 0.0
+    try:
+        return float((cache_cfg.get("tools") or {}).get(tool_name, 0))
+    except (TypeError, ValueError):
+        return 0.0
+
+
 def is_service_visible_to_agent(service_name: str, agent_id: Optional[str] = None) -> bool:
     manifest = MANIFEST_CACHE.get(service_name)
     if not manifest:
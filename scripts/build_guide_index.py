@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+构建攻略 RAG 向量索引
+
+读取游戏数据目录（默认取攻略引擎配置的 gamedata_dir）中各处理器声明的数据文件，
+分块、编码后写入 <数据目录>/guide_engine/vector_index/，GuideService 的语义检索
+从这里加载索引。两种方式：
+  默认：全量重建
+  --incremental：IncrementalIngestor 对比入库清单，只重新处理变化的实体（数据更新后用）
+索引原子替换，后端运行中也可以直接执行，GuideService 下次检索时自动加载新索引。
+
+用法：
+    cd NagaAgent
+    python -X utf8 scripts/build_guide_index.py [--gamedata-dir ./data] [--index-dir DIR] [--game genshin ...] [--incremental] [--offline]
+"""
+
+import argparse
+import logging
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from guide_engine.models import get_guide_engine_settings  # noqa: E402
+from guide_engine.rag.ingest import MANIFEST_FILENAME, IncrementalIngestor, default_manifest_path  # noqa: E402
+from guide_engine.rag.vector_index import (  # noqa: E402
+    META_FILENAME,
+    HashingEmbedder,
+    VectorIndex,
+    build_vector_index,
+    default_index_dir,
+    default_processors,
+)
+
+
+def run_build(gamedata_dir: Path, index_dir: Path, games: list, incremental: bool, offline: bool):
+    processors = default_processors()
+    if games:
+        processors = [p for p in processors if p.game_id in games]
+        missing = set(games) - {p.game_id for p in processors}
+        if missing:
+            raise SystemExit(f"未知的游戏: {', '.join(sorted(missing))}")
+
+    embedder = HashingEmbedder() if offline else None
+    start = time.perf_counter()
+    if incremental:
+        index = VectorIndex.load(index_dir) if (index_dir / META_FILENAME).exists() else VectorIndex()
+        # 非默认索引目录使用各自的清单，避免与后端使用的索引互相干扰
+        manifest_path = None if index_dir == default_index_dir() else index_dir / MANIFEST_FILENAME
+        report = IncrementalIngestor(gamedata_dir, index, embedder=embedder, processors=processors,
+                                     manifest_path=manifest_path, index_dir=index_dir).run_sync()
+        print(f"✓ 增量入库：变化文件 {report.files_changed} 个，upsert {report.chunks_upserted:,} 个分块"
+              f"（编码 {report.chunks_embedded:,} 个），删除 {report.chunks_deleted:,} 个；"
+              f"索引共 {len(index):,} 个分块，耗时 {time.perf_counter() - start:.1f}s")
+        return
+
+    index = build_vector_index(gamedata_dir, embedder, processors=processors)
+    if not len(index):
+        raise SystemExit(f"{gamedata_dir} 下没有可用的游戏数据文件，索引未写入")
+    index.save(index_dir)
+    if index_dir == default_index_dir():
+        # 全量重建后增量清单已与索引不符，删除后下次增量入库重新比对（未变化的分块不会重新编码）
+        default_manifest_path().unlink(missing_ok=True)
+    print(f"✓ {len(index):,} 个分块（{index.embedder_name}）已写入 {index_dir}，"
+          f"耗时 {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="build guide RAG vector index")
+    parser.add_argument("--gamedata-dir", default=None, help="游戏数据目录（默认取攻略引擎配置）")
+    parser.add_argument("--index-dir", default=None, help="索引输出目录（默认 <数据目录>/guide_engine/vector_index）")
+    parser.add_argument("--game", action="append", default=[], help="只构建指定处理器的 game_id，可重复")
+    parser.add_argument("--incremental", action="store_true", help="按入库清单增量更新，不全量重建")
+    parser.add_argument("--offline", action="store_true", help="使用离线 HashingEmbedder，不调用嵌入接口")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    run_build(
+        Path(args.gamedata_dir or get_guide_engine_settings().gamedata_dir),
+        Path(args.index_dir) if args.index_dir else default_index_dir(),
+        args.game,
+        args.incremental,
+        args.offline,
+    )
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+DogTag 调度器基准测试
+
+注册若干个快速周期职责和一个耗时较长的周期职责（执行时间超过自身间隔），运行 --seconds 秒，
+对比两种调度方式：
+  1Hz 轮询：旧实现的主循环，每秒遍历所有周期职责并串行 await 执行
+  截止时间堆：DogTagScheduler，睡到最近的截止时间，到期职责并发执行、同一职责不重叠
+统计快速职责的实际执行间隔和慢职责执行次数，并校验慢职责没有重叠执行、快速职责没有被
+慢职责拖慢；另外测量只有一个 60s 职责时（空闲）主循环的唤醒次数。
+
+用法：
+    cd NagaAgent
+    python -X utf8 scripts/dogtag_scheduler_benchmark.py [--seconds 10] [--fast 5] [--slow-seconds 3.0]
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agentserver.dogtag.models import DogTag, DutyStatus, TriggerType  # noqa: E402
+from agentserver.dogtag.registry import DogTagRegistry  # noqa: E402
+from agentserver.dogtag.scheduler import DogTagScheduler  # noqa: E402
+
+FAST_INTERVAL = 1
+SLOW_INTERVAL = 2
+
+
+class Recorder:
+    def __init__(self):
+        self.starts: dict = {}
+        self.active: dict = {}
+        self.overlaps = 0
+
+    def executor(self, duty_id: str, seconds: float):
+        async def _run():
+            if self.active.get(duty_id):
+                self.overlaps += 1
+            self.active[duty_id] = True
+            self.starts.setdefault(duty_id, []).append(time.perf_counter())
+            try:
+                await asyncio.sleep(seconds)
+            finally:
+                self.active[duty_id] = False
+        return _run
+
+
+def build_registry(recorder: Recorder, fast: int, slow_seconds: float) -> DogTagRegistry:
+    registry = DogTagRegistry()
+    for i in range(fast):
+        registry.register(
+            DogTag(duty_id=f"fast-{i}", name=f"fast-{i}", description="", trigger_type=TriggerType.PERIODIC,
+                   interval_seconds=FAST_INTERVAL, status=DutyStatus.ENABLED),
+            recorder.executor(f"fast-{i}", 0.01),
+        )
+    registry.register(
+        DogTag(duty_id="slow", name="slow", description="", trigger_type=TriggerType.PERIODIC,
+               interval_seconds=SLOW_INTERVAL, status=DutyStatus.ENABLED),
+        recorder.executor("slow", slow_seconds),
+    )
+    return registry
+
+
+async def run_legacy(registry: DogTagRegistry, seconds: float) -> int:
+    """旧实现：1s tick，串行执行到期职责"""
+    scheduler = DogTagScheduler(registry)
+    wakeups = 0
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        wakeups += 1
+        for duty in registry.get_active_by_trigger(TriggerType.PERIODIC):
+            if scheduler._should_execute(duty):
+                elapsed = time.time() - scheduler._last_check_times.get(duty.duty_id, 0.0)
+                if elapsed >= (duty.interval_seconds or 30):
+                    scheduler._last_check_times[duty.duty_id] = time.time()
+                    await registry.get_executor(duty.duty_id)()
+        await asyncio.sleep(1)
+    return wakeups
+
+
+async def run_heap(registry: DogTagRegistry, seconds: float) -> int:
+    scheduler = DogTagScheduler(registry)
+    wakeups = 0
+    dispatch = scheduler._dispatch_due
+
+    def counted():
+        nonlocal wakeups
+        wakeups += 1
+        return dispatch()
+
+    scheduler._dispatch_due = counted
+    await scheduler.start()
+    await asyncio.sleep(seconds)
+    await scheduler.stop()
+    return wakeups
+
+
+def summarize(recorder: Recorder, fast: int) -> dict:
+    gaps = []
+    for i in range(fast):
+        starts = recorder.starts.get(f"fast-{i}", [])
+        gaps.extend(b - a for a, b in zip(starts, starts[1:]))
+    return {
+        "runs": sum(len(recorder.starts.get(f"fast-{i}", [])) for i in range(fast)),
+        "gap_p50": statistics.median(gaps) if gaps else float("nan"),
+        "gap_max": max(gaps) if gaps else float("nan"),
+        "slow_runs": len(recorder.starts.get("slow", [])),
+        "overlaps": recorder.overlaps,
+    }
+
+
+def run_benchmark(seconds: float, fast: int, slow_seconds: float):
+    results = {}
+    for label, runner in (("1Hz 轮询", run_legacy), ("截止时间堆", run_heap)):
+        recorder = Recorder()
+        asyncio.run(runner(build_registry(recorder, fast, slow_seconds), seconds))
+        results[label] = summarize(recorder, fast)
+
+        idle_registry = DogTagRegistry()
+        idle_registry.register(
+            DogTag(duty_id="idle", name="idle", description="", trigger_type=TriggerType.PERIODIC,
+                   interval_seconds=60, status=DutyStatus.ENABLED),
+            Recorder().executor("idle", 0.01),
+        )
+        results[label]["idle_wakeups"] = asyncio.run(runner(idle_registry, min(seconds, 5)))
+
+    heap = results["截止时间堆"]
+    assert heap["overlaps"] == 0, "同一职责出现重叠执行"
+    assert heap["gap_max"] < FAST_INTERVAL + 0.5, f"快速职责被拖慢: 最大间隔 {heap['gap_max']:.2f}s"
+
+    print("=" * 72)
+    print(f"  {fast} 个快速职责（间隔 {FAST_INTERVAL}s）+ 1 个慢职责（间隔 {SLOW_INTERVAL}s，"
+          f"每次耗时 {slow_seconds:.1f}s），运行 {seconds:.0f}s")
+    print(f"  {'方式':<12}{'快速职责执行次数':>16}{'间隔 p50':>10}{'间隔 max':>10}{'慢职责次数':>10}"
+          f"{f'空闲 {min(seconds, 5):.0f}s 唤醒':>14}")
+    for label, stats in results.items():
+        print(f"  {label:<12}{stats['runs']:>16}{stats['gap_p50']:>9.2f}s{stats['gap_max']:>9.2f}s"
+              f"{stats['slow_runs']:>10}{stats['idle_wakeups']:>14}")
+    print("✓ 慢职责没有拖慢其他职责，同一职责没有重叠执行")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="DogTag scheduler benchmark")
+    parser.add_argument("--seconds", type=float, default=10, help="每种方式的运行时长（秒）")
+    parser.add_argument("--fast", type=int, default=5, help="快速周期职责数")
+    parser.add_argument("--slow-seconds", type=float, default=3.0, help="慢职责每次执行耗时（秒）")
+    args = parser.parse_args()
+    run_benchmark(args.seconds, args.fast, args.slow_seconds)
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+攻略数据增量入库基准测试
+
+生成合成的原神角色数据文件，对比数据更新后的两种处理方式（HashingEmbedder，离线）：
+  全量重建：json.load 整个文件，全部实体重新分块、编码，写入新索引
+  增量入库：IncrementalIngestor 流式解析，只处理内容哈希变化的实体，
+            向量索引只 upsert / 删除受影响的分块
+并校验增量结果与全量重建的分块集合和向量一致。
+
+用法：
+    cd NagaAgent
+    python -X utf8 scripts/guide_ingest_benchmark.py [--entities 20000] [--changed 1.0]
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np  # noqa: E402
+
+from guide_engine.rag.ingest import IncrementalIngestor  # noqa: E402
+from guide_engine.rag.processors import GenshinProcessor  # noqa: E402
+from guide_engine.rag.vector_index import HashingEmbedder, VectorIndex, build_vector_index  # noqa: E402
+
+ELEMENTS = ["火", "水", "风", "雷", "草", "冰", "岩"]
+MATERIALS = ["摩拉", "燃愿玛瑙", "小灯草", "史莱姆凝液", "英雄的名刀", "霜夜的灵髓"]
+
+
+def make_character(i: int, rng: random.Random, revision: int = 0) -> dict:
+    return {
+        "id": f"char_{i}",
+        "name": f"角色{i}",
+        "rarity": rng.choice([4, 5]),
+        "elementText": rng.choice(ELEMENTS),
+        "weaponText": rng.choice(["单手剑", "双手剑", "长柄武器", "法器", "弓"]),
+        "title": f"称号{i}" + (f"（第{revision}次调整）" if revision else ""),
+        "region": rng.choice(["蒙德", "璃月", "稻妻", "须弥", "枫丹"]),
+        "affiliation": f"组织{i % 50}",
+        "costs": {
+            f"ascend{stage}": [{"name": rng.choice(MATERIALS), "count": rng.randint(1, 20) + revision}
+                               for _ in range(3)]
+            for stage in range(1, 7)
+        },
+    }
+
+
+def run_benchmark(entities: int, changed_percent: float):
+    rng = random.Random(5)
+    embedder = HashingEmbedder()
+    processor = GenshinProcessor()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        data_file = tmp / "data" / "genshin" / "global" / "characters.json"
+        data_file.parent.mkdir(parents=True)
+        characters = [make_character(i, random.Random(i)) for i in range(entities)]
+        data_file.write_text(json.dumps(characters, ensure_ascii=False), encoding="utf-8")
+
+        index = VectorIndex()
+        ingestor = IncrementalIngestor(tmp / "data", index, embedder=embedder, processors=[processor],
+                                       manifest_path=tmp / "manifest.json", index_dir=tmp / "index")
+        start = time.perf_counter()
+        first = ingestor.run_sync()
+        initial_elapsed = time.perf_counter() - start
+
+        # 数据更新：修改一部分实体，删除 / 新增少量实体
+        n_changed = max(1, int(entities * changed_percent / 100))
+        for i in rng.sample(range(entities), n_changed):
+            characters[i] = make_character(i, random.Random(i), revision=1)
+        removed = characters.pop(rng.randrange(len(characters)))
+        characters.append(make_character(entities, random.Random(entities)))
+        data_file.write_text(json.dumps(characters, ensure_ascii=False), encoding="utf-8")
+
+        start = time.perf_counter()
+        full = build_vector_index(tmp / "data", embedder, processors=[processor])
+        full.save(tmp / "full_index")
+        full_elapsed = time.perf_counter() - start
+
+        ingestor = IncrementalIngestor(tmp / "data", VectorIndex.load(tmp / "index"), embedder=embedder,
+                                       processors=[processor], manifest_path=tmp / "manifest.json",
+                                       index_dir=tmp / "index")
+        start = time.perf_counter()
+        patch = ingestor.run_sync()
+        incremental_elapsed = time.perf_counter() - start
+
+        patched = ingestor.index
+        assert sorted(c["id"] for c in patched._chunks) == sorted(c["id"] for c in full._chunks), "分块集合不一致"
+        for chunk in full._chunks:
+            assert np.allclose(patched._vectors[patched._positions[chunk["id"]]],
+                               full._vectors[full._positions[chunk["id"]]]), "向量不一致"
+        assert not any(c["entity_id"] == removed["id"] for c in patched._chunks), "删除的实体仍有分块"
+
+    print("=" * 72)
+    print(f"  实体数 {entities:,}，分块数 {len(full):,}；本次更新修改 {n_changed} 个实体，删除 1 个，新增 1 个")
+    print(f"  首次入库（空清单）      {initial_elapsed:>8.2f}s   编码 {first.chunks_embedded:,} 个分块")
+    print(f"  全量重建                {full_elapsed:>8.2f}s   编码 {len(full):,} 个分块")
+    print(f"  增量入库                {incremental_elapsed:>8.2f}s   编码 {patch.chunks_embedded:,} 个分块，"
+          f"删除 {patch.chunks_deleted:,} 个")
+    print(f"  加速比                  {full_elapsed / incremental_elapsed:>8.1f}x")
+    print("✓ 增量入库结果与全量重建一致")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="guide_engine incremental ingest benchmark")
+    parser.add_argument("--entities", type=int, default=20000, help="合成的角色数")
+    parser.add_argument("--changed", type=float, default=1.0, help="修改的实体百分比")
+    args = parser.parse_args()
+    run_benchmark(args.entities, args.changed)
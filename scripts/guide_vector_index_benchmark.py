@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+攻略分块向量索引基准测试
+
+对 guide_engine.rag.vector_index.VectorIndex 做离线测量（HashingEmbedder，无需嵌入接口）：
+  入库：按批编码合成分块并写入矩阵
+  检索：无过滤 / game_id 过滤 / game_id + chunk_type 过滤三种情况下的单次查询延迟
+  持久化：save 后以 memmap 重新加载，检索结果与内存索引一致
+  混合检索：hybrid_search（BM25 + 向量 + 时效性列）的单次查询延迟；
+            并对比候选重排的两种方式：逐条 calculate_freshness_weight + is_deprecated（正则扫描）
+            与列式 freshness_weights
+同时用全量排序校验 top-k 结果，并校验两种时效性权重一致。
+
+用法：
+    cd NagaAgent
+    python -X utf8 scripts/guide_vector_index_benchmark.py [--sizes 10000 100000] [--queries 200] [--dim 256]
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np  # noqa: E402
+
+from guide_engine.rag.base import Chunk, ChunkType  # noqa: E402
+from guide_engine.rag_utils import calculate_freshness_weight, freshness_weights, is_deprecated  # noqa: E402
+from guide_engine.rag.vector_index import HashingEmbedder, VectorIndex  # noqa: E402
+
+GAMES = ["arknights", "genshin", "starrail", "zenless", "wutheringwaves", "pgr", "umamusume"]
+WORDS = ["技能", "天赋", "模组", "攻击力", "防御", "治疗", "护盾", "暴击", "元素", "充能",
+         "专精", "精英化", "潜能", "配队", "输出", "生存", "控制", "位移", "召唤", "回复",
+         "活动", "限时", "已过时", "攻略", "打法"]
+VERSIONS = [None, "1.0", "1.6", "2.0", "2.3", "3.1"]
+
+
+def make_chunks(size: int, seed: int = 7) -> list:
+    rng = random.Random(seed)
+    chunk_types = list(ChunkType)
+    chunks = []
+    for i in range(size):
+        name = f"角色{i % 5000}"
+        content = f"{name} " + "".join(rng.choice(WORDS) for _ in range(12))
+        metadata = {"game_version": rng.choice(VERSIONS)}
+        if rng.random() < 0.8:
+            metadata["publish_date"] = (datetime(2026, 6, 1) - timedelta(days=rng.randint(0, 900))).isoformat()
+        chunks.append(Chunk(
+            id=f"chunk_{i}", game_id=GAMES[i % len(GAMES)], entity_type="character",
+            entity_id=str(i % 5000), entity_name=name,
+            chunk_type=chunk_types[i % len(chunk_types)], content=content, metadata=metadata,
+        ))
+    return chunks
+
+
+def brute_force(index: VectorIndex, query: np.ndarray, k: int, game_id=None, chunk_type=None) -> list:
+    matrix = np.asarray(index._vectors[:len(index)])
+    scores = matrix @ query
+    rows = [r for r in np.argsort(-scores, kind="stable")
+            if (game_id is None or index._chunks[r]["game_id"] == game_id)
+            and (chunk_type is None or index._chunks[r]["chunk_type"] == chunk_type)]
+    return [index._chunks[r]["id"] for r in rows[:k]]
+
+
+def measure(index: VectorIndex, queries: np.ndarray, k: int, **filters) -> tuple:
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        index.search(query, k, **filters)
+        latencies.append((time.perf_counter() - start) * 1000)
+    latencies.sort()
+    return statistics.median(latencies), latencies[int(len(latencies) * 0.95) - 1]
+
+
+def same_top_k(hits, expected_ids, query, index) -> bool:
+    """并列分数的行顺序可能不同，比较分数序列与 id 集合"""
+    got = [hit.chunk["id"] for hit in hits]
+    if got == expected_ids:
+        return True
+    matrix = np.asarray(index._vectors[:len(index)])
+    got_scores = [float(matrix[index._positions[i]] @ query) for i in got]
+    exp_scores = [float(matrix[index._positions[i]] @ query) for i in expected_ids]
+    return np.allclose(got_scores, exp_scores, atol=1e-6)
+
+
+def measure_hybrid(index: VectorIndex, embedder, texts: list, k: int) -> tuple:
+    latencies = []
+    for text in texts:
+        start = time.perf_counter()
+        index.hybrid_search(text, embedder, k, game_id="genshin")
+        latencies.append((time.perf_counter() - start) * 1000)
+    latencies.sort()
+    return statistics.median(latencies), latencies[int(len(latencies) * 0.95) - 1]
+
+
+def legacy_weight(chunk: dict, current_version: str) -> float:
+    metadata = chunk["metadata"]
+    publish_date = datetime.fromisoformat(metadata["publish_date"]) if metadata.get("publish_date") else None
+    return calculate_freshness_weight(
+        publish_date=publish_date,
+        content_type=chunk["chunk_type"],
+        content=chunk["content"],
+        game_version=metadata.get("game_version"),
+        current_version=current_version,
+        is_deprecated=is_deprecated(chunk["content"], metadata),
+    )
+
+
+def compare_rerank(index: VectorIndex, rounds: int, candidates: int = 100) -> tuple:
+    """同一批候选：逐条正则重算时效性 vs 读取预计算列做向量化计算"""
+    rng = np.random.default_rng(3)
+    now = time.time()
+    legacy_total = column_total = 0.0
+    for _ in range(rounds):
+        rows = rng.choice(len(index), size=candidates, replace=False)
+        start = time.perf_counter()
+        legacy = [legacy_weight(index._chunks[r], "2.3") for r in rows]
+        legacy_total += time.perf_counter() - start
+
+        start = time.perf_counter()
+        weights = freshness_weights(
+            index._level_codes[rows], index._deprecated[rows], index._publish_ts[rows],
+            index._version_major[rows], index._version_minor[rows], "2.3", now)
+        column_total += time.perf_counter() - start
+
+        assert np.allclose(weights, legacy), "时效性权重不一致"
+    return legacy_total / rounds * 1000, column_total / rounds * 1000
+
+
+def run_benchmark(sizes: list[int], num_queries: int, dim: int, top_k: int):
+    embedder = HashingEmbedder(dim)
+    rng = random.Random(11)
+    query_texts = ["".join(rng.choice(WORDS) for _ in range(4)) for _ in range(num_queries)]
+    queries = embedder.embed(query_texts)
+
+    print("=" * 102)
+    print(f"  {'分块数':>8}{'入库':>10}{'无过滤 p50/p95':>20}{'game_id':>18}{'game+type':>18}{'hybrid':>18}")
+    for size in sizes:
+        chunks = make_chunks(size)
+        index = VectorIndex()
+        start = time.perf_counter()
+        index.add_chunks(chunks, embedder)
+        ingest = time.perf_counter() - start
+
+        plain = measure(index, queries, top_k)
+        by_game = measure(index, queries, top_k, game_id="genshin-impact")
+        by_type = measure(index, queries, top_k, game_id="genshin", chunk_types=["skill"])
+        index.hybrid_search(query_texts[0], embedder, top_k)   # 构建 BM25 倒排
+        hybrid = measure_hybrid(index, embedder, query_texts, top_k)
+        legacy_ms, column_ms = compare_rerank(index, 50)
+
+        for query in queries[:20]:
+            assert same_top_k(index.search(query, top_k), brute_force(index, query, top_k), query, index)
+            assert same_top_k(index.search(query, top_k, game_id="genshin", chunk_types=["skill"]),
+                              brute_force(index, query, top_k, "genshin", "skill"), query, index)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            index.save(tmp)
+            loaded = VectorIndex.load(tmp)
+            for query in queries[:20]:
+                assert [h.chunk["id"] for h in loaded.search(query, top_k, game_id="starrail")] == \
+                       [h.chunk["id"] for h in index.search(query, top_k, game_id="starrail")]
+            mmap_plain = measure(loaded, queries, top_k)
+            del loaded
+
+        print(f"  {size:>8,}{ingest:>9.2f}s"
+              f"{plain[0]:>11.2f}/{plain[1]:.2f}ms{by_game[0]:>10.2f}/{by_game[1]:.2f}ms"
+              f"{by_type[0]:>10.2f}/{by_type[1]:.2f}ms{hybrid[0]:>10.2f}/{hybrid[1]:.2f}ms")
+        print(f"  {'':>8}{'memmap 加载后无过滤':>22} {mmap_plain[0]:.2f}/{mmap_plain[1]:.2f}ms")
+        print(f"  {'':>8}{'100 个候选时效性重排':>22} 逐条正则 {legacy_ms:.3f}ms / 列式 {column_ms:.3f}ms"
+              f"（{legacy_ms / column_ms:.0f}x）")
+    print("✓ top-k 与全量排序一致，memmap 加载结果与内存索引一致，两种时效性权重一致")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="guide_engine vector index benchmark")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000], help="分块数")
+    parser.add_argument("--queries", type=int, default=200, help="每种情况的查询次数")
+    parser.add_argument("--dim", type=int, default=256, help="HashingEmbedder 维度")
+    parser.add_argument("--top-k", type=int, default=5, help="每次返回的分块数")
+    args = parser.parse_args()
+    run_benchmark(args.sizes, args.queries, args.dim, args.top_k)
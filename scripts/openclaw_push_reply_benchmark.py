@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+OpenClaw 回复投递基准测试（本地模拟 Gateway）
+
+在本机启动一个最小的模拟 OpenClaw Gateway（FastAPI + uvicorn）：
+  WebSocket：connect.challenge / connect 握手，运行结束时推送 agent lifecycle end 与 chat final 事件
+  POST /hooks/agent：返回 202 + runId，后台模拟一次耗时 --run-seconds 的运行，写入若干条 assistant 消息
+  POST /tools/invoke：sessions_history，返回最近 limit 条消息，并统计请求次数与传输的消息条数
+对同一会话连续发送 --tasks 条消息，比较三种等待方式：
+  事件推送：订阅 Gateway 事件，运行结束后增量拉取一次
+  增量轮询：关闭事件订阅（reply_via_events=False），按游标增量轮询直到消息稳定
+  连接中断：运行中途 Gateway 断开 WebSocket，回退到增量轮询
+并校验每个任务拿到的回复恰好是本次运行新增的 assistant 消息。
+
+用法：
+    cd NagaAgent
+    python -X utf8 scripts/openclaw_push_reply_benchmark.py [--tasks 3] [--run-seconds 2.0] [--history 200]
+"""
+
+import argparse
+import asyncio
+import os
+import socket
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from pathlib import Path
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import uvicorn  # noqa: E402
+from fastapi import FastAPI, Request, WebSocket, WebSocketDisconnect  # noqa: E402
+from fastapi.responses import JSONResponse  # noqa: E402
+
+from agentserver.openclaw.openclaw_client import OpenClawClient, OpenClawConfig  # noqa: E402
+
+REPLIES_PER_RUN = 3
+
+
+class MockGateway:
+    """单会话的模拟 Gateway，run 结束时间记录在 run_ended 中"""
+
+    def __init__(self, run_seconds: float, history: int):
+        self.run_seconds = run_seconds
+        self.messages: dict = {}
+        self.sockets: set = set()
+        self.run_ended: dict = {}
+        self.expected: dict = {}
+        self.history_requests = 0
+        self.history_messages_sent = 0
+        self.drop_socket_mid_run = False
+        self._history = history
+        self.app = self._build_app()
+
+    def seed(self, session_key: str):
+        self.messages[session_key] = [
+            {"id": f"old-{i}", "role": "assistant" if i % 2 else "user", "timestamp": 1_700_000_000_000 + i,
+             "content": [{"type": "text", "text": f"旧消息 {i}"}]}
+            for i in range(self._history)
+        ]
+
+    def _append(self, session_key: str, role: str, text: str):
+        self.messages.setdefault(session_key, []).append({
+            "id": uuid.uuid4().hex, "role": role, "timestamp": int(time.time() * 1000),
+            "content": [{"type": "text", "text": text}],
+        })
+
+    async def _broadcast(self, event: str, payload: dict):
+        for ws in list(self.sockets):
+            try:
+                await ws.send_json({"type": "event", "event": event, "payload": payload})
+            except Exception:
+                self.sockets.discard(ws)
+
+    async def _run(self, session_key: str, run_id: str, message: str):
+        self._append(session_key, "user", message)
+        await self._broadcast("agent", {"runId": run_id, "stream": "lifecycle", "data": {"phase": "start"}})
+        replies = [f"{message} -> 第{i + 1}段回复" for i in range(REPLIES_PER_RUN)]
+        self.expected[run_id] = replies
+        for i, text in enumerate(replies):
+            await asyncio.sleep(self.run_seconds / REPLIES_PER_RUN)
+            if self.drop_socket_mid_run and i == 0:
+                for ws in list(self.sockets):
+                    await ws.close()
+                self.sockets.clear()
+            self._append(session_key, "assistant", text)
+        self.run_ended[run_id] = time.perf_counter()
+        await self._broadcast("agent", {"runId": run_id, "stream": "lifecycle", "data": {"phase": "end"}})
+        await self._broadcast("chat", {
+            "runId": run_id, "sessionKey": f"agent:main:{session_key}", "state": "final",
+            "message": {"role": "assistant", "content": [{"type": "text", "text": replies[-1]}]},
+        })
+
+    def _build_app(self) -> FastAPI:
+        app = FastAPI()
+
+        @app.websocket("/")
+        async def gateway_ws(ws: WebSocket):
+            await ws.accept()
+            await ws.send_json({"type": "event", "event": "connect.challenge", "payload": {"nonce": "n"}})
+            req = await ws.receive_json()
+            await ws.send_json({"type": "res", "id": req["id"], "ok": True, "payload": {"type": "hello-ok"}})
+            self.sockets.add(ws)
+            try:
+                while True:
+                    await ws.receive_text()
+            except (WebSocketDisconnect, RuntimeError):
+                self.sockets.discard(ws)
+
+        @app.post("/hooks/agent")
+        async def hooks_agent(request: Request):
+            body = await request.json()
+            run_id = uuid.uuid4().hex
+            asyncio.create_task(self._run(body["sessionKey"], run_id, body["message"]))
+            return JSONResponse(status_code=202, content={"status": "accepted", "runId": run_id})
+
+        @app.post("/tools/invoke")
+        async def tools_invoke(request: Request):
+            body = await request.json()
+            args = body.get("args") or {}
+            messages = self.messages.get(args.get("sessionKey"), [])[-int(args.get("limit") or 50):]
+            self.history_requests += 1
+            self.history_messages_sent += len(messages)
+            return {"ok": True, "result": {"details": {"messages": messages}}}
+
+        return app
+
+
+def start_server(app: FastAPI) -> tuple:
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="error"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    return server, thread, port
+
+
+async def run_scenario(gateway: MockGateway, port: int, tasks: int, via_events: bool, drop: bool,
+                       session_file: Path) -> dict:
+    session_key = f"naga:{uuid.uuid4().hex[:12]}"
+    gateway.seed(session_key)
+    gateway.drop_socket_mid_run = drop
+    gateway.history_requests = gateway.history_messages_sent = 0
+
+    client = OpenClawClient(OpenClawConfig(gateway_url=f"http://127.0.0.1:{port}", reply_via_events=via_events))
+    client._SESSION_FILE = session_file
+    latencies = []
+    try:
+        for i in range(tasks):
+            task = await client.send_message(f"任务{i}", session_key=session_key, timeout_seconds=60)
+            done = time.perf_counter()
+            assert task.result and task.result.get("replies") == gateway.expected[task.run_id], \
+                f"回复不一致: {task.result}"
+            latencies.append(done - gateway.run_ended[task.run_id])
+    finally:
+        await client.close()
+    return {
+        "latency": statistics.median(latencies),
+        "requests": gateway.history_requests / tasks,
+        "messages": gateway.history_messages_sent / tasks,
+    }
+
+
+def run_benchmark(tasks: int, run_seconds: float, history: int):
+    gateway = MockGateway(run_seconds, history)
+    server, thread, port = start_server(gateway.app)
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            session_file = Path(tmp) / "openclaw_session.json"
+            push = asyncio.run(run_scenario(gateway, port, tasks, True, False, session_file))
+            poll = asyncio.run(run_scenario(gateway, port, tasks, False, False, session_file))
+            dropped = asyncio.run(run_scenario(gateway, port, tasks, True, True, session_file))
+    finally:
+        server.should_exit = True
+        thread.join(timeout=5)
+
+    print("=" * 72)
+    print(f"  每次运行 {run_seconds:.1f}s、{REPLIES_PER_RUN} 条回复；会话已有 {history} 条历史；每种方式 {tasks} 个任务")
+    print(f"  {'方式':<14}{'运行结束→拿到回复 p50':>24}{'history 请求/任务':>20}{'传输消息/任务':>16}")
+    for label, stats in (("事件推送", push), ("增量轮询", poll), ("连接中断回退", dropped)):
+        print(f"  {label:<14}{stats['latency'] * 1000:>21.0f}ms{stats['requests']:>20.1f}{stats['messages']:>16.1f}")
+    print("✓ 三种方式都只返回本次运行新增的 assistant 消息")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="OpenClaw push reply benchmark")
+    parser.add_argument("--tasks", type=int, default=3, help="每种方式连续发送的任务数")
+    parser.add_argument("--run-seconds", type=float, default=2.0, help="模拟运行时长（秒）")
+    parser.add_argument("--history", type=int, default=200, help="会话中已有的历史消息条数")
+    args = parser.parse_args()
+    run_benchmark(args.tasks, args.run_seconds, args.history)
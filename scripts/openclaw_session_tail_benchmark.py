@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+OpenClaw 本地会话 transcript 增量读取基准测试
+
+在临时目录中构造 OpenClaw 状态目录（sessions.json + 会话 JSONL + 若干其他会话文件），
+模拟长时间运行的干员：每轮向会话文件追加几行，然后读取历史，对比两种方式：
+  全量重读：read_text().splitlines() 逐行 json.loads，再 _normalize_history_messages
+  增量读取：OpenClawClient._read_local_session_messages / _read_local_session_transcript
+            （JsonlTail 只解析新追加的行，归并结果缓存）
+并校验两种方式结果一致；最后用新文件替换会话文件（inode 变化），校验增量读取会整体重读。
+
+用法：
+    cd NagaAgent
+    python -X utf8 scripts/openclaw_session_tail_benchmark.py [--lines 20000] [--rounds 50] [--append 5]
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agentserver.openclaw.openclaw_client import OpenClawClient  # noqa: E402
+
+SESSION_KEY = "naga:benchmark"
+OTHER_FILES = 20
+
+
+def make_entry(i: int, rng: random.Random) -> dict:
+    kind = i % 4
+    base = {"type": "message", "id": f"e{i}", "parentId": f"e{i - 1}" if i else None,
+            "timestamp": f"2026-10-01T{(i // 3600) % 24:02d}:{(i // 60) % 60:02d}:{i % 60:02d}.{i % 1000:03d}Z"}
+    if kind == 0:
+        base["message"] = {"role": "user", "content": f"第{i}条指令：" + "检查进度" * rng.randint(5, 30)}
+    elif kind == 1:
+        base["message"] = {"role": "assistant", "content": [
+            {"type": "text", "text": "正在处理" * rng.randint(5, 40)},
+            {"type": "tool_use", "id": f"call{i}", "name": "browser", "input": {"url": f"https://example.com/{i}"}},
+        ], "usage": {"input": rng.randint(100, 5000), "output": rng.randint(10, 500)}}
+    elif kind == 2:
+        base["message"] = {"role": "toolResult", "toolName": "browser", "toolCallId": f"call{i - 1}",
+                           "content": [{"type": "text", "text": "页面内容" * rng.randint(20, 100)}]}
+    else:
+        base["message"] = {"role": "assistant", "content": [{"type": "text", "text": "完成" * rng.randint(5, 20)}]}
+    return base
+
+
+def write_lines(path: Path, entries: list, mode: str = "a"):
+    with open(path, mode, encoding="utf-8") as f:
+        for entry in entries:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+
+def legacy_messages(session_file: Path) -> list:
+    raw_messages = []
+    for line in session_file.read_text(encoding="utf-8").splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        entry = json.loads(line)
+        if entry.get("type") == "message" and isinstance(entry.get("message"), dict):
+            raw_messages.append(entry)
+    return OpenClawClient._normalize_history_messages(raw_messages)
+
+
+def legacy_transcript(sessions_dir: Path, session_file: Path) -> list:
+    candidate_keys = [SESSION_KEY, f"agent:main:{SESSION_KEY}"]
+    candidate_files = [session_file]
+    for path in sessions_dir.glob("*.jsonl"):
+        if path not in candidate_files and any(key in path.read_text(encoding="utf-8") for key in candidate_keys):
+            candidate_files.append(path)
+    entries = []
+    for path in candidate_files:
+        seen = set()
+        for line_no, line in enumerate(path.read_text(encoding="utf-8").splitlines(), start=1):
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            key = str(entry.get("id") or "").strip() or str(line_no)
+            if key in seen:
+                continue
+            seen.add(key)
+            entries.append({"entryType": entry.get("type"), "id": entry.get("id"), "parentId": entry.get("parentId"),
+                            "timestamp": entry.get("timestamp"), "sourceFile": path.name,
+                            "message": entry.get("message"), "raw": entry})
+    entries.sort(key=lambda item: (str(item.get("timestamp") or ""), str(item.get("sourceFile") or "")))
+    return entries
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, (time.perf_counter() - start) * 1000
+
+
+def run_benchmark(lines: int, rounds: int, append: int):
+    rng = random.Random(3)
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        sessions_dir = root / "state" / "agents" / "main" / "sessions"
+        sessions_dir.mkdir(parents=True)
+        session_file = sessions_dir / "s-main.jsonl"
+        (sessions_dir / "sessions.json").write_text(json.dumps({
+            f"agent:main:{SESSION_KEY}": {"sessionId": "s-main", "sessionFile": str(session_file)},
+        }), encoding="utf-8")
+        write_lines(session_file, [make_entry(i, rng) for i in range(lines)], "w")
+        for n in range(OTHER_FILES):
+            write_lines(sessions_dir / f"other-{n}.jsonl", [make_entry(i, rng) for i in range(lines // OTHER_FILES)], "w")
+
+        client = OpenClawClient()
+        client._SESSION_FILE = root / "openclaw_session.json"
+
+        _, cold_messages_ms = timed(client._read_local_session_messages, SESSION_KEY)
+        _, cold_transcript_ms = timed(client._read_local_session_transcript, SESSION_KEY)
+
+        legacy_ms, tail_ms, legacy_tr_ms, tail_tr_ms = [], [], [], []
+        next_id = lines
+        for _ in range(rounds):
+            write_lines(session_file, [make_entry(next_id + k, rng) for k in range(append)])
+            next_id += append
+            expected, ms = timed(legacy_messages, session_file)
+            legacy_ms.append(ms)
+            got, ms = timed(client._read_local_session_messages, SESSION_KEY)
+            tail_ms.append(ms)
+            assert got == expected, "增量读取的会话历史与全量重读不一致"
+
+            expected, ms = timed(legacy_transcript, sessions_dir, session_file)
+            legacy_tr_ms.append(ms)
+            got, ms = timed(client._read_local_session_transcript, SESSION_KEY)
+            tail_tr_ms.append(ms)
+            assert got == expected, "增量读取的 transcript 与全量重读不一致"
+
+        # 会话被重写（新 inode，行数变少）
+        replacement = session_file.with_suffix(".tmp")
+        write_lines(replacement, [make_entry(i, rng) for i in range(lines // 2)], "w")
+        os.replace(replacement, session_file)
+        assert client._read_local_session_messages(SESSION_KEY) == legacy_messages(session_file), "文件替换后未重读"
+        assert client._read_local_session_transcript(SESSION_KEY) == legacy_transcript(sessions_dir, session_file)
+        file_mb = sum(p.stat().st_size for p in sessions_dir.glob("*.jsonl")) / 1e6
+
+    print("=" * 72)
+    print(f"  会话 {lines:,} 行（另有 {OTHER_FILES} 个会话文件，共 {file_mb:.1f}MB）；{rounds} 轮，每轮追加 {append} 行")
+    print(f"  首次读取            messages {cold_messages_ms:>8.1f}ms   transcript {cold_transcript_ms:>8.1f}ms")
+    print(f"  {'每轮 p50':<16}{'全量重读':>12}{'增量读取':>12}{'加速比':>10}")
+    for label, legacy, tail in (("messages", legacy_ms, tail_ms), ("transcript", legacy_tr_ms, tail_tr_ms)):
+        legacy_p50, tail_p50 = statistics.median(legacy), statistics.median(tail)
+        print(f"  {label:<16}{legacy_p50:>10.1f}ms{tail_p50:>10.2f}ms{legacy_p50 / tail_p50:>9.0f}x")
+    print("✓ 增量读取与全量重读结果一致，文件替换后会整体重读")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="OpenClaw session transcript tail benchmark")
+    parser.add_argument("--lines", type=int, default=20000, help="会话文件的初始行数")
+    parser.add_argument("--rounds", type=int, default=50, help="追加 + 读取的轮数")
+    parser.add_argument("--append", type=int, default=5, help="每轮追加的行数")
+    args = parser.parse_args()
+    run_benchmark(args.lines, args.rounds, args.append)
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+五元组写入 Neo4j 基准测试
+
+对比 summer_memory.quintuple_graph 的两种写图方式：
+  旧方案：逐条写入，每个五元组 head 节点 / tail 节点 / 关系各一次 merge 往返
+  新方案：按批次在一个事务中提交，同一关系类型合并为一条 UNWIND ... MERGE 语句
+
+使用本地 Neo4j 替身（内存图 + 每次往返固定延迟）模拟数据库，不依赖真实 Neo4j 服务；
+同时校验两种方式写出的节点与关系完全一致。
+
+用法：
+    cd NagaAgent
+    python -X utf8 scripts/quintuple_write_benchmark.py [--sizes 1000 10000] [--rtt-ms 0.3]
+"""
+
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from summer_memory.quintuple_graph import _write_quintuples_to_graph  # noqa: E402
+
+
+# ---------------------------------------------------------------------------
+# Neo4j 替身
+# ---------------------------------------------------------------------------
+
+class _Node:
+    def __init__(self, labels, **props):
+        self.labels = labels
+        self.props = props
+
+
+class _Relationship:
+    def __init__(self, head, rel_type, tail, **props):
+        self.head = head
+        self.rel_type = rel_type
+        self.tail = tail
+        self.props = props
+
+
+class StandInGraph:
+    """内存图：每次 merge / 事务语句 / 提交都计为一次网络往返并休眠 rtt 秒"""
+
+    _REL_RE = re.compile(r"\[r:`((?:[^`]|``)*)`\]")
+
+    def __init__(self, rtt: float):
+        self.rtt = rtt
+        self.round_trips = 0
+        self.nodes = {}   # name -> entity_type
+        self.rels = {}    # (head, rel, tail) -> (head_type, tail_type)
+
+    def _round_trip(self):
+        self.round_trips += 1
+        if self.rtt:
+            time.sleep(self.rtt)
+
+    # 旧方案使用的 py2neo 接口
+    def merge(self, obj, label=None, key=None):
+        self._round_trip()
+        if isinstance(obj, _Node):
+            self.nodes[obj.props["name"]] = obj.props.get("entity_type")
+        else:
+            self.rels[(obj.head.props["name"], obj.rel_type, obj.tail.props["name"])] = (
+                obj.props.get("head_type"), obj.props.get("tail_type"))
+
+    # 新方案使用的共享客户端事务接口（system.neo4j_client.Neo4jClient）：每条语句一次往返，提交一次往返
+    def run_in_transaction_sync(self, statements, database=None, timeout=None):
+        applied = []
+        for cypher, params in statements:
+            self._round_trip()
+            rel = self._REL_RE.search(cypher).group(1).replace("``", "`")
+            applied.append((rel, params["rows"]))
+        self._round_trip()
+        for rel, rows in applied:
+            for row in rows:
+                self.nodes[row["head"]] = row["head_type"]
+                self.nodes[row["tail"]] = row["tail_type"]
+                self.rels[(row["head"], rel, row["tail"])] = (row["head_type"], row["tail_type"])
+
+
+def legacy_store(graph, quintuples) -> int:
+    """旧方案：逐条三次 merge"""
+    success_count = 0
+    for head, head_type, rel, tail, tail_type in quintuples:
+        if not head or not tail:
+            continue
+        h_node = _Node("Entity", name=head, entity_type=head_type)
+        t_node = _Node("Entity", name=tail, entity_type=tail_type)
+        r = _Relationship(h_node, rel, t_node, head_type=head_type, tail_type=tail_type)
+        graph.merge(h_node, "Entity", "name")
+        graph.merge(t_node, "Entity", "name")
+        graph.merge(r)
+        success_count += 1
+    return success_count
+
+
+# ---------------------------------------------------------------------------
+# 数据
+# ---------------------------------------------------------------------------
+
+ENTITY_TYPES = ["人物", "地点", "组织", "物品", "概念", "时间"]
+RELATIONS = ["喜欢", "位于", "属于", "认识", "拥有", "参加", "来自", "使用", "学习", "讨厌"]
+
+
+def make_quintuples(count: int, seed: int = 42):
+    rng = random.Random(seed)
+    entities = [(f"实体{i}", rng.choice(ENTITY_TYPES)) for i in range(max(50, count // 4))]
+    quintuples = []
+    for _ in range(count):
+        (head, head_type), (tail, tail_type) = rng.sample(entities, 2)
+        quintuples.append((head, head_type, rng.choice(RELATIONS), tail, tail_type))
+    return quintuples
+
+
+def run_benchmark(sizes, rtt_ms: float):
+    print("=" * 72)
+    print(f"五元组写入 Neo4j 基准测试（替身往返延迟 {rtt_ms}ms）")
+    print("=" * 72)
+    print(f"  {'条数':>8}{'旧方案':>14}{'往返':>8}{'新方案':>14}{'往返':>8}{'加速比':>10}")
+    for size in sizes:
+        quintuples = make_quintuples(size)
+
+        legacy_graph = StandInGraph(rtt_ms / 1000)
+        start = time.perf_counter()
+        legacy_store(legacy_graph, quintuples)
+        legacy_elapsed = time.perf_counter() - start
+
+        batch_graph = StandInGraph(rtt_ms / 1000)
+        start = time.perf_counter()
+        _write_quintuples_to_graph(batch_graph, quintuples)
+        batch_elapsed = time.perf_counter() - start
+
+        assert legacy_graph.nodes == batch_graph.nodes, "节点不一致"
+        assert legacy_graph.rels == batch_graph.rels, "关系不一致"
+
+        print(f"  {size:>8,}{legacy_elapsed:>13.2f}s{legacy_graph.round_trips:>8,}"
+              f"{batch_elapsed:>13.3f}s{batch_graph.round_trips:>8,}"
+              f"{legacy_elapsed / batch_elapsed:>9.0f}x")
+    print("✓ 两种方式写出的节点与关系一致")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="quintuple Neo4j write benchmark")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000], help="写入的五元组条数")
+    parser.add_argument("--rtt-ms", type=float, default=0.3, help="替身每次往返的模拟延迟（毫秒）")
+    args = parser.parse_args()
+    run_benchmark(args.sizes, args.rtt_ms)
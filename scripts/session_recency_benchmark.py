@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+“上一个会话”查找基准测试
+
+对比 build_conversation_messages() 注入持久化上下文时查找最近活跃会话的开销：
+  旧方案：每次请求遍历全部会话，构建候选列表并按 last_activity 排序（O(n log n)）
+  新方案：LazySessionMap 维护最近活跃顺序表，倒序取第一个非当前会话（摊还 O(1)）
+
+用法：
+    cd NagaAgent
+    python -X utf8 scripts/session_recency_benchmark.py [--sessions 10000] [--requests 2000]
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from apiserver.session_store import LazySessionMap, SessionStore, build_index_entry  # noqa: E402
+
+
+def make_sessions(count: int) -> dict:
+    """生成 count 个带消息的合成会话"""
+    base = datetime(2025, 1, 1)
+    offsets = random.sample(range(86400 * 365), count)  # 互不相同，避免排序并列
+    sessions = {}
+    for i, offset in enumerate(offsets):
+        ts = (base + timedelta(seconds=offset)).isoformat()
+        sessions[f"session-{i:06d}"] = {
+            "created_at": ts,
+            "last_activity": ts,
+            "agent_type": "default",
+            "temporary": False,
+            "messages": [{"role": "user", "content": f"msg {i}"}, {"role": "assistant", "content": "ok"}],
+            "compress": "",
+        }
+    return sessions
+
+
+def legacy_previous_session_id(sessions: dict, current_session_id: str):
+    """旧方案：全量扫描 + 排序"""
+    candidates = [
+        (sid, s) for sid, s in sessions.items()
+        if sid != current_session_id and s.get("messages")
+    ]
+    if not candidates:
+        return None
+    candidates.sort(key=lambda x: x[1].get("last_activity", ""), reverse=True)
+    return candidates[0][0]
+
+
+def run_benchmark(session_count: int, request_count: int):
+    random.seed(42)
+    sessions = make_sessions(session_count)
+    ids = list(sessions)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = SessionStore(tmp)
+        index = {sid: build_index_entry(s) for sid, s in sessions.items()}
+        lazy = LazySessionMap(store, index)
+
+        # 正确性：两种方案结果一致
+        for sid in random.sample(ids, min(200, len(ids))):
+            assert legacy_previous_session_id(sessions, sid) == lazy.latest(sid)
+
+        current = random.sample(ids, request_count)
+
+        start = time.perf_counter()
+        for sid in current:
+            legacy_previous_session_id(sessions, sid)
+        legacy_elapsed = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for sid in current:
+            lazy.latest(sid)
+        new_elapsed = time.perf_counter() - start
+
+        store.close()
+
+    legacy_us = legacy_elapsed / request_count * 1e6
+    new_us = new_elapsed / request_count * 1e6
+    print("=" * 60)
+    print(f"“上一个会话”查找基准测试（{session_count:,} 个会话，{request_count:,} 次请求）")
+    print("=" * 60)
+    print(f"  旧方案（扫描 + 排序）:   {legacy_us:>12.2f} µs/请求")
+    print(f"  新方案（最近活跃顺序表）: {new_us:>12.2f} µs/请求")
+    print(f"  加速比:                  {legacy_us / max(new_us, 1e-9):>12.0f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="previous-session lookup benchmark")
+    parser.add_argument("--sessions", type=int, default=10000, help="会话数量")
+    parser.add_argument("--requests", type=int, default=2000, help="模拟请求次数")
+    args = parser.parse_args()
+    run_benchmark(args.sessions, min(args.requests, args.sessions))
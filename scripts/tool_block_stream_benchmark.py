@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+流式 ```tool``` 代码块解析：一致性校验 + 首个工具派发时间
+
+对比文本协议模型（无原生 function calling）的工具调用派发时机：
+  旧方案：等整段回复流式输出完毕，parse_tool_calls_from_text 一次性解析后派发
+  新方案：IncrementalToolBlockParser 在代码块闭合时即解析派发，正文剩余部分继续流式输出
+
+1. 一致性：在录制的回复语料上以多种随机切块方式喂入，流式解析结果必须是
+   整段解析结果的前缀（未闭合尾块、裸 JSON 等仍由整段解析兜底）。
+2. 首个派发时间：按固定 token 间隔模拟流式输出，统计首个工具调用的派发时刻。
+
+用法：
+    cd NagaAgent
+    python -X utf8 scripts/tool_block_stream_benchmark.py [--rounds 50] [--token-ms 30]
+"""
+
+import argparse
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from apiserver.agentic_tool_loop import (  # noqa: E402
+    IncrementalToolBlockParser,
+    _extract_tool_blocks,
+    parse_tool_calls_from_text,
+)
+
+
+# ---------------------------------------------------------------------------
+# 录制语料（覆盖常见输出形态与边界情况）
+# ---------------------------------------------------------------------------
+
+RECORDED_REPLIES = [
+    # 单个工具块 + 之后的长段说明
+    "好的，我帮你查一下北京的天气。\n```tool\n"
+    '{"agentType": "mcp", "service_name": "weather_time", "tool_name": "today_weather", "city": "北京 北京"}\n'
+    "```\n查询结果出来之前，先简单说一下：北京这几天昼夜温差比较大，早晚出门记得加件外套。"
+    "如果你打算周末去爬山，最好提前关注一下风力预报，山上的体感温度会比市区低不少。" * 3,
+    # 多个工具块分散在正文中
+    "我同时搜一下两个关键词。\n```tool\n"
+    '{"agentType": "tool", "tool_name": "web_search", "args": {"query": "NagaAgent 发布"}}\n'
+    "```\n另外再搜一下相关新闻：\n```tool\n"
+    '{"agentType": "tool", "tool_name": "web_search", "args": {"query": "NagaAgent 更新日志", "count": 5}}\n'
+    "```\n稍等片刻，结果马上就来。" + "整理中……" * 20,
+    # 一个块里多个对象 + 数组
+    "```tool\n"
+    '[{"agentType": "mcp", "service_name": "a", "tool_name": "x"}, {"agentType": "mcp", "service_name": "b", "tool_name": "y"}]\n'
+    '{"agentType": "naga_control", "action": "pause_voice", "params": {"nested": {"k": [1, 2, {"z": 3}]}}}\n'
+    "```\n以上三个操作已提交。",
+    # 全角字符 + json5 单引号
+    "处理一下：\n```tool\n｛'agentType'：'mcp'，'service_name'：'app_launcher'，'tool_name'：'启动应用'，'app'：'Chrome'｝\n```\n已为你启动。",
+    # live2d 与普通调用混合
+    "```tool\n"
+    '{"agentType": "live2d", "action": "happy"}\n'
+    '{"agentType": "mcp", "service_name": "weather_time", "tool_name": "time"}\n'
+    "```\n现在是下午三点。" + "顺便说点别的。" * 15,
+    # 未闭合的尾部块（仅整段解析处理）
+    "先查一个：\n```tool\n"
+    '{"agentType": "mcp", "service_name": "a", "tool_name": "x"}\n'
+    "```\n再查一个：\n```tool\n"
+    '{"agentType": "mcp", "service_name": "b", "tool_name": "y"}',
+    # 非工具代码块 / ```tools 开头行不合法
+    "示例代码：\n```python\nprint({'agentType': 'x'})\n```\n"
+    "这不是工具块：\n```tools\n{\"agentType\": \"mcp\"}\n```\n"
+    "这才是：\n```tool  \n"
+    '{"agentType": "mcp", "service_name": "c", "tool_name": "z"}\n'
+    "```\n完成。",
+    # 空块 / 无 agentType 的对象
+    "```tool\n\n```\n```tool\n{\"foo\": 1}\n```\n```tool\n{\"agentType\": \"openclaw\", \"message\": \"hi\"}\n```",
+    # 没有工具块：裸 JSON 兼容路径
+    '我来调用：\n{"agentType": "mcp", "service_name": "weather_time", "tool_name": "today_weather"}\n好的。',
+    # 纯文本
+    "今天过得怎么样？有什么我可以帮你的吗？" * 5,
+]
+
+
+def random_chunks(rng: random.Random, text: str, max_size: int):
+    pos = 0
+    while pos < len(text):
+        size = rng.randint(1, max_size)
+        yield text[pos:pos + size]
+        pos += size
+
+
+def stream_parse(chunks):
+    """返回 (流式解析出的调用, 首个调用所在块序号)"""
+    parser = IncrementalToolBlockParser()
+    first_index = None
+    for i, chunk in enumerate(chunks):
+        if parser.feed(chunk) and first_index is None:
+            first_index = i
+    return parser.calls, first_index
+
+
+def check_consistency(rounds: int) -> int:
+    rng = random.Random(20240601)
+    cases = 0
+    for text in RECORDED_REPLIES:
+        _, batch_calls = parse_tool_calls_from_text(text)
+        _, block_calls = _extract_tool_blocks(text)
+        splits = [[text], list(text)]
+        splits += [list(random_chunks(rng, text, rng.randint(1, 30))) for _ in range(rounds)]
+        for chunks in splits:
+            stream_calls, _ = stream_parse(chunks)
+            ok = stream_calls == batch_calls[:len(stream_calls)]
+            # 流式解析到调用时，整段解析必然走 ```tool``` 代码块路径
+            ok = ok and (not stream_calls or batch_calls == block_calls)
+            if not ok:
+                print("✗ 流式解析结果与整段解析不一致")
+                print(f"  文本: {text[:80]!r}")
+                print(f"  整段: {batch_calls}")
+                print(f"  流式: {stream_calls}")
+                sys.exit(1)
+            cases += 1
+    return cases
+
+
+def measure_first_dispatch(token_ms: float):
+    rng = random.Random(7)
+    rows = []
+    for text in RECORDED_REPLIES:
+        chunks = list(random_chunks(rng, text, 4))  # 约 1 token ≈ 1~4 字符
+        stream_calls, first_index = stream_parse(chunks)
+        _, batch_calls = parse_tool_calls_from_text(text)
+        if not batch_calls:
+            continue
+        batch_ms = len(chunks) * token_ms  # 旧方案：流结束才派发
+        stream_ms = (first_index + 1) * token_ms if stream_calls else batch_ms
+        rows.append((text[:24].replace("\n", " "), batch_ms, stream_ms))
+    return rows
+
+
+def run_benchmark(rounds: int, token_ms: float):
+    print("=" * 72)
+    print("流式 ```tool``` 代码块解析：一致性校验 + 首个工具派发时间")
+    print("=" * 72)
+
+    cases = check_consistency(rounds)
+    print(f"✓ 一致性校验通过：{len(RECORDED_REPLIES)} 条语料，{cases} 组切块方式")
+    print()
+
+    rows = measure_first_dispatch(token_ms)
+    print(f"首个工具派发时间（模拟每 token {token_ms:.0f}ms）")
+    print(f"  {'语料':<26}{'整段解析':>10}{'流式解析':>10}")
+    for label, batch_ms, stream_ms in rows:
+        print(f"  {label:<26}{batch_ms:>8.0f}ms{stream_ms:>8.0f}ms")
+    total_batch = sum(r[1] for r in rows)
+    total_stream = sum(r[2] for r in rows)
+    print(f"  平均: 整段 {total_batch / len(rows):.0f}ms → 流式 {total_stream / len(rows):.0f}ms "
+          f"（提前 {(1 - total_stream / total_batch) * 100:.0f}%）")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="incremental tool block parser benchmark")
+    parser.add_argument("--rounds", type=int, default=50, help="每条语料的随机切块次数")
+    parser.add_argument("--token-ms", type=float, default=30.0, help="模拟的 token 间隔（毫秒）")
+    args = parser.parse_args()
+    run_benchmark(args.rounds, args.token_ms)
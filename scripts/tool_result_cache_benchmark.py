@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+工具结果缓存基准测试
+
+模拟 agentic loop 中重复的只读工具调用（--distinct 组不同参数，共 --calls 次，每次真实调用
+耗时 --latency-ms 毫秒），对比不缓存与 ToolResultCache 的总耗时和实际执行次数，并校验：
+  - 原生 function call 经 _convert_native_to_dispatch 转换后，参数相同（id、参数顺序、空白不同）
+    的两次调用得到相同的缓存键
+  - 并发的相同调用只执行一次；发起者被取消时其余等待者仍拿到结果
+  - 全部等待者都被取消时，在途的工具调用随之取消
+
+用法：
+    cd NagaAgent
+    python -X utf8 scripts/tool_result_cache_benchmark.py [--calls 200] [--distinct 20] [--latency-ms 50]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from apiserver.agentic_tool_loop import _convert_native_to_dispatch  # noqa: E402
+from apiserver.tool_result_cache import ToolResultCache, make_cache_key  # noqa: E402
+
+TTL = 300.0
+
+
+def check_native_keys():
+    calls = _convert_native_to_dispatch([
+        {"id": "call_a", "name": "mcp__weather_time__today_weather",
+         "arguments": json.dumps({"city": "上海", "days": 3}, ensure_ascii=False)},
+        {"id": "call_b", "name": "mcp__weather_time__today_weather",
+         "arguments": '{ "days": 3,  "city": "上海" }'},
+    ])
+    keys = [make_cache_key("mcp", c["service_name"], c["tool_name"], c) for c in calls]
+    assert keys[0] == keys[1], f"参数相同的原生调用缓存键不同: {keys}"
+
+
+async def check_cancellation():
+    cache = ToolResultCache()
+    runs = 0
+    cancelled = False
+
+    async def runner():
+        nonlocal runs, cancelled
+        runs += 1
+        try:
+            await asyncio.sleep(0.05)
+        except asyncio.CancelledError:
+            cancelled = True
+            raise
+        return "result"
+
+    key = make_cache_key("mcp", "svc", "tool", {"q": 1})
+    originator = asyncio.create_task(cache.get_or_run(key, TTL, runner))
+    await asyncio.sleep(0)
+    waiters = [asyncio.create_task(cache.get_or_run(key, TTL, runner)) for _ in range(3)]
+    await asyncio.sleep(0)
+    originator.cancel()
+    assert await asyncio.gather(*waiters) == ["result"] * 3, "发起者取消后等待者没有拿到结果"
+    assert runs == 1 and not cancelled, "发起者取消导致重复执行或工具调用被取消"
+
+    key = make_cache_key("mcp", "svc", "tool", {"q": 2})
+    tasks = [asyncio.create_task(cache.get_or_run(key, TTL, runner)) for _ in range(2)]
+    await asyncio.sleep(0)
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    await asyncio.sleep(0)
+    assert cancelled, "全部等待者取消后工具调用仍在执行"
+    assert not cache._inflight and not cache._waiters, "取消后残留在途记录"
+
+
+async def run_calls(cache, calls: list, latency: float) -> tuple:
+    executed = 0
+
+    async def call(args):
+        async def runner():
+            nonlocal executed
+            executed += 1
+            await asyncio.sleep(latency)
+            return {"echo": args}
+
+        if cache is None:
+            return await runner()
+        return await cache.get_or_run(make_cache_key("mcp", "svc", "search", args), TTL, runner)
+
+    start = time.perf_counter()
+    # 每轮并发 4 个调用，模拟模型一次发起多个工具调用
+    for i in range(0, len(calls), 4):
+        await asyncio.gather(*(call(args) for args in calls[i:i + 4]))
+    return time.perf_counter() - start, executed
+
+
+def run_benchmark(n_calls: int, distinct: int, latency_ms: float):
+    check_native_keys()
+    asyncio.run(check_cancellation())
+
+    rng = random.Random(3)
+    calls = [{"query": f"关键词{rng.randrange(distinct)}"} for _ in range(n_calls)]
+    latency = latency_ms / 1000
+    plain_elapsed, plain_runs = asyncio.run(run_calls(None, calls, latency))
+    cache = ToolResultCache()
+    cached_elapsed, cached_runs = asyncio.run(run_calls(cache, calls, latency))
+    assert cached_runs <= distinct, f"缓存后仍执行了 {cached_runs} 次"
+
+    print("=" * 72)
+    print(f"  {n_calls} 次调用，{distinct} 组不同参数，单次耗时 {latency_ms:.0f}ms")
+    print(f"  {'方式':<10}{'执行次数':>10}{'总耗时':>12}")
+    print(f"  {'不缓存':<10}{plain_runs:>10}{plain_elapsed * 1000:>10.0f}ms")
+    print(f"  {'缓存':<10}{cached_runs:>10}{cached_elapsed * 1000:>10.0f}ms")
+    print(f"  统计: {cache.stats()}")
+    print("✓ 原生调用缓存键一致；发起者取消不影响合并的等待者，全部取消时工具调用随之取消")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="tool result cache benchmark")
+    parser.add_argument("--calls", type=int, default=200, help="工具调用次数")
+    parser.add_argument("--distinct", type=int, default=20, help="不同参数的组数")
+    parser.add_argument("--latency-ms", type=float, default=50, help="单次真实调用耗时（毫秒）")
+    args = parser.parse_args()
+    run_benchmark(args.calls, args.distinct, args.latency_ms)
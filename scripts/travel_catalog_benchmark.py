@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+旅行 session 目录索引基准测试
+
+在临时目录中生成 --sessions 个旅行 session 文件（多数已结束、带较长的进度事件和发现列表，
+少数进行中 / 已中断，分属若干干员），对比常用查询的两种实现：
+  全量解析：glob *.json，逐个 TravelSession.model_validate_json 后过滤、排序（旧实现）
+  目录索引：travel_service.list_sessions 先查 SQLite 索引，只解析命中的 session
+查询包括 get_active_session、list_open_sessions、get_open_session_for_agent、get_latest_session；
+另外测量首次建立索引和 save_session 之后（目录 mtime 变化，需要按 stat 核对）的查询耗时，
+并校验两种实现返回的 session 一致。
+
+用法：
+    cd NagaAgent
+    python -X utf8 scripts/travel_catalog_benchmark.py [--sessions 5000] [--repeat 20]
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from apiserver import travel_service  # noqa: E402
+from apiserver.travel_catalog import TravelSessionCatalog  # noqa: E402
+from apiserver.travel_service import (  # noqa: E402
+    OPEN_TRAVEL_STATUSES,
+    TravelDiscovery,
+    TravelProgressEvent,
+    TravelSession,
+    TravelStatus,
+)
+
+AGENTS = [None] + [f"agent-{i}" for i in range(8)]
+
+
+def make_session(i: int, n_sessions: int, rng: random.Random) -> TravelSession:
+    created = datetime(2026, 1, 1) + timedelta(minutes=i * 7 + rng.randint(0, 5))
+    # 历史 session 基本都已结束，只有最近的少数仍在运行；偶有未恢复的中断 session
+    if i >= n_sessions - 10:
+        status = rng.choice([TravelStatus.RUNNING, TravelStatus.PENDING, TravelStatus.COMPLETED])
+    else:
+        status = rng.choices(
+            [TravelStatus.COMPLETED, TravelStatus.FAILED, TravelStatus.CANCELLED, TravelStatus.INTERRUPTED],
+            weights=[90, 4, 5, 1],
+        )[0]
+    return TravelSession(
+        session_id=f"{i:016x}",
+        status=status,
+        created_at=created.isoformat(),
+        agent_id=rng.choice(AGENTS),
+        goal_prompt=f"探索主题 {i}",
+        progress_events=[
+            TravelProgressEvent(timestamp=created.isoformat(), type="tool_activity", message="进展" * 20)
+            for _ in range(rng.randint(20, 60))
+        ],
+        discoveries=[
+            TravelDiscovery(url=f"https://example.com/{i}/{j}", title=f"发现{j}", summary="摘要" * 40,
+                            found_at=created.isoformat())
+            for j in range(rng.randint(5, 30))
+        ],
+    )
+
+
+def legacy_list(travel_dir: Path, *, agent_id=travel_service._ANY_AGENT, statuses=None) -> list:
+    sessions = []
+    for path in travel_dir.glob("*.json"):
+        try:
+            session = TravelSession.model_validate_json(path.read_text(encoding="utf-8"))
+            if agent_id is not travel_service._ANY_AGENT and session.agent_id != agent_id:
+                continue
+            if statuses is not None and session.status not in statuses:
+                continue
+            sessions.append(session)
+        except Exception:
+            continue
+    sessions.sort(key=lambda s: s.created_at, reverse=True)
+    return sessions
+
+
+def first_id(sessions: list):
+    return sessions[0].session_id if sessions else None
+
+
+def timed(fn, repeat: int) -> tuple:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return result, statistics.median(samples)
+
+
+def run_benchmark(n_sessions: int, repeat: int):
+    rng = random.Random(7)
+    with tempfile.TemporaryDirectory() as tmp:
+        travel_dir = Path(tmp)
+        for i in range(n_sessions):
+            session = make_session(i, n_sessions, rng)
+            (travel_dir / f"{session.session_id}.json").write_text(session.model_dump_json(indent=2), encoding="utf-8")
+        (travel_dir / "browser-policies.json").write_text("{}", encoding="utf-8")
+        travel_service.TRAVEL_DIR = travel_dir
+        travel_service._catalog = TravelSessionCatalog(travel_dir)
+
+        start = time.perf_counter()
+        travel_service.get_latest_session()
+        build_ms = (time.perf_counter() - start) * 1000
+
+        agent = AGENTS[3]
+        cases = [
+            ("get_active_session",
+             lambda: first_id(legacy_list(travel_dir, statuses={TravelStatus.RUNNING})),
+             lambda: getattr(travel_service.get_active_session(), "session_id", None)),
+            ("list_open_sessions",
+             lambda: [s.session_id for s in legacy_list(travel_dir, statuses=OPEN_TRAVEL_STATUSES)],
+             lambda: [s.session_id for s in travel_service.list_open_sessions()]),
+            ("get_open_session_for_agent",
+             lambda: first_id(legacy_list(travel_dir, agent_id=agent, statuses=OPEN_TRAVEL_STATUSES)),
+             lambda: getattr(travel_service.get_open_session_for_agent(agent), "session_id", None)),
+            ("get_latest_session",
+             lambda: first_id(legacy_list(travel_dir)),
+             lambda: getattr(travel_service.get_latest_session(), "session_id", None)),
+        ]
+        rows = []
+        for label, legacy_fn, catalog_fn in cases:
+            expected, legacy_ms = timed(legacy_fn, max(1, repeat // 10))
+            got, catalog_ms = timed(catalog_fn, repeat)
+            assert got == expected, f"{label} 结果不一致: {got} != {expected}"
+            rows.append((label, legacy_ms, catalog_ms))
+
+        # 保存一个 session（目录 mtime 变化）后的首次查询
+        after_save = []
+        for i in range(repeat):
+            session = travel_service.load_session(f"{i:016x}")
+            session.status = TravelStatus.RUNNING if i % 2 else TravelStatus.COMPLETED
+            travel_service.save_session(session)
+            start = time.perf_counter()
+            travel_service.list_open_sessions()
+            after_save.append((time.perf_counter() - start) * 1000)
+        expected = [s.session_id for s in legacy_list(travel_dir, statuses=OPEN_TRAVEL_STATUSES)]
+        assert [s.session_id for s in travel_service.list_open_sessions()] == expected, "保存后索引不一致"
+
+        # 绕过 save_session 直接删除 / 新增文件
+        (travel_dir / f"{0:016x}.json").unlink()
+        extra = make_session(n_sessions, n_sessions, rng)
+        extra.status = TravelStatus.RUNNING
+        (travel_dir / f"{extra.session_id}.json").write_text(extra.model_dump_json(), encoding="utf-8")
+        assert [s.session_id for s in travel_service.list_open_sessions()] == \
+            [s.session_id for s in legacy_list(travel_dir, statuses=OPEN_TRAVEL_STATUSES)], "外部增删文件后索引不一致"
+        n_open = len(expected)
+
+    print("=" * 72)
+    print(f"  {n_sessions:,} 个 session（其中未结束 {n_open} 个）；首次建立索引 {build_ms:.0f}ms")
+    print(f"  {'查询':<30}{'全量解析':>12}{'目录索引':>12}{'加速比':>10}")
+    for label, legacy_ms, catalog_ms in rows:
+        print(f"  {label:<30}{legacy_ms:>10.1f}ms{catalog_ms:>10.2f}ms{legacy_ms / catalog_ms:>9.0f}x")
+    print(f"  {'save_session 后 list_open':<30}{'':>12}{statistics.median(after_save):>10.2f}ms")
+    print("✓ 目录索引查询结果与全量解析一致（含保存后、外部增删文件后）")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="travel session catalog benchmark")
+    parser.add_argument("--sessions", type=int, default=5000, help="生成的 session 数")
+    parser.add_argument("--repeat", type=int, default=20, help="每个查询的重复次数")
+    args = parser.parse_args()
+    run_benchmark(args.sessions, args.repeat)
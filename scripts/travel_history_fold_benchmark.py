@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+旅行历史增量分析基准测试
+
+构造一段不断增长的 OpenClaw 会话历史（assistant 文本 / 工具调用 / 工具结果交替），
+模拟旅行监控循环：每轮追加若干条消息，然后分析历史，对比两种方式：
+  全量分析：每轮对完整历史调用 analyze_history
+  增量折叠：fold_history 只解析游标之后的新消息；每轮另把 session 序列化往返一次，
+            校验分析状态落盘后能继续折叠（往返耗时单独统计）
+并校验最终的积分、工具统计、发现和来源与全量分析一致。
+
+用法：
+    cd NagaAgent
+    python -X utf8 scripts/travel_history_fold_benchmark.py [--messages 3000] [--rounds 100] [--append 4]
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from apiserver.travel_service import TravelSession, analyze_history, fold_history  # noqa: E402
+
+TOOLS = ["web_search", "browser", "web_fetch", "travel_discovery", "travel_progress"]
+
+
+def make_turn(i: int, rng: random.Random) -> list:
+    """一轮 assistant 工具调用 + 工具结果，偶尔夹带纯文本回复"""
+    if i % 5 == 4:
+        text = f"阶段小结 {i}：" + "继续深入" * rng.randint(5, 30)
+        if i % 15 == 4:
+            text += (f"\n[DISCOVERY]\nurl: https://blog{i % 40}.example.org/{i}\ntitle: 文章{i}\n"
+                     f"summary: 第{i}篇值得追踪的长文摘要\ntags: 趋势, 技术\n[/DISCOVERY]")
+        return [{"role": "assistant", "content": [{"type": "text", "text": text}],
+                 "usage": {"totalTokens": rng.randint(200, 4000)}}]
+
+    tool = TOOLS[i % len(TOOLS)]
+    call_id = f"call{i}"
+    if tool == "web_search":
+        args = {"query": f"主题{i}"}
+        details = {"query": args["query"], "results": [
+            {"url": f"https://news{(i + j) % 60}.example.com/{i}-{j}", "title": f"结果{i}-{j}",
+             "description": "搜索结果摘要" * rng.randint(2, 8)} for j in range(5)]}
+    elif tool == "travel_progress":
+        args = {"message": f"进展 {i}"}
+        details = {"ok": True}
+    else:
+        args = {"url": f"https://site{i % 80}.example.net/page{i}", "action": "open"}
+        details = {"url": args["url"], "title": f"页面{i}", "summary": "页面正文摘要" * rng.randint(3, 10)}
+    return [
+        {"role": "assistant", "content": [{"type": "toolCall", "id": call_id, "name": tool, "arguments": args}],
+         "usage": {"totalTokens": rng.randint(200, 4000)}},
+        {"role": "toolResult", "toolName": tool, "toolCallId": call_id, "isError": rng.random() < 0.05,
+         "content": [{"type": "text", "text": json.dumps(details, ensure_ascii=False)}], "details": details},
+    ]
+
+
+def run_benchmark(messages: int, rounds: int, append: int):
+    rng = random.Random(11)
+    stream = []
+    i = 0
+    while len(stream) < messages + rounds * append:
+        stream.extend(make_turn(i, rng))
+        i += 1
+
+    session = TravelSession(session_id="benchmark", created_at="")
+    fold_history(session, stream[:messages])
+
+    full_ms, fold_ms, roundtrip_ms = [], [], []
+    size = messages
+    for _ in range(rounds):
+        size += append
+        history = stream[:size]
+        start = time.perf_counter()
+        expected = analyze_history(history)
+        full_ms.append((time.perf_counter() - start) * 1000)
+
+        start = time.perf_counter()
+        session = TravelSession.model_validate_json(session.model_dump_json())
+        roundtrip_ms.append((time.perf_counter() - start) * 1000)
+
+        start = time.perf_counter()
+        fold_history(session, history)
+        fold_ms.append((time.perf_counter() - start) * 1000)
+
+    assert session.credits_used == expected.credits_used, "积分与全量分析不一致"
+    assert session.tool_stats == expected.tool_stats, "工具统计与全量分析不一致"
+    assert sorted(d.url for d in session.discoveries) == sorted(d.url for d in expected.discoveries), "发现不一致"
+    assert sorted(session.sources) == sorted(expected.sources), "来源不一致"
+
+    full_p50, fold_p50 = statistics.median(full_ms), statistics.median(fold_ms)
+    print("=" * 72)
+    print(f"  历史 {messages:,} → {size:,} 条消息；{rounds} 轮，每轮追加 {append} 条；"
+          f"累计 {len(session.discoveries)} 条发现")
+    print(f"  全量分析 p50   {full_p50:>10.2f}ms")
+    print(f"  增量折叠 p50   {fold_p50:>10.2f}ms")
+    print(f"  session 往返   {statistics.median(roundtrip_ms):>10.2f}ms   （仅在 session 被外部修改时需要重新加载）")
+    print(f"  加速比         {full_p50 / fold_p50:>10.1f}x")
+    print("✓ 增量折叠的积分、工具统计、发现和来源与全量分析一致")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="travel history fold benchmark")
+    parser.add_argument("--messages", type=int, default=3000, help="初始历史消息条数")
+    parser.add_argument("--rounds", type=int, default=100, help="追加 + 分析的轮数")
+    parser.add_argument("--append", type=int, default=4, help="每轮追加的消息条数")
+    args = parser.parse_args()
+    run_benchmark(args.messages, args.rounds, args.append)
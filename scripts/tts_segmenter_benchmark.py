@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+TTS 分句器一致性校验 + 吞吐基准测试
+
+对比 StreamingToolCallExtractor 的分句逻辑：
+  旧方案：逐字符处理，每个字符一次 re.search，缓冲区逐字符拼接
+  新方案：SentenceSegmenter 整块正则扫描，普通文本整段并入缓冲区
+
+1. 一致性：在固定语料（中英文、代码块、跨块反引号、超长无标点文本等）上，
+   以多种随机切块方式喂入，两种方案产生的 TTS 切分动作必须完全一致。
+2. 吞吐：模拟 LLM 流式输出（每块 1~6 字符），统计每秒处理的块数（≈ tokens/sec）。
+
+用法：
+    cd NagaAgent
+    python -X utf8 scripts/tts_segmenter_benchmark.py [--rounds 20]
+"""
+
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from apiserver.streaming_tool_extractor import (  # noqa: E402
+    MAX_SENTENCE_LENGTH,
+    SentenceSegmenter,
+    _find_best_cut_position,
+)
+
+
+# ---------------------------------------------------------------------------
+# 旧方案参考实现（逐字符）
+# ---------------------------------------------------------------------------
+
+class LegacySegmenter:
+    """旧版 process_text_chunk / _flush_text_buffer 的分句逻辑"""
+
+    sentence_endings = r"[。？！；\.\?\!\;]"
+
+    def __init__(self):
+        self.text_buffer = ""
+        self.in_code_block = False
+        self.backtick_count = 0
+
+    def feed(self, text_chunk: str):
+        actions = []
+        for char in text_chunk:
+            if char == '`':
+                self.backtick_count += 1
+                continue
+            else:
+                if self.backtick_count >= 3:
+                    if not self.in_code_block:
+                        actions.append(("flush", self.text_buffer.strip()))
+                        self.text_buffer = ""
+                    self.in_code_block = not self.in_code_block
+                self.backtick_count = 0
+
+            if self.in_code_block:
+                continue
+
+            self.text_buffer += char
+
+            if re.search(self.sentence_endings, char):
+                sentence = self.text_buffer.strip()
+                if sentence:
+                    actions.append(("send", sentence))
+                self.text_buffer = ""
+            elif len(self.text_buffer) >= MAX_SENTENCE_LENGTH:
+                cut_pos = _find_best_cut_position(self.text_buffer)
+                sentence = self.text_buffer[:cut_pos].strip()
+                if sentence:
+                    actions.append(("send", sentence))
+                self.text_buffer = self.text_buffer[cut_pos:]
+        return actions
+
+    def finish(self):
+        if self.backtick_count >= 3:
+            self.in_code_block = not self.in_code_block
+        self.backtick_count = 0
+        text = self.text_buffer
+        self.text_buffer = ""
+        return [("flush", text)]
+
+
+# ---------------------------------------------------------------------------
+# 语料
+# ---------------------------------------------------------------------------
+
+GOLDEN_CORPUS = [
+    "你好！今天天气怎么样？我们去公园散步吧。",
+    "Hello world. This is a test! Is it working? Yes; it is.",
+    "这是一段没有任何标点符号的超长文本用来测试强制截断逻辑是否正确因为缓冲区达到五十个字符时需要在次要断点处截断或者直接在最大长度处截断然后继续累积剩余的文本直到结束",
+    "这是一段带逗号的长文本，用来测试次要断点，在三十字之后如果出现逗号、顿号或者空格就应该在那里截断，而不是在五十字处硬切，继续测试更多内容",
+    "先说明一下：\n```python\nprint('hello. world!')\nx = 1; y = 2\n```\n代码结束了。接下来继续说话！",
+    "行内代码 `x.y()` 不切换代码块。两个反引号 ``a.b`` 也不切换。",
+    "四个反引号````开始代码块。里面的句子不会发送！````结束后继续。",
+    "末尾未闭合的代码块```\nsome code here. more code",
+    "末尾的反引号```",
+    "数字 3.14159 和网址 example.com 也会被切开。",
+    "  前后有空格的句子。  。。！！  ",
+    "Mixed 中英文 sentence，with commas, and — dashes — everywhere without any ending punctuation at all for a long time",
+    "",
+]
+
+
+def random_text(rng: random.Random, length: int) -> str:
+    alphabet = "的一是在不了有和人这中大为上个国我以要他时来用们生到作地于出就分对成会可主发年动同工也能下过子说产种面而方后多定行学法所民得经十三之进着等部度家电力里如水化高自二理起小物现实加量都两体制机当使点从业本去把性好应开它合还因由其些然前外天政四日那社义事平形相全表间样与关各重新线内数正心反你明看原又么利比或但质气第向道命此变条只没结解问意建月公无系军很情者最立代想已通并提直题党程展五果料象员革位入常文总次品式活设及管特件长求老头基资边流路级少图山统接知较将组见计别她手角期根论运农指几九区强放决西被干做必战先回则任取据处府南给色光门即保治北造百规热领七海口东导器压志世金增争济阶油思术极交受联什认六共权收证改清己美再采转更单风切打白教速花带安场身车例真务具万每目至达走积示议声报斗完类八离华名确才科张信马节话米整空元况今集温传土许步群广石记需段研界拉林律叫且究观越织装影算低持音众书布复容儿须际商非验连断深难近矿千周委素技备半办青省列习响约支般史感劳便团往酸历市克何除消构府称太准精值号率族维划选标写存候毛亲快效斯院查江型眼王按格养易置派层片始却专状育厂京识适属圆包火住调满县局照参红细引听该铁价严"
+    punct = "，。！？；、 .!?;,`\n"
+    out = []
+    for _ in range(length):
+        if rng.random() < 0.12:
+            out.append(rng.choice(punct))
+        else:
+            out.append(rng.choice(alphabet))
+    return "".join(out)
+
+
+def random_chunks(rng: random.Random, text: str, min_size: int = 1, max_size: int = 6):
+    pos = 0
+    while pos < len(text):
+        size = rng.randint(min_size, max_size)
+        yield text[pos:pos + size]
+        pos += size
+
+
+def run_segmenter(seg_cls, chunks):
+    seg = seg_cls()
+    actions = []
+    for chunk in chunks:
+        actions.extend(seg.feed(chunk))
+    actions.extend(seg.finish())
+    return actions
+
+
+# ---------------------------------------------------------------------------
+# 主逻辑
+# ---------------------------------------------------------------------------
+
+def check_consistency(rounds: int) -> int:
+    rng = random.Random(20240601)
+    corpus = list(GOLDEN_CORPUS) + [random_text(rng, rng.randint(50, 3000)) for _ in range(50)]
+    cases = 0
+    for text in corpus:
+        splits = [[text], list(text)]
+        splits += [list(random_chunks(rng, text, 1, rng.randint(1, 40))) for _ in range(rounds)]
+        for chunks in splits:
+            expected = run_segmenter(LegacySegmenter, chunks)
+            actual = run_segmenter(SentenceSegmenter, chunks)
+            if expected != actual:
+                print("✗ 切分结果不一致")
+                print(f"  文本: {text[:80]!r}")
+                print(f"  旧方案: {expected[:6]}")
+                print(f"  新方案: {actual[:6]}")
+                sys.exit(1)
+            cases += 1
+    return cases
+
+
+def measure_throughput(seg_cls, chunk_lists) -> float:
+    total_chunks = sum(len(c) for c in chunk_lists)
+    start = time.perf_counter()
+    for chunks in chunk_lists:
+        run_segmenter(seg_cls, chunks)
+    elapsed = time.perf_counter() - start
+    return total_chunks / elapsed
+
+
+def run_benchmark(rounds: int):
+    print("=" * 60)
+    print("TTS 分句器一致性校验 + 吞吐基准测试")
+    print("=" * 60)
+
+    cases = check_consistency(rounds)
+    print(f"✓ 一致性校验通过：{cases} 组切块方式，切分动作完全一致")
+    print()
+
+    rng = random.Random(7)
+    texts = [random_text(rng, 4000) for _ in range(30)]
+    chunk_lists = [list(random_chunks(rng, t, 1, 6)) for t in texts]
+
+    legacy_tps = measure_throughput(LegacySegmenter, chunk_lists)
+    new_tps = measure_throughput(SentenceSegmenter, chunk_lists)
+    print(f"  旧方案（逐字符）:  {legacy_tps:>12,.0f} tokens/s")
+    print(f"  新方案（整块扫描）: {new_tps:>12,.0f} tokens/s")
+    print(f"  加速比:            {new_tps / legacy_tps:>12.2f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="TTS sentence segmenter benchmark")
+    parser.add_argument("--rounds", type=int, default=20, help="每条语料的随机切块次数")
+    args = parser.parse_args()
+    run_benchmark(args.rounds)
@@ -0,0 +1,94 @@
+"""
+五元组提取任务的持久化队列（SQLite）
+
+QuintupleTaskManager 的内存队列只负责调度，任务本身在入队时同步写入本表，
+任务结束（完成 / 失败 / 取消 / 溢出丢弃）后删除。服务重启时，上次未处理完的
+（等待中与运行中）任务由 start() 按入队顺序回放，不会因为重启而丢失。
+
+  - knowledge_graph/extraction_queue.db   表 pending(seq, task_id, text, text_hash, created_at)
+"""
+
+import logging
+import sqlite3
+import threading
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+QUEUE_FILENAME = "extraction_queue.db"
+
+# (task_id, text, text_hash, created_at)
+PendingRow = Tuple[str, str, str, float]
+
+
+def default_queue_path() -> Path:
+    from system.config import get_data_dir
+    return get_data_dir() / "knowledge_graph" / QUEUE_FILENAME
+
+
+class DurableTaskQueue:
+    """按入队顺序保存未完成的提取任务"""
+
+    def __init__(self, db_path: Optional[str] = None):
+        self.db_path = Path(db_path) if db_path else default_queue_path()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS pending ("
+                "seq INTEGER PRIMARY KEY AUTOINCREMENT, task_id TEXT NOT NULL UNIQUE, "
+                "text TEXT NOT NULL, text_hash TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def put(self, task_id: str, text: str, text_hash: str, created_at: float):
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO pending (task_id, text, text_hash, created_at) VALUES (?, ?, ?, ?)",
+                (task_id, text, text_hash, created_at),
+            )
+            conn.commit()
+
+    def update_text(self, task_id: str, text: str):
+        """合并（coalesce）溢出任务后更新文本"""
+        with self._lock:
+            conn = self._connect()
+            conn.execute("UPDATE pending SET text = ? WHERE task_id = ?", (text, task_id))
+            conn.commit()
+
+    def remove(self, task_id: str):
+        with self._lock:
+            conn = self._connect()
+            conn.execute("DELETE FROM pending WHERE task_id = ?", (task_id,))
+            conn.commit()
+
+    def load(self) -> List[PendingRow]:
+        """按入队顺序返回全部未完成任务"""
+        with self._lock:
+            try:
+                return list(self._connect().execute(
+                    "SELECT task_id, text, text_hash, created_at FROM pending ORDER BY seq"
+                ))
+            except sqlite3.DatabaseError as e:
+                logger.error(f"读取持久化提取队列失败 {self.db_path}: {e}")
+                return []
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._connect().execute("SELECT COUNT(*) FROM pending").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
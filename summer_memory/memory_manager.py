@@ -4,8 +4,8 @@ import traceback
 import weakref
 from typing import List, Dict, Optional, Tuple
 from .quintuple_extractor import extract_quintuples
-from .quintuple_graph import store_quintuples, query_graph_by_keywords, get_all_quintuples
-from .quintuple_rag_query import query_knowledge, set_context
+from .quintuple_graph import store_quintuples, enqueue_quintuples, query_graph_by_keywords_async, get_all_quintuples
+from .quintuple_rag_query import extract_keywords_local, query_knowledge, set_context
 from .task_manager import task_manager, start_auto_cleanup
 from system.config import config, AI_NAME
 
@@ -121,8 +121,8 @@ class GRAGMemoryManager:
 
             logger.debug(f"准备存储五元组: {quintuples[:2]}...")
 
-            # 直接调用同步存储函数（避免线程切换）
-            store_success = store_quintuples(quintuples)
+            # 写文件后交给写缓冲批量写入 Neo4j，不在事件循环中等待图数据库往返
+            store_success = enqueue_quintuples(quintuples)
 
             if store_success:
                 logger.info(f"任务 {task_id} 的五元组存储成功")
@@ -217,8 +217,9 @@ class GRAGMemoryManager:
             return []
             
         try:
-            # 从Neo4j查询相关五元组
-            quintuples = await asyncio.to_thread(query_graph_by_keywords, [query])
+            # 先在本地实体词表中匹配查询里的已知实体，未命中时按整句检索
+            keywords = await asyncio.to_thread(extract_keywords_local, query) or [query]
+            quintuples = await query_graph_by_keywords_async(keywords)
             
             # 限制返回数量
             return quintuples[:limit]
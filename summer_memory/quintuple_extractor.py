@@ -87,6 +87,15 @@ class QuintupleResponse(BaseModel):
     quintuples: List[Quintuple]
 
 
+class SegmentQuintuples(BaseModel):
+    index: int
+    quintuples: List[Quintuple]
+
+
+class BatchQuintupleResponse(BaseModel):
+    segments: List[SegmentQuintuples]
+
+
 async def extract_quintuples_async(text):
     """异步版本的五元组提取"""
     # DeepSeek API不支持结构化输出，直接使用传统JSON解析方法
@@ -267,6 +276,111 @@ async def _extract_quintuples_async_fallback(text):
     return []
 
 
+_BATCH_RULES = """
+下面是按编号排列的多段中文对话文本。请分别从每一段中抽取有价值的五元组（主语-主语类型-谓语-宾语-宾语类型）关系。
+
+## 提取规则
+1. 只提取**事实性**信息：具体的行为和动作、明确的实体关系、实际存在的状态和属性、用户表达的具体需求/偏好/计划。
+2. 严格过滤：比喻拟人夸张等修辞、虚拟假设想象的内容、纯粹的情感表达、赞美讽刺调侃等主观评价、闲聊中的无关信息、重复或冗余的关系。
+3. 类型包括但不限于：人物、地点、组织、物品、概念、时间、事件、活动等。
+4. 每段独立抽取，不要把一段的信息归到另一段。
+"""
+
+# 结构化输出（OpenAI 兼容接口）使用的系统提示，返回格式由 BatchQuintupleResponse 约束
+_BATCH_STRUCTURED_SYSTEM_PROMPT = _BATCH_RULES + """
+## 输出格式
+每段返回一项：index 为段落编号，quintuples 为该段的五元组；没有可提取内容的段落返回空的 quintuples。
+"""
+
+# Anthropic 接口不支持结构化输出，使用自由格式 JSON
+_BATCH_PROMPT_TEMPLATE = _BATCH_RULES + """
+## 输出格式
+返回一个 JSON 对象，键为段落编号（字符串），值为该段的五元组数组；没有可提取内容的段落返回空数组。
+示例：{{"1": [["小明", "人物", "踢", "足球", "物品"]], "2": []}}
+
+{segments}
+
+除了JSON数据，请不要输出任何其他数据，例如：```、```json、以下是我提取的数据：。
+"""
+
+
+def _parse_batch_response(content: str, count: int) -> List[List[tuple]]:
+    """解析批量提取结果，按段落编号拆回每段的五元组列表；格式不符时抛出 ValueError"""
+    content = content.strip()
+    if '{' not in content or '}' not in content:
+        raise ValueError("批量提取结果不是 JSON 对象")
+    data = json.loads(content[content.index('{'):content.rindex('}') + 1])
+    if not isinstance(data, dict):
+        raise ValueError("批量提取结果不是 JSON 对象")
+    results = []
+    for i in range(1, count + 1):
+        items = data.get(str(i), [])
+        if not isinstance(items, list):
+            raise ValueError(f"第 {i} 段的五元组不是数组")
+        results.append([tuple(t) for t in items if isinstance(t, list) and len(t) == 5])
+    return results
+
+
+def _batch_results_from_parsed(parsed: BatchQuintupleResponse, count: int) -> List[List[tuple]]:
+    """把结构化输出按段落编号拆回每段的五元组列表，缺失的段落为空列表"""
+    results: List[List[tuple]] = [[] for _ in range(count)]
+    for segment in parsed.segments:
+        if 1 <= segment.index <= count:
+            results[segment.index - 1].extend(
+                (q.subject, q.subject_type, q.predicate, q.object, q.object_type)
+                for q in segment.quintuples
+            )
+    return results
+
+
+async def extract_quintuples_batch_async(texts: List[str]) -> List[List[tuple]]:
+    """一次 LLM 调用提取多段文本的五元组，按输入顺序返回每段的结果
+
+    OpenAI 兼容接口使用结构化输出（BatchQuintupleResponse），Anthropic 接口使用自由格式 JSON；
+    批量结果无法解析时退回逐段提取，保证每段都有结果。
+    """
+    if len(texts) == 1:
+        return [await extract_quintuples_async(texts[0])]
+
+    segments = "\n\n".join(f"[{i}]\n{text}" for i, text in enumerate(texts, 1))
+
+    max_retries = 1
+    for attempt in range(max_retries + 1):
+        try:
+            if _is_anthropic:
+                content = await _anthropic_chat_async(
+                    system="你是一个专业的中文文本信息抽取专家。",
+                    user=_BATCH_PROMPT_TEMPLATE.format(segments=segments),
+                    temperature=0.3,
+                )
+                results = _parse_batch_response(content, len(texts))
+            else:
+                completion = await async_client.beta.chat.completions.parse(
+                    model=config.api.model,
+                    messages=[
+                        {"role": "system", "content": _BATCH_STRUCTURED_SYSTEM_PROMPT},
+                        {"role": "user", "content": f"请从以下各段文本中分别提取五元组：\n\n{segments}"}
+                    ],
+                    response_format=BatchQuintupleResponse,
+                    max_tokens=config.api.max_tokens,
+                    temperature=0.3,
+                    timeout=600 + (attempt * 20)
+                )
+                parsed = completion.choices[0].message.parsed
+                if parsed is None:
+                    raise ValueError("结构化输出没有返回结果")
+                results = _batch_results_from_parsed(parsed, len(texts))
+            logger.info(f"批量提取成功: {len(texts)} 段，共 {sum(len(r) for r in results)} 个五元组")
+            return results
+        except Exception as e:
+            logger.error(f"批量提取失败: {str(e)}")
+            if attempt < max_retries:
+                await asyncio.sleep(1 + attempt)
+
+    logger.info("批量提取失败，回退到逐段提取")
+    return list(await asyncio.gather(*(extract_quintuples_async(text) for text in texts)))
+
+
 def extract_quintuples(text):
     """同步版本的五元组提取"""
     if _is_anthropic:
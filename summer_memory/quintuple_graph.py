@@ -1,141 +1,74 @@
-import json as _json
-
-try:
-    from py2neo import Graph, Node, Relationship
-    from py2neo.errors import ServiceUnavailable
-except ImportError:
-    Graph = None  # type: ignore[assignment,misc]
-    Node = None  # type: ignore[assignment,misc]
-    Relationship = None  # type: ignore[assignment,misc]
-    ServiceUnavailable = Exception  # type: ignore[assignment,misc]
-
+import asyncio
+import atexit
 import logging
 import sys
 import os
-from charset_normalizer import from_path
+import threading
+import time
 from typing import Optional
 
 # 添加项目根目录到路径，以便导入config
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
 
-# 延迟加载的graph实例
-_graph: Optional[Graph] = None
+from system.neo4j_client import Neo4jClient, get_neo4j_client
+
+# 延迟连接的共享 Neo4j 客户端（驱动与连接池由 system.neo4j_client 统一管理）
+_graph: Optional[Neo4jClient] = None
 _graph_connection_failed: bool = False  # 连接失败标志，避免重复尝试
+_graph_lock = threading.Lock()
 
-# Neo4j配置变量（全局）
-NEO4J_URI: Optional[str] = None
-NEO4J_USER: Optional[str] = None
-NEO4J_PASSWORD: Optional[str] = None
 NEO4J_DATABASE: Optional[str] = None
 GRAG_ENABLED: bool = False
 
 
-def _load_config():
-    """加载Neo4j配置"""
-    global NEO4J_URI, NEO4J_USER, NEO4J_PASSWORD, NEO4J_DATABASE, GRAG_ENABLED
-
-    if NEO4J_URI is not None:
-        return  # 已经加载过配置
-
-    try:
-        from system.config import config
-        GRAG_ENABLED = config.grag.enabled
-        NEO4J_URI = config.grag.neo4j_uri
-        NEO4J_USER = config.grag.neo4j_user
-        NEO4J_PASSWORD = config.grag.neo4j_password
-        NEO4J_DATABASE = config.grag.neo4j_database
-        print(f"[GRAG] 成功从config模块读取配置: enabled={GRAG_ENABLED}, uri={NEO4J_URI}")
-        print(f"[GRAG] 全局变量设置后: NEO4J_URI={NEO4J_URI}")
-        return  # 成功加载，直接返回
-    except Exception as e:
-        print(f"[GRAG] 无法从config模块读取Neo4j配置: {e}", file=sys.stderr)
-        import traceback
-        traceback.print_exc()
-        # 兼容旧版本，从config.json读取
-        try:
-            CONFIG_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'config.json')
-
-            # 使用Charset Normalizer自动检测编码
-            charset_results = from_path(CONFIG_PATH)
-            if charset_results:
-                best_match = charset_results.best()
-                if best_match:
-                    detected_encoding = best_match.encoding
-                    print(f"[GRAG] 检测到配置文件编码: {detected_encoding}")
-
-                    # 使用检测到的编码直接打开文件，然后使用JSON读取
-                    with open(CONFIG_PATH, 'r', encoding=detected_encoding) as f:
-                        _cfg = _json.load(f)
-                else:
-                    print("[GRAG] 无法检测配置文件编码，使用回退方法")
-                    with open(CONFIG_PATH, 'r', encoding='utf-8') as f:
-                        _cfg = _json.load(f)
-            else:
-                print("[GRAG] 无法检测配置文件编码，使用回退方法")
-                with open(CONFIG_PATH, 'r', encoding='utf-8') as f:
-                    _cfg = _json.load(f)
-
-            grag_cfg = _cfg.get('grag', {})
-            NEO4J_URI = grag_cfg.get('neo4j_uri')
-            NEO4J_USER = grag_cfg.get('neo4j_user')
-            NEO4J_PASSWORD = grag_cfg.get('neo4j_password')
-            NEO4J_DATABASE = grag_cfg.get('neo4j_database')
-            GRAG_ENABLED = grag_cfg.get('enabled', True)
-        except Exception as e2:
-            print(f"[GRAG] 无法从 config.json 读取Neo4j配置: {e2}", file=sys.stderr)
-            GRAG_ENABLED = False
-
-
-def get_graph():
-    """获取graph实例（延迟加载）"""
-    global _graph, GRAG_ENABLED, _graph_connection_failed
+def get_graph() -> Optional[Neo4jClient]:
+    """获取共享 Neo4j 客户端（延迟连接，连接失败后不再重试）"""
+    global _graph, GRAG_ENABLED, _graph_connection_failed, NEO4J_DATABASE
 
     # 已经连接失败过，不再重试
-    if _graph_connection_failed:
-        return None
+    if _graph_connection_failed or _graph is not None:
+        return _graph
 
-    if _graph is None:
-        if Graph is None:
-            GRAG_ENABLED = False
-            _graph_connection_failed = True
-            return None
-        # 直接从系统配置获取，避免全局变量问题
+    with _graph_lock:
+        if _graph_connection_failed or _graph is not None:
+            return _graph
         try:
+            # 直接从系统配置获取，避免全局变量问题
             from system.config import config
-            grag_enabled = config.grag.enabled
-            neo4j_uri = config.grag.neo4j_uri
-            neo4j_user = config.grag.neo4j_user
-            neo4j_password = config.grag.neo4j_password
-            neo4j_database = config.grag.neo4j_database
-
-            if grag_enabled and neo4j_uri and neo4j_user and neo4j_password:
-                try:
-                    _graph = Graph(neo4j_uri, auth=(neo4j_user, neo4j_password), name=neo4j_database)
-                    _graph.service.kernel_version
-                    print("[GRAG] 成功连接到 Neo4j。")
-                    GRAG_ENABLED = True
-                except ServiceUnavailable:
-                    print("[GRAG] 未能连接到 Neo4j，图数据库功能已禁用。请检查 Neo4j 是否正在运行以及配置是否正确。", file=sys.stderr)
-                    _graph = None
-                    GRAG_ENABLED = False
-                    _graph_connection_failed = True
-                except Exception as e:
-                    print(f"[GRAG] Neo4j连接失败: {e}", file=sys.stderr)
-                    _graph = None
-                    GRAG_ENABLED = False
-                    _graph_connection_failed = True
-            else:
-                print(f"[GRAG] GRAG未启用或配置不完整: enabled={grag_enabled}, uri={neo4j_uri}")
+            grag = config.grag
+            if not (grag.enabled and grag.neo4j_uri and grag.neo4j_user and grag.neo4j_password):
+                print(f"[GRAG] GRAG未启用或配置不完整: enabled={grag.enabled}, uri={grag.neo4j_uri}")
+                GRAG_ENABLED = False
+                _graph_connection_failed = True
+                return None
+
+            client = get_neo4j_client(grag.neo4j_uri, grag.neo4j_user, grag.neo4j_password)
+            if not client.verify_connectivity_sync():
+                print("[GRAG] 未能连接到 Neo4j，图数据库功能已禁用。请检查 Neo4j 是否正在运行以及配置是否正确。", file=sys.stderr)
                 GRAG_ENABLED = False
                 _graph_connection_failed = True
+                return None
+
+            NEO4J_DATABASE = grag.neo4j_database or None
+            print("[GRAG] 成功连接到 Neo4j。")
+            GRAG_ENABLED = True
+            ensure_fulltext_index(client)
+            _graph = client
         except Exception as e:
-            print(f"[GRAG] 无法加载配置: {e}", file=sys.stderr)
+            print(f"[GRAG] Neo4j连接失败: {e}", file=sys.stderr)
             GRAG_ENABLED = False
             _graph_connection_failed = True
 
     return _graph
 
 
+async def get_graph_async() -> Optional[Neo4jClient]:
+    """get_graph 的异步版本：仅首次连接检测放到线程中，之后直接返回"""
+    if _graph_connection_failed or _graph is not None:
+        return _graph
+    return await asyncio.to_thread(get_graph)
+
+
 logger = logging.getLogger(__name__)
 
 def _get_quintuples_file() -> str:
@@ -146,67 +79,213 @@ def _get_quintuples_file() -> str:
 QUINTUPLES_FILE = _get_quintuples_file()
 
 
-def load_quintuples():
-    try:
-        with open(QUINTUPLES_FILE, 'r', encoding='utf-8') as f:
-            return set(tuple(t) for t in _json.load(f))
-    except FileNotFoundError:
-        return set()
+_quintuple_store = None
+_quintuple_store_lock = threading.Lock()
+
+
+def get_quintuple_store():
+    """获取本地五元组存储（按 config.grag.local_store 选择引擎，进程内常驻）"""
+    global _quintuple_store
+    with _quintuple_store_lock:
+        if _quintuple_store is None:
+            from .quintuple_store import SQLITE_FILENAME, JsonlQuintupleStore, SqliteQuintupleStore
+            try:
+                from system.config import config
+                engine = config.grag.local_store
+            except Exception:
+                engine = "jsonl"
+            if engine == "sqlite":
+                db_path = os.path.join(os.path.dirname(QUINTUPLES_FILE), SQLITE_FILENAME)
+                _quintuple_store = SqliteQuintupleStore(db_path, legacy_snapshot_path=QUINTUPLES_FILE)
+            else:
+                _quintuple_store = JsonlQuintupleStore(QUINTUPLES_FILE)
+            atexit.register(_quintuple_store.close)
+        return _quintuple_store
 
 
-def save_quintuples(quintuples):
-    # 确保目录存在
-    import os
-    os.makedirs(os.path.dirname(QUINTUPLES_FILE), exist_ok=True)
-    
-    with open(QUINTUPLES_FILE, 'w', encoding='utf-8') as f:
-        _json.dump(list(quintuples), f, ensure_ascii=False, indent=2)
+def load_quintuples():
+    return get_quintuple_store().all()
+
+
+# 批量写入参数
+NEO4J_WRITE_BATCH_SIZE = 500         # 单个事务最多写入的五元组数
+WRITE_BUFFER_FLUSH_INTERVAL = 2.0    # 写缓冲最长滞留时间（秒）
+WRITE_BUFFER_MAX_PENDING = 10000     # 写缓冲上限，超过后由写入方同步刷新（背压）
+
+
+def _rel_type_literal(rel: str) -> str:
+    """关系类型不能参数化，用反引号转义后拼入 Cypher"""
+    return "`" + str(rel).replace("`", "``") + "`"
+
+
+def _write_quintuples_batch(graph, quintuples) -> int:
+    """在一个事务内批量写入五元组，返回写入条数
+
+    同一关系类型的五元组合并为一条 UNWIND ... MERGE 语句（关系类型无法作为参数传递），
+    整批一次提交，替代逐条三次 merge 往返。
+    """
+    rows_by_rel = {}
+    written = 0
+    for quintuple in quintuples:
+        head, head_type, rel, tail, tail_type = quintuple
+        if not head or not tail or not rel:
+            logger.warning(f"跳过无效五元组，head、rel或tail为空: {tuple(quintuple)}")
+            continue
+        rows_by_rel.setdefault(rel, []).append({
+            "head": head, "head_type": head_type,
+            "tail": tail, "tail_type": tail_type,
+        })
+        written += 1
+
+    if not rows_by_rel:
+        return 0
+
+    statements = [(
+        "UNWIND $rows AS row "
+        "MERGE (h:Entity {name: row.head}) SET h.entity_type = row.head_type "
+        "MERGE (t:Entity {name: row.tail}) SET t.entity_type = row.tail_type "
+        f"MERGE (h)-[r:{_rel_type_literal(rel)}]->(t) "
+        "SET r.head_type = row.head_type, r.tail_type = row.tail_type",
+        {"rows": rows},
+    ) for rel, rows in rows_by_rel.items()]
+    graph.run_in_transaction_sync(statements, database=NEO4J_DATABASE)
+    return written
+
+
+def _write_quintuples_to_graph(graph, quintuples) -> int:
+    """按 NEO4J_WRITE_BATCH_SIZE 分批写入，返回成功写入条数（失败批次记录日志后跳过）"""
+    quintuples = list(quintuples)
+    success_count = 0
+    for i in range(0, len(quintuples), NEO4J_WRITE_BATCH_SIZE):
+        batch = quintuples[i:i + NEO4J_WRITE_BATCH_SIZE]
+        try:
+            success_count += _write_quintuples_batch(graph, batch)
+        except Exception as e:
+            logger.error(f"批量存储五元组失败（{len(batch)} 条）: {e}")
+    return success_count
+
+
+class QuintupleWriteBuffer:
+    """Neo4j 写缓冲：攒够 batch_size 条或最早一条滞留超过 flush_interval 秒即批量写入
+
+    后台线程负责定时刷新；待写条数超过 max_pending 时由写入方同步刷新，缓冲区大小有界。
+    五元组在入缓冲前已持久化到文件，写图失败只记录日志。
+    """
+
+    def __init__(self, batch_size: int = NEO4J_WRITE_BATCH_SIZE,
+                 flush_interval: float = WRITE_BUFFER_FLUSH_INTERVAL,
+                 max_pending: int = WRITE_BUFFER_MAX_PENDING):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._pending = []
+        self._oldest = 0.0  # 最早一条待写五元组的入队时间
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()  # 保证同一时刻只有一个刷新在写图
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="quintuple-write-buffer", daemon=True)
+        self._thread.start()
+
+    def add(self, quintuples):
+        with self._cond:
+            was_empty = not self._pending
+            if was_empty:
+                self._oldest = time.monotonic()
+            self._pending.extend(quintuples)
+            overflow = len(self._pending) >= self.max_pending
+            if was_empty or len(self._pending) >= self.batch_size:
+                self._cond.notify()  # 唤醒后台线程开始计时或立即刷新
+        if overflow:
+            self.flush()
+
+    def _take(self):
+        with self._cond:
+            items, self._pending = self._pending, []
+            return items
+
+    def flush(self) -> int:
+        """立即写入全部待写五元组，返回写入条数"""
+        with self._flush_lock:
+            items = self._take()
+            if not items:
+                return 0
+            graph = get_graph()
+            if graph is None:
+                logger.info(f"跳过Neo4j存储（未启用），丢弃 {len(items)} 个待写五元组")
+                return 0
+            written = _write_quintuples_to_graph(graph, items)
+            logger.info(f"批量写入 {written}/{len(items)} 个五元组到Neo4j")
+            return written
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._closed:
+                    if len(self._pending) >= self.batch_size:
+                        break
+                    if self._pending:
+                        remaining = self._oldest + self.flush_interval - time.monotonic()
+                        if remaining <= 0:
+                            break
+                        self._cond.wait(remaining)
+                    else:
+                        self._cond.wait()
+                closed = self._closed
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"五元组写缓冲刷新失败: {e}")
+            if closed:
+                return
+
+    def close(self):
+        """刷新剩余五元组并停止后台线程"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self._thread.join(timeout=30)
+
+    def __len__(self):
+        with self._cond:
+            return len(self._pending)
+
+
+_write_buffer: Optional[QuintupleWriteBuffer] = None
+_write_buffer_lock = threading.Lock()
+
+
+def get_write_buffer() -> QuintupleWriteBuffer:
+    """获取全局写缓冲（首次调用时创建，进程退出前自动刷新）"""
+    global _write_buffer
+    with _write_buffer_lock:
+        if _write_buffer is None:
+            _write_buffer = QuintupleWriteBuffer()
+            atexit.register(_write_buffer.close)
+        return _write_buffer
+
+
+def _persist_quintuples(new_quintuples):
+    # 只追加此前不存在的五元组（存储内部常驻去重集合）
+    get_quintuple_store().add(new_quintuples)
 
 
 def store_quintuples(new_quintuples) -> bool:
-    """存储五元组到文件和Neo4j，返回是否成功"""
+    """存储五元组到文件和Neo4j（同步批量写入），返回是否成功"""
     try:
-        all_quintuples = load_quintuples()
-        all_quintuples.update(new_quintuples)  # 集合自动去重
+        new_quintuples = [tuple(q) for q in new_quintuples]
 
         # 持久化到文件
-        save_quintuples(all_quintuples)
+        _persist_quintuples(new_quintuples)
 
         # 获取graph实例（延迟加载）
         _graph = get_graph()
 
         # 同步更新Neo4j图谱数据库（仅在graph可用时）
-        success = True
         if _graph is not None:
-            success_count = 0
-            for head, head_type, rel, tail, tail_type in new_quintuples:
-                if not head or not tail:
-                    logger.warning(f"跳过无效五元组，head或tail为空: {(head, head_type, rel, tail, tail_type)}")
-                    continue
-
-                try:
-                    # 创建带类型的节点
-                    h_node = Node("Entity", name=head, entity_type=head_type)
-                    t_node = Node("Entity", name=tail, entity_type=tail_type)
-
-                    # 创建关系，保存主体和客体类型信息
-                    r = Relationship(h_node, rel, t_node, head_type=head_type, tail_type=tail_type)
-
-                    # 合并节点时使用name和entity_type作为唯一标识
-                    _graph.merge(h_node, "Entity", "name")
-                    _graph.merge(t_node, "Entity", "name")
-                    _graph.merge(r)
-                    success_count += 1
-                except Exception as e:
-                    logger.error(f"存储五元组失败: {head}-{rel}-{tail}, 错误: {e}")
-                    success = False
-
+            success_count = _write_quintuples_to_graph(_graph, new_quintuples)
             logger.info(f"成功存储 {success_count}/{len(new_quintuples)} 个五元组到Neo4j")
             # 如果至少成功存储了一个五元组，就认为是成功的
-            if success_count > 0:
-                return True
-            else:
-                return False
+            return success_count > 0
         else:
             logger.info(f"跳过Neo4j存储（未启用），保存 {len(new_quintuples)} 个五元组到文件")
             return True  # 文件存储成功也算成功
@@ -214,29 +293,177 @@ def store_quintuples(new_quintuples) -> bool:
         logger.error(f"存储五元组失败: {e}")
         return False
 
+
+def enqueue_quintuples(new_quintuples) -> bool:
+    """存储五元组到文件，Neo4j 写入交给写缓冲批量完成（不等待写图），返回文件存储是否成功"""
+    try:
+        new_quintuples = [tuple(q) for q in new_quintuples]
+        _persist_quintuples(new_quintuples)
+        if get_graph() is not None:
+            get_write_buffer().add(new_quintuples)
+        return True
+    except Exception as e:
+        logger.error(f"存储五元组失败: {e}")
+        return False
+
+
+def flush_quintuple_writes() -> int:
+    """立即写入写缓冲中的全部五元组"""
+    if _write_buffer is None:
+        return 0
+    return _write_buffer.flush()
+
+
 def get_all_quintuples():
     return load_quintuples()
 
 
+FULLTEXT_INDEX_NAME = "entity_fulltext"
+KEYWORD_RESULTS_PER_KEYWORD = 5   # 每个关键词贡献的结果条数（总上限 = 关键词数 × 5）
+REL_TYPES_CACHE_TTL = 60.0        # 关系类型列表缓存时间（秒）
+
+_fulltext_ready: bool = False
+_rel_types_cache: tuple = (0.0, [])  # (获取时间, 关系类型列表)
+
+
+def ensure_fulltext_index(graph) -> bool:
+    """创建 Entity.name / entity_type 全文索引（已存在则跳过），连接建立后调用一次"""
+    global _fulltext_ready
+    statements = (
+        # Neo4j 4.3+
+        f"CREATE FULLTEXT INDEX {FULLTEXT_INDEX_NAME} IF NOT EXISTS "
+        f"FOR (e:Entity) ON EACH [e.name, e.entity_type]",
+        # Neo4j 4.0~4.2 只能用过程创建，索引已存在时会报错，下面再确认一次
+        f"CALL db.index.fulltext.createNodeIndex('{FULLTEXT_INDEX_NAME}', ['Entity'], ['name', 'entity_type'])",
+    )
+    for statement in statements:
+        try:
+            graph.run_sync(statement, database=NEO4J_DATABASE, write=True)
+            _fulltext_ready = True
+            return True
+        except Exception as e:
+            logger.debug(f"[GRAG] 创建全文索引失败（{statement[:40]}...）: {e}")
+    try:
+        graph.run_sync(f"CALL db.index.fulltext.queryNodes('{FULLTEXT_INDEX_NAME}', 'x') YIELD node RETURN node LIMIT 1",
+                       database=NEO4J_DATABASE)
+        _fulltext_ready = True
+    except Exception as e:
+        logger.warning(f"[GRAG] 全文索引不可用，关键词检索退化为 CONTAINS 扫描: {e}")
+        _fulltext_ready = False
+    return _fulltext_ready
+
+
+def _lucene_phrase(keyword: str) -> str:
+    """把关键词转成 Lucene 短语查询（转义引号与反斜杠，其余特殊字符在短语内无效）"""
+    return '"' + keyword.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+async def _relationship_types(graph) -> list:
+    """库中已有的关系类型（带缓存）；关系类型无法走全文索引，在此处做子串匹配"""
+    global _rel_types_cache
+    fetched_at, rel_types = _rel_types_cache
+    if time.monotonic() - fetched_at > REL_TYPES_CACHE_TTL:
+        try:
+            rows = await graph.run("CALL db.relationshipTypes()", database=NEO4J_DATABASE)
+            rel_types = [row["relationshipType"] for row in rows]
+        except Exception as e:
+            logger.debug(f"[GRAG] 获取关系类型失败: {e}")
+        _rel_types_cache = (time.monotonic(), rel_types)
+    return rel_types
+
+
+_KEYWORD_RETURN = """
+WITH r, count(DISTINCT kw) AS hits, max(score) AS score
+ORDER BY hits DESC, score DESC
+LIMIT $limit
+RETURN startNode(r).name AS head, startNode(r).entity_type AS head_type, type(r) AS relation,
+       endNode(r).name AS tail, endNode(r).entity_type AS tail_type
+"""
+
+# 全文索引命中实体的关系 + 关系类型命中的关系，按命中关键词数、相关度排序
+_FULLTEXT_KEYWORD_QUERY = """
+UNWIND $keywords AS item
+CALL {
+    WITH item
+    CALL db.index.fulltext.queryNodes($index, item.query) YIELD node, score
+    MATCH (node)-[r]-(:Entity)
+    RETURN r, score
+    UNION
+    WITH item
+    MATCH (:Entity)-[r]->(:Entity)
+    WHERE size(item.rel_types) > 0 AND type(r) IN item.rel_types
+    RETURN r, 0.0 AS score
+}
+WITH r, item.raw AS kw, score
+""" + _KEYWORD_RETURN
+
+# 全文索引不可用时的兜底：仍是一条参数化语句，而不是每个关键词拼接一条
+_CONTAINS_KEYWORD_QUERY = """
+UNWIND $keywords AS item
+MATCH (e1:Entity)-[r]->(e2:Entity)
+WHERE e1.name CONTAINS item.raw OR e2.name CONTAINS item.raw OR type(r) CONTAINS item.raw
+   OR e1.entity_type CONTAINS item.raw OR e2.entity_type CONTAINS item.raw
+WITH r, item.raw AS kw, 0.0 AS score
+""" + _KEYWORD_RETURN
+
+
 def query_graph_by_keywords(keywords):
+    """按关键词检索相关五元组，命中关键词越多越靠前，结果去重
+
+    Neo4j 可用时用一条参数化查询（全文索引 + 关系类型匹配）检索全部关键词；
+    未启用 Neo4j 时查询本地五元组存储的关键词索引。
+    """
+    keywords, limit = _normalize_keywords(keywords)
+    if not keywords:
+        return []
+    graph = get_graph()
+    if graph is None:
+        return get_quintuple_store().search(keywords, limit)
+    return graph.wait(_query_graph(graph, keywords, limit))
+
+
+async def query_graph_by_keywords_async(keywords):
+    """query_graph_by_keywords 的异步版本，查询在共享驱动的 IO 循环上执行，不占用线程池"""
+    keywords, limit = _normalize_keywords(keywords)
+    if not keywords:
+        return []
+    graph = await get_graph_async()
+    if graph is None:
+        return get_quintuple_store().search(keywords, limit)
+    return await _query_graph(graph, keywords, limit)
+
+
+def _normalize_keywords(keywords):
+    keywords = list(dict.fromkeys(str(k).strip() for k in keywords if k is not None and str(k).strip()))
+    return keywords, KEYWORD_RESULTS_PER_KEYWORD * len(keywords)
+
+
+async def _query_graph(graph, keywords, limit):
+    records = None
+    if _fulltext_ready:
+        rel_types = await _relationship_types(graph)
+        params = [{
+            "raw": kw,
+            "query": _lucene_phrase(kw),
+            "rel_types": [t for t in rel_types if kw in t],
+        } for kw in keywords]
+        try:
+            records = await graph.run(_FULLTEXT_KEYWORD_QUERY,
+                                      {"keywords": params, "index": FULLTEXT_INDEX_NAME, "limit": limit},
+                                      database=NEO4J_DATABASE)
+        except Exception as e:
+            logger.warning(f"[GRAG] 全文索引查询失败，改用 CONTAINS 查询: {e}")
+    if records is None:
+        records = await graph.run(_CONTAINS_KEYWORD_QUERY,
+                                  {"keywords": [{"raw": kw} for kw in keywords], "limit": limit},
+                                  database=NEO4J_DATABASE)
+
     results = []
-    _graph = get_graph()
-    if _graph is not None:
-        for kw in keywords:
-            query = f"""
-            MATCH (e1:Entity)-[r]->(e2:Entity)
-            WHERE e1.name CONTAINS '{kw}' OR e2.name CONTAINS '{kw}' OR type(r) CONTAINS '{kw}'
-               OR e1.entity_type CONTAINS '{kw}' OR e2.entity_type CONTAINS '{kw}'
-            RETURN e1.name, e1.entity_type, type(r), e2.name, e2.entity_type
-            LIMIT 5
-            """
-            res = _graph.run(query).data()
-            for record in res:
-                results.append((
-                    record['e1.name'],
-                    record['e1.entity_type'],
-                    record['type(r)'],
-                    record['e2.name'],
-                    record['e2.entity_type']
-                ))
+    seen = set()
+    for record in records:
+        quintuple = (record["head"], record["head_type"], record["relation"],
+                     record["tail"], record["tail_type"])
+        if quintuple not in seen:
+            seen.add(quintuple)
+            results.append(quintuple)
     return results
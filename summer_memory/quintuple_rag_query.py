@@ -25,7 +25,50 @@ def set_context(texts):
     recent_context = texts[:context_length]  # 限制上下文长度
     logger.info(f"更新查询上下文: {len(recent_context)} 条记录")
 
+def extract_keywords_local(user_question, limit: int = 10):
+    """在问题中匹配本地五元组存储里已知的实体 / 关系词（进程内自动机，无网络往返）"""
+    try:
+        from .quintuple_graph import get_quintuple_store
+        return get_quintuple_store().match_entities(user_question, limit)
+    except Exception as e:
+        logger.error(f"本地实体匹配失败: {e}")
+        return []
+
+
 def query_knowledge(user_question):
+    """提取关键词并查询知识图谱
+
+    优先用本地实体词表匹配问题中的已知实体；没有命中且开启了 llm_keyword_fallback 时，
+    才调用 LLM 提取关键词。
+    """
+    keywords = extract_keywords_local(user_question)
+    if keywords:
+        logger.info(f"本地匹配关键词: {keywords}")
+        try:
+            return _answer_with_keywords(keywords)
+        except Exception as e:
+            logger.error(f"查询过程中发生未知错误: {e}")
+            return "查询过程中发生未知错误，请稍后重试。"
+    if not getattr(config.grag, 'llm_keyword_fallback', True):
+        logger.info("本地未匹配到已知实体，且未启用 LLM 关键词提取")
+        return "未在知识图谱中找到相关信息。"
+    return _query_knowledge_with_llm(user_question)
+
+
+def _answer_with_keywords(keywords):
+    from .quintuple_graph import query_graph_by_keywords
+    quintuples = query_graph_by_keywords(keywords)
+    if not quintuples:
+        logger.info(f"未找到相关五元组: {keywords}")
+        return "未在知识图谱中找到相关信息。"
+
+    answer = "我在知识图谱中找到以下相关信息：\n\n"
+    for h, h_type, r, t, t_type in quintuples:
+        answer += f"- {h}({h_type}) —[{r}]→ {t}({t_type})\n"
+    return answer
+
+
+def _query_knowledge_with_llm(user_question):
     """使用 DeepSeek API 提取关键词并查询知识图谱"""
     context_str = "\n".join(recent_context) if recent_context else "无上下文"
     prompt = (
@@ -92,16 +135,7 @@ def query_knowledge(user_question):
             return "未找到相关关键词，请提供更具体的问题。"
 
         logger.info(f"提取关键词: {keywords}")
-        from .quintuple_graph import query_graph_by_keywords
-        quintuples = query_graph_by_keywords(keywords)
-        if not quintuples:
-            logger.info(f"未找到相关五元组: {keywords}")
-            return "未在知识图谱中找到相关信息。"
-
-        answer = "我在知识图谱中找到以下相关信息：\n\n"
-        for h, h_type, r, t, t_type in quintuples:
-            answer += f"- {h}({h_type}) —[{r}]→ {t}({t_type})\n"
-        return answer
+        return _answer_with_keywords(keywords)
 
     except requests.exceptions.HTTPError as e:
         logger.error(f"DeepSeek API HTTP 错误: {e}")
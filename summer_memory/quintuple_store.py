@@ -0,0 +1,448 @@
+"""
+五元组本地存储 — 追加日志 + 常驻内存去重集合
+
+取代每轮对话都整体读取、整体重写 quintuples.json 的做法：
+  - knowledge_graph/quintuples.json        快照（与旧格式兼容：五元组列表）
+  - knowledge_graph/quintuples.log.jsonl   追加日志，每行一个新五元组
+首次访问时读取快照并回放日志，之后全部五元组常驻内存集合；
+写入只追加真正新增的五元组（O(新增)），日志累计到阈值后合并回快照
+（临时文件 + fsync + os.replace 原子替换，合并中途崩溃时日志回放靠集合去重，不会重复）。
+
+可选 SQLite 后端（config.grag.local_store = "sqlite"）：五元组存入带 head / tail / relation
+索引的表，支持按实体或关系直接查询；首次启用时自动导入已有的 JSON 快照与日志。
+
+两种后端共用常驻内存的本地检索结构：KeywordIndex（关键词子串检索，Neo4j 未启用时使用）
+与 EntityMatcher（在用户问题中直接匹配已知实体，省去 LLM 关键词提取）。
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+Quintuple = Tuple[str, str, str, str, str]
+
+# 日志累计多少条后合并回快照
+DEFAULT_COMPACT_EVERY = 2000
+
+# 实体词表中参与匹配的最短词长（单字词误命中太多）
+MIN_ENTITY_LENGTH = 2
+
+LOG_SUFFIX = ".log.jsonl"
+SQLITE_FILENAME = "quintuples.db"
+
+
+def _normalize(quintuples: Iterable) -> List[Quintuple]:
+    """转为元组；缺失的字段（如未识别的实体类型 None）记为 ""，与 SQLite 的 NOT NULL 列一致"""
+    return [
+        tuple("" if field is None else field for field in q)
+        for q in quintuples if q is not None and len(q) == 5
+    ]
+
+
+def _grams(text: str) -> Set[str]:
+    """字符二元组（单字词取单字），用于子串候选过滤"""
+    if len(text) < 2:
+        return {text} if text else set()
+    return {text[i:i + 2] for i in range(len(text) - 1)}
+
+
+class KeywordIndex:
+    """五元组关键词索引（Neo4j 不可用时的本地检索）
+
+    对 head / head_type / relation / tail / tail_type 的每个不同取值建立字符二元组倒排，
+    查询时先用关键词的二元组求交得到候选取值，再校验子串包含（与 Cypher CONTAINS 语义一致），
+    避免逐条扫描全部五元组。
+    """
+
+    def __init__(self):
+        self._items: List[Quintuple] = []
+        self._term_items: Dict[str, List[int]] = {}  # 字段取值 -> 五元组下标
+        self._gram_terms: Dict[str, Set[str]] = {}   # 二元组 -> 含该二元组的字段取值
+        self._single_chars: Dict[str, Set[str]] = {}  # 单字 -> 单字取值（二元组无法覆盖）
+
+    def add(self, quintuple: Quintuple):
+        item_id = len(self._items)
+        self._items.append(quintuple)
+        for term in set(quintuple):
+            if not isinstance(term, str) or not term:
+                continue
+            ids = self._term_items.get(term)
+            if ids is None:
+                ids = self._term_items[term] = []
+                if len(term) == 1:
+                    self._single_chars.setdefault(term, set()).add(term)
+                for gram in _grams(term):
+                    self._gram_terms.setdefault(gram, set()).add(term)
+            ids.append(item_id)
+
+    def _matching_terms(self, keyword: str) -> Set[str]:
+        if len(keyword) == 1:
+            # 单字关键词：含该字的所有取值 = 含该字的二元组对应的取值 + 单字取值
+            terms = set(self._single_chars.get(keyword, ()))
+            for gram, gram_terms in self._gram_terms.items():
+                if keyword in gram:
+                    terms |= gram_terms
+            return terms
+        candidates: Optional[Set[str]] = None
+        for gram in _grams(keyword):
+            gram_terms = self._gram_terms.get(gram)
+            if not gram_terms:
+                return set()
+            candidates = set(gram_terms) if candidates is None else candidates & gram_terms
+            if not candidates:
+                return set()
+        return {term for term in candidates or () if keyword in term}
+
+    def search(self, keywords: Iterable[str], limit: int = 20) -> List[Quintuple]:
+        """返回命中关键词数最多的五元组（同分时较新的在前）"""
+        hits: Dict[int, int] = {}
+        for keyword in {str(k).strip() for k in keywords if str(k).strip()}:
+            matched: Set[int] = set()
+            for term in self._matching_terms(keyword):
+                matched.update(self._term_items[term])
+            for item_id in matched:
+                hits[item_id] = hits.get(item_id, 0) + 1
+        ranked = sorted(hits, key=lambda i: (-hits[i], -i))
+        return [self._items[i] for i in ranked[:limit]]
+
+
+class EntityMatcher:
+    """实体词表 Aho-Corasick 自动机，在用户问题中找出已知的实体 / 关系 / 实体类型
+
+    词表取自五元组的全部字段，随五元组写入增量插入 trie；失配指针在插入后的
+    下一次匹配时统一重建（只重建一次，O(词表字符数)），匹配本身 O(文本长度 + 命中数)。
+    英文按小写匹配，返回词表中的原始写法。
+    """
+
+    def __init__(self):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[Optional[str]] = [None]  # 以该节点结尾的词（小写形式）
+        self._terms: Dict[str, str] = {}            # 小写形式 -> 原始写法
+        self._dirty = False
+
+    def __len__(self) -> int:
+        return len(self._terms)
+
+    def add(self, term: str):
+        if not isinstance(term, str):
+            return
+        term = term.strip()
+        key = term.lower()
+        if len(key) < MIN_ENTITY_LENGTH or key in self._terms:
+            return
+        self._terms[key] = term
+        node = 0
+        for ch in key:
+            nxt = self._goto[node].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[node][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append(None)
+            node = nxt
+        self._output[node] = key
+        self._dirty = True
+
+    def add_quintuple(self, quintuple: Quintuple):
+        for term in quintuple:
+            self.add(term)
+
+    def _build_failure_links(self):
+        queue = list(self._goto[0].values())
+        for child in queue:
+            self._fail[child] = 0
+        head = 0
+        while head < len(queue):
+            node = queue[head]
+            head += 1
+            for ch, child in self._goto[node].items():
+                fail = self._fail[node]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[child] = self._goto[fail].get(ch, 0)
+                queue.append(child)
+        self._dirty = False
+
+    def match(self, text: str, limit: int = 10) -> List[str]:
+        """返回文本中出现的词表词：按出现位置排序，重叠时保留最长的那个，去重"""
+        if not text or not self._terms:
+            return []
+        if self._dirty:
+            self._build_failure_links()
+        spans: List[Tuple[int, int, str]] = []
+        node = 0
+        for end, ch in enumerate(text.lower(), 1):
+            while node and ch not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(ch, 0)
+            out = node
+            while out:
+                term = self._output[out]
+                if term is not None:
+                    spans.append((end - len(term), end, term))
+                out = self._fail[out]
+        # 最左最长、互不重叠（“北京大学”命中时不再单独返回“北京”“大学”）
+        spans.sort(key=lambda span: (span[0], span[0] - span[1]))
+        result: List[str] = []
+        covered = 0
+        for start, end, term in spans:
+            if start < covered:
+                continue
+            covered = end
+            original = self._terms[term]
+            if original not in result:
+                result.append(original)
+                if len(result) >= limit:
+                    break
+        return result
+
+
+class _ResidentQuintupleStore:
+    """常驻内存的去重集合 + 关键词索引；子类负责加载与持久化"""
+
+    def __init__(self):
+        self._quintuples: Optional[Set[Quintuple]] = None
+        self._index: Optional[KeywordIndex] = None
+        self._matcher: Optional[EntityMatcher] = None
+        self._lock = threading.Lock()
+
+    def _load(self) -> Set[Quintuple]:
+        raise NotImplementedError
+
+    def _persist(self, added: List[Quintuple]):
+        raise NotImplementedError
+
+    def _after_add(self):
+        """新增五元组已写入内存集合后调用（JSONL 存储在此合并快照）"""
+
+    def _ensure_loaded(self) -> Set[Quintuple]:
+        if self._quintuples is None:
+            self._quintuples = self._load()
+        return self._quintuples
+
+    def all(self) -> Set[Quintuple]:
+        with self._lock:
+            return set(self._ensure_loaded())
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._ensure_loaded())
+
+    def __contains__(self, quintuple) -> bool:
+        with self._lock:
+            return tuple(quintuple) in self._ensure_loaded()
+
+    def add(self, quintuples: Iterable) -> List[Quintuple]:
+        """写入五元组，返回其中真正新增（此前不存在）的部分"""
+        with self._lock:
+            existing = self._ensure_loaded()
+            added = [q for q in dict.fromkeys(_normalize(quintuples)) if q not in existing]
+            if added:
+                # 先落盘再更新内存：持久化失败时集合与索引中不会出现未保存的五元组，下次写入会重试
+                self._persist(added)
+                existing.update(added)
+                for quintuple in added:
+                    if self._index is not None:
+                        self._index.add(quintuple)
+                    if self._matcher is not None:
+                        self._matcher.add_quintuple(quintuple)
+                self._after_add()
+            return added
+
+    def search(self, keywords: Iterable[str], limit: int = 20) -> List[Quintuple]:
+        """本地关键词检索（索引首次查询时构建，之后随写入增量维护）"""
+        with self._lock:
+            if self._index is None:
+                index = KeywordIndex()
+                for quintuple in self._ensure_loaded():
+                    index.add(quintuple)
+                self._index = index
+            return self._index.search(keywords, limit)
+
+    def match_entities(self, text: str, limit: int = 10) -> List[str]:
+        """在文本中匹配已知实体 / 关系词（自动机首次使用时构建，之后随写入增量维护）"""
+        with self._lock:
+            if self._matcher is None:
+                matcher = EntityMatcher()
+                for quintuple in self._ensure_loaded():
+                    matcher.add_quintuple(quintuple)
+                self._matcher = matcher
+            return self._matcher.match(text, limit)
+
+
+class JsonlQuintupleStore(_ResidentQuintupleStore):
+    """JSON 快照 + 追加日志 + 内存集合"""
+
+    def __init__(self, snapshot_path: str, compact_every: int = DEFAULT_COMPACT_EVERY):
+        super().__init__()
+        self.snapshot_path = Path(snapshot_path)
+        self.log_path = self.snapshot_path.with_name(self.snapshot_path.stem + LOG_SUFFIX)
+        self.compact_every = compact_every
+        self._log_count = 0
+        self._log_needs_newline = False
+
+    def _load(self) -> Set[Quintuple]:
+        quintuples: Set[Quintuple] = set()
+        try:
+            with open(self.snapshot_path, "r", encoding="utf-8") as f:
+                quintuples.update(_normalize(json.load(f)))
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.error(f"读取五元组快照失败 {self.snapshot_path}: {e}")
+        log_count = 0
+        try:
+            with open(self.log_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    # 崩溃时写了一半的尾行没有换行符，下次追加前先补上，避免与新记录粘连
+                    self._log_needs_newline = not line.endswith("\n")
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        quintuples.update(_normalize([json.loads(line)]))
+                        log_count += 1
+                    except json.JSONDecodeError:
+                        logger.warning(f"跳过损坏的五元组日志行: {line[:80]}")
+        except FileNotFoundError:
+            pass
+        self._log_count = log_count
+        return quintuples
+
+    def _persist(self, added: List[Quintuple]):
+        self._append_log(added)
+
+    def _after_add(self):
+        # 快照取自内存集合，必须在新增五元组加入集合之后合并，否则截断日志会丢数据
+        if self._log_count >= self.compact_every:
+            self._compact_locked()
+
+    def _append_log(self, quintuples: List[Quintuple]):
+        self.log_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.log_path, "a", encoding="utf-8") as f:
+            if self._log_needs_newline:
+                f.write("\n")
+                self._log_needs_newline = False
+            f.write("".join(json.dumps(list(q), ensure_ascii=False) + "\n" for q in quintuples))
+            f.flush()
+            os.fsync(f.fileno())
+        self._log_count += len(quintuples)
+
+    def compact(self):
+        """把日志合并回快照并清空日志"""
+        with self._lock:
+            self._ensure_loaded()
+            self._compact_locked()
+
+    def _compact_locked(self):
+        self.snapshot_path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=str(self.snapshot_path.parent), suffix=".tmp",
+                                        prefix=f".{self.snapshot_path.stem}_")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump([list(q) for q in self._quintuples], f, ensure_ascii=False)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.snapshot_path)
+        except BaseException:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            raise
+        # 快照已包含全部五元组，此后截断日志；截断前崩溃只会导致重复回放（由集合去重）
+        with open(self.log_path, "w", encoding="utf-8"):
+            pass
+        self._log_count = 0
+        self._log_needs_newline = False
+        logger.info(f"五元组日志已合并到快照: {len(self._quintuples)} 条")
+
+    def close(self):
+        with self._lock:
+            if self._quintuples is not None and self._log_count:
+                self._compact_locked()
+
+
+class SqliteQuintupleStore(_ResidentQuintupleStore):
+    """SQLite 表存储（head / tail / relation 索引）+ 内存集合"""
+
+    def __init__(self, db_path: str, legacy_snapshot_path: Optional[str] = None):
+        super().__init__()
+        self.db_path = Path(db_path)
+        self.legacy_snapshot_path = legacy_snapshot_path
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            is_new = not self.db_path.exists()
+            conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS quintuples (
+                    head TEXT NOT NULL,
+                    head_type TEXT NOT NULL,
+                    relation TEXT NOT NULL,
+                    tail TEXT NOT NULL,
+                    tail_type TEXT NOT NULL,
+                    PRIMARY KEY (head, head_type, relation, tail, tail_type)
+                ) WITHOUT ROWID;
+                CREATE INDEX IF NOT EXISTS idx_quintuples_head ON quintuples (head);
+                CREATE INDEX IF NOT EXISTS idx_quintuples_tail ON quintuples (tail);
+                CREATE INDEX IF NOT EXISTS idx_quintuples_relation ON quintuples (relation);
+                """
+            )
+            self._conn = conn
+            if is_new and self.legacy_snapshot_path:
+                # 首次启用：导入已有的 JSON 快照与追加日志
+                legacy = JsonlQuintupleStore(self.legacy_snapshot_path).all()
+                if legacy:
+                    self._insert(legacy)
+                    logger.info(f"已从 JSON 存储导入 {len(legacy)} 个五元组到 SQLite")
+        return self._conn
+
+    def _insert(self, quintuples: Iterable[Quintuple]):
+        conn = self._conn
+        with conn:
+            conn.executemany("INSERT OR IGNORE INTO quintuples VALUES (?, ?, ?, ?, ?)", quintuples)
+
+    def _load(self) -> Set[Quintuple]:
+        return set(self._connect().execute("SELECT * FROM quintuples"))
+
+    def _persist(self, added: List[Quintuple]):
+        self._insert(added)
+
+    def find(self, entity: Optional[str] = None, relation: Optional[str] = None,
+             limit: int = 50) -> List[Quintuple]:
+        """按实体（head 或 tail 精确匹配）和/或关系查询，走索引"""
+        clauses, params = [], []
+        if entity is not None:
+            clauses.append("(head = ? OR tail = ?)")
+            params += [entity, entity]
+        if relation is not None:
+            clauses.append("relation = ?")
+            params.append(relation)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        with self._lock:
+            conn = self._connect()
+            return [tuple(r) for r in conn.execute(f"SELECT * FROM quintuples {where} LIMIT ?", (*params, limit))]
+
+    def compact(self):
+        """SQLite 无需合并，保持接口一致"""
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
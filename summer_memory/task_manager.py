@@ -2,8 +2,9 @@ import asyncio
 import logging
 import threading
 import time
-from typing import Dict, List, Optional, Callable, Tuple
-from dataclasses import dataclass
+from collections import deque
+from typing import Deque, Dict, List, Optional, Callable, Tuple
+from dataclasses import dataclass, field
 from enum import Enum
 import hashlib
 import traceback
@@ -20,6 +21,16 @@ except ImportError:
 
 logger = logging.getLogger(__name__)
 
+# 微批默认值：攒够 N 轮或等待窗口到期后合并为一次 LLM 提取（batch_size <= 1 关闭微批）
+DEFAULT_BATCH_SIZE = 4
+DEFAULT_BATCH_WINDOW = 1.5  # 秒
+
+# 内存队列满时的处理策略（add_task 不再阻塞等待队列空位）
+OVERFLOW_SPILL = "spill"              # 任务只留在磁盘队列，内存队列有空位时按顺序补回
+OVERFLOW_DROP_OLDEST = "drop_oldest"  # 丢弃内存队列中最早的任务
+OVERFLOW_COALESCE = "coalesce"        # 把新一轮文本合并到最近入队、尚未开始的任务
+OVERFLOW_POLICIES = (OVERFLOW_SPILL, OVERFLOW_DROP_OLDEST, OVERFLOW_COALESCE)
+
 
 class TaskStatus(Enum):
     """任务状态枚举"""
@@ -45,6 +56,7 @@ class ExtractionTask:
     retry_count: int = 0
     max_retries: int = 3
     future: Optional[asyncio.Future] = None
+    coalesced_hashes: List[str] = field(default_factory=list)  # 合并进来的其他轮次文本哈希
 
 
 class QuintupleTaskManager:
@@ -64,19 +76,42 @@ class QuintupleTaskManager:
             self.task_timeout = 30
             self.auto_cleanup_hours = 24
             self.enabled = True
+        try:
+            self.batch_size = config.grag.extraction_batch_size
+            self.batch_window = config.grag.extraction_batch_window
+        except Exception:
+            self.batch_size = DEFAULT_BATCH_SIZE
+            self.batch_window = DEFAULT_BATCH_WINDOW
+        try:
+            self.persist_queue = config.grag.extraction_queue_persist
+            self.overflow_policy = config.grag.extraction_queue_overflow
+        except Exception:
+            self.persist_queue = True
+            self.overflow_policy = OVERFLOW_SPILL
+        if self.overflow_policy not in OVERFLOW_POLICIES:
+            logger.warning(f"未知的队列溢出策略 {self.overflow_policy}，使用 {OVERFLOW_SPILL}")
+            self.overflow_policy = OVERFLOW_SPILL
 
         # 任务存储
         self.tasks: Dict[str, ExtractionTask] = {}
+        self.active_by_hash: Dict[str, str] = {}  # 文本哈希 -> 等待/运行中的任务ID，用于重复检测
         self.task_queue = asyncio.Queue(maxsize=self.max_queue_size)
+        self.spilled: Deque[str] = deque()  # 溢出到磁盘、尚未进入内存队列的任务ID（按入队顺序）
+        self.last_enqueued: Optional[ExtractionTask] = None  # coalesce 策略的合并目标
+        self.durable = None  # DurableTaskQueue，start() 时打开
 
         # 工作协程管理
         self.worker_tasks: List[asyncio.Task] = []
         self.is_running = False
         self.lock = asyncio.Lock()
+        self.collect_lock = asyncio.Lock()  # 同一时刻只有一个工作协程在攒批，避免各自拿走一轮
 
         # 统计信息
         self.completed_tasks = 0
         self.failed_tasks = 0
+        self.extraction_calls = 0  # 实际发起的提取调用次数（一批算一次）
+        self.dropped_tasks = 0     # 溢出丢弃的任务数
+        self.coalesced_tasks = 0   # 溢出合并的轮次数
 
         # 回调函数
         self.on_task_completed: Optional[Callable] = None
@@ -85,7 +120,8 @@ class QuintupleTaskManager:
         # 自动清理任务
         self.cleanup_task: Optional[asyncio.Task] = None
 
-        logger.info(f"任务管理器初始化完成: workers={self.max_workers}, queue_size={self.max_queue_size}")
+        logger.info(f"任务管理器初始化完成: workers={self.max_workers}, queue_size={self.max_queue_size}, "
+                    f"batch={self.batch_size}/{self.batch_window}s")
 
     async def start(self):
         if self.is_running:
@@ -99,6 +135,16 @@ class QuintupleTaskManager:
             # 确保在事件循环中运行
             loop = asyncio.get_running_loop()
 
+            # 打开持久化队列并回放上次未处理完的任务
+            if self.persist_queue and self.durable is None:
+                try:
+                    from .extraction_queue import DurableTaskQueue
+                    self.durable = DurableTaskQueue()
+                    await self._replay_durable()
+                except Exception as e:
+                    logger.error(f"持久化提取队列不可用，仅使用内存队列: {e}")
+                    self.durable = None
+
             # 创建工作协程
             for i in range(self.max_workers):
                 worker_task = loop.create_task(  # 使用当前循环创建任务
@@ -148,6 +194,11 @@ class QuintupleTaskManager:
                 await self.cleanup_task
             except asyncio.CancelledError:
                 pass
+
+        # 未完成的任务保留在磁盘队列中，下次启动时回放
+        if self.durable is not None:
+            self.durable.close()
+            self.durable = None
         logger.warning("任务管理器正在关闭...")
         logger.warning(f"调用栈: {''.join(traceback.format_stack())}")
 
@@ -183,44 +234,141 @@ class QuintupleTaskManager:
             logger.warning("任务管理器未运行，尝试启动...")
             await self.start()  # 确保任务管理器已启动
 
-        # 检查重复任务
-        async with self.lock:
-            for task in self.tasks.values():
-                if task.text_hash == text_hash and task.status in [TaskStatus.PENDING, TaskStatus.RUNNING]:
-                    logger.info(f"发现重复任务: {task.task_id}")
-                    return task.task_id
-
-        # 创建新任务
-        task_id = self._generate_task_id(text)
-        task = ExtractionTask(
-            task_id=task_id,
-            text=text,
-            text_hash=text_hash,
-            status=TaskStatus.PENDING,
-            created_at=time.time(),
-            future=asyncio.Future()
-        )
-
-        # 添加到任务字典
         async with self.lock:
+            # 检查重复任务（哈希索引，O(1)）
+            existing = self.tasks.get(self.active_by_hash.get(text_hash, ""))
+            if existing and existing.status in [TaskStatus.PENDING, TaskStatus.RUNNING]:
+                logger.info(f"发现重复任务: {existing.task_id}")
+                return existing.task_id
+
+            # coalesce 策略：队列已满时并入最近入队、尚未开始的任务
+            merged = self._coalesce(text, text_hash)
+            if merged:
+                return merged
+
+            # 创建新任务并加入任务字典
+            task_id = self._generate_task_id(text)
+            task = ExtractionTask(
+                task_id=task_id,
+                text=text,
+                text_hash=text_hash,
+                status=TaskStatus.PENDING,
+                created_at=time.time(),
+                future=asyncio.Future()
+            )
             self.tasks[task_id] = task
+            self.active_by_hash[text_hash] = task_id
 
         logger.info(f"添加新任务: {task_id} (长度={len(text)})")
 
-        # 将任务放入队列
         try:
-            if self.task_queue.full():
-                logger.warning(f"任务队列已满 ({self.task_queue.qsize()}/{self.max_queue_size})")
-
-            await self.task_queue.put(task)
-            logger.info(f"任务已加入队列: {task_id}")
+            self._persist(task)
+            self._enqueue(task)
             return task_id
         except Exception as e:
             logger.error(f"加入队列失败: {task_id}, 错误: {e}")
             async with self.lock:
-                del self.tasks[task_id]
+                self.tasks.pop(task_id, None)
+                self._release_hash(task)
+            self._unpersist(task)
             raise RuntimeError("加入队列失败")
 
+    def _release_hash(self, task: ExtractionTask):
+        """任务结束后从重复检测索引中移除（调用方持有 self.lock）"""
+        for text_hash in [task.text_hash, *task.coalesced_hashes]:
+            if self.active_by_hash.get(text_hash) == task.task_id:
+                del self.active_by_hash[text_hash]
+
+    def _persist(self, task: ExtractionTask):
+        if self.durable is not None:
+            self.durable.put(task.task_id, task.text, task.text_hash, task.created_at)
+
+    def _unpersist(self, task: ExtractionTask):
+        if self.durable is not None:
+            try:
+                self.durable.remove(task.task_id)
+            except Exception as e:
+                logger.error(f"从持久化队列移除任务失败: {task.task_id}, 错误: {e}")
+
+    def _enqueue(self, task: ExtractionTask):
+        """放入内存队列；队列已满时按溢出策略处理，从不阻塞调用方"""
+        if self.spilled or self.task_queue.full():
+            if self.overflow_policy == OVERFLOW_DROP_OLDEST:
+                self._drop_oldest()
+            else:
+                # spill（coalesce 无法合并时同样暂存）
+                self.spilled.append(task.task_id)
+                logger.warning(f"任务队列已满 ({self.task_queue.qsize()}/{self.max_queue_size})，"
+                               f"任务暂存磁盘队列: {task.task_id} (积压 {len(self.spilled)})")
+                return
+        self.task_queue.put_nowait(task)
+        self.last_enqueued = task
+        logger.info(f"任务已加入队列: {task.task_id}")
+
+    def _refill_from_spill(self):
+        """内存队列有空位时，按顺序补回溢出的任务"""
+        while self.spilled and not self.task_queue.full():
+            task = self.tasks.get(self.spilled.popleft())
+            if task is not None and task.status == TaskStatus.PENDING:
+                self.task_queue.put_nowait(task)
+                self.last_enqueued = task
+
+    def _drop_oldest(self):
+        try:
+            dropped = self.task_queue.get_nowait()
+        except asyncio.QueueEmpty:
+            return
+        self.task_queue.task_done()
+        if dropped.status != TaskStatus.PENDING:
+            return
+        dropped.status = TaskStatus.CANCELLED
+        dropped.error = "任务队列已满，丢弃最早的任务"
+        dropped.completed_at = time.time()
+        self._release_hash(dropped)
+        self._unpersist(dropped)
+        if dropped.future and not dropped.future.done():
+            dropped.future.cancel()
+        self.dropped_tasks += 1
+        logger.warning(f"任务队列已满，丢弃最早的任务: {dropped.task_id}")
+
+    def _coalesce(self, text: str, text_hash: str) -> Optional[str]:
+        """coalesce 策略下把新文本并入最近入队的等待任务，返回其任务ID（调用方持有 self.lock）"""
+        if self.overflow_policy != OVERFLOW_COALESCE or not self.task_queue.full():
+            return None
+        target = self.last_enqueued
+        if target is None or target.status != TaskStatus.PENDING:
+            return None
+        target.text = f"{target.text}\n{text}"
+        target.coalesced_hashes.append(text_hash)
+        self.active_by_hash[text_hash] = target.task_id
+        if self.durable is not None:
+            self.durable.update_text(target.task_id, target.text)
+        self.coalesced_tasks += 1
+        logger.info(f"任务队列已满，新一轮对话并入任务: {target.task_id}")
+        return target.task_id
+
+    async def _replay_durable(self):
+        """回放磁盘队列中上次未处理完的任务"""
+        rows = self.durable.load()
+        if not rows:
+            return
+        async with self.lock:
+            for task_id, text, text_hash, created_at in rows:
+                if task_id in self.tasks:
+                    continue
+                task = ExtractionTask(
+                    task_id=task_id,
+                    text=text,
+                    text_hash=text_hash,
+                    status=TaskStatus.PENDING,
+                    created_at=created_at,
+                    future=asyncio.Future()
+                )
+                self.tasks[task_id] = task
+                self.active_by_hash.setdefault(text_hash, task_id)
+                self._enqueue(task)
+        logger.info(f"已回放 {len(rows)} 个未完成的提取任务")
+
     async def get_task_result(self, task_id: str, timeout: float = None) -> Tuple[List, str]:
         """获取任务结果，支持超时等待"""
         async with self.lock:
@@ -257,86 +405,35 @@ class QuintupleTaskManager:
                 # === 添加队列状态日志 ===
                 logger.debug(f"{worker_id} 正在等待新任务 (队列大小: {self.task_queue.qsize()})")
 
-                # 使用带超时的get，避免永久阻塞
-                try:
-                    task = await asyncio.wait_for(self.task_queue.get(), timeout=1.0)
-                except asyncio.TimeoutError:
-                    # 超时但继续循环检查
-                    continue
-
-                logger.info(f"{worker_id} 获取到任务: {task.task_id}")
-
-                if task.status != TaskStatus.PENDING:
-                    logger.warning(f"任务状态异常: {task.task_id} ({task.status.value})")
-                    self.task_queue.task_done()
+                async with self.collect_lock:
+                    # 使用带超时的get，避免永久阻塞
+                    try:
+                        task = await self._take(timeout=1.0)
+                    except asyncio.TimeoutError:
+                        # 超时但继续循环检查
+                        continue
+                    batch = await self._collect_batch(task)
+
+                tasks = []
+                for task in batch:
+                    if task.status != TaskStatus.PENDING:
+                        logger.warning(f"任务状态异常: {task.task_id} ({task.status.value})")
+                        self.task_queue.task_done()
+                        continue
+                    # 更新任务状态
+                    task.status = TaskStatus.RUNNING
+                    task.started_at = time.time()
+                    tasks.append(task)
+                if not tasks:
                     continue
 
-                # 更新任务状态
-                task.status = TaskStatus.RUNNING
-                task.started_at = time.time()
-                logger.info(f"{worker_id} 开始处理任务: {task.task_id}")
-
-                # 执行任务
-                result = None
-                error = None
-                try:
-                    # 导入提取函数（避免循环导入）
-                    from .quintuple_extractor import extract_quintuples_async
-                    logger.info(f"{worker_id} 调用五元组提取API: {task.task_id}")
-
-                    # 使用超时控制执行任务
-                    result = await asyncio.wait_for(
-                        extract_quintuples_async(task.text),
-                        timeout=self.task_timeout
-                    )
-                    logger.info(f"{worker_id} 提取到 {len(result)} 个五元组: {task.text}")
-
-                    # 更新任务状态
-                    async with self.lock:
-                        task.status = TaskStatus.COMPLETED
-                        task.result = result
-                        task.completed_at = time.time()
-                        self.completed_tasks += 1
-
-                except asyncio.TimeoutError:
-                    error = "任务执行超时"
-                    logger.warning(f"{worker_id} 任务超时: {task.task_id}")
-                    async with self.lock:
-                        task.status = TaskStatus.FAILED
-                        task.error = error
-                        task.completed_at = time.time()
-                        self.failed_tasks += 1
-
-                except Exception as e:
-                    error = str(e)
-                    logger.error(f"{worker_id} 任务失败: {task.task_id}, 错误: {error}")
-                    traceback.print_exc()
-                    async with self.lock:
-                        task.status = TaskStatus.FAILED
-                        task.error = error
-                        task.completed_at = time.time()
-                        self.failed_tasks += 1
-
-                # 设置future结果
-                if not task.future.done():
-                    if task.status == TaskStatus.COMPLETED:
-                        task.future.set_result(result)
-                    else:
-                        task.future.set_exception(Exception(error or "任务失败"))
-
-                # 触发回调
-                try:
-                    if task.status == TaskStatus.COMPLETED and self.on_task_completed:
-                        self.on_task_completed(task.task_id, result)
-                    elif task.status == TaskStatus.FAILED and self.on_task_failed:
-                        self.on_task_failed(task.task_id, error)
-                except Exception as e:
-                    logger.error(f"任务回调失败: {task.task_id}, 错误: {str(e)}")
+                logger.info(f"{worker_id} 开始处理任务: {', '.join(t.task_id for t in tasks)}")
+                await self._run_batch(worker_id, tasks)
 
                 # 标记任务完成
-                self.task_queue.task_done()
-                logger.info(f"{worker_id} 任务处理完成: {task.task_id}")
-
+                for task in tasks:
+                    self.task_queue.task_done()
+                logger.info(f"{worker_id} 任务处理完成: {len(tasks)} 个")
 
             except asyncio.CancelledError:
                 logger.info(f"{worker_id} 工作协程被取消")
@@ -348,6 +445,91 @@ class QuintupleTaskManager:
                 # 防止异常导致循环崩溃
                 await asyncio.sleep(1)
 
+    async def _take(self, timeout: float) -> ExtractionTask:
+        task = await asyncio.wait_for(self.task_queue.get(), timeout=timeout)
+        self._refill_from_spill()
+        return task
+
+    async def _collect_batch(self, first: ExtractionTask) -> List[ExtractionTask]:
+        """以 first 为首攒一批任务：凑满 batch_size 或等待窗口到期即返回"""
+        batch = [first]
+        if self.batch_size <= 1:
+            return batch
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.batch_window
+        while len(batch) < self.batch_size:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await self._take(timeout=remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run_batch(self, worker_id: str, tasks: List[ExtractionTask]):
+        """一次提取调用处理整批任务，再把结果拆回各任务"""
+        # 导入提取函数（避免循环导入）
+        from .quintuple_extractor import extract_quintuples_batch_async
+        logger.info(f"{worker_id} 调用五元组提取API: {len(tasks)} 段文本")
+
+        # 批量输出更长，超时按批大小适当放宽
+        timeout = self.task_timeout * (1 + 0.5 * (len(tasks) - 1))
+        self.extraction_calls += 1
+        try:
+            results = await asyncio.wait_for(
+                extract_quintuples_batch_async([task.text for task in tasks]),
+                timeout=timeout
+            )
+        except asyncio.TimeoutError:
+            logger.warning(f"{worker_id} 任务超时: {', '.join(t.task_id for t in tasks)}")
+            for task in tasks:
+                await self._finish_task(task, None, "任务执行超时")
+            return
+        except Exception as e:
+            logger.error(f"{worker_id} 任务失败: {', '.join(t.task_id for t in tasks)}, 错误: {e}")
+            traceback.print_exc()
+            for task in tasks:
+                await self._finish_task(task, None, str(e))
+            return
+
+        for task, result in zip(tasks, results):
+            logger.info(f"{worker_id} 提取到 {len(result)} 个五元组: {task.text}")
+            await self._finish_task(task, result, None)
+
+    async def _finish_task(self, task: ExtractionTask, result: Optional[List], error: Optional[str]):
+        """更新任务状态、设置 future 并触发回调"""
+        self._unpersist(task)
+        async with self.lock:
+            self._release_hash(task)
+            if task.status == TaskStatus.CANCELLED:
+                # 运行期间已被取消：丢弃结果
+                return
+            task.completed_at = time.time()
+            if error is None:
+                task.status = TaskStatus.COMPLETED
+                task.result = result
+                self.completed_tasks += 1
+            else:
+                task.status = TaskStatus.FAILED
+                task.error = error
+                self.failed_tasks += 1
+
+        # 设置future结果
+        if not task.future.done():
+            if task.status == TaskStatus.COMPLETED:
+                task.future.set_result(result)
+            else:
+                task.future.set_exception(Exception(error or "任务失败"))
+
+        # 触发回调
+        try:
+            if task.status == TaskStatus.COMPLETED and self.on_task_completed:
+                self.on_task_completed(task.task_id, result)
+            elif task.status == TaskStatus.FAILED and self.on_task_failed:
+                self.on_task_failed(task.task_id, error)
+        except Exception as e:
+            logger.error(f"任务回调失败: {task.task_id}, 错误: {str(e)}")
 
     async def clear_completed_tasks(self, max_age_hours: int = None):
         """清理已完成的任务"""
@@ -417,6 +599,8 @@ class QuintupleTaskManager:
             if task.status in [TaskStatus.PENDING, TaskStatus.RUNNING]:
                 task.status = TaskStatus.CANCELLED
                 task.completed_at = time.time()
+                self._release_hash(task)
+                self._unpersist(task)
 
                 # 设置future异常
                 if task.future and not task.future.done():
@@ -463,7 +647,15 @@ class QuintupleTaskManager:
             "max_queue_size": self.max_queue_size,
             "queue_size": self.task_queue.qsize(),
             "queue_usage": f"{self.task_queue.qsize()}/{self.max_queue_size}",
-            "task_timeout": self.task_timeout
+            "task_timeout": self.task_timeout,
+            "batch_size": self.batch_size,
+            "batch_window": self.batch_window,
+            "extraction_calls": self.extraction_calls,
+            "overflow_policy": self.overflow_policy,
+            "spilled_tasks": len(self.spilled),
+            "dropped_tasks": self.dropped_tasks,
+            "coalesced_tasks": self.coalesced_tasks,
+            "persistent_queue": self.durable is not None
         }
 
 
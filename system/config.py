@@ -428,6 +428,21 @@ class GRAGConfig(BaseModel):
     extraction_timeout: int = Field(default=12, ge=1, le=60, description="知识提取超时时间（秒）")
     extraction_retries: int = Field(default=2, ge=0, le=5, description="知识提取重试次数")
     base_timeout: int = Field(default=15, ge=5, le=120, description="基础操作超时时间（秒）")
+    local_store: str = Field(default="jsonl", description="五元组本地存储引擎：jsonl（快照+追加日志）/ sqlite（带 head/tail/relation 索引的表）")
+    llm_keyword_fallback: bool = Field(default=True, description="问题中未匹配到已知实体时，是否调用LLM提取关键词")
+    extraction_batch_size: int = Field(default=4, ge=1, le=20, description="五元组提取微批大小：最多合并多少轮对话为一次LLM调用（1为不合并）")
+    extraction_batch_window: float = Field(default=1.5, ge=0.0, le=30.0, description="五元组提取微批等待窗口（秒）")
+    extraction_queue_persist: bool = Field(default=True, description="五元组提取队列是否持久化到磁盘（重启后回放未完成任务）")
+    extraction_queue_overflow: str = Field(default="spill", description="提取队列满时的策略：spill（暂存磁盘）/ drop_oldest（丢弃最早）/ coalesce（并入最近的等待任务）")
+
+
+class Neo4jConnectionConfig(BaseModel):
+    """共享 Neo4j 驱动配置（记忆图谱与攻略图谱共用）"""
+
+    max_pool_size: int = Field(default=20, ge=1, le=200, description="每个 Neo4j 实例的最大连接数")
+    query_timeout: float = Field(default=15.0, ge=1.0, le=600.0, description="单次查询 / 事务超时时间（秒）")
+    max_retries: int = Field(default=2, ge=0, le=10, description="连接中断或瞬时错误时的重试次数")
+    retry_backoff: float = Field(default=0.5, ge=0.0, le=30.0, description="首次重试前的等待时间（秒），之后指数递增")
 
 
 class HandoffConfig(BaseModel):
@@ -710,6 +725,7 @@ class OnlineSearchConfig(BaseModel):
     num_results: int = Field(default=5, ge=1, le=20, description="搜索结果数量")
     search_api_key: str = Field(default="", description="Brave Search API Key（未登录Naga时使用）")
     search_api_base: str = Field(default="https://api.search.brave.com/res/v1/web/search", description="搜索API地址")
+    result_cache_ttl: int = Field(default=300, ge=0, description="相同搜索请求的结果缓存秒数（0 为不缓存）")
 
 
 class OpenClawFeishuConfig(BaseModel):
@@ -775,6 +791,37 @@ class TelemetryConfig(BaseModel):
     max_queue_bytes: int = Field(default=8 * 1024 * 1024, ge=1024 * 1024, le=128 * 1024 * 1024, description="本地队列最大字节数")
 
 
+class ToolServiceLimitConfig(BaseModel):
+    """单个工具服务的调度限制"""
+
+    concurrency: int = Field(default=0, ge=0, le=64, description="最大并发调用数（0 为不限）")
+    rate: float = Field(default=0.0, ge=0.0, le=100.0, description="令牌桶速率：每秒允许发起的调用数（0 为不限速）")
+    burst: int = Field(default=1, ge=1, le=100, description="令牌桶容量：允许的瞬时突发调用数")
+
+
+def _default_tool_service_limits() -> Dict[str, ToolServiceLimitConfig]:
+    return {
+        "openclaw": ToolServiceLimitConfig(concurrency=2),
+        "web_search": ToolServiceLimitConfig(concurrency=3, rate=2.0, burst=3),
+        "search_proxy": ToolServiceLimitConfig(concurrency=3, rate=2.0, burst=3),
+        "mcp": ToolServiceLimitConfig(concurrency=4),
+    }
+
+
+class ToolSchedulerConfig(BaseModel):
+    """并行工具调用调度配置
+
+    services 的键为服务分组：openclaw（OpenClaw 网关/agent 会话工具）、web_search、local（本地执行工具）、
+    naga_control、search_proxy（OpenClaw 网关经 /tools/search 的搜索）、mcp（全部 MCP 服务），
+    或 mcp:<服务名> 单独限制某个 MCP 服务。
+    """
+
+    default_concurrency: int = Field(default=4, ge=0, le=64, description="未单独配置的服务的最大并发数（0 为不限）")
+    services: Dict[str, ToolServiceLimitConfig] = Field(
+        default_factory=_default_tool_service_limits, description="按服务分组的并发与速率限制"
+    )
+
+
 class FeishuNotificationConfig(BaseModel):
     """飞书通知默认配置。"""
 
@@ -1323,6 +1370,7 @@ class NagaConfig(BaseModel):
     agent_server: AgentServerConfig = Field(default_factory=AgentServerConfig)
     mcp_server: MCPServerConfig = Field(default_factory=MCPServerConfig)
     grag: GRAGConfig = Field(default_factory=GRAGConfig)
+    neo4j: Neo4jConnectionConfig = Field(default_factory=Neo4jConnectionConfig)
     handoff: HandoffConfig = Field(default_factory=HandoffConfig)
     browser: BrowserConfig = Field(default_factory=BrowserConfig)
     tts: TTSConfig = Field(default_factory=TTSConfig)
@@ -1343,6 +1391,7 @@ class NagaConfig(BaseModel):
     notifications: NotificationsConfig = Field(default_factory=NotificationsConfig)
     naga_business: NagaBusinessConfig = Field(default_factory=NagaBusinessConfig)
     telemetry: TelemetryConfig = Field(default_factory=TelemetryConfig)
+    tool_scheduler: ToolSchedulerConfig = Field(default_factory=ToolSchedulerConfig)
     system_check: SystemCheckConfig = Field(default_factory=SystemCheckConfig)
     computer_control: ComputerControlConfig = Field(default_factory=ComputerControlConfig)
     guide_engine: GuideEngineConfig = Field(default_factory=GuideEngineConfig)
@@ -0,0 +1,234 @@
+"""
+共享 Neo4j 访问层（官方 neo4j 异步驱动）
+
+summer_memory（记忆图谱）与 guide_engine（攻略图谱）共用同一套驱动与连接池：
+  - 同一 (uri, user) 只创建一个驱动，连接池大小、查询超时、重试次数读取 config.json 的 neo4j 段
+  - 驱动运行在专用的 IO 线程事件循环上，任意事件循环都可以直接 await，
+    同步代码（写缓冲线程等）通过 *_sync 方法调用，不再占用 asyncio.to_thread 线程池
+  - 连接中断、会话过期、瞬时错误（死锁等）按指数退避重试；查询超时同时在服务端
+    （事务超时）与客户端（wait_for）生效
+"""
+
+import asyncio
+import atexit
+import concurrent.futures
+import logging
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+try:
+    from neo4j import AsyncGraphDatabase, Query, READ_ACCESS, WRITE_ACCESS
+    from neo4j.exceptions import ServiceUnavailable, SessionExpired, TransientError
+    _RETRYABLE_ERRORS: Tuple[type, ...] = (ServiceUnavailable, SessionExpired, TransientError)
+except ImportError:
+    AsyncGraphDatabase = None  # type: ignore[assignment,misc]
+    Query = None  # type: ignore[assignment,misc]
+    READ_ACCESS, WRITE_ACCESS = "READ", "WRITE"
+    _RETRYABLE_ERRORS = ()
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_POOL_SIZE = 20
+DEFAULT_QUERY_TIMEOUT = 15.0    # 秒
+DEFAULT_MAX_RETRIES = 2
+DEFAULT_RETRY_BACKOFF = 0.5     # 秒，第 n 次重试前等待 backoff * 2^(n-1)
+CLIENT_TIMEOUT_GRACE = 5.0      # 客户端超时比服务端事务超时多留的余量（秒）
+
+Statement = Tuple[str, Dict[str, Any]]
+
+
+class _IOLoop:
+    """所有驱动共用的专用事件循环线程"""
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run, name="neo4j-io", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def submit(self, coro) -> concurrent.futures.Future:
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def stop(self):
+        self.loop.call_soon_threadsafe(self.loop.stop)
+
+
+_io_loop: Optional[_IOLoop] = None
+_io_loop_lock = threading.Lock()
+
+
+def _get_io_loop() -> _IOLoop:
+    global _io_loop
+    with _io_loop_lock:
+        if _io_loop is None:
+            _io_loop = _IOLoop()
+        return _io_loop
+
+
+class Neo4jClient:
+    """共享驱动的查询入口；async 方法可在任意事件循环中 await，*_sync 方法供同步代码调用"""
+
+    def __init__(self, uri: str, user: str, password: str, *,
+                 max_pool_size: int = DEFAULT_MAX_POOL_SIZE,
+                 query_timeout: float = DEFAULT_QUERY_TIMEOUT,
+                 max_retries: int = DEFAULT_MAX_RETRIES,
+                 retry_backoff: float = DEFAULT_RETRY_BACKOFF):
+        if AsyncGraphDatabase is None:
+            raise RuntimeError("neo4j 未安装，请运行 pip install neo4j 或禁用图数据库功能")
+        self.uri = uri
+        self.user = user
+        self._password = password
+        self.max_pool_size = max_pool_size
+        self.query_timeout = query_timeout
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self._io = _get_io_loop()
+        self._driver = None  # 在 IO 循环中惰性创建，驱动绑定该循环
+
+    # ------------------------------------------------------------------
+    # IO 循环内执行
+    # ------------------------------------------------------------------
+
+    def _get_driver(self):
+        if self._driver is None:
+            self._driver = AsyncGraphDatabase.driver(
+                self.uri,
+                auth=(self.user, self._password),
+                max_connection_pool_size=self.max_pool_size,
+            )
+        return self._driver
+
+    async def _with_retry(self, operation, timeout: float):
+        attempt = 0
+        while True:
+            try:
+                return await asyncio.wait_for(operation(), timeout=timeout + CLIENT_TIMEOUT_GRACE)
+            except _RETRYABLE_ERRORS as e:
+                if attempt >= self.max_retries:
+                    raise
+                attempt += 1
+                delay = self.retry_backoff * (2 ** (attempt - 1))
+                logger.warning(f"[Neo4j] 查询失败，{delay:.1f}s 后第 {attempt} 次重试: {e}")
+                await asyncio.sleep(delay)
+
+    async def _run_on_loop(self, query: str, parameters: Dict[str, Any], database: Optional[str],
+                           write: bool, timeout: float) -> List[Dict[str, Any]]:
+        async def operation():
+            session = self._get_driver().session(
+                database=database, default_access_mode=WRITE_ACCESS if write else READ_ACCESS)
+            async with session:
+                result = await session.run(Query(query, timeout=timeout), parameters)
+                return [record.data() async for record in result]
+        return await self._with_retry(operation, timeout)
+
+    async def _run_tx_on_loop(self, statements: List[Statement], database: Optional[str],
+                              timeout: float) -> None:
+        async def operation():
+            async with self._get_driver().session(database=database) as session:
+                tx = await session.begin_transaction(timeout=timeout)
+                try:
+                    for query, parameters in statements:
+                        result = await tx.run(query, parameters)
+                        await result.consume()
+                    await tx.commit()
+                finally:
+                    await tx.close()  # 未提交时回滚
+        await self._with_retry(operation, timeout)
+
+    # ------------------------------------------------------------------
+    # 对外接口
+    # ------------------------------------------------------------------
+
+    async def run(self, query: str, parameters: Optional[Dict[str, Any]] = None, *,
+                  database: Optional[str] = None, write: bool = False,
+                  timeout: Optional[float] = None) -> List[Dict[str, Any]]:
+        """执行一条 Cypher（自动提交），返回记录字典列表"""
+        future = self._io.submit(self._run_on_loop(
+            query, parameters or {}, database, write, timeout or self.query_timeout))
+        return await asyncio.wrap_future(future)
+
+    async def run_in_transaction(self, statements: Iterable[Statement], *,
+                                 database: Optional[str] = None, timeout: Optional[float] = None) -> None:
+        """在一个写事务中依次执行多条语句，全部成功才提交"""
+        future = self._io.submit(self._run_tx_on_loop(
+            list(statements), database, timeout or self.query_timeout))
+        await asyncio.wrap_future(future)
+
+    def run_sync(self, query: str, parameters: Optional[Dict[str, Any]] = None, *,
+                 database: Optional[str] = None, write: bool = False,
+                 timeout: Optional[float] = None) -> List[Dict[str, Any]]:
+        """同步版 run（不可在 IO 循环线程内调用）"""
+        timeout = timeout or self.query_timeout
+        future = self._io.submit(self._run_on_loop(query, parameters or {}, database, write, timeout))
+        return future.result()
+
+    def run_in_transaction_sync(self, statements: Iterable[Statement], *,
+                                database: Optional[str] = None, timeout: Optional[float] = None) -> None:
+        """同步版 run_in_transaction"""
+        future = self._io.submit(self._run_tx_on_loop(
+            list(statements), database, timeout or self.query_timeout))
+        future.result()
+
+    def wait(self, coro):
+        """在 IO 循环上执行协程（可在其中 await 本客户端的 async 方法）并同步等待结果"""
+        return self._io.submit(coro).result()
+
+    def verify_connectivity_sync(self, timeout: float = 5.0) -> bool:
+        """检查数据库是否可达（不重试）"""
+        async def verify():
+            await asyncio.wait_for(self._get_driver().verify_connectivity(), timeout=timeout)
+        try:
+            self._io.submit(verify()).result()
+            return True
+        except Exception as e:
+            logger.warning(f"[Neo4j] 无法连接 {self.uri}: {e}")
+            return False
+
+    async def _close_on_loop(self):
+        if self._driver is not None:
+            await self._driver.close()
+            self._driver = None
+
+    def close_sync(self):
+        try:
+            self._io.submit(self._close_on_loop()).result(timeout=5)
+        except Exception as e:
+            logger.debug(f"[Neo4j] 关闭驱动失败: {e}")
+
+
+_clients: Dict[Tuple[str, str, str], Neo4jClient] = {}
+_clients_lock = threading.Lock()
+
+
+def get_neo4j_client(uri: str, user: str, password: str) -> Neo4jClient:
+    """获取（或创建）指定数据库的共享客户端；连接池参数取自 config.neo4j"""
+    key = (uri, user, password)
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            try:
+                from system.config import config
+                pool_cfg = config.neo4j
+                options = dict(
+                    max_pool_size=pool_cfg.max_pool_size,
+                    query_timeout=pool_cfg.query_timeout,
+                    max_retries=pool_cfg.max_retries,
+                    retry_backoff=pool_cfg.retry_backoff,
+                )
+            except Exception:
+                options = {}
+            client = Neo4jClient(uri, user, password, **options)
+            _clients[key] = client
+        return client
+
+
+@atexit.register
+def close_all_clients():
+    with _clients_lock:
+        clients = list(_clients.values())
+        _clients.clear()
+    for client in clients:
+        client.close_sync()